@@ -0,0 +1 @@
+"""Performance benchmarks for the Lambda handlers (not deployed)."""
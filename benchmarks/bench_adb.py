@@ -0,0 +1,116 @@
+"""Latency of multi-read requests: sequential ``lib.db`` calls vs gathered ``lib.adb`` calls.
+
+Usage::
+
+    python -m benchmarks.bench_adb                    # compare with baseline
+    python -m benchmarks.bench_adb --update-baseline
+
+The tables live in ``LocalDynamo`` with ``LATENCY`` seconds injected per call
+to stand in for the network round trip, so wall time is dominated by how
+many round trips a request waits for one after another. Reads are consistent
+so the container cache never answers. Each pair of cases does the same
+reads: ``*_sequential`` one call after another, ``*_gathered`` with
+``asyncio.gather`` on the shared pool.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+from benchmarks.local_dynamo import LocalDynamo
+
+import lib.db
+from lib import adb
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+LATENCY = 0.005
+ROWS = 2_000
+GETS = 10
+BATCH = 500
+SEGMENTS = 4
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs over one emulated table."""
+    emu = LocalDynamo(latency=LATENCY, page_limit_bytes=64 * 1024)
+    emu.create_table(
+        "bench-adb",
+        "patient_id",
+        [{"patient_id": f"p{i}", "notes": "n" * 200} for i in range(ROWS)],
+    )
+    os.environ["DYNAMODB_TABLE"] = "bench-adb"
+    lib.db._table = emu.resource().Table("bench-adb")
+    lib.db._dynamodb = emu.resource()
+    ids = [f"p{i}" for i in range(0, ROWS, ROWS // BATCH)]
+
+    def gets_sequential() -> None:
+        for pid in ids[:GETS]:
+            lib.db.get_patient(pid, consistent=True)
+
+    async def _gets() -> None:
+        await asyncio.gather(*(adb.get_patient(pid, consistent=True) for pid in ids[:GETS]))
+
+    def batch_sequential() -> None:
+        for i in range(0, BATCH, adb.BATCH_GET_LIMIT):
+            adb.run(adb.batch_get_patients(ids[i : i + adb.BATCH_GET_LIMIT], consistent=True))
+
+    return [
+        (f"gets_sequential@{GETS}", gets_sequential),
+        (f"gets_gathered@{GETS}", lambda: adb.run(_gets())),
+        (f"batch_get_sequential@{BATCH}", batch_sequential),
+        (
+            f"batch_get_gathered@{BATCH}",
+            lambda: adb.run(adb.batch_get_patients(ids, consistent=True)),
+        ),
+        (f"scan_sequential@{ROWS}", lib.db.scan_patients),
+        (f"scan_segments{SEGMENTS}@{ROWS}", lambda: adb.run(adb.scan_patients(SEGMENTS))),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; prints the speed-up of each gathered case over its pair."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        results[name] = measure(thunk, repeats=20)
+    for sequential, gathered in (
+        (f"gets_sequential@{GETS}", f"gets_gathered@{GETS}"),
+        (f"batch_get_sequential@{BATCH}", f"batch_get_gathered@{BATCH}"),
+        (f"scan_sequential@{ROWS}", f"scan_segments{SEGMENTS}@{ROWS}"),
+    ):
+        speedup = results[sequential]["p50_ms"] / results[gathered]["p50_ms"]
+        print(f"{gathered}: {speedup:.1f}x faster than {sequential}", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
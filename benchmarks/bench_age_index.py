@@ -0,0 +1,140 @@
+"""Age-window queries: in-memory scan aggregation vs the age index and the cohort cube.
+
+Usage::
+
+    python -m benchmarks.bench_age_index                    # compare with baseline
+    python -m benchmarks.bench_age_index --update-baseline
+
+The ``scan_*`` cases aggregate an already-scanned list the way the admin
+handlers do (no DynamoDB round trips), so they are a lower bound on the live
+path; the ``index_*`` and ``cube_*`` cases answer the same windows from
+``lib.age_index`` and ``lib.cohort_cube``. ``snapshot_load``,
+``cube_load`` and ``stream_apply`` cover what a container pays to load
+either structure and what the stream handler pays per batch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import patients
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+from boto3.dynamodb.types import TypeSerializer
+
+from lib import age_index, aggregate, cohort_cube
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ROWS = 10_000
+WINDOWS = [(None, None), (18.0, 65.0), (30.0, 39.99), (65.0, None)]
+STREAM_BATCH = 100
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs over one synthetic dataset."""
+    items = patients(ROWS)
+    index = age_index.AgeIndex.build(items)
+    data = index.to_bytes()
+    cube = cohort_cube.CohortCube.build(items)
+    cube_data = cube.to_bytes()
+    print(
+        f"age index {len(data) // 1024} KB, cube {len(cube_data) // 1024} KB "
+        f"({len(cube.years)} year + {len(cube.days)} day cells)",
+        file=sys.stderr,
+    )
+    serializer = TypeSerializer()
+    records = [
+        {
+            "dynamodb": {
+                "OldImage": {k: serializer.serialize(v) for k, v in it.items()},
+                "NewImage": {k: serializer.serialize(v) for k, v in {**it, "sex": "X"}.items()},
+            }
+        }
+        for it in items[:STREAM_BATCH]
+    ]
+
+    def scan_overview() -> None:
+        for lo, hi in WINDOWS:
+            aggregate.overview(*aggregate.select(items, lo, hi))
+
+    def scan_diseases() -> None:
+        for lo, hi in WINDOWS:
+            aggregate.disease_counts(aggregate.within(items, lo, hi))
+
+    def index_overview() -> None:
+        for lo, hi in WINDOWS:
+            index.overview(lo, hi)
+
+    def index_diseases() -> None:
+        for lo, hi in WINDOWS:
+            index.term_counts("diseases", lo, hi)
+
+    def cube_overview() -> None:
+        for lo, hi in WINDOWS:
+            cube.overview(lo, hi)
+
+    def cube_diseases() -> None:
+        for lo, hi in WINDOWS:
+            cube.term_counts("diseases", lo, hi)
+
+    def stream_apply() -> None:
+        loaded = age_index.AgeIndex.from_bytes(data)
+        for record in records:
+            loaded.apply_stream_record(record)
+        loaded.to_bytes()
+
+    return [
+        (f"scan_overview@{ROWS}", scan_overview),
+        (f"index_overview@{ROWS}", index_overview),
+        (f"scan_diseases@{ROWS}", scan_diseases),
+        (f"index_diseases@{ROWS}", index_diseases),
+        (f"cube_overview@{ROWS}", cube_overview),
+        (f"cube_diseases@{ROWS}", cube_diseases),
+        (f"snapshot_load@{ROWS}", lambda: age_index.AgeIndex.from_bytes(data)),
+        (f"cube_load@{ROWS}", lambda: cohort_cube.CohortCube.from_bytes(cube_data)),
+        (f"stream_apply@{STREAM_BATCH}", stream_apply),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; prints the speed-up of each index and cube case over its scan."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        results[name] = measure(thunk, repeats=10)
+    for what in ("overview", "diseases"):
+        scan = results[f"scan_{what}@{ROWS}"]["p50_ms"]
+        for kind in ("index", "cube"):
+            speedup = scan / results[f"{kind}_{what}@{ROWS}"]["p50_ms"]
+            print(f"{kind}_{what}: {speedup:.0f}x faster than scan_{what}", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""Medication x disease associations: one full scan per question vs the CSR matrix.
+
+Usage::
+
+    python -m benchmarks.bench_associations                    # compare with baseline
+    python -m benchmarks.bench_associations --update-baseline
+
+``scan_associations`` counts medication/disease pairs and both marginals by
+walking every patient, which is what each question would cost without the
+matrix; ``matrix_query`` answers the same windows from
+``lib.associations``. ``matrix_build`` is the one pass the precompute job
+(or the scan fallback) pays and ``matrix_load`` what a container pays to
+read the published snapshot. Everything runs at ``ROWS`` = 1M patients, so
+the slow cases are measured once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.datasets import patients
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+from lib import associations
+from lib.utils import compute_age_years
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ROWS = 1_000_000
+WINDOWS = [(None, None), (18.0, 65.0), (65.0, None)]
+TOP = 5
+SLOW = ("scan_associations", "matrix_build")
+
+
+def _scan_associations(
+    items: List[Dict[str, Any]], min_age: Optional[float], max_age: Optional[float]
+) -> Tuple[int, Dict[str, int], Dict[str, int], Dict[Tuple[str, str], int]]:
+    total = 0
+    meds: Dict[str, int] = {}
+    diseases: Dict[str, int] = {}
+    pairs: Dict[Tuple[str, str], int] = {}
+    for it in items:
+        age = compute_age_years(it["date_of_birth"])
+        if (min_age is not None and age < min_age) or (max_age is not None and age > max_age):
+            continue
+        total += 1
+        ds = set(it.get("diseases") or [])
+        for d in ds:
+            diseases[d] = diseases.get(d, 0) + 1
+        for m in set(it.get("medications") or []):
+            meds[m] = meds.get(m, 0) + 1
+            for d in ds:
+                pairs[(m, d)] = pairs.get((m, d), 0) + 1
+    return total, meds, diseases, pairs
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs over one synthetic dataset."""
+    items = patients(ROWS)
+    matrix = associations.AssociationMatrix.build(items)
+    data = matrix.to_bytes()
+    print(
+        f"matrix {len(data) // 1024} KB, {matrix.nnz} cells, {len(matrix.days)} series points",
+        file=sys.stderr,
+    )
+
+    def scan_associations() -> None:
+        for lo, hi in WINDOWS:
+            _scan_associations(items, lo, hi)
+
+    def matrix_query() -> None:
+        for lo, hi in WINDOWS:
+            matrix.associations(lo, hi, TOP)
+
+    return [
+        (f"scan_associations@{ROWS}", scan_associations),
+        (f"matrix_query@{ROWS}", matrix_query),
+        (f"matrix_build@{ROWS}", lambda: associations.AssociationMatrix.build(items)),
+        (f"matrix_load@{ROWS}", lambda: associations.AssociationMatrix.from_bytes(data)),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; prints the speed-up of the matrix query over the scan."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        slow = name.startswith(SLOW)
+        results[name] = measure(thunk, repeats=1 if slow else 10, warmup=0 if slow else 1)
+        print(f"{name}: {results[name]}", file=sys.stderr)
+    scan = results[f"scan_associations@{ROWS}"]["p50_ms"]
+    speedup = scan / results[f"matrix_query@{ROWS}"]["p50_ms"]
+    print(f"matrix_query: {speedup:.0f}x faster than scan_associations", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""In-function JWT verification cost on verified-token cache hits and misses.
+
+Usage::
+
+    python -m benchmarks.bench_auth                    # compare with baseline
+    python -m benchmarks.bench_auth --update-baseline
+
+Each case verifies ``TOKENS`` distinct 2048-bit RS256 tokens, so ``p50_ms`` of
+a case divided by ``TOKENS`` is the cost of one verification. ``jwt_miss``
+clears the verified-token LRU first (base64 + JSON + one RSA public-key
+operation per token); ``jwt_hit`` only hashes the token and looks it up.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+import dev_jwt
+from lib import auth
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+TOKENS = 100
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs; each thunk verifies ``TOKENS`` tokens."""
+    key = dev_jwt.generate_key(2048, seed=2048)
+    jwks = auth.JwksCache(fetch=lambda: dev_jwt.jwks([key]))
+    cache = auth.VerifiedTokenCache(max_size=TOKENS * 2)
+    tokens = [
+        dev_jwt.sign(key, dev_jwt.claims_for(f"user-{i}", groups=["GroupPatients"]))
+        for i in range(TOKENS)
+    ]
+
+    def miss() -> None:
+        cache.clear()
+        for token in tokens:
+            auth.verify_token(token, jwks, cache, issuer="", audience="")
+
+    def hit() -> None:
+        for token in tokens:
+            auth.verify_token(token, jwks, cache, issuer="", audience="")
+
+    miss()
+    return [("jwt_miss", miss), ("jwt_hit", hit)]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures both cases; results are keyed ``"<case>@<TOKENS>"``."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        key = f"{name}@{TOKENS}"
+        results[key] = measure(thunk, repeats=20)
+        per_token = results[key]["p50_ms"] * 1000.0 / TOKENS
+        print(f"{key}: {per_token:.1f} us/verification", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Peak memory of an aggregation scan: boto3 dicts vs ``lib.columnar`` columns.
+
+Usage::
+
+    python -m benchmarks.bench_columnar                    # compare with baseline
+    python -m benchmarks.bench_columnar --update-baseline
+
+Each ``scan_*`` case deserialises the same low-level scan pages the way the
+boto3 resource does. ``scan_dicts`` keeps every item, as ``scan_patients``
+does. ``scan_columns`` appends each page to ``PatientColumns`` and drops it,
+as ``scan_columns`` does. ``overview_*`` aggregates the kept data. Peak
+memory is printed per 100k patients next to the 256 MB function size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import patients
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from lib import aggregate
+from lib.columnar import ATTRIBUTES, PatientColumns
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ROWS = 100_000
+PAGE = 1_000
+WINDOW = (18.0, 65.0)
+
+
+def _pages(projected: bool) -> List[List[Dict[str, Any]]]:
+    ser = TypeSerializer()
+    keep = set(ATTRIBUTES)
+    raw = [
+        {k: ser.serialize(v) for k, v in it.items() if not projected or k in keep}
+        for it in patients(ROWS)
+    ]
+    return [raw[i : i + PAGE] for i in range(0, len(raw), PAGE)]
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs over the same synthetic scan."""
+    full, projected = _pages(False), _pages(True)
+    deserializer = TypeDeserializer()
+
+    def load(page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{k: deserializer.deserialize(v) for k, v in it.items()} for it in page]
+
+    def scan_dicts() -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        for page in full:
+            items.extend(load(page))
+        return items
+
+    def scan_columns() -> PatientColumns:
+        columns = PatientColumns()
+        for page in projected:
+            columns.extend(load(page))
+        return columns
+
+    items, columns = scan_dicts(), scan_columns()
+
+    def overview_dicts() -> None:
+        aggregate.overview(*aggregate.select(items, *WINDOW))
+
+    def overview_columns() -> None:
+        columns.overview(*columns.select(*WINDOW))
+
+    print(f"columns hold {columns.nbytes() // 1024} KB for {ROWS} patients", file=sys.stderr)
+    return [
+        (f"scan_dicts@{ROWS}", scan_dicts),
+        (f"scan_columns@{ROWS}", scan_columns),
+        (f"overview_dicts@{ROWS}", overview_dicts),
+        (f"overview_columns@{ROWS}", overview_columns),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; prints peak memory per 100k patients."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        results[name] = measure(thunk, repeats=3)
+        per_100k = results[name]["peak_kb"] / 1024 * 100_000 / ROWS
+        print(f"{name}: peak {per_100k:.1f} MB per 100k patients", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
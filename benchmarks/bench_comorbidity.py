@@ -0,0 +1,108 @@
+"""Disease co-occurrence: dict-per-patient scan vs per-disease bitmaps.
+
+Usage::
+
+    python -m benchmarks.bench_comorbidity                    # compare with baseline
+    python -m benchmarks.bench_comorbidity --update-baseline
+
+``scan_cooccurrence`` walks every patient's disease list the way a handler
+without the index would; ``bitmap_query`` answers the same question for the
+same windows from ``lib.bitmaps``. ``bitmap_build`` is what the scan
+fallback and the precompute job pay, ``bitmap_load`` what a container pays
+to read the published snapshot.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.datasets import patients
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+from lib import bitmaps
+from lib.utils import compute_age_years
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ROWS = 100_000
+WINDOWS = [(None, None), (18.0, 65.0), (65.0, None)]
+
+
+def _scan_cooccurrence(
+    items: List[Dict[str, Any]], disease: str, min_age: Optional[float], max_age: Optional[float]
+) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for it in items:
+        age = compute_age_years(it["date_of_birth"])
+        if (min_age is not None and age < min_age) or (max_age is not None and age > max_age):
+            continue
+        diseases = set(it.get("diseases") or [])
+        if disease in diseases:
+            for other in diseases:
+                counts[other] = counts.get(other, 0) + 1
+    return counts
+
+
+def cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs over one synthetic dataset."""
+    items = patients(ROWS)
+    index = bitmaps.BitmapIndex.build(items)
+    data = index.to_bytes()
+    disease = max(index.diseases, key=lambda name: bitmaps.popcount(index.diseases[name]))
+    print(f"bitmaps {len(data) // 1024} KB, {len(index.diseases)} diseases", file=sys.stderr)
+
+    def scan_cooccurrence() -> None:
+        for lo, hi in WINDOWS:
+            _scan_cooccurrence(items, disease, lo, hi)
+
+    def bitmap_query() -> None:
+        for lo, hi in WINDOWS:
+            index.comorbidity(disease, lo, hi)
+
+    return [
+        (f"scan_cooccurrence@{ROWS}", scan_cooccurrence),
+        (f"bitmap_query@{ROWS}", bitmap_query),
+        (f"bitmap_build@{ROWS}", lambda: bitmaps.BitmapIndex.build(items)),
+        (f"bitmap_load@{ROWS}", lambda: bitmaps.BitmapIndex.from_bytes(data)),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; prints the speed-up of the bitmap query over the scan."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, thunk in cases():
+        results[name] = measure(thunk, repeats=5)
+    scan = results[f"scan_cooccurrence@{ROWS}"]["p50_ms"]
+    speedup = scan / results[f"bitmap_query@{ROWS}"]["p50_ms"]
+    print(f"bitmap_query: {speedup:.0f}x faster than scan_cooccurrence", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+"""Handler benchmarks across dataset sizes with a baseline regression gate.
+
+Usage::
+
+    python -m benchmarks.bench_handlers                      # 1k and 10k, compare
+    python -m benchmarks.bench_handlers --sizes all          # 1k..1M
+    python -m benchmarks.bench_handlers --update-baseline    # rewrite baseline entries
+
+Exit status is 1 when any metric exceeds its baseline tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import StubClient, StubResource, StubTable, patients
+from benchmarks.harness import compare, load_baseline, measure, repeats_for, save_baseline
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+ALL_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (1_000, 10_000)
+
+os.environ.setdefault("TABLE_NAME", "bench")
+os.environ.setdefault("AWS_REGION", "eu-central-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+# Per-call EMF and INFO lines would flood the report; timing and level checks still run.
+os.environ.setdefault("EMF_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Measure the handlers' own work, not repeated cache hits.
+for _ttl in ("PATIENT_CACHE_TTL", "METRICS_CACHE_TTL", "RESULT_CACHE_TTL"):
+    os.environ.setdefault(_ttl, "0")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+_ADMIN_CLAIMS = {
+    "sub": "admin-1",
+    "email": "admin@example.com",
+    "cognito:groups": ["Admin", "GroupAdmin"],
+}
+
+
+def _event(claims: Dict[str, Any], method: str = "GET", **extra: Any) -> Dict[str, Any]:
+    event: Dict[str, Any] = {
+        "requestContext": {"authorizer": {"jwt": {"claims": claims}}, "http": {"method": method}}
+    }
+    event.update(extra)
+    return event
+
+
+def _admin_event() -> Dict[str, Any]:
+    return _event(_ADMIN_CLAIMS, queryStringParameters={"min_age": "18", "max_age": "65"})
+
+
+def _patient_event(item: Dict[str, Any]) -> Dict[str, Any]:
+    claims = {
+        "sub": item["patient_id"],
+        "email": item["email"],
+        "cognito:groups": ["GroupPatients"],
+    }
+    return _event(claims)
+
+
+def install(table: StubTable) -> None:
+    """Points every handler's data access at ``table``."""
+    import lib.db
+
+    resource = StubResource(table)
+    lib.db._table = table
+    for name in ("handlers.admin_metrics", "handlers.patient_me", "patient_me"):
+        module = importlib.import_module(name)
+        module.dynamodb = resource
+    importlib.import_module("handlers.admin_metrics").TABLE_NAME = "bench"
+    importlib.import_module("handlers.patient_me").TABLE_NAME = "bench"
+    importlib.import_module("handlers.me_record").table = table
+    importlib.import_module("handlers.patient_handler")._dynamo = lambda: StubClient(table)
+
+
+def cases(items: List[Dict[str, Any]]) -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs, one per handler variant."""
+    probe = items[len(items) // 2]
+    admin = _admin_event()
+    patient = _patient_event(probe)
+    out: List[Tuple[str, Callable[[], Any]]] = []
+    for name in ("admin_overview", "admin_diseases", "admin_medications", "admin_metrics"):
+        fn = importlib.import_module(f"handlers.{name}").lambda_handler
+        out.append((name, lambda fn=fn: fn(admin, None)))
+    point_reads = (
+        ("patient_me", "handlers.patient_me", "lambda_handler", patient),
+        ("patient_me_root", "patient_me", "lambda_handler", patient),
+        ("me_record", "handlers.me_record", "handler", patient),
+        ("patient_record_get", "handlers.patient_handler", "handler", patient),
+        ("health", "handlers.health", "lambda_handler", {}),
+        ("health_root", "health", "lambda_handler", {}),
+    )
+    for name, module, attr, event in point_reads:
+        fn = getattr(importlib.import_module(module), attr)
+        out.append((name, lambda fn=fn, event=event: fn(event, None)))
+    return out
+
+
+def run(sizes: Tuple[int, ...], only: Tuple[str, ...] = ()) -> Dict[str, Dict[str, float]]:
+    """Runs every case at every size and returns results keyed ``"<case>@<size>"``."""
+    os.environ["PATIENT_TABLE_NAME"] = "bench"
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        items = patients(size)
+        install(StubTable(items))
+        for name, thunk in cases(items):
+            if only and name not in only:
+                continue
+            resp = thunk()
+            if resp.get("statusCode") not in (200, 204):
+                raise RuntimeError(f"{name}@{size} returned {resp.get('statusCode')}")
+            results[f"{name}@{size}"] = measure(thunk, repeats_for(size))
+            print(f"{name}@{size}: {json.dumps(results[f'{name}@{size}'])}", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    """Runs the suite, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="quick", help="'quick', 'all' or comma-separated counts")
+    parser.add_argument("--only", default="", help="comma-separated case names")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if args.sizes == "all":
+        sizes = ALL_SIZES
+    elif args.sizes == "quick":
+        sizes = QUICK_SIZES
+    else:
+        sizes = tuple(int(s) for s in args.sizes.split(","))
+    only = tuple(s for s in args.only.split(",") if s)
+
+    results = run(sizes, only)
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+"""Per-request logging overhead: the stdlib ``app`` logger versus ``lib.log``.
+
+Usage::
+
+    python -m benchmarks.bench_logging                    # compare with baseline
+    python -m benchmarks.bench_logging --update-baseline
+
+Each case replays the log calls of a /patient/me request (one INFO line and
+one DEBUG line that lists the record's fields) for ``REQUESTS`` requests, so
+``p50_ms`` of a case equals microseconds per request. Output goes to
+``os.devnull`` so only formatting and buffering are measured.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import patients
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+
+from lib import log
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+REQUESTS = 1000
+
+
+def _stdlib_logger(stream: Any) -> logging.Logger:
+    """The ``common.utils`` setup: plain formatter, INFO level."""
+    logger = logging.getLogger("bench.stdlib")
+    logger.handlers[:] = []
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def cases(item: Dict[str, Any], sink: Any) -> List[Tuple[str, Callable[[], Any]]]:
+    """Returns ``(name, thunk)`` pairs; each thunk logs ``REQUESTS`` requests."""
+    stdlib = _stdlib_logger(sink)
+
+    def stdlib_eager() -> None:
+        for i in range(REQUESTS):
+            stdlib.info(f"patient profile request_id=req-{i} found={item is not None}")
+            stdlib.debug(f"patient fields {sorted(item)}")
+
+    def structured() -> None:
+        for i in range(REQUESTS):
+            token = log.begin(function="patient_me", request_id=f"req-{i}", cold_start=False)
+            log.info("patient profile", found=item is not None)
+            log.debug("patient fields", fields=lambda: sorted(item))
+            log.end(token)
+
+    def structured_sampled() -> None:
+        rates = log.SAMPLE_RATES
+        log.SAMPLE_RATES = {log.INFO: 0.1}
+        try:
+            structured()
+        finally:
+            log.SAMPLE_RATES = rates
+
+    return [
+        ("logging_stdlib", stdlib_eager),
+        ("logging_structured", structured),
+        ("logging_structured_sampled", structured_sampled),
+    ]
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    """Measures every case; results are keyed ``"<case>@<REQUESTS>"``."""
+    item = patients(1_000)[500]
+    results: Dict[str, Dict[str, float]] = {}
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        write, level = log._write, log.LEVEL
+        log._write, log.LEVEL = sink.write, log.INFO
+        try:
+            for name, thunk in cases(item, sink):
+                key = f"{name}@{REQUESTS}"
+                results[key] = measure(thunk, repeats=20)
+                print(f"{key}: {results[key]['p50_ms']:.3f} us/request", file=sys.stderr)
+        finally:
+            log._write, log.LEVEL = write, level
+    return results
+
+
+def main() -> int:
+    """Runs the cases, prints a comparison and gates on regressions."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run()
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    if args.update_baseline:
+        baseline.setdefault("results", {}).update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"updated {len(results)} entries in {baseline_path}")
+        return 0
+
+    regressions, lines = compare(results, baseline)
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+"""Synthetic patient datasets and in-memory table stubs for the handler benchmarks."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from benchmarks import harness  # noqa: F401  (puts src/ and scripts/ on sys.path)
+
+from boto3.dynamodb.types import TypeSerializer
+
+import generate_patients as gen
+
+STATUSES = ("active", "inactive", "discharged", "admitted")
+_serializer = TypeSerializer()
+
+
+@lru_cache(maxsize=1)
+def patients(size: int, seed: int = 1234) -> List[Dict[str, Any]]:
+    """
+    Returns ``size`` boto3-shaped patient items (``Decimal`` numbers).
+
+    Items carry both ``patient_id`` and ``patientId`` plus ``email`` and
+    ``status`` so every handler variant finds the attributes it reads.
+    """
+    disease_lists = gen._mask_lists(gen.DISEASES)
+    med_lists = gen._mask_lists(gen.MEDS)
+    items: List[Dict[str, Any]] = []
+    for cols in gen.generate(seed, size):
+        s = gen._columns_to_strings(cols)
+        for i, (pid, name, sex, dob, bmi, d, m) in enumerate(
+            zip(
+                s["patient_id"],
+                s["name"],
+                s["sex"],
+                s["date_of_birth"],
+                s["bmi"],
+                cols["diseases"].tolist(),
+                cols["medications"].tolist(),
+                strict=True,
+            )
+        ):
+            n = len(items)
+            items.append(
+                {
+                    "patient_id": pid,
+                    "patientId": f"patient{n}@example.com",
+                    "email": f"patient{n}@example.com",
+                    "name": name,
+                    "sex": sex,
+                    "date_of_birth": dob,
+                    "bmi": Decimal(bmi),
+                    "status": STATUSES[i % len(STATUSES)],
+                    "diseases": list(disease_lists[d]),
+                    "medications": list(med_lists[m]),
+                }
+            )
+    return items
+
+
+class StubTable:
+    """Resource-style table over a list; scans return fixed-size pages."""
+
+    def __init__(self, items: List[Dict[str, Any]], page_size: int = 1000) -> None:
+        self.items = items
+        self.page_size = page_size
+        self._index: Dict[str, Dict[str, Any]] = {}
+        for it in items:
+            for key in ("patient_id", "patientId"):
+                self._index[it[key]] = it
+
+    def scan(self, **kwargs: Any) -> Dict[str, Any]:
+        """Returns one page, with ``LastEvaluatedKey`` while more items remain."""
+        start = (kwargs.get("ExclusiveStartKey") or {}).get("_offset", 0)
+        end = start + self.page_size
+        resp: Dict[str, Any] = {"Items": self.items[start:end], "Count": len(self.items[start:end])}
+        if end < len(self.items):
+            resp["LastEvaluatedKey"] = {"_offset": end}
+        return resp
+
+    def get_item(self, Key: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        """Looks up by the single key value, whatever the attribute is called."""
+        (value,) = Key.values()
+        item = self._index.get(value)
+        return {"Item": item} if item is not None else {}
+
+
+class StubResource:
+    """``boto3.resource("dynamodb")`` stand-in returning one shared ``StubTable``."""
+
+    def __init__(self, table: StubTable) -> None:
+        self.table = table
+
+    def Table(self, name: str) -> StubTable:  # noqa: N802 (boto3 API name)
+        """Returns the shared table regardless of ``name``."""
+        return self.table
+
+
+class StubClient:
+    """Low-level client stand-in serving typed items from a ``StubTable``."""
+
+    def __init__(self, table: StubTable) -> None:
+        self.table = table
+
+    def get_item(self, TableName: str, Key: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        """Returns the item serialized to attribute-value maps."""
+        ((_, typed),) = Key.items()
+        (value,) = typed.values()
+        item: Optional[Dict[str, Any]] = self.table._index.get(value)
+        if item is None:
+            return {}
+        return {"Item": {k: _serializer.serialize(v) for k, v in item.items()}}
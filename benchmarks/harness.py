@@ -0,0 +1,121 @@
+"""Timing, memory measurement and baseline comparison shared by the benchmark scripts."""
+
+from __future__ import annotations
+
+import gc
+import json
+import math
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+for _sub in ("src", "scripts"):
+    if str(PROJECT_ROOT / _sub) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT / _sub))
+
+DEFAULT_TOLERANCES: Dict[str, float] = {
+    "p50_ms": 0.5,
+    "p95_ms": 0.75,
+    "cpu_ms": 0.5,
+    "peak_kb": 0.25,
+}
+ABSOLUTE_SLACK: Dict[str, float] = {"p50_ms": 0.5, "p95_ms": 1.0, "cpu_ms": 0.5, "peak_kb": 64.0}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def repeats_for(size: int) -> int:
+    """Fewer repetitions for large datasets so the full suite stays in minutes."""
+    if size <= 1_000:
+        return 50
+    if size <= 10_000:
+        return 20
+    if size <= 100_000:
+        return 7
+    return 3
+
+
+def measure(fn: Callable[[], Any], repeats: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Runs ``fn`` and returns wall p50/p95, mean CPU time and tracemalloc peak.
+
+    Peak memory is taken from one extra traced run so tracing never skews timings.
+    """
+    for _ in range(warmup):
+        fn()
+    walls: List[float] = []
+    cpus: List[float] = []
+    gc.collect()
+    for _ in range(repeats):
+        c0, w0 = time.process_time(), time.perf_counter()
+        fn()
+        walls.append((time.perf_counter() - w0) * 1000.0)
+        cpus.append((time.process_time() - c0) * 1000.0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": round(percentile(walls, 50), 3),
+        "p95_ms": round(percentile(walls, 95), 3),
+        "cpu_ms": round(sum(cpus) / len(cpus), 3),
+        "peak_kb": round(peak / 1024.0, 1),
+        "repeats": repeats,
+    }
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    """Reads a baseline file, returning an empty baseline if it does not exist."""
+    if not path.exists():
+        return {"tolerances": dict(DEFAULT_TOLERANCES), "results": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, baseline: Dict[str, Any]) -> None:
+    """Writes a baseline file with stable key order."""
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Any]
+) -> Tuple[List[str], List[str]]:
+    """
+    Compares results to the baseline and returns ``(regressions, report_lines)``.
+
+    A metric regresses when it exceeds ``baseline * (1 + tolerance)`` plus a
+    small absolute slack that absorbs timer noise on sub-millisecond cases.
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **baseline.get("tolerances", {})}
+    base = baseline.get("results", {})
+    regressions: List[str] = []
+    lines: List[str] = []
+    for case, metrics in sorted(results.items()):
+        ref = base.get(case)
+        if ref is None:
+            lines.append(f"{case:<40} (no baseline)")
+            continue
+        parts = []
+        for metric, tol in tolerances.items():
+            if metric not in ref or metric not in metrics:
+                continue
+            limit = ref[metric] * (1.0 + tol) + ABSOLUTE_SLACK.get(metric, 0.0)
+            ratio = metrics[metric] / ref[metric] if ref[metric] else 1.0
+            flag = ""
+            if metrics[metric] > limit:
+                flag = " REGRESSION"
+                regressions.append(f"{case} {metric}: {metrics[metric]} > {round(limit, 3)}")
+            parts.append(f"{metric}={metrics[metric]} ({ratio:.2f}x){flag}")
+        lines.append(f"{case:<40} " + " ".join(parts))
+    return regressions, lines
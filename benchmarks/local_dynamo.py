@@ -0,0 +1,1070 @@
+"""In-process DynamoDB emulator for tests, benchmarks and local runs.
+
+Unlike the one-page stubs used in older tests, the emulator reproduces the
+behaviour that matters for performance work:
+
+* scans stop at the 1 MB page limit (or ``Limit``) and return ``LastEvaluatedKey``;
+* ``Segment``/``TotalSegments`` partition items by key hash;
+* ``ProjectionExpression``, ``FilterExpression``, ``Select=COUNT``;
+* condition and update expressions (``SET``/``REMOVE``/``ADD``/``DELETE``), including
+  ``ReturnValuesOnConditionCheckFailure=ALL_OLD``;
+* ``BatchGetItem``/``BatchWriteItem`` limits and simulated unprocessed items;
+* ``ReturnConsumedCapacity`` using DynamoDB's 4 KB read / 1 KB write units;
+* per-call latency and throttling injection.
+
+Both API styles used by the handlers are provided: ``emulator.resource()``
+mirrors ``boto3.resource("dynamodb")`` (plain values, ``Decimal`` numbers)
+and ``emulator.client()`` mirrors ``boto3.client("dynamodb")`` (typed
+attribute-value maps). ``emulator.patch_boto3()`` swaps both into boto3.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import copy
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+PAGE_LIMIT_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def _value_size(value: Any) -> int:
+    """Approximates DynamoDB's attribute-value size accounting."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (int, float, Decimal)):
+        digits = len(str(value).lstrip("-").replace(".", "").lstrip("0")) or 1
+        return 1 + (digits + 1) // 2
+    if isinstance(value, (bytes, bytearray, Binary)):
+        return len(bytes(value))
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode("utf-8")) + _value_size(v) + 1 for k, v in value.items())
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return 3 + sum(_value_size(v) + 1 for v in value)
+    return len(str(value))
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    """Returns the approximate stored size of an item in bytes."""
+    return sum(len(k.encode("utf-8")) + _value_size(v) for k, v in item.items())
+
+
+# --------------------------------------------------------------------------- expressions
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<op><>|<=|>=|=|<|>|\(|\)|,|\+|-|\[|\]|\.)|(?P<name>#[A-Za-z0-9_]+)"
+    r"|(?P<value>:[A-Za-z0-9_]+)|(?P<num>\d+)|(?P<word>[A-Za-z_][A-Za-z0-9_]*))"
+)
+_COMPARATORS = ("=", "<>", "<", "<=", ">", ">=")
+
+
+def _tokenize(expr: str) -> List[str]:
+    tokens: List[str] = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Invalid expression near: {expr[pos:pos + 20]!r}")
+        tokens.append(m.group(m.lastgroup or "op"))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for condition, projection and update expressions."""
+
+    def __init__(self, expr: str, names: Dict[str, str], values: Dict[str, Any]) -> None:
+        self.tokens = _tokenize(expr)
+        self.pos = 0
+        self.names = names
+        self.values = values
+
+    def peek(self, offset: int = 0) -> Optional[str]:
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        tok = self.peek()
+        if tok is None or (expected is not None and tok.upper() != expected):
+            raise ValueError(f"Expected {expected or 'token'}, got {tok!r}")
+        self.pos += 1
+        return tok
+
+    def done(self) -> bool:
+        return self.pos >= len(self.tokens)
+
+    # paths and operands -----------------------------------------------------------
+
+    def path(self) -> Tuple[Union[str, int], ...]:
+        parts: List[Union[str, int]] = [self._name(self.take())]
+        while self.peek() in (".", "["):
+            if self.take() == ".":
+                parts.append(self._name(self.take()))
+            else:
+                parts.append(int(self.take()))
+                self.take("]")
+        return tuple(parts)
+
+    def _name(self, tok: str) -> str:
+        if tok.startswith("#"):
+            if tok not in self.names:
+                raise ValueError(f"Unknown ExpressionAttributeName {tok}")
+            return self.names[tok]
+        return tok
+
+    def operand(self) -> Callable[[Dict[str, Any]], Any]:
+        tok = self.peek()
+        if tok is None:
+            raise ValueError("Unexpected end of expression")
+        if tok.startswith(":"):
+            self.take()
+            if tok not in self.values:
+                raise ValueError(f"Unknown ExpressionAttributeValue {tok}")
+            val = self.values[tok]
+            return lambda item: val
+        if tok.lower() in ("if_not_exists", "list_append", "size") and self.peek(1) == "(":
+            fn = self.take().lower()
+            self.take("(")
+            if fn == "size":
+                p = self.path()
+                self.take(")")
+                return lambda item: _size(_get_path(item, p))
+            first = self.path() if fn == "if_not_exists" else None
+            a = (lambda item: _get_path(item, first)) if first else self.operand()
+            self.take(",")
+            b = self.operand()
+            self.take(")")
+            if fn == "if_not_exists":
+                return lambda item: a(item) if a(item) is not None else b(item)
+            return lambda item: list(a(item) or []) + list(b(item) or [])
+        p = self.path()
+        return lambda item: _get_path(item, p)
+
+    def value_expr(self) -> Callable[[Dict[str, Any]], Any]:
+        left = self.operand()
+        if self.peek() in ("+", "-"):
+            op = self.take()
+            right = self.operand()
+            if op == "+":
+                return lambda item: Decimal(left(item)) + Decimal(right(item))
+            return lambda item: Decimal(left(item)) - Decimal(right(item))
+        return left
+
+    # conditions -----------------------------------------------------------------
+
+    def condition(self) -> Callable[[Dict[str, Any]], bool]:
+        left = self._and()
+        while (self.peek() or "").upper() == "OR":
+            self.take()
+            right = self._and()
+            left = (lambda lf, rf: lambda item: lf(item) or rf(item))(left, right)
+        return left
+
+    def _and(self) -> Callable[[Dict[str, Any]], bool]:
+        left = self._not()
+        while (self.peek() or "").upper() == "AND":
+            self.take()
+            right = self._not()
+            left = (lambda lf, rf: lambda item: lf(item) and rf(item))(left, right)
+        return left
+
+    def _not(self) -> Callable[[Dict[str, Any]], bool]:
+        if (self.peek() or "").upper() == "NOT":
+            self.take()
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._atom()
+
+    def _atom(self) -> Callable[[Dict[str, Any]], bool]:
+        tok = self.peek() or ""
+        if tok == "(":
+            self.take()
+            cond = self.condition()
+            self.take(")")
+            return cond
+        fn = tok.lower()
+        if (
+            fn in ("attribute_exists", "attribute_not_exists", "begins_with", "contains")
+            and self.peek(1) == "("
+        ):
+            self.take()
+            self.take("(")
+            p = self.path()
+            if fn == "attribute_exists":
+                self.take(")")
+                return lambda item: _get_path(item, p) is not None
+            if fn == "attribute_not_exists":
+                self.take(")")
+                return lambda item: _get_path(item, p) is None
+            self.take(",")
+            arg = self.operand()
+            self.take(")")
+            if fn == "begins_with":
+                return lambda item: isinstance(_get_path(item, p), str) and _get_path(
+                    item, p
+                ).startswith(arg(item))
+            return lambda item: _contains(_get_path(item, p), arg(item))
+        left = self.operand()
+        op = self.take()
+        if op.upper() == "BETWEEN":
+            lo = self.operand()
+            self.take("AND")
+            hi = self.operand()
+            return lambda item: _compare(left(item), ">=", lo(item)) and _compare(
+                left(item), "<=", hi(item)
+            )
+        if op.upper() == "IN":
+            self.take("(")
+            options = [self.operand()]
+            while self.peek() == ",":
+                self.take()
+                options.append(self.operand())
+            self.take(")")
+            return lambda item: any(left(item) == o(item) for o in options)
+        if op not in _COMPARATORS:
+            raise ValueError(f"Unsupported operator {op!r}")
+        right = self.operand()
+        return lambda item: _compare(left(item), op, right(item))
+
+
+def _size(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    if isinstance(value, (Decimal, int)):
+        return None
+    return Decimal(len(value))
+
+
+def _contains(container: Any, value: Any) -> bool:
+    if isinstance(container, str):
+        return isinstance(value, str) and value in container
+    if isinstance(container, (list, set, frozenset)):
+        return value in container
+    return False
+
+
+def _compare(a: Any, op: str, b: Any) -> bool:
+    if op == "=":
+        return a is not None and bool(a == b)
+    if op == "<>":
+        return bool(a != b)
+    if (
+        a is None
+        or b is None
+        or type(a) is not type(b)
+        and not (isinstance(a, (int, Decimal)) and isinstance(b, (int, Decimal)))
+    ):
+        return False
+    if op == "<":
+        return bool(a < b)
+    if op == "<=":
+        return bool(a <= b)
+    if op == ">":
+        return bool(a > b)
+    return bool(a >= b)
+
+
+def _get_path(item: Any, path: Sequence[Union[str, int]]) -> Any:
+    cur = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(cur, list) or part >= len(cur):
+                return None
+            cur = cur[part]
+        else:
+            if not isinstance(cur, dict) or part not in cur:
+                return None
+            cur = cur[part]
+    return cur
+
+
+def _set_path(item: Dict[str, Any], path: Sequence[Union[str, int]], value: Any) -> None:
+    cur: Any = item
+    for part in path[:-1]:
+        cur = cur[part]
+    cur[path[-1]] = value
+
+
+def _remove_path(item: Dict[str, Any], path: Sequence[Union[str, int]]) -> None:
+    cur: Any = item
+    for part in path[:-1]:
+        cur = _get_path(cur, (part,))
+        if cur is None:
+            return
+    last = path[-1]
+    if isinstance(last, int):
+        if isinstance(cur, list) and last < len(cur):
+            cur.pop(last)
+    elif isinstance(cur, dict):
+        cur.pop(last, None)
+
+
+def compile_condition(
+    expr: Optional[str],
+    names: Optional[Dict[str, str]] = None,
+    values: Optional[Dict[str, Any]] = None,
+) -> Callable[[Dict[str, Any]], bool]:
+    """Compiles a condition/filter expression into a predicate over plain items."""
+    if not expr:
+        return lambda item: True
+    parser = _Parser(expr, names or {}, values or {})
+    cond = parser.condition()
+    if not parser.done():
+        raise ValueError(f"Unexpected token {parser.peek()!r} in condition")
+    return cond
+
+
+def compile_projection(
+    expr: Optional[str], names: Optional[Dict[str, str]] = None
+) -> Optional[List[Tuple[Union[str, int], ...]]]:
+    """Parses a projection expression into attribute paths (``None`` = all attributes)."""
+    if not expr:
+        return None
+    parser = _Parser(expr, names or {}, {})
+    paths = [parser.path()]
+    while parser.peek() == ",":
+        parser.take()
+        paths.append(parser.path())
+    return paths
+
+
+def project(
+    item: Dict[str, Any], paths: Optional[List[Tuple[Union[str, int], ...]]]
+) -> Dict[str, Any]:
+    """Returns a copy of ``item`` restricted to ``paths``."""
+    if paths is None:
+        return dict(item)
+    out: Dict[str, Any] = {}
+    for p in paths:
+        val = _get_path(item, p)
+        if val is None:
+            continue
+        cur: Dict[Any, Any] = out
+        for part in p[:-1]:
+            cur = cur.setdefault(part, {})
+        cur[p[-1]] = copy.deepcopy(val)
+    return out
+
+
+def apply_update(
+    item: Dict[str, Any], expr: str, names: Dict[str, str], values: Dict[str, Any]
+) -> List[str]:
+    """Applies an update expression in place and returns the top-level attributes touched."""
+    parser = _Parser(expr, names, values)
+    touched: List[str] = []
+    assignments: List[Tuple[str, Tuple[Union[str, int], ...], Any]] = []
+    while not parser.done():
+        action = parser.take().upper()
+        if action not in ("SET", "REMOVE", "ADD", "DELETE"):
+            raise ValueError(f"Unsupported update action {action!r}")
+        while True:
+            path = parser.path()
+            if action == "SET":
+                parser.take("=")
+                assignments.append(("SET", path, parser.value_expr()))
+            elif action == "REMOVE":
+                assignments.append(("REMOVE", path, None))
+            else:
+                assignments.append((action, path, parser.operand()))
+            if parser.peek() != ",":
+                break
+            parser.take()
+    evaluated: List[Tuple[str, Tuple[Union[str, int], ...], Any]] = [
+        (a, p, fn(item) if fn else None) for a, p, fn in assignments
+    ]
+    for action, path, val in evaluated:
+        touched.append(str(path[0]))
+        current = _get_path(item, path)
+        if action == "SET":
+            _set_path(item, path, val)
+        elif action == "REMOVE":
+            _remove_path(item, path)
+        elif action == "ADD":
+            if isinstance(val, (set, frozenset)):
+                _set_path(item, path, set(current or set()) | set(val))
+            else:
+                _set_path(item, path, Decimal(current or 0) + Decimal(val))
+        elif action == "DELETE" and current is not None:
+            remaining = set(current) - set(val)
+            if remaining:
+                _set_path(item, path, remaining)
+            else:
+                _remove_path(item, path)
+    return touched
+
+
+# --------------------------------------------------------------------------- storage
+
+
+def scan_order(key: Any) -> Tuple[int, str]:
+    """Position of a key in scan order: by hash, like DynamoDB partitions, then by value.
+
+    The order depends only on the key, so a scan resumes after an
+    ``ExclusiveStartKey`` even if that item was deleted in the meantime.
+    """
+    text = str(key)
+    return zlib.crc32(text.encode("utf-8")), text
+
+
+class _Table:
+    def __init__(self, name: str, hash_key: str) -> None:
+        self.name = name
+        self.hash_key = hash_key
+        self.items: Dict[Any, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+        self._segments: Dict[int, List[List[Tuple[int, str, Any]]]] = {}
+
+    def key_of(self, key: Dict[str, Any], operation: str) -> Any:
+        if set(key) != {self.hash_key}:
+            raise _error(
+                "ValidationException",
+                "The provided key element does not match the schema",
+                operation,
+            )
+        return key[self.hash_key]
+
+    def segment_lists(self, total: int) -> List[List[Tuple[int, str, Any]]]:
+        """Returns each segment's keys in scan order as ``(*scan_order(k), k)`` (cached)."""
+        cached = self._segments.get(total)
+        if cached is None:
+            cached = [[] for _ in range(total)]
+            for k in self.items:
+                order = scan_order(k)
+                cached[order[0] % total].append((*order, k))
+            for seg in cached:
+                seg.sort(key=lambda entry: entry[:2])
+            self._segments[total] = cached
+        return cached
+
+    def changed(self) -> None:
+        self._segments.clear()
+
+
+class LocalDynamo:
+    """
+    The emulator: tables plus fault/latency injection and accounting.
+
+    ``latency`` is seconds per call (or a callable returning seconds);
+    ``throttle_rate`` is the probability that a call raises
+    ``ProvisionedThroughputExceededException``; ``unprocessed_rate`` is the
+    fraction of batch requests returned as unprocessed. Randomness is seeded
+    so test runs are repeatable.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[str], float]] = 0.0,
+        throttle_rate: float = 0.0,
+        unprocessed_rate: float = 0.0,
+        page_limit_bytes: int = PAGE_LIMIT_BYTES,
+        seed: int = 0,
+    ) -> None:
+        self.tables: Dict[str, _Table] = {}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.unprocessed_rate = unprocessed_rate
+        self.page_limit_bytes = page_limit_bytes
+        self.calls: Counter = Counter()
+        self.read_units: Dict[str, float] = defaultdict(float)
+        self.write_units: Dict[str, float] = defaultdict(float)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    # setup --------------------------------------------------------------------------
+
+    def create_table(
+        self, name: str, hash_key: str = "patientId", items: Sequence[Dict[str, Any]] = ()
+    ) -> None:
+        """Creates (or replaces) a hash-key table, optionally preloaded with plain items."""
+        table = _Table(name, hash_key)
+        for it in items:
+            table.items[it[hash_key]] = _normalize(it)
+        self.tables[name] = table
+
+    def items(self, name: str) -> List[Dict[str, Any]]:
+        """Returns a snapshot of a table's items (plain values)."""
+        return [dict(it) for it in self._table(name, "Scan").items.values()]
+
+    def resource(self) -> "LocalResource":
+        """Returns a ``boto3.resource("dynamodb")``-style facade."""
+        return LocalResource(self)
+
+    def client(self) -> "LocalClient":
+        """Returns a ``boto3.client("dynamodb")``-style facade."""
+        return LocalClient(self)
+
+    @contextlib.contextmanager
+    def patch_boto3(self) -> Iterator["LocalDynamo"]:
+        """Routes ``boto3.resource/client("dynamodb")`` to this emulator within the block."""
+        import boto3
+
+        orig_resource, orig_client = boto3.resource, boto3.client
+
+        def _resource(service: str, *args: Any, **kwargs: Any) -> Any:
+            return (
+                self.resource()
+                if service == "dynamodb"
+                else orig_resource(service, *args, **kwargs)
+            )
+
+        def _client(service: str, *args: Any, **kwargs: Any) -> Any:
+            return self.client() if service == "dynamodb" else orig_client(service, *args, **kwargs)
+
+        boto3.resource, boto3.client = _resource, _client
+        try:
+            yield self
+        finally:
+            boto3.resource, boto3.client = orig_resource, orig_client
+
+    # plumbing ---------------------------------------------------------------------
+
+    def _table(self, name: str, operation: str) -> _Table:
+        table = self.tables.get(name)
+        if table is None:
+            raise _error(
+                "ResourceNotFoundException", f"Requested resource not found: {name}", operation
+            )
+        return table
+
+    def _chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < rate
+
+    def _enter(self, operation: str) -> None:
+        self.calls[operation] += 1
+        delay = self.latency(operation) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if self._chance(self.throttle_rate):
+            raise _error(
+                "ProvisionedThroughputExceededException",
+                "The level of configured provisioned throughput for the table was exceeded.",
+                operation,
+            )
+
+    def _capacity(
+        self, kwargs: Dict[str, Any], table: str, units: float, write: bool
+    ) -> Optional[Dict[str, Any]]:
+        (self.write_units if write else self.read_units)[table] += units
+        mode = kwargs.get("ReturnConsumedCapacity", "NONE")
+        if mode == "NONE":
+            return None
+        cap: Dict[str, Any] = {"TableName": table, "CapacityUnits": units}
+        if mode == "INDEXES":
+            cap["Table"] = {"CapacityUnits": units}
+        if write:
+            cap["WriteCapacityUnits"] = units
+        else:
+            cap["ReadCapacityUnits"] = units
+        return cap
+
+    @staticmethod
+    def _read_units(size: int, consistent: bool) -> float:
+        units = max(1, math.ceil(size / READ_UNIT_BYTES))
+        return float(units) if consistent else units / 2.0
+
+    @staticmethod
+    def _write_units(size: int) -> float:
+        return float(max(1, math.ceil(size / WRITE_UNIT_BYTES)))
+
+    # operations (plain values) --------------------------------------------------------
+
+    def get_item(self, TableName: str, Key: Dict[str, Any], **kw: Any) -> Dict[str, Any]:
+        self._enter("GetItem")
+        table = self._table(TableName, "GetItem")
+        with table.lock:
+            item = table.items.get(table.key_of(Key, "GetItem"))
+        resp: Dict[str, Any] = {}
+        size = item_size(item) if item else 0
+        cap = self._capacity(
+            kw, TableName, self._read_units(size, bool(kw.get("ConsistentRead"))), False
+        )
+        if item is not None:
+            paths = compile_projection(
+                kw.get("ProjectionExpression"), kw.get("ExpressionAttributeNames")
+            )
+            resp["Item"] = project(item, paths)
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def _check(
+        self, table: _Table, current: Optional[Dict[str, Any]], kw: Dict[str, Any], op: str
+    ) -> None:
+        cond = compile_condition(
+            kw.get("ConditionExpression"),
+            kw.get("ExpressionAttributeNames"),
+            kw.get("ExpressionAttributeValues"),
+        )
+        if not cond(current or {}):
+            err = _error("ConditionalCheckFailedException", "The conditional request failed", op)
+            if kw.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD" and current is not None:
+                err.response["Item"] = copy.deepcopy(current)
+            raise err
+
+    def put_item(self, TableName: str, Item: Dict[str, Any], **kw: Any) -> Dict[str, Any]:
+        self._enter("PutItem")
+        table = self._table(TableName, "PutItem")
+        item = _normalize(Item)
+        if table.hash_key not in item:
+            raise _error("ValidationException", "Missing the key in the item", "PutItem")
+        with table.lock:
+            old = table.items.get(item[table.hash_key])
+            self._check(table, old, kw, "PutItem")
+            table.items[item[table.hash_key]] = item
+            if old is None:
+                table.changed()
+        resp: Dict[str, Any] = {}
+        if kw.get("ReturnValues") == "ALL_OLD" and old is not None:
+            resp["Attributes"] = dict(old)
+        cap = self._capacity(
+            kw, TableName, self._write_units(max(item_size(item), item_size(old or {}))), True
+        )
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def update_item(self, TableName: str, Key: Dict[str, Any], **kw: Any) -> Dict[str, Any]:
+        self._enter("UpdateItem")
+        table = self._table(TableName, "UpdateItem")
+        key = table.key_of(Key, "UpdateItem")
+        with table.lock:
+            old = table.items.get(key)
+            self._check(table, old, kw, "UpdateItem")
+            new = copy.deepcopy(old) if old is not None else {table.hash_key: key}
+            touched: List[str] = []
+            if kw.get("UpdateExpression"):
+                try:
+                    touched = apply_update(
+                        new,
+                        kw["UpdateExpression"],
+                        kw.get("ExpressionAttributeNames") or {},
+                        kw.get("ExpressionAttributeValues") or {},
+                    )
+                except (ValueError, TypeError, ArithmeticError) as e:
+                    raise _error("ValidationException", str(e), "UpdateItem") from e
+            if table.hash_key in touched:
+                raise _error(
+                    "ValidationException", "Cannot update attribute in the key", "UpdateItem"
+                )
+            table.items[key] = new
+            if old is None:
+                table.changed()
+        resp: Dict[str, Any] = {}
+        rv = kw.get("ReturnValues", "NONE")
+        if rv == "ALL_NEW":
+            resp["Attributes"] = copy.deepcopy(new)
+        elif rv == "ALL_OLD" and old is not None:
+            resp["Attributes"] = copy.deepcopy(old)
+        elif rv in ("UPDATED_NEW", "UPDATED_OLD"):
+            src = new if rv == "UPDATED_NEW" else (old or {})
+            resp["Attributes"] = {k: copy.deepcopy(src[k]) for k in touched if k in src}
+        cap = self._capacity(
+            kw, TableName, self._write_units(max(item_size(new), item_size(old or {}))), True
+        )
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def delete_item(self, TableName: str, Key: Dict[str, Any], **kw: Any) -> Dict[str, Any]:
+        self._enter("DeleteItem")
+        table = self._table(TableName, "DeleteItem")
+        key = table.key_of(Key, "DeleteItem")
+        with table.lock:
+            old = table.items.get(key)
+            self._check(table, old, kw, "DeleteItem")
+            if old is not None:
+                del table.items[key]
+                table.changed()
+        resp: Dict[str, Any] = {}
+        if kw.get("ReturnValues") == "ALL_OLD" and old is not None:
+            resp["Attributes"] = old
+        cap = self._capacity(kw, TableName, self._write_units(item_size(old or {})), True)
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def scan(self, TableName: str, **kw: Any) -> Dict[str, Any]:
+        self._enter("Scan")
+        table = self._table(TableName, "Scan")
+        total = int(kw.get("TotalSegments", 1))
+        segment = int(kw.get("Segment", 0))
+        if not 0 <= segment < total:
+            raise _error("ValidationException", "Segment must be less than TotalSegments", "Scan")
+        limit = kw.get("Limit")
+        select = kw.get("Select", "ALL_ATTRIBUTES")
+        cond = compile_condition(
+            kw.get("FilterExpression"),
+            kw.get("ExpressionAttributeNames"),
+            kw.get("ExpressionAttributeValues"),
+        )
+        paths = compile_projection(
+            kw.get("ProjectionExpression"), kw.get("ExpressionAttributeNames")
+        )
+        with table.lock:
+            keys = table.segment_lists(total)[segment]
+            start = 0
+            esk = kw.get("ExclusiveStartKey")
+            if esk:
+                after = scan_order(table.key_of(esk, "Scan"))
+                start = bisect.bisect_right(keys, after, key=lambda entry: entry[:2])
+            out: List[Dict[str, Any]] = []
+            count = scanned = read_bytes = 0
+            idx = start
+            while idx < len(keys):
+                item = table.items.get(keys[idx][2])
+                idx += 1
+                if item is None:
+                    continue
+                scanned += 1
+                read_bytes += item_size(item)
+                if cond(item):
+                    count += 1
+                    if select != "COUNT":
+                        out.append(project(item, paths))
+                if read_bytes >= self.page_limit_bytes or (limit and scanned >= int(limit)):
+                    break
+            last_key = keys[idx - 1][2] if idx < len(keys) and idx > start else None
+        resp: Dict[str, Any] = {"Count": count, "ScannedCount": scanned}
+        if select != "COUNT":
+            resp["Items"] = out
+        if last_key is not None:
+            resp["LastEvaluatedKey"] = {table.hash_key: last_key}
+        cap = self._capacity(
+            kw, TableName, self._read_units(read_bytes, bool(kw.get("ConsistentRead"))), False
+        )
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def query(self, TableName: str, KeyConditionExpression: str, **kw: Any) -> Dict[str, Any]:
+        self._enter("Query")
+        table = self._table(TableName, "Query")
+        names = kw.get("ExpressionAttributeNames")
+        values = kw.get("ExpressionAttributeValues")
+        key_cond = compile_condition(KeyConditionExpression, names, values)
+        cond = compile_condition(kw.get("FilterExpression"), names, values)
+        paths = compile_projection(kw.get("ProjectionExpression"), names)
+        with table.lock:
+            matched = [it for it in table.items.values() if key_cond(it)]
+        read_bytes = sum(item_size(it) for it in matched)
+        out = [project(it, paths) for it in matched if cond(it)]
+        resp: Dict[str, Any] = {"Count": len(out), "ScannedCount": len(matched)}
+        if kw.get("Select") != "COUNT":
+            resp["Items"] = out
+        cap = self._capacity(
+            kw, TableName, self._read_units(read_bytes, bool(kw.get("ConsistentRead"))), False
+        )
+        if cap:
+            resp["ConsumedCapacity"] = cap
+        return resp
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **kw: Any) -> Dict[str, Any]:
+        self._enter("BatchGetItem")
+        if sum(len(r.get("Keys", [])) for r in RequestItems.values()) > BATCH_GET_LIMIT:
+            raise _error(
+                "ValidationException",
+                "Too many items requested for the BatchGetItem call",
+                "BatchGetItem",
+            )
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        unprocessed: Dict[str, Dict[str, Any]] = {}
+        caps: List[Dict[str, Any]] = []
+        for name, req in RequestItems.items():
+            table = self._table(name, "BatchGetItem")
+            paths = compile_projection(
+                req.get("ProjectionExpression"), req.get("ExpressionAttributeNames")
+            )
+            consistent = bool(req.get("ConsistentRead"))
+            units = 0.0
+            found: List[Dict[str, Any]] = []
+            for key in req.get("Keys", []):
+                if self._chance(self.unprocessed_rate):
+                    unprocessed.setdefault(name, {k: v for k, v in req.items() if k != "Keys"})
+                    unprocessed[name].setdefault("Keys", []).append(key)
+                    continue
+                with table.lock:
+                    item = table.items.get(table.key_of(key, "BatchGetItem"))
+                units += self._read_units(item_size(item) if item else 0, consistent)
+                if item is not None:
+                    found.append(project(item, paths))
+            responses[name] = found
+            cap = self._capacity(kw, name, units, False)
+            if cap:
+                caps.append(cap)
+        resp: Dict[str, Any] = {"Responses": responses, "UnprocessedKeys": unprocessed}
+        if caps:
+            resp["ConsumedCapacity"] = caps
+        return resp
+
+    def batch_write_item(
+        self, RequestItems: Dict[str, List[Dict[str, Any]]], **kw: Any
+    ) -> Dict[str, Any]:
+        self._enter("BatchWriteItem")
+        if sum(len(v) for v in RequestItems.values()) > BATCH_WRITE_LIMIT:
+            raise _error(
+                "ValidationException",
+                "Too many items requested for the BatchWriteItem call",
+                "BatchWriteItem",
+            )
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        caps: List[Dict[str, Any]] = []
+        for name, reqs in RequestItems.items():
+            table = self._table(name, "BatchWriteItem")
+            units = 0.0
+            seen = set()
+            for req in reqs:
+                key_val = (
+                    req["PutRequest"]["Item"].get(table.hash_key)
+                    if "PutRequest" in req
+                    else table.key_of(req["DeleteRequest"]["Key"], "BatchWriteItem")
+                )
+                if key_val in seen:
+                    raise _error(
+                        "ValidationException",
+                        "Provided list of item keys contains duplicates",
+                        "BatchWriteItem",
+                    )
+                seen.add(key_val)
+            for req in reqs:
+                if self._chance(self.unprocessed_rate):
+                    unprocessed.setdefault(name, []).append(req)
+                    continue
+                with table.lock:
+                    if "PutRequest" in req:
+                        item = _normalize(req["PutRequest"]["Item"])
+                        is_new = item[table.hash_key] not in table.items
+                        table.items[item[table.hash_key]] = item
+                        units += self._write_units(item_size(item))
+                        if is_new:
+                            table.changed()
+                    else:
+                        key = table.key_of(req["DeleteRequest"]["Key"], "BatchWriteItem")
+                        old = table.items.pop(key, None)
+                        units += self._write_units(item_size(old or {}))
+                        if old is not None:
+                            table.changed()
+            cap = self._capacity(kw, name, units, True)
+            if cap:
+                caps.append(cap)
+        resp: Dict[str, Any] = {"UnprocessedItems": unprocessed}
+        if caps:
+            resp["ConsumedCapacity"] = caps
+        return resp
+
+
+def _normalize(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Round-trips an item through boto3's serializer (rejects floats, like boto3 does)."""
+    return {k: _deserializer.deserialize(_serializer.serialize(v)) for k, v in item.items()}
+
+
+# --------------------------------------------------------------------------- facades
+
+
+class _ResourceTable:
+    """``boto3.resource("dynamodb").Table(name)`` facade."""
+
+    def __init__(self, emulator: LocalDynamo, name: str) -> None:
+        self._emu = emulator
+        self.name = name
+        self.table_name = name
+
+    @property
+    def key_schema(self) -> List[Dict[str, str]]:
+        return [
+            {
+                "AttributeName": self._emu._table(self.name, "DescribeTable").hash_key,
+                "KeyType": "HASH",
+            }
+        ]
+
+    def load(self) -> None:
+        self._emu._table(self.name, "DescribeTable")
+
+    def get_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.get_item(TableName=self.name, **kw)
+
+    def put_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.put_item(TableName=self.name, **kw)
+
+    def update_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.update_item(TableName=self.name, **kw)
+
+    def delete_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.delete_item(TableName=self.name, **kw)
+
+    def scan(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.scan(TableName=self.name, **kw)
+
+    def query(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.query(TableName=self.name, **kw)
+
+    @contextlib.contextmanager
+    def batch_writer(
+        self, overwrite_by_pkeys: Optional[List[str]] = None
+    ) -> Iterator["_BatchWriter"]:
+        writer = _BatchWriter(self._emu, self.name)
+        try:
+            yield writer
+        finally:
+            writer.flush()
+
+
+class _BatchWriter:
+    def __init__(self, emulator: LocalDynamo, name: str) -> None:
+        self._emu = emulator
+        self._name = name
+        self._buffer: List[Dict[str, Any]] = []
+
+    def put_item(self, Item: Dict[str, Any]) -> None:
+        self._buffer.append({"PutRequest": {"Item": Item}})
+        if len(self._buffer) >= BATCH_WRITE_LIMIT:
+            self.flush()
+
+    def delete_item(self, Key: Dict[str, Any]) -> None:
+        self._buffer.append({"DeleteRequest": {"Key": Key}})
+        if len(self._buffer) >= BATCH_WRITE_LIMIT:
+            self.flush()
+
+    def flush(self) -> None:
+        while self._buffer:
+            batch, self._buffer = self._buffer[:BATCH_WRITE_LIMIT], self._buffer[BATCH_WRITE_LIMIT:]
+            resp = self._emu.batch_write_item(RequestItems={self._name: batch})
+            self._buffer.extend(resp["UnprocessedItems"].get(self._name, []))
+
+
+class LocalResource:
+    """``boto3.resource("dynamodb")`` facade."""
+
+    def __init__(self, emulator: LocalDynamo) -> None:
+        self._emu = emulator
+
+    def Table(self, name: str) -> _ResourceTable:  # noqa: N802 (boto3 API name)
+        return _ResourceTable(self._emu, name)
+
+    def batch_get_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.batch_get_item(**kw)
+
+    def batch_write_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._emu.batch_write_item(**kw)
+
+
+def _plain(value: Any) -> Any:
+    return _deserializer.deserialize(value)
+
+
+def _typed(value: Any) -> Any:
+    return _serializer.serialize(value)
+
+
+def _plain_map(m: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return None if m is None else {k: _plain(v) for k, v in m.items()}
+
+
+def _typed_map(m: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return None if m is None else {k: _typed(v) for k, v in m.items()}
+
+
+class LocalClient:
+    """``boto3.client("dynamodb")`` facade: converts attribute-value maps at the edge."""
+
+    _KEY_ARGS = ("Key", "Item", "ExclusiveStartKey", "ExpressionAttributeValues")
+
+    def __init__(self, emulator: LocalDynamo) -> None:
+        self._emu = emulator
+
+    def _in(self, kw: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: (_plain_map(v) if k in self._KEY_ARGS else v) for k, v in kw.items()}
+
+    @staticmethod
+    def _out(resp: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(resp)
+        for k in ("Item", "Attributes", "LastEvaluatedKey"):
+            if k in out:
+                out[k] = _typed_map(out[k])
+        if "Items" in out:
+            out["Items"] = [_typed_map(it) for it in out["Items"]]
+        return out
+
+    def _write(self, fn: Callable[..., Dict[str, Any]], kw: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self._out(fn(**self._in(kw)))
+        except ClientError as exc:
+            if "Item" in exc.response:
+                exc.response["Item"] = _typed_map(exc.response["Item"])
+            raise
+
+    def get_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._out(self._emu.get_item(**self._in(kw)))
+
+    def put_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._write(self._emu.put_item, kw)
+
+    def update_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._write(self._emu.update_item, kw)
+
+    def delete_item(self, **kw: Any) -> Dict[str, Any]:
+        return self._write(self._emu.delete_item, kw)
+
+    def scan(self, **kw: Any) -> Dict[str, Any]:
+        return self._out(self._emu.scan(**self._in(kw)))
+
+    def query(self, **kw: Any) -> Dict[str, Any]:
+        return self._out(self._emu.query(**self._in(kw)))
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **kw: Any) -> Dict[str, Any]:
+        plain = {
+            name: {**req, "Keys": [_plain_map(k) for k in req.get("Keys", [])]}
+            for name, req in RequestItems.items()
+        }
+        resp = self._emu.batch_get_item(RequestItems=plain, **kw)
+        resp["Responses"] = {
+            n: [_typed_map(it) for it in items] for n, items in resp["Responses"].items()
+        }
+        resp["UnprocessedKeys"] = {
+            n: {**req, "Keys": [_typed_map(k) for k in req["Keys"]]}
+            for n, req in resp["UnprocessedKeys"].items()
+        }
+        return resp
+
+    def batch_write_item(
+        self, RequestItems: Dict[str, List[Dict[str, Any]]], **kw: Any
+    ) -> Dict[str, Any]:
+        def _conv(req: Dict[str, Any], fn: Callable[[Dict[str, Any]], Any]) -> Dict[str, Any]:
+            if "PutRequest" in req:
+                return {"PutRequest": {"Item": fn(req["PutRequest"]["Item"])}}
+            return {"DeleteRequest": {"Key": fn(req["DeleteRequest"]["Key"])}}
+
+        plain = {n: [_conv(r, _plain_map) for r in reqs] for n, reqs in RequestItems.items()}
+        resp = self._emu.batch_write_item(RequestItems=plain, **kw)
+        resp["UnprocessedItems"] = {
+            n: [_conv(r, _typed_map) for r in reqs] for n, reqs in resp["UnprocessedItems"].items()
+        }
+        return resp
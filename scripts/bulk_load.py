@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Load NDJSON/CSV patient records into DynamoDB with a parallel BatchWriteItem pool."""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from lib.bulk_load import LoadStats, load, load_checkpoint, read_records  # noqa: E402
+
+
+def _progress(stats: LoadStats) -> None:
+    snap = stats.snapshot()
+    print(
+        f"\rwritten={snap['written']} rejected={snap['rejected']} "
+        f"retries={snap['retries']} offset={snap['offset']} {snap['itemsPerSec']} items/s",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main() -> int:
+    """
+    Streams the input file into the table; re-running with the same --checkpoint resumes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help=".ndjson/.jsonl/.csv, optionally .gz")
+    parser.add_argument(
+        "--table", default=os.getenv("PATIENT_TABLE_NAME") or os.getenv("TABLE_NAME")
+    )
+    parser.add_argument("--key-attr", default=os.getenv("PK_NAME", "patient_id"))
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", default=None, help="defaults to <input>.checkpoint.json")
+    parser.add_argument("--rejects", default=None, help="NDJSON file for rows that fail validation")
+    parser.add_argument("--region", default=os.getenv("AWS_REGION") or "eu-central-1")
+    args = parser.parse_args()
+
+    if not args.table:
+        print("--table or PATIENT_TABLE_NAME is required", file=sys.stderr)
+        return 1
+
+    checkpoint = args.checkpoint or args.input + ".checkpoint.json"
+    offset = load_checkpoint(checkpoint)
+    client = boto3.client(
+        "dynamodb",
+        region_name=args.region,
+        config=Config(
+            max_pool_connections=args.workers * 2,
+            retries={"max_attempts": 2, "mode": "standard"},
+        ),
+    )
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+    try:
+        stats = load(
+            client,
+            args.table,
+            read_records(args.input, skip=offset),
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            key_attr=args.key_attr,
+            checkpoint_path=checkpoint,
+            start_offset=offset,
+            on_progress=_progress,
+            on_reject=(
+                (lambda r: rejects.write(json.dumps(r, default=str) + "\n")) if rejects else None
+            ),
+        )
+    finally:
+        if rejects:
+            rejects.close()
+    print(file=sys.stderr)
+    print(json.dumps(stats.snapshot()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""
+Local RS256 key pair, JWKS and token issuer for exercising JWT_VERIFY without Cognito.
+
+Usage:
+  python scripts/dev_jwt.py keygen --out .dev-jwt-key.json --jwks .dev-jwks.json
+  python scripts/dev_jwt.py sign --key .dev-jwt-key.json --sub u1 --email a@b.c --groups Admin
+
+Then run handlers with JWT_VERIFY=true JWKS_PATH=.dev-jwks.json and send
+``Authorization: Bearer <token>``. Keys are generated in pure Python (Miller-Rabin
+primes), so no crypto library is needed; they are for local use only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# ASN.1 DigestInfo prefix for SHA-256, as in lib.auth.
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+PUBLIC_EXPONENT = 65537
+_SMALL_PRIMES = [p for p in range(3, 2000, 2) if all(p % d for d in range(3, int(p**0.5) + 1, 2))]
+
+
+def is_probable_prime(n: int, rng: random.Random, rounds: int = 40) -> bool:
+    """Miller-Rabin test with ``rounds`` random bases after trial division."""
+    if n < 2:
+        return False
+    for p in [2] + _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d, r = d // 2, r + 1
+    for _ in range(rounds):
+        x = pow(rng.randrange(2, n - 1), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def random_prime(bits: int, rng: random.Random) -> int:
+    """Returns a prime with exactly ``bits`` bits and ``p - 1`` coprime to 65537."""
+    while True:
+        candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | (1 << (bits - 2)) | 1
+        if candidate % PUBLIC_EXPONENT != 1 and is_probable_prime(candidate, rng):
+            return candidate
+
+
+def generate_key(bits: int = 2048, seed: Optional[int] = None, kid: str = "dev") -> Dict[str, Any]:
+    """Returns ``{"kid", "n", "e", "d"}`` (integers) for a fresh RSA key."""
+    rng = random.Random(seed) if seed is not None else random.SystemRandom()
+    while True:
+        p, q = random_prime(bits // 2, rng), random_prime(bits // 2, rng)
+        n = p * q
+        if p != q and n.bit_length() == bits:
+            break
+    phi = (p - 1) * (q - 1)
+    return {"kid": kid, "n": n, "e": PUBLIC_EXPONENT, "d": pow(PUBLIC_EXPONENT, -1, phi)}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int_b64url(value: int) -> str:
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def jwks(keys: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Builds a JWKS document with the public parts of ``keys``."""
+    return {
+        "keys": [
+            {
+                "kty": "RSA",
+                "alg": "RS256",
+                "use": "sig",
+                "kid": k["kid"],
+                "n": _int_b64url(k["n"]),
+                "e": _int_b64url(k["e"]),
+            }
+            for k in keys
+        ]
+    }
+
+
+def sign(key: Dict[str, Any], claims: Dict[str, Any]) -> str:
+    """Returns a compact RS256 JWT for ``claims``."""
+    header = {"alg": "RS256", "typ": "JWT", "kid": key["kid"]}
+    signing_input = (
+        _b64url(json.dumps(header, separators=(",", ":")).encode())
+        + "."
+        + _b64url(json.dumps(claims, separators=(",", ":")).encode())
+    )
+    k = (key["n"].bit_length() + 7) // 8
+    suffix = SHA256_DIGEST_INFO + hashlib.sha256(signing_input.encode()).digest()
+    em = b"\x00\x01" + b"\xff" * (k - len(suffix) - 3) + b"\x00" + suffix
+    signature = pow(int.from_bytes(em, "big"), key["d"], key["n"]).to_bytes(k, "big")
+    return signing_input + "." + _b64url(signature)
+
+
+def claims_for(
+    sub: str,
+    email: str = "",
+    groups: Optional[List[str]] = None,
+    ttl: int = 3600,
+    issuer: str = "",
+    audience: str = "",
+) -> Dict[str, Any]:
+    """Builds Cognito-shaped ID token claims."""
+    now = int(time.time())
+    claims: Dict[str, Any] = {"sub": sub, "token_use": "id", "iat": now, "exp": now + ttl}
+    if email:
+        claims["email"] = email
+    if groups:
+        claims["cognito:groups"] = groups
+    if issuer:
+        claims["iss"] = issuer
+    if audience:
+        claims["aud"] = audience
+    return claims
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    keygen = sub.add_parser("keygen")
+    keygen.add_argument("--out", required=True, help="private key JSON")
+    keygen.add_argument("--jwks", required=True, help="public JWKS JSON")
+    keygen.add_argument("--bits", type=int, default=2048)
+    keygen.add_argument("--kid", default="dev")
+    signp = sub.add_parser("sign")
+    signp.add_argument("--key", required=True)
+    signp.add_argument("--sub", required=True)
+    signp.add_argument("--email", default="")
+    signp.add_argument("--groups", default="", help="comma-separated Cognito groups")
+    signp.add_argument("--ttl", type=int, default=3600)
+    signp.add_argument("--issuer", default="")
+    signp.add_argument("--audience", default="")
+    args = parser.parse_args()
+
+    if args.cmd == "keygen":
+        key = generate_key(args.bits, kid=args.kid)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({k: str(v) if isinstance(v, int) else v for k, v in key.items()}, fh)
+        with open(args.jwks, "w", encoding="utf-8") as fh:
+            json.dump(jwks([key]), fh, indent=2)
+        print(f"wrote {args.out} and {args.jwks}", file=sys.stderr)
+        return 0
+
+    with open(args.key, "r", encoding="utf-8") as fh:
+        raw = json.load(fh)
+    key = {k: (v if k == "kid" else int(v)) for k, v in raw.items()}
+    groups = [g for g in args.groups.split(",") if g]
+    print(sign(key, claims_for(args.sub, args.email, groups, args.ttl, args.issuer, args.audience)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Export the patient table to gzip-compressed NDJSON/CSV parts with a manifest."""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import boto3
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from lib.export import DEFAULT_PHI_FIELDS, FORMATS, export_table  # noqa: E402
+
+
+def main() -> int:
+    """
+    Runs a parallel segmented export; re-running with the same --out resumes it.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--table", default=os.getenv("PATIENT_TABLE_NAME") or os.getenv("TABLE_NAME")
+    )
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--redact", action="store_true", help="drop PHI fields")
+    parser.add_argument("--redact-fields", default=",".join(DEFAULT_PHI_FIELDS))
+    parser.add_argument("--region", default=os.getenv("AWS_REGION") or "eu-central-1")
+    args = parser.parse_args()
+
+    if not args.table:
+        print("--table or PATIENT_TABLE_NAME is required", file=sys.stderr)
+        return 1
+
+    redact_fields = [f for f in args.redact_fields.split(",") if f] if args.redact else []
+    manifest = export_table(
+        boto3.client("dynamodb", region_name=args.region),
+        args.table,
+        args.out,
+        segments=args.segments,
+        fmt=args.format,
+        chunk_rows=args.chunk_rows,
+        redact_fields=redact_fields,
+        page_size=args.page_size,
+    )
+    summary = {k: manifest[k] for k in ("rows", "complete", "elapsedSeconds")}
+    summary["parts"] = len(manifest["parts"])
+    print(json.dumps(summary))
+    return 0 if manifest["complete"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
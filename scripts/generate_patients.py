@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Vectorized synthetic patient generator for benchmarks and load tests.
+
+Every column is drawn with NumPy in fixed-size chunks, each chunk seeded from
+``(seed, chunk_index)``, so a given ``--seed``/``--rows``/``--as-of`` always
+produces byte-identical output. Diseases and medications are sampled from the
+``DISEASES``/``MEDS`` vocabularies with Zipf-distributed popularity and stored
+as per-row bitmasks, which lets the writers use a small precomputed fragment
+per combination instead of building lists row by row.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from vocabularies import DISEASES, MEDS  # noqa: E402
+
+CHUNK_ROWS = 100_000
+FORMATS = ("ndjson", "dynamodb-json", "npz")
+DEFAULT_AS_OF = "2025-06-30"
+AS_OF = date.fromisoformat(DEFAULT_AS_OF)
+
+FIRST_NAMES = [
+    "Olena", "Andrii", "Maria", "John", "Anna", "Taras", "Sofia", "David", "Iryna", "Mark",
+    "Emma", "Oleh", "Laura", "Peter", "Yana", "Chris", "Nadia", "Samuel", "Kateryna", "Alex",
+]
+LAST_NAMES = [
+    "Shevchenko", "Smith", "Kovalenko", "Johnson", "Bondarenko", "Brown", "Tkachenko", "Miller",
+    "Kravchenko", "Wilson", "Melnyk", "Taylor", "Boyko", "Clark", "Moroz", "Lewis",
+]
+SEXES = np.array(["F", "M", "X"])
+SEX_P = [0.505, 0.485, 0.01]
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def zipf_weights(size: int, s: float = 1.1) -> np.ndarray:
+    """Normalised Zipf probabilities for ranks ``1..size``."""
+    w = 1.0 / np.arange(1, size + 1) ** s
+    return w / w.sum()
+
+
+def _membership(
+    rng: np.random.Generator, counts: np.ndarray, vocab_size: int, s: float
+) -> np.ndarray:
+    """Returns a bitmask per row with ``<= counts`` distinct Zipf-sampled vocabulary entries."""
+    n = counts.shape[0]
+    draws = rng.choice(vocab_size, size=(n, vocab_size), p=zipf_weights(vocab_size, s))
+    take = np.arange(vocab_size)[None, :] < counts[:, None]
+    bits = np.where(take, np.left_shift(1, draws), 0)
+    return np.bitwise_or.reduce(bits, axis=1).astype(np.int64)
+
+
+def generate_chunk(
+    seed: int, index: int, rows: int, as_of: date = AS_OF
+) -> Dict[str, np.ndarray]:
+    """
+    Generates one chunk of columns: ids, names, sex, birth day, BMI and bitmasks.
+    """
+    rng = np.random.default_rng([seed, index])
+    ids = rng.integers(0, 2**63, size=(rows, 2), dtype=np.uint64)
+
+    age_years = np.clip(rng.gamma(shape=4.0, scale=11.0, size=rows), 0.0, 100.0)
+    age_days = (age_years * 365.2425).astype(np.int64)
+    as_of_day = (np.datetime64(as_of.isoformat(), "D") - _EPOCH).astype(np.int64)
+    birth_day = as_of_day - age_days
+
+    bmi = np.clip(rng.lognormal(mean=np.log(26.5), sigma=0.17, size=rows), 15.0, 55.0)
+    bmi = np.round(bmi, 1)
+
+    lam_d = 0.2 + age_years / 35.0
+    lam_m = 0.1 + age_years / 45.0
+    n_dis = np.minimum(rng.poisson(lam_d), len(DISEASES))
+    n_med = np.minimum(rng.poisson(lam_m), len(MEDS))
+
+    return {
+        "id_hi": ids[:, 0],
+        "id_lo": ids[:, 1],
+        "first": rng.integers(0, len(FIRST_NAMES), size=rows).astype(np.int16),
+        "last": rng.integers(0, len(LAST_NAMES), size=rows).astype(np.int16),
+        "sex": rng.choice(len(SEXES), size=rows, p=SEX_P).astype(np.int8),
+        "birth_day": birth_day.astype(np.int32),
+        "bmi": bmi,
+        "diseases": _membership(rng, n_dis, len(DISEASES), 1.1),
+        "medications": _membership(rng, n_med, len(MEDS), 1.3),
+    }
+
+
+def generate(
+    seed: int, rows: int, as_of: date = AS_OF
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Yields column chunks of at most ``CHUNK_ROWS`` rows."""
+    for index, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        yield generate_chunk(seed, index, min(CHUNK_ROWS, rows - start), as_of)
+
+
+def _mask_lists(vocab: Sequence[str]) -> List[List[str]]:
+    return [
+        [v for bit, v in enumerate(vocab) if mask >> bit & 1] for mask in range(1 << len(vocab))
+    ]
+
+
+def _columns_to_strings(cols: Dict[str, np.ndarray]) -> Dict[str, List[str]]:
+    hi = cols["id_hi"].tolist()
+    lo = cols["id_lo"].tolist()
+    ids = [f"{h:016x}{low:016x}" for h, low in zip(hi, lo, strict=True)]
+    ids = [f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:32]}" for x in ids]
+    first = np.array(FIRST_NAMES)[cols["first"]]
+    last = np.array(LAST_NAMES)[cols["last"]]
+    return {
+        "patient_id": ids,
+        "name": np.char.add(np.char.add(first, " "), last).tolist(),
+        "sex": SEXES[cols["sex"]].tolist(),
+        "date_of_birth": (_EPOCH + cols["birth_day"].astype("timedelta64[D]")).astype(str).tolist(),
+        "bmi": [f"{b:.1f}" for b in cols["bmi"].tolist()],
+    }
+
+
+def ndjson_lines(cols: Dict[str, np.ndarray]) -> Iterator[str]:
+    """Renders a chunk as plain NDJSON lines (``PatientRecord`` shape)."""
+    dis = [json.dumps(x, separators=(",", ":")) for x in _mask_lists(DISEASES)]
+    med = [json.dumps(x, separators=(",", ":")) for x in _mask_lists(MEDS)]
+    s = _columns_to_strings(cols)
+    for pid, name, sex, dob, bmi, d, m in zip(
+        s["patient_id"], s["name"], s["sex"], s["date_of_birth"], s["bmi"],
+        cols["diseases"].tolist(), cols["medications"].tolist(), strict=True,
+    ):
+        yield (
+            f'{{"patient_id":"{pid}","name":"{name}","sex":"{sex}","date_of_birth":"{dob}",'
+            f'"bmi":{bmi},"diseases":{dis[d]},"medications":{med[m]}}}\n'
+        )
+
+
+def dynamodb_json_lines(cols: Dict[str, np.ndarray]) -> Iterator[str]:
+    """Renders a chunk as DynamoDB-JSON lines (``{"Item": {...}}``, S3 import format)."""
+
+    def _typed(vocab: Sequence[str]) -> List[str]:
+        return [
+            json.dumps({"L": [{"S": v} for v in lst]}, separators=(",", ":"))
+            for lst in _mask_lists(vocab)
+        ]
+
+    dis = _typed(DISEASES)
+    med = _typed(MEDS)
+    s = _columns_to_strings(cols)
+    for pid, name, sex, dob, bmi, d, m in zip(
+        s["patient_id"], s["name"], s["sex"], s["date_of_birth"], s["bmi"],
+        cols["diseases"].tolist(), cols["medications"].tolist(), strict=True,
+    ):
+        yield (
+            f'{{"Item":{{"patient_id":{{"S":"{pid}"}},"name":{{"S":"{name}"}},'
+            f'"sex":{{"S":"{sex}"}},"date_of_birth":{{"S":"{dob}"}},"bmi":{{"N":"{bmi}"}},'
+            f'"diseases":{dis[d]},"medications":{med[m]}}}}}\n'
+        )
+
+
+def write_text(path: str, seed: int, rows: int, fmt: str, as_of: date) -> None:
+    """Writes NDJSON or DynamoDB-JSON, gzip-compressed when ``path`` ends with ``.gz``."""
+    render = ndjson_lines if fmt == "ndjson" else dynamodb_json_lines
+    raw = open(path, "wb")
+    stream: io.BufferedIOBase = raw
+    if path.endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0, filename="")
+    with raw, stream, io.TextIOWrapper(stream, encoding="utf-8", newline="") as out:
+        for cols in generate(seed, rows, as_of):
+            out.write("".join(render(cols)))
+
+
+def write_npz(path: str, seed: int, rows: int, as_of: date) -> None:
+    """
+    Writes the columnar form: one array per column plus the vocabularies.
+
+    ``diseases``/``medications`` are bitmasks over ``vocab_diseases``/``vocab_medications``
+    (bit ``i`` set means entry ``i`` is present).
+    """
+    chunks = list(generate(seed, rows, as_of))
+    cols = {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]} if chunks else {}
+    np.savez(
+        path,
+        vocab_diseases=np.array(DISEASES),
+        vocab_medications=np.array(MEDS),
+        vocab_first=np.array(FIRST_NAMES),
+        vocab_last=np.array(LAST_NAMES),
+        vocab_sex=SEXES,
+        **cols,
+    )
+
+
+def main() -> int:
+    """
+    Generates ``--rows`` patients; the same seed and as-of date give identical bytes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--as-of", default=DEFAULT_AS_OF, help="reference date (YYYY-MM-DD)")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    as_of = date.fromisoformat(args.as_of)
+    if args.format == "npz":
+        write_npz(args.out, args.seed, args.rows, as_of)
+    else:
+        write_text(args.out, args.seed, args.rows, args.format, as_of)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Serve the Lambda handlers over HTTP for load tests and on-prem runs.
+
+Usage:
+  python scripts/local_server.py --emulator --seed patients.ndjson.gz --claims-file admin.json
+  python scripts/local_server.py --port 3000 --workers 32 --quiet  # real DynamoDB (env/credentials)
+
+Each request becomes an API Gateway HTTP API (payload 2.0) event and runs on a
+thread pool, so blocking handlers see real concurrency. Claims come from
+--claims/--claims-file (or per request from an ``X-Local-Claims`` JSON header)
+and are placed where the JWT authorizer would put them; with --no-claims the
+authorizer is left empty so ``JWT_VERIFY`` and ``Authorization`` headers are
+exercised instead. ``GET /metrics`` returns Prometheus request counts and
+latency histograms per route. --emulator routes boto3 DynamoDB calls to
+``benchmarks.local_dynamo`` (optionally seeded through ``lib.bulk_load``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+_ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(_ROOT / "src"), str(_ROOT)]  # handlers/lib, and benchmarks for --emulator
+
+ROUTES = {
+    "GET /health": "handlers.health.lambda_handler",
+    "GET /patient/me": "handlers.patient_me.lambda_handler",
+    "GET /me/record": "handlers.patient_handler.handler",
+    "PUT /me/record": "handlers.patient_handler.handler",
+    "GET /admin/metrics": "handlers.admin_metrics.lambda_handler",
+    "GET /admin/metrics/comorbidity": "handlers.admin_comorbidity.lambda_handler",
+    "GET /admin/metrics/associations": "handlers.admin_associations.lambda_handler",
+    "GET /admin/overview": "handlers.admin_overview.lambda_handler",
+    "GET /admin/diseases": "handlers.admin_diseases.lambda_handler",
+    "GET /admin/medications": "handlers.admin_medications.lambda_handler",
+    "GET /admin/stats": "handlers.admin_handler.handler",
+}
+
+# Seconds; the upper bounds of the latency histogram buckets.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_BODY = 6 * 1024 * 1024  # the Lambda synchronous payload limit
+
+Handler = Callable[[Dict[str, Any], Any], Any]
+
+
+def resolve(target: str) -> Handler:
+    """Imports ``package.module.function``."""
+    module, _, attr = target.rpartition(".")
+    return getattr(importlib.import_module(module), attr)
+
+
+class Metrics:
+    """Request counters and cumulative latency histograms, per route."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hist: Dict[str, List[int]] = {}
+        self._sum: Dict[str, float] = {}
+        self._status: Dict[Tuple[str, int], int] = {}
+        self.in_flight = 0
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            hist = self._hist.setdefault(route, [0] * (len(BUCKETS) + 1))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-1] += 1
+            self._sum[route] = self._sum.get(route, 0.0) + seconds
+            self._status[(route, status)] = self._status.get((route, status), 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        h = "handler_request_duration_seconds"
+        out = [f"# TYPE {h} histogram"]
+        with self._lock:
+            for route in sorted(self._hist):
+                hist, label = self._hist[route], f'route="{route}"'
+                for bound, n in zip(BUCKETS, hist[:-1], strict=True):
+                    out.append(f'{h}_bucket{{{label},le="{bound}"}} {n}')
+                out.append(f'{h}_bucket{{{label},le="+Inf"}} {hist[-1]}')
+                out.append(f"{h}_sum{{{label}}} {self._sum[route]:.6f}")
+                out.append(f"{h}_count{{{label}}} {hist[-1]}")
+            out.append("# TYPE handler_requests_total counter")
+            for (route, status), n in sorted(self._status.items()):
+                out.append(f'handler_requests_total{{route="{route}",status="{status}"}} {n}')
+            out.append("# TYPE handler_requests_in_flight gauge")
+            out.append(f"handler_requests_in_flight {self.in_flight}")
+        return "\n".join(out) + "\n"
+
+
+class LambdaContext:
+    """The parts of the Lambda context object handlers may touch."""
+
+    def __init__(self, function_name: str, timeout: float) -> None:
+        self.function_name = function_name
+        self.function_version = "$LATEST"
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{function_name}"
+        self.memory_limit_in_mb = 256
+        self.aws_request_id = str(uuid.uuid4())
+        self.log_group_name = f"/aws/lambda/{function_name}"
+        self.log_stream_name = "local"
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def build_event(
+    method: str,
+    target: str,
+    headers: List[Tuple[str, str]],
+    body: bytes,
+    route_key: str,
+    claims: Optional[Dict[str, Any]],
+    source_ip: str = "127.0.0.1",
+) -> Dict[str, Any]:
+    """Builds an HTTP API payload 2.0 event."""
+    url = urlsplit(target)
+    merged: Dict[str, str] = {}
+    cookies: List[str] = []
+    for name, value in headers:
+        name = name.lower()
+        if name == "cookie":
+            cookies.extend(c.strip() for c in value.split(";") if c.strip())
+            continue
+        merged[name] = f"{merged[name]},{value}" if name in merged else value
+    query: Dict[str, str] = {}
+    for k, v in parse_qsl(url.query, keep_blank_values=True):
+        query[k] = f"{query[k]},{v}" if k in query else v
+    try:
+        text, is_b64 = body.decode("utf-8"), False
+    except UnicodeDecodeError:
+        text, is_b64 = base64.b64encode(body).decode("ascii"), True
+    now = time.time()
+    event: Dict[str, Any] = {
+        "version": "2.0",
+        "routeKey": route_key,
+        "rawPath": url.path,
+        "rawQueryString": url.query,
+        "headers": merged,
+        "requestContext": {
+            "accountId": "000000000000",
+            "apiId": "local",
+            "domainName": merged.get("host", "localhost"),
+            "http": {
+                "method": method,
+                "path": url.path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": source_ip,
+                "userAgent": merged.get("user-agent", ""),
+            },
+            "requestId": uuid.uuid4().hex,
+            "routeKey": route_key,
+            "stage": "$default",
+            "time": time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(now)),
+            "timeEpoch": int(now * 1000),
+        },
+        "isBase64Encoded": is_b64,
+    }
+    if cookies:
+        event["cookies"] = cookies
+    if query:
+        event["queryStringParameters"] = query
+    if body:
+        event["body"] = text
+    if claims is not None:
+        event["requestContext"]["authorizer"] = {"jwt": {"claims": claims, "scopes": None}}
+    return event
+
+
+def to_http(result: Any) -> Tuple[int, Dict[str, str], bytes]:
+    """Converts a handler result to (status, headers, body) the way HTTP API does."""
+    if not isinstance(result, dict) or "statusCode" not in result:
+        # Payload 2.0 treats anything else as a 200 JSON body.
+        return 200, {"content-type": "application/json"}, json.dumps(result).encode()
+    headers = {k.lower(): str(v) for k, v in (result.get("headers") or {}).items()}
+    body = result.get("body") or ""
+    data = base64.b64decode(body) if result.get("isBase64Encoded") else str(body).encode()
+    headers.setdefault("content-type", "application/json")
+    return int(result["statusCode"]), headers, data
+
+
+class LocalServer:
+    """asyncio HTTP/1.1 front end; handlers run on a thread pool."""
+
+    def __init__(
+        self,
+        routes: Dict[str, Handler],
+        claims: Optional[Dict[str, Any]] = None,
+        workers: int = 16,
+        timeout: float = 10.0,
+    ) -> None:
+        self.routes = routes
+        self.claims = claims
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handler")
+        self.metrics = Metrics()
+        self.paths = {key.split(" ", 1)[1] for key in routes}
+
+    def _claims_for(self, headers: List[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+        for name, value in headers:
+            if name.lower() == "x-local-claims":
+                return json.loads(value)
+        return self.claims
+
+    async def dispatch(
+        self, method: str, target: str, headers: List[Tuple[str, str]], body: bytes, peer: str
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Runs the matching handler and returns (status, headers, body)."""
+        path = urlsplit(target).path
+        if method == "GET" and path == "/metrics":
+            return (
+                200,
+                {"content-type": "text/plain; version=0.0.4"},
+                self.metrics.render().encode(),
+            )
+        route_key = f"{method} {path}"
+        fn = self.routes.get(route_key)
+        if fn is None:
+            status = 405 if path in self.paths else 404
+            return status, {"content-type": "application/json"}, b'{"message":"Not Found"}'
+
+        started = time.perf_counter()
+        self.metrics.in_flight += 1
+        try:
+            event = build_event(
+                method, target, headers, body, route_key, self._claims_for(headers), peer
+            )
+            context = LambdaContext(fn.__module__.rsplit(".", 1)[-1], self.timeout)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.pool, fn, event, context)
+            status, out_headers, data = to_http(result)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            status, out_headers = 500, {"content-type": "application/json"}
+            data = b'{"message":"Internal Server Error"}'
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.observe(route_key, status, time.perf_counter() - started)
+        return status, out_headers, data
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = (writer.get_extra_info("peername") or ("127.0.0.1",))[0]
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, version = line.decode("latin-1").split()
+                headers: List[Tuple[str, str]] = []
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = raw.decode("latin-1").partition(":")
+                    headers.append((name.strip(), value.strip()))
+                lowered = {k.lower(): v for k, v in headers}
+                keep_alive = (
+                    lowered.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                )
+                if "chunked" in lowered.get("transfer-encoding", "").lower():
+                    status, out_headers, data = 411, {}, b""
+                    keep_alive = False
+                else:
+                    length = int(lowered.get("content-length") or 0)
+                    if length > MAX_BODY:
+                        status, out_headers, data = 413, {}, b""
+                        keep_alive = False
+                    else:
+                        body = await reader.readexactly(length) if length else b""
+                        status, out_headers, data = await self.dispatch(
+                            method.upper(), target, headers, body, peer
+                        )
+                out_headers["content-length"] = str(len(data))
+                out_headers["connection"] = "keep-alive" if keep_alive else "close"
+                head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n" + "".join(
+                    f"{k}: {v}\r\n" for k, v in out_headers.items()
+                )
+                writer.write(head.encode("latin-1") + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 3000) -> asyncio.AbstractServer:
+        """Starts listening; returns the asyncio server (``sockets[0]`` has the port)."""
+        return await asyncio.start_server(self._serve, host, port, backlog=1024)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False)
+
+
+def emulator(seed: Optional[str], latency: float) -> Any:
+    """Creates the tables the handlers expect, seeded from ``seed`` if given."""
+    from benchmarks.local_dynamo import LocalDynamo
+    from lib.bulk_load import load, read_records
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+    os.environ.setdefault("PATIENT_TABLE_NAME", "PatientRecords")
+    os.environ.setdefault("TABLE_NAME", os.environ["PATIENT_TABLE_NAME"])
+    os.environ.setdefault("DYNAMODB_TABLE", "patients")
+    emu = LocalDynamo(latency=latency)
+    emu.create_table(os.environ["PATIENT_TABLE_NAME"], os.getenv("PK_NAME", "patientId"))
+    emu.create_table(os.environ["DYNAMODB_TABLE"], "patient_id")
+    for var in ("IDEMPOTENCY_TABLE", "RATE_LIMIT_TABLE"):
+        if os.getenv(var):
+            emu.create_table(os.environ[var], "id")
+    if seed:
+        stats = load(emu.client(), os.environ["DYNAMODB_TABLE"], read_records(seed), workers=4)
+        print(f"seeded {stats.snapshot()['written']} records", file=sys.stderr)
+    return emu
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=16, help="handler thread pool size")
+    parser.add_argument("--timeout", type=float, default=10.0, help="context deadline, seconds")
+    parser.add_argument("--claims", default=None, help="JSON claims injected into every request")
+    parser.add_argument("--claims-file", default=None)
+    parser.add_argument("--no-claims", action="store_true", help="leave the authorizer empty")
+    parser.add_argument("--emulator", action="store_true", help="use the in-process DynamoDB")
+    parser.add_argument("--seed", default=None, help="NDJSON/CSV records for the emulator")
+    parser.add_argument("--latency", type=float, default=0.0, help="emulated seconds per call")
+    parser.add_argument("--quiet", action="store_true", help="no EMF lines, WARNING logs only")
+    args = parser.parse_args()
+    if args.quiet:
+        # Before lib is imported: both are read at import time.
+        os.environ.setdefault("EMF_ENABLED", "false")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    claims: Optional[Dict[str, Any]] = {"sub": "local-user", "email": "local@example.com"}
+    if args.claims_file:
+        with open(args.claims_file, encoding="utf-8") as fh:
+            claims = json.load(fh)
+    elif args.claims:
+        claims = json.loads(args.claims)
+    if args.no_claims:
+        claims = None
+
+    with contextlib.ExitStack() as stack:
+        if args.emulator:
+            stack.enter_context(emulator(args.seed, args.latency).patch_boto3())
+        server = LocalServer(
+            {k: resolve(v) for k, v in ROUTES.items()}, claims, args.workers, args.timeout
+        )
+
+        async def run() -> None:
+            srv = await server.start(args.host, args.port)
+            print(
+                f"listening on http://{args.host}:{srv.sockets[0].getsockname()[1]}",
+                file=sys.stderr,
+            )
+            async with srv:
+                await srv.serve_forever()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
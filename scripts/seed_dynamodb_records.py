@@ -8,24 +8,7 @@ from typing import Dict, List
 import boto3
 from faker import Faker
 
-
-DISEASES = [
-    "hypertension",
-    "type 2 diabetes",
-    "asthma",
-    "hyperlipidemia",
-    "coronary artery disease",
-    "depression",
-    "anxiety",
-]
-
-MEDS = [
-    "lisinopril 10 mg",
-    "metformin 500 mg",
-    "atorvastatin 20 mg",
-    "amlodipine 5 mg",
-    "albuterol inhaler",
-]
+from vocabularies import DISEASES, MEDS
 
 
 def main() -> None:
@@ -46,7 +29,9 @@ def main() -> None:
     table = dynamodb.Table(table_name)
     fake = Faker()
 
-    with open(args.csv, newline="") as f:
+    with open(args.csv, newline="") as f, table.batch_writer(
+        overwrite_by_pkeys=["patient_id"]
+    ) as batch:
         reader = csv.DictReader(f)
         for row in reader:
             sub = row["sub"]
@@ -60,9 +45,7 @@ def main() -> None:
                 "diseases": fake.random_choices(elements=DISEASES, length=fake.random_int(0, 3), unique=True),
             }
             if not args.dry_run:
-                table.put_item(Item=profile)
-            else:
-                pass
+                batch.put_item(Item=profile)
 
 
 if __name__ == "__main__":
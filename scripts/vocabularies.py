@@ -0,0 +1,22 @@
+"""Disease and medication vocabularies shared by the seed and generator scripts.
+
+Kept free of third-party imports so offline tools can use them without boto3 or faker.
+"""
+
+DISEASES = [
+    "hypertension",
+    "type 2 diabetes",
+    "asthma",
+    "hyperlipidemia",
+    "coronary artery disease",
+    "depression",
+    "anxiety",
+]
+
+MEDS = [
+    "lisinopril 10 mg",
+    "metformin 500 mg",
+    "atorvastatin 20 mg",
+    "amlodipine 5 mg",
+    "albuterol inhaler",
+]
@@ -4,11 +4,16 @@ import os
 import sys
 import time
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import Dict, Any, Iterable
 
 import boto3
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from lib.bulk_load import BATCH_LIMIT, write_batch  # noqa: E402
+
 
 def _env(name: str) -> str:
     """Return a required environment variable or fail fast."""
@@ -76,15 +81,11 @@ def as_item(pk_name: str, patient_email: str, diagnosis: str, updated_iso: str)
     }
 
 
-def seed_bulk(dynamo, table: str, items: Iterable[Dict[str, Any]]) -> None:
-    """Batch-write a bounded list of items using BatchWriteItem with automatic unprocessed retries."""
-    request_items = {table: [{"PutRequest": {"Item": it}} for it in items]}
-    while request_items[table]:
-        resp = dynamo.batch_write_item(RequestItems=request_items)
-        unp = resp.get("UnprocessedItems", {}).get(table, [])
-        request_items[table] = unp
-        if unp:
-            time.sleep(0.5)
+def seed_bulk(dynamo, table: str, items: Iterable[Dict[str, Any]], max_attempts: int = 8) -> None:
+    """Batch-write items 25 at a time with ``lib.bulk_load.write_batch`` (jittered retries)."""
+    items = list(items)
+    for start in range(0, len(items), BATCH_LIMIT):
+        write_batch(dynamo, table, items[start : start + BATCH_LIMIT], max_attempts=max_attempts)
 
 
 def main() -> int:
@@ -0,0 +1,83 @@
+"""Admin medication/disease associations Lambda handler."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from lib import associations
+from lib.auth import extract_claims, require_admin
+from lib.cache import wants_consistent
+from lib.db import scan_patients, table_name
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.result_cache import cached_response, quantize_bounds
+from lib.timing import count, instrumented, phase, query_shape, set_property
+from lib.utils import json_response, parse_age_bounds
+
+DEFAULT_TOP = 5
+MAX_TOP = 100
+
+
+@instrumented("admin_associations")
+@rate_limited("admin_associations", "scan")
+@profiled("admin_associations")
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Returns medication -> disease associations (support, confidence, lift),
+    the top ``?top=`` diseases per medication, for admin with optional age
+    filtering and an optional ``?medication=`` row.
+    """
+    try:
+        with phase("auth"):
+            claims = extract_claims(event)
+            require_admin(claims)
+    except PermissionError as e:
+        return json_response(403, {"message": str(e)})
+
+    params = event.get("queryStringParameters") or {}
+    medication = (params.get("medication") or "").strip() or None
+    try:
+        top = int(params.get("top") or DEFAULT_TOP)
+    except ValueError:
+        return json_response(400, {"message": "top must be an integer"})
+    if not 1 <= top <= MAX_TOP:
+        return json_response(400, {"message": f"top must be between 1 and {MAX_TOP}"})
+    try:
+        min_age, max_age = parse_age_bounds(params)
+    except ValueError as e:
+        return json_response(400, {"message": str(e)})
+    set_property("query_shape", query_shape(params))
+    min_age, max_age = quantize_bounds(min_age, max_age)
+    consistent = wants_consistent(event)
+    return cached_response(
+        f"admin_associations#{medication or '*'}#{top}",
+        table_name(),
+        min_age,
+        max_age,
+        lambda: _compute(medication, top, min_age, max_age, consistent),
+        consistent,
+    )
+
+
+def _compute(
+    medication: Optional[str],
+    top: int,
+    min_age: Optional[float],
+    max_age: Optional[float],
+    consistent: bool,
+) -> Dict[str, Any]:
+    """Reads the published association matrix, or one built on a scan."""
+    matrix = None
+    if not consistent:
+        with phase("index"):
+            matrix = associations.current(table_name())
+    if matrix is None:
+        with phase("scan"):
+            items = scan_patients()
+        count("items", len(items))
+        with phase("build"):
+            matrix = associations.AssociationMatrix.build(items)
+    with phase("aggregate"):
+        payload = matrix.associations(min_age, max_age, top, medication)
+    with phase("serialize"):
+        return json_response(200, payload)
@@ -0,0 +1,71 @@
+"""Admin comorbidity metrics Lambda handler."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from lib import bitmaps
+from lib.auth import extract_claims, require_admin
+from lib.cache import wants_consistent
+from lib.db import scan_patients, table_name
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.result_cache import cached_response, quantize_bounds
+from lib.timing import count, instrumented, phase, query_shape, set_property
+from lib.utils import json_response, parse_age_bounds
+
+
+@instrumented("admin_comorbidity")
+@rate_limited("admin_comorbidity", "scan")
+@profiled("admin_comorbidity")
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Returns the diseases co-occurring with ``?disease=`` (counts and lift) for
+    admin with optional age filtering.
+    """
+    try:
+        with phase("auth"):
+            claims = extract_claims(event)
+            require_admin(claims)
+    except PermissionError as e:
+        return json_response(403, {"message": str(e)})
+
+    params = event.get("queryStringParameters") or {}
+    disease = (params.get("disease") or "").strip()
+    if not disease:
+        return json_response(400, {"message": "disease is required"})
+    try:
+        min_age, max_age = parse_age_bounds(params)
+    except ValueError as e:
+        return json_response(400, {"message": str(e)})
+    set_property("query_shape", query_shape(params))
+    min_age, max_age = quantize_bounds(min_age, max_age)
+    consistent = wants_consistent(event)
+    return cached_response(
+        f"admin_comorbidity#{disease}",
+        table_name(),
+        min_age,
+        max_age,
+        lambda: _compute(disease, min_age, max_age, consistent),
+        consistent,
+    )
+
+
+def _compute(
+    disease: str, min_age: Optional[float], max_age: Optional[float], consistent: bool
+) -> Dict[str, Any]:
+    """Intersects disease bitmaps from the published index, or from one built on a scan."""
+    index = None
+    if not consistent:
+        with phase("index"):
+            index = bitmaps.current(table_name())
+    if index is None:
+        with phase("scan"):
+            items = scan_patients()
+        count("items", len(items))
+        with phase("build"):
+            index = bitmaps.BitmapIndex.build(items)
+    with phase("aggregate"):
+        payload = index.comorbidity(disease, min_age, max_age)
+    with phase("serialize"):
+        return json_response(200, payload)
@@ -0,0 +1,109 @@
+"""Bulk export Lambda handler (invoked directly or on a schedule, not via the API)."""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Any, Dict
+
+import boto3
+
+from lib.export import CHECKPOINT_DIR, DEFAULT_PHI_FIELDS, FORMATS, export_table
+from lib.timing import instrumented
+
+_SAFETY_MARGIN_MS = 30_000
+
+
+def new_job_id() -> str:
+    """Returns a sortable, unique job id such as ``20260101T120000Z-1a2b3c4d``."""
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:8]
+
+
+def _positive_int(event: Dict[str, Any], key: str, default: int) -> int:
+    """Reads an optional positive integer option from the event."""
+    try:
+        value = int(event.get(key) or default)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer") from None
+    if value < 1:
+        raise ValueError(f"{key} must be >= 1")
+    return value
+
+
+def _restore_checkpoints(s3: Any, bucket: str, prefix: str, out_dir: str) -> None:
+    """Copies the job's checkpoints from S3, so any container can resume it."""
+    local = os.path.join(out_dir, CHECKPOINT_DIR)
+    os.makedirs(local, exist_ok=True)
+    pages = s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket, Prefix=f"{prefix}/{CHECKPOINT_DIR}/"
+    )
+    for page in pages:
+        for obj in page.get("Contents", []):
+            s3.download_file(bucket, obj["Key"], os.path.join(local, os.path.basename(obj["Key"])))
+
+
+@instrumented("admin_export")
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Exports the patient table to ``/tmp`` and uploads each finished part to S3.
+
+    Event keys (all optional): ``jobId``, ``format`` (``ndjson``/``csv``),
+    ``segments``, ``chunkRows``, ``redact`` (bool). Without ``jobId`` every
+    invocation starts a new export under a fresh id. When the invocation runs
+    low on time the export stops at a page boundary and returns
+    ``complete: false``; invoking again with the returned ``jobId`` resumes
+    from the per-segment checkpoints, which are kept in S3 next to the parts.
+    """
+    table_name = os.getenv("PATIENT_TABLE_NAME") or os.getenv("TABLE_NAME")
+    if not table_name:
+        return {"complete": False, "error": "PATIENT_TABLE_NAME env not set"}
+    fmt = event.get("format") or "ndjson"
+    try:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+        segments = _positive_int(event, "segments", 4)
+        chunk_rows = _positive_int(event, "chunkRows", 100_000)
+    except ValueError as exc:
+        return {"complete": False, "error": str(exc)}
+
+    job_id = str(event.get("jobId") or new_job_id())
+    out_dir = os.path.join(os.getenv("EXPORT_TMP_DIR", "/tmp/export"), job_id)
+    bucket = os.getenv("EXPORT_BUCKET")
+    prefix = os.getenv("EXPORT_PREFIX", "exports").rstrip("/") + "/" + job_id
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "eu-central-1"
+
+    s3 = boto3.client("s3", region_name=region) if bucket else None
+    if s3 is not None and bucket:
+        _restore_checkpoints(s3, bucket, prefix, out_dir)
+
+    def _upload(path: str, entry: Dict[str, Any]) -> None:
+        if s3 is None:
+            return
+        s3.upload_file(path, bucket, f"{prefix}/{entry['path']}")
+        os.remove(path)
+
+    def _upload_checkpoint(path: str, state: Dict[str, Any]) -> None:
+        if s3 is None:
+            return
+        s3.upload_file(path, bucket, f"{prefix}/{CHECKPOINT_DIR}/{os.path.basename(path)}")
+
+    def _should_stop() -> bool:
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        return remaining is not None and remaining() < _SAFETY_MARGIN_MS
+
+    manifest = export_table(
+        boto3.client("dynamodb", region_name=region),
+        table_name,
+        out_dir,
+        segments=segments,
+        fmt=fmt,
+        chunk_rows=chunk_rows,
+        redact_fields=DEFAULT_PHI_FIELDS if event.get("redact", True) else (),
+        on_part=_upload,
+        should_stop=_should_stop,
+        on_checkpoint=_upload_checkpoint,
+    )
+    if s3 is not None and manifest["complete"]:
+        s3.upload_file(os.path.join(out_dir, "manifest.json"), bucket, f"{prefix}/manifest.json")
+    return {"jobId": job_id, **manifest}
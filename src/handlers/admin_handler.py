@@ -4,11 +4,17 @@ from typing import Any, Dict, List
 
 import boto3
 
+from lib import capacity
+from lib.auth import verified_claims
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.timing import instrumented, phase
+
 
 def _is_admin(event: Dict[str, Any]) -> bool:
     """Return True if the caller is in the Cognito admin group."""
     claims = event.get("requestContext", {}).get("authorizer", {}).get("jwt", {}).get("claims", {})
-    groups = claims.get("cognito:groups", "") or ""
+    groups = (claims or verified_claims(event)).get("cognito:groups", "") or ""
     if isinstance(groups, list):
         return "GroupAdmin" in groups
     return "GroupAdmin" in str(groups).split(",")
@@ -20,6 +26,9 @@ def _dynamo():
     return boto3.client("dynamodb", region_name=region)
 
 
+@instrumented("admin_handler")
+@rate_limited("admin_handler", "scan")
+@profiled("admin_handler")
 def handler(event, context):
     """Serve /admin/stats with basic counts, using an aggregates table when possible."""
     if not _is_admin(event):
@@ -30,13 +39,21 @@ def handler(event, context):
     aggs = os.getenv("AGG_TABLE") or os.getenv("AGGREGATES_TABLE") or "AdminAggregates-dev"
 
     try:
-        agg = db.get_item(TableName=aggs, Key={"aggKey": {"S": "daily"}}).get("Item") or {}
+        with phase("get_item"):
+            resp = db.get_item(
+                TableName=aggs, Key={"aggKey": {"S": "daily"}}, **capacity.request()
+            )
+        agg = capacity.record("GetItem", resp).get("Item") or {}
         snapshot = {
             "patientsTotal": int(agg.get("patientsTotal", {}).get("N", "0")),
             "updatedToday": int(agg.get("updatedToday", {}).get("N", "0")),
         }
         return {"statusCode": 200, "headers": {"content-type": "application/json"}, "body": json.dumps({"snapshot": snapshot})}
     except Exception:
-        resp = db.scan(TableName=records, ProjectionExpression="patientId")
+        with phase("scan"):
+            resp = db.scan(
+                TableName=records, ProjectionExpression="patientId", **capacity.request()
+            )
+        capacity.record("Scan", resp)
         count = resp.get("Count", 0)
         return {"statusCode": 200, "headers": {"content-type": "application/json"}, "body": json.dumps({"snapshot": {"patientsTotal": count}})}
@@ -1,19 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
+from lib.age_index import indexed
+from lib.aggregate import precomputed_or, scan_counts
 from lib.auth import extract_claims, require_admin
-from lib.db import scan_patients
-from lib.utils import json_response, compute_age_years, parse_age_bounds
+from lib.cache import wants_consistent
+from lib.cohort_cube import cubed
+from lib.db import table_name
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.result_cache import cached_response, quantize_bounds
+from lib.timing import instrumented, phase, query_shape, set_property
+from lib.utils import json_response, parse_age_bounds
 
 
+@instrumented("admin_medications")
+@rate_limited("admin_medications", "scan")
+@profiled("admin_medications")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Returns histogram of medications for admin with optional age filtering.
     """
     try:
-        claims = extract_claims(event)
-        require_admin(claims)
+        with phase("auth"):
+            claims = extract_claims(event)
+            require_admin(claims)
     except PermissionError as e:
         return json_response(403, {"message": str(e)})
 
@@ -22,22 +34,36 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         min_age, max_age = parse_age_bounds(params)
     except ValueError as e:
         return json_response(400, {"message": str(e)})
+    set_property("query_shape", query_shape(params))
+    min_age, max_age = quantize_bounds(min_age, max_age)
+    consistent = wants_consistent(event)
+    return cached_response(
+        "admin_medications",
+        table_name(),
+        min_age,
+        max_age,
+        lambda: precomputed_or(
+            "admin_medications",
+            min_age,
+            max_age,
+            lambda: _compute(min_age, max_age, consistent),
+            consistent,
+        ),
+        consistent,
+    )
 
-    items = scan_patients()
-    counts: Dict[str, int] = {}
 
-    def age_ok(iso: str) -> bool:
-        age = compute_age_years(iso)
-        if min_age is not None and age < min_age:
-            return False
-        if max_age is not None and age > max_age:
-            return False
-        return True
-
-    for it in items:
-        if not age_ok(it["date_of_birth"]):
-            continue
-        for m in it.get("medications", []):
-            if m:
-                counts[m] = counts.get(m, 0) + 1
-    return json_response(200, {"medications": counts})
+def _compute(
+    min_age: Optional[float], max_age: Optional[float], consistent: bool
+) -> Dict[str, Any]:
+    """Counts medications within the age window (age index, cohort cube, else a scan)."""
+    payload = None
+    if not consistent:
+        with phase("index"):
+            payload = indexed("admin_medications", table_name(), min_age, max_age)
+            if payload is None:
+                payload = cubed("admin_medications", table_name(), min_age, max_age)
+    if payload is None:
+        payload = scan_counts("medications", min_age, max_age)
+    with phase("serialize"):
+        return json_response(200, payload)
@@ -3,11 +3,20 @@
 import json
 import os
 from collections import Counter
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+from lib import capacity, log
+from lib.auth import verified_claims
+from lib.cache import metrics_cache, read_through, wants_consistent
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.result_cache import data_version
+from lib.timing import count, instrumented, phase
+from lib.tracing import span
+
 dynamodb = boto3.resource("dynamodb")
 TABLE_NAME = os.getenv("PATIENT_TABLE_NAME", "")
 ADMIN_GROUPS_ENV = os.getenv("ADMIN_GROUPS", "GroupAdmin")
@@ -28,7 +37,8 @@ def _get_claims(event: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(claims, dict):
         return claims
 
-    return {}
+    verified: Dict[str, Any] = verified_claims(event)
+    return verified
 
 
 def _normalize_groups_string(raw: str) -> List[str]:
@@ -72,18 +82,19 @@ def _is_admin(groups: Iterable[str]) -> bool:
     return bool(allowed.intersection(current))
 
 
-def _scan_patients() -> List[Dict[str, Any]]:
-    """Scan DynamoDB table and return all patient items."""
+def _scan_patients() -> Optional[List[Dict[str, Any]]]:
+    """Scan DynamoDB table and return all patient items (``None`` if the scan failed)."""
     if not TABLE_NAME:
         return []
 
     try:
         table = dynamodb.Table(TABLE_NAME)
         items: List[Dict[str, Any]] = []
-        scan_kwargs: Dict[str, Any] = {}
+        scan_kwargs: Dict[str, Any] = capacity.request()
 
         while True:
-            response = table.scan(**scan_kwargs)
+            with span("DynamoDB.Scan", namespace="aws", table=TABLE_NAME):
+                response = capacity.record("Scan", table.scan(**scan_kwargs))
             items.extend(response.get("Items", []))
 
             token = response.get("LastEvaluatedKey")
@@ -92,16 +103,41 @@ def _scan_patients() -> List[Dict[str, Any]]:
             scan_kwargs["ExclusiveStartKey"] = token
 
         return items
-    except (BotoCoreError, ClientError):
-        return []
+    except (BotoCoreError, ClientError) as exc:
+        log.error("patient scan failed", error=str(exc))
+        return None
+
+
+def _compute_metrics() -> Optional[Dict[str, Any]]:
+    """Scans and aggregates; ``None`` when the scan failed (never cached)."""
+    with phase("scan"):
+        patients = _scan_patients()
+    if patients is None:
+        return None
+    total = len(patients)
+    count("items", total)
+
+    with phase("aggregate"):
+        by_status_counter = Counter(item.get("status", "unknown") for item in patients)
+        by_status = dict(by_status_counter)
+
+    return {
+        "totalPatients": total,
+        "byStatus": by_status,
+    }
 
 
+@instrumented("admin_metrics")
+@rate_limited("admin_metrics", "scan")
+@profiled("admin_metrics")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Return aggregated patient metrics for admin users."""
-    claims = _get_claims(event)
-    groups = _extract_groups(claims)
+    with phase("auth"):
+        claims = _get_claims(event)
+        groups = _extract_groups(claims)
 
     if not _is_admin(groups):
+        log.warning("admin access denied", groups=groups)
         body = {
             "message": "Forbidden",
             "reason": "User is not in an allowed admin group",
@@ -112,19 +148,18 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             "body": json.dumps(body),
         }
 
-    patients = _scan_patients()
-    total = len(patients)
-
-    by_status_counter = Counter(item.get("status", "unknown") for item in patients)
-    by_status = dict(by_status_counter)
-
-    body = {
-        "totalPatients": total,
-        "byStatus": by_status,
-    }
+    metrics: Optional[Dict[str, Any]] = read_through(
+        metrics_cache,
+        ("admin_metrics", TABLE_NAME, data_version(TABLE_NAME)),
+        _compute_metrics,
+        wants_consistent(event),
+    )
+    if metrics is None:
+        metrics = {"totalPatients": 0, "byStatus": {}}
 
-    return {
-        "statusCode": 200,
-        "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(body),
-    }
+    with phase("serialize"):
+        return {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps(metrics),
+        }
@@ -1,18 +1,29 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
 
+from lib.age_index import indexed
+from lib.aggregate import precomputed_or
 from lib.auth import extract_claims, require_admin
-from lib.db import scan_patients
-from lib.models import MetricsOverview, TopItem
-from lib.utils import json_response, compute_age_years, average, parse_age_bounds
+from lib.cache import wants_consistent
+from lib.cohort_cube import cubed
+from lib.db import scan_columns, table_name
+from lib.profiling import profiled
+from lib.ratelimit import rate_limited
+from lib.result_cache import cached_response, quantize_bounds
+from lib.timing import count, instrumented, phase, query_shape, set_property
+from lib.utils import json_response, parse_age_bounds
 
 
+@instrumented("admin_overview")
+@rate_limited("admin_overview", "scan")
+@profiled("admin_overview")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Computes aggregated metrics for admin with optional age filtering."""
     try:
-        claims = extract_claims(event)
-        require_admin(claims)
+        with phase("auth"):
+            claims = extract_claims(event)
+            require_admin(claims)
     except PermissionError as e:
         return json_response(403, {"message": str(e)})
 
@@ -21,45 +32,45 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         min_age, max_age = parse_age_bounds(params)
     except ValueError as e:
         return json_response(400, {"message": str(e)})
+    set_property("query_shape", query_shape(params))
+    min_age, max_age = quantize_bounds(min_age, max_age)
+    consistent = wants_consistent(event)
+    return cached_response(
+        "admin_overview",
+        table_name(),
+        min_age,
+        max_age,
+        lambda: precomputed_or(
+            "admin_overview",
+            min_age,
+            max_age,
+            lambda: _compute(min_age, max_age, consistent),
+            consistent,
+        ),
+        consistent,
+    )
 
-    items = scan_patients()
-    filtered: List[Dict[str, Any]] = []
-    for it in items:
-        age = compute_age_years(it["date_of_birth"])
-        if min_age is not None and age < min_age:
-            continue
-        if max_age is not None and age > max_age:
-            continue
-        filtered.append(it)
-
-    total = len(filtered)
-    avg_bmi = average([float(it.get("bmi", 0.0)) for it in filtered])
-
-    counts_by_sex: Dict[str, int] = {}
-    for it in filtered:
-        sex = it.get("sex") or ""
-        counts_by_sex[sex] = counts_by_sex.get(sex, 0) + 1
-
-    avg_age = average([compute_age_years(it["date_of_birth"]) for it in filtered])
-
-    disease_counts: Dict[str, int] = {}
-    for it in filtered:
-        for d in it.get("diseases", []):
-            if d:
-                disease_counts[d] = disease_counts.get(d, 0) + 1
-
-    # Build typed TopItem list (prevents pydantic coercion issues)
-    top_items: List[TopItem] = [
-        TopItem(name=name, count=count) for name, count in disease_counts.items()
-    ]
-    top_items.sort(key=lambda x: x.count, reverse=True)
-    top_items = top_items[:10]
 
-    payload = MetricsOverview(
-        total_patients=total,
-        avg_bmi=avg_bmi,
-        counts_by_sex=counts_by_sex,
-        avg_age_years=avg_age,
-        top_diseases=top_items,
-    )
-    return json_response(200, payload.model_dump())
+def _compute(
+    min_age: Optional[float], max_age: Optional[float], consistent: bool
+) -> Dict[str, Any]:
+    """
+    Builds the overview for the (quantised) age window from the age index or
+    the cohort cube, or by scanning patients when neither is available or a
+    consistent read is asked for.
+    """
+    payload = None
+    if not consistent:
+        with phase("index"):
+            payload = indexed("admin_overview", table_name(), min_age, max_age)
+            if payload is None:
+                payload = cubed("admin_overview", table_name(), min_age, max_age)
+    if payload is None:
+        with phase("scan"):
+            columns = scan_columns(("diseases",))
+        count("items", len(columns))
+        with phase("aggregate"):
+            rows, ages = columns.select(min_age, max_age)
+            payload = columns.overview(rows, ages)
+    with phase("serialize"):
+        return json_response(200, payload)
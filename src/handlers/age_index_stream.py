@@ -0,0 +1,24 @@
+"""DynamoDB stream Lambda handler that keeps the age index current."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from lib import log
+from lib.age_index import apply_changes
+from lib.db import scan_patients, table_name
+from lib.timing import count, instrumented, phase
+
+
+@instrumented("age_index_stream")
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Applies a batch of patient table stream records to the age index snapshot
+    (built from a scan the first time).
+    """
+    records = event.get("Records") or []
+    count("records", len(records))
+    with phase("apply"):
+        index = apply_changes(table_name(), records, scan_patients)
+    log.info("age index updated", records=len(records), patients=index.records)
+    return {"records": len(records), "patients": index.records}
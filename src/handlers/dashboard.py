@@ -2,6 +2,8 @@
 import json
 from typing import Dict, Any
 
+from lib.timing import instrumented
+
 
 _HTML = """<!doctype html>
 <html lang="en"><head>
@@ -61,6 +63,7 @@ def _resp(code: int, body: str, ctype: str) -> Dict[str, Any]:
     }
 
 
+@instrumented("dashboard")
 def handler(event: Dict[str, Any], _ctx) -> Dict[str, Any]:
     """Entry point for API Gateway HTTP API."""
     path = event.get("rawPath") or ""
@@ -3,7 +3,10 @@
 import json
 from typing import Any, Dict
 
+from lib.timing import instrumented
 
+
+@instrumented("health")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Return basic health information for the API."""
     body = {
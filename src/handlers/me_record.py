@@ -1,8 +1,17 @@
 import json
 import os
+from typing import Any, Dict, Optional
+
 import boto3
 from botocore.exceptions import ClientError
 
+from common.helpers import json_response
+from lib import capacity, log
+from lib.auth import verified_claims
+from lib.cache import patient_cache, read_through, wants_consistent
+from lib.ratelimit import rate_limited
+from lib.timing import instrumented, phase
+
 TABLE_NAME = os.environ["TABLE_NAME"]
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(TABLE_NAME)
@@ -13,20 +22,34 @@ def _user_sub(event: dict) -> str | None:
                    .get("authorizer", {})
                    .get("jwt", {})
                    .get("claims", {}))
-    return claims.get("sub")
+    sub: Optional[str] = (claims or verified_claims(event)).get("sub")
+    return sub
 
 
+@instrumented("me_record")
+@rate_limited("me_record", "read")
 def handler(event, context):
     """Return current user's record by cognito sub."""
     sub = _user_sub(event)
     if not sub:
         return {"statusCode": 401, "body": json.dumps({"message": "unauthorized"})}
 
+    consistent = wants_consistent(event)
+
+    def load() -> Optional[Dict[str, Any]]:
+        kwargs = capacity.request()
+        if consistent:
+            kwargs["ConsistentRead"] = True
+        resp = table.get_item(Key={"patient_id": sub}, **kwargs)
+        item: Optional[Dict[str, Any]] = capacity.record("GetItem", resp).get("Item")
+        return item
+
     try:
-        resp = table.get_item(Key={"patient_id": sub})
-        item = resp.get("Item")
+        with phase("get_item"):
+            item = read_through(patient_cache, (TABLE_NAME, sub), load, consistent)
         if not item:
             return {"statusCode": 404, "body": json.dumps({"message": "not_found"})}
-        return {"statusCode": 200, "headers": {"Content-Type": "application/json"}, "body": json.dumps(item)}
+        return json_response(200, item)
     except ClientError as e:
+        log.error("me_record lookup failed", error=str(e))
         return {"statusCode": 500, "body": json.dumps({"message": "dynamodb_error", "error": str(e)})}
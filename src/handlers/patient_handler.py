@@ -1,14 +1,26 @@
 import json
 import os
-from typing import Any, Dict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 
 import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from lib import capacity, idempotency, log
+from lib.auth import verified_claims
+from lib.cache import patient_cache, read_through, wants_consistent
+from lib.ratelimit import rate_limited
+from lib.result_cache import bump_data_version
+from lib.timing import instrumented, phase
+
+_deserializer = TypeDeserializer()
 
 
 def _email_from_jwt(event: Dict[str, Any]) -> str:
     """Extract the email claim from a Cognito-authorized request."""
     claims = event.get("requestContext", {}).get("authorizer", {}).get("jwt", {}).get("claims", {})
-    email = claims.get("email")
+    email = (claims or verified_claims(event)).get("email")
     if not email:
         raise ValueError("Missing email claim")
     return email
@@ -20,38 +32,126 @@ def _dynamo():
     return boto3.client("dynamodb", region_name=region)
 
 
+def _plain(item: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Convert a typed attribute map to the plain shape the read caches hold."""
+    return None if item is None else {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
+def _record(email: str, item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Response body for a (plain) patient item."""
+    item = item or {}
+    return {
+        "patientId": email,
+        "diagnosis": item.get("diagnosis"),
+        "updatedAt": item.get("updatedAt"),
+        "version": int(item.get("version", 0)),
+    }
+
+
+def _respond(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    headers = {"content-type": "application/json"}
+    if "version" in body:
+        headers["etag"] = f'"{body["version"]}"'
+    return {"statusCode": status, "headers": headers, "body": json.dumps(body)}
+
+
+def _expected_version(event: Dict[str, Any], payload: Dict[str, Any]) -> Optional[int]:
+    """Version the client last read, from ``If-Match`` or the body; None means unconditional."""
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    raw = headers.get("if-match") or payload.get("version")
+    if raw is None or raw == "*":
+        return None
+    return int(str(raw).removeprefix("W/").strip('"'))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _put(event: Dict[str, Any], db: Any, table: str, pk_name: str, email: str) -> Dict[str, Any]:
+    """Update the diagnosis and return the stored record (409 on a version conflict)."""
+    payload = json.loads(event.get("body") or "{}")
+    diagnosis = payload.get("diagnosis")
+    if not diagnosis:
+        return {"statusCode": 400, "body": json.dumps({"error": "diagnosis is required"})}
+    try:
+        expected = _expected_version(event, payload)
+    except ValueError:
+        return {"statusCode": 400, "body": json.dumps({"error": "version must be an integer"})}
+
+    kwargs: Dict[str, Any] = capacity.request()
+    values = {":d": {"S": str(diagnosis)}, ":t": {"S": _now()}, ":one": {"N": "1"}}
+    if expected is not None:
+        # Version 0 is "never written": the item (or its version) must not exist yet.
+        if expected == 0:
+            kwargs["ConditionExpression"] = "attribute_not_exists(#v)"
+        else:
+            kwargs["ConditionExpression"] = "#v = :expected"
+            values[":expected"] = {"N": str(expected)}
+    try:
+        with phase("update_item"):
+            res = db.update_item(
+                TableName=table,
+                Key={pk_name: {"S": email}},
+                UpdateExpression="SET diagnosis = :d, updatedAt = :t ADD #v :one",
+                ExpressionAttributeNames={"#v": "version"},
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                **kwargs,
+            )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        current = _plain(e.response.get("Item"))
+        log.info("record version conflict", expected=expected)
+        return _respond(409, {"error": "version conflict", "current": _record(email, current)})
+    capacity.record("UpdateItem", res)
+    item = _plain(res["Attributes"])
+    patient_cache.put((table, email), item)
+    bump_data_version(table)
+    return _respond(200, _record(email, item))
+
+
+def _method(event: Dict[str, Any]) -> str:
+    method: str = event.get("requestContext", {}).get("http", {}).get("method", "GET")
+    return method.upper()
+
+
+@instrumented("patient_handler")
+@rate_limited("patient_handler", lambda e: "write" if _method(e) == "PUT" else "read")
 def handler(event, context):
     """Handle GET/PUT /me/record using patientId as HASH key."""
-    method = event.get("requestContext", {}).get("http", {}).get("method", "GET").upper()
+    method = _method(event)
     table = os.getenv("TABLE_NAME")
     pk_name = os.getenv("PK_NAME", "patientId")
     email = _email_from_jwt(event)
     db = _dynamo()
 
     if method == "GET":
-        res = db.get_item(TableName=table, Key={pk_name: {"S": email}})
-        item = res.get("Item")
-        body = {
-            "patientId": email,
-            "diagnosis": item.get("diagnosis", {}).get("S") if item else None,
-            "updatedAt": item.get("updatedAt", {}).get("S") if item else None,
-        }
-        return {"statusCode": 200, "headers": {"content-type": "application/json"}, "body": json.dumps(body)}
+        consistent = wants_consistent(event)
+
+        def load() -> Optional[Dict[str, Any]]:
+            kwargs = capacity.request()
+            if consistent:
+                kwargs["ConsistentRead"] = True
+            res = db.get_item(TableName=table, Key={pk_name: {"S": email}}, **kwargs)
+            return _plain(capacity.record("GetItem", res).get("Item"))
+
+        with phase("get_item"):
+            item = read_through(patient_cache, (table, email), load, consistent)
+        return _respond(200, _record(email, item))
 
     if method == "PUT":
-        payload = json.loads(event.get("body") or "{}")
-        diagnosis = payload.get("diagnosis")
-        if not diagnosis:
-            return {"statusCode": 400, "body": json.dumps({"error": "diagnosis is required"})}
-        db.update_item(
-            TableName=table,
-            Key={pk_name: {"S": email}},
-            UpdateExpression="SET diagnosis = :d, updatedAt = :t",
-            ExpressionAttributeValues={
-                ":d": {"S": str(diagnosis)},
-                ":t": {"S": payload.get("updatedAt") or "1970-01-01T00:00:00Z"},
-            },
-        )
-        return {"statusCode": 204, "body": ""}
+        key = idempotency.header_key(event)
+        if key and idempotency.IDEMPOTENCY_TABLE:
+            store = idempotency.IdempotencyStore(db, idempotency.IDEMPOTENCY_TABLE)
+            return idempotency.run(
+                store,
+                f"{table}#{email}#{key}",
+                event.get("body"),
+                lambda: _put(event, db, table, pk_name, email),
+            )
+        return _put(event, db, table, pk_name, email)
 
     return {"statusCode": 405, "body": json.dumps({"error": "method not allowed"})}
@@ -8,6 +8,12 @@ from decimal import Decimal
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+from lib import capacity, log
+from lib.auth import verified_claims
+from lib.cache import patient_cache, read_through, wants_consistent
+from lib.ratelimit import rate_limited
+from lib.timing import instrumented, phase
+
 dynamodb = boto3.resource("dynamodb")
 TABLE_NAME = os.getenv("PATIENT_TABLE_NAME", "")
 
@@ -27,21 +33,32 @@ def _get_claims(event: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(claims, dict):
         return claims
 
-    return {}
+    verified: Dict[str, Any] = verified_claims(event)
+    return verified
 
 
-def _load_patient(email: Optional[str]) -> Optional[Dict[str, Any]]:
-    """Load patient record from DynamoDB by email, if possible."""
+def _load_patient(email: Optional[str], consistent: bool = False) -> Optional[Dict[str, Any]]:
+    """Load patient record by email through the container cache, if possible."""
     if not email or not TABLE_NAME:
         return None
 
-    try:
+    def load() -> Optional[Dict[str, Any]]:
         table = dynamodb.Table(TABLE_NAME)
-        resp = table.get_item(Key={"patientId": email})
-    except (BotoCoreError, ClientError):
-        return None
+        kwargs = capacity.request()
+        if consistent:
+            kwargs["ConsistentRead"] = True
+        resp = capacity.record("GetItem", table.get_item(Key={"patientId": email}, **kwargs))
+        item: Optional[Dict[str, Any]] = resp.get("Item")
+        return item
 
-    return resp.get("Item")
+    try:
+        cached: Optional[Dict[str, Any]] = read_through(
+            patient_cache, (TABLE_NAME, email), load, consistent
+        )
+        return cached
+    except (BotoCoreError, ClientError) as exc:
+        log.error("patient lookup failed", error=str(exc))
+        return None
 
 
 def _to_plain(obj: Any) -> Any:
@@ -56,6 +73,8 @@ def _to_plain(obj: Any) -> Any:
     return obj
 
 
+@instrumented("patient_me")
+@rate_limited("patient_me", "read")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Return profile information for the authenticated patient."""
     claims = _get_claims(event)
@@ -63,8 +82,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     email = claims.get("email")
     sub = claims.get("sub") or claims.get("cognito:username")
 
-    patient = _load_patient(email)
+    with phase("get_item"):
+        patient = _load_patient(email, wants_consistent(event))
     patient_plain = _to_plain(patient) if patient is not None else None
+    log.info("patient profile", found=patient is not None)
+    log.debug("patient fields", fields=lambda: sorted(patient or {}))
 
     body = {
         "user": {
@@ -0,0 +1,49 @@
+"""Scheduled Lambda handler that precomputes admin cohort results."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from lib import age_index, associations, bitmaps, cohort_cube, log
+from lib.aggregate import COHORTS, aggregates_table, store
+from lib.db import scan_patients, table_name
+from lib.timing import count, instrumented, phase
+
+
+@instrumented("precompute_cohorts")
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Scans patients once and stores the admin overview, disease and medication
+    results of every configured cohort in the aggregates table, then rebuilds
+    the age index when ``AGE_INDEX_URL`` is set, publishes the cohort cube
+    when ``COHORT_CUBE_URL`` is, and the disease bitmaps and the association
+    matrix when ``BITMAP_INDEX_URL`` is (run on a schedule).
+    """
+    if not aggregates_table():
+        raise RuntimeError("AGGREGATES_TABLE is not set")
+    # Same scan as the live handlers, so stored bodies are byte-identical to theirs.
+    with phase("scan"):
+        items = scan_patients()
+    count("items", len(items))
+    written = store(items, COHORTS)
+    count("cohort_items", written)
+    summary = {"cohorts": len(COHORTS), "items": written, "patients": len(items)}
+    if age_index.AGE_INDEX_URL:
+        with phase("age_index"):
+            summary["index_patients"] = age_index.publish(table_name(), items).records
+    if cohort_cube.COHORT_CUBE_URL:
+        with phase("cube"):
+            cube = cohort_cube.CohortCube.build(items)
+            summary["cube_bytes"] = cohort_cube.publish(table_name(), cube)
+        summary["cube_cells"] = len(cube.years) + len(cube.days)
+    if bitmaps.BITMAP_INDEX_URL:
+        with phase("bitmaps"):
+            summary["bitmap_bytes"] = bitmaps.publish(
+                table_name(), bitmaps.BitmapIndex.build(items)
+            )
+        with phase("associations"):
+            summary["association_bytes"] = associations.publish(
+                table_name(), associations.AssociationMatrix.build(items)
+            )
+    log.info("cohorts precomputed", **summary)
+    return summary
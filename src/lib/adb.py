@@ -0,0 +1,182 @@
+"""Asyncio access to the patients table.
+
+``lib.db`` is synchronous, so independent reads in one request run back to
+back. This module mirrors it with coroutines a handler can ``gather``::
+
+    @instrumented("me_summary")
+    @adb.async_handler
+    async def handler(event, context):
+        me, peers = await asyncio.gather(
+            adb.get_patient(pid), adb.batch_get_patients(peer_ids)
+        )
+
+aiobotocore is not a dependency: each blocking boto3 call runs on one shared
+thread pool (``DB_MAX_CONNECTIONS`` threads, the same size as the client's
+connection pool), so concurrent calls overlap their network round trips
+while the event loop keeps span, counter and capacity bookkeeping on the
+invocation's own context. Reads go through the same ``patient_cache`` as
+``lib.db``.
+
+* ``get_patient`` - one ``GetItem``, like ``db.get_patient``;
+* ``scan_patients`` - a parallel scan over ``segments`` segments (pages of a
+  segment stay sequential), concatenated in segment order;
+* ``batch_get_patients`` - cache hits first, then ``BatchGetItem`` chunks of
+  100 keys in parallel with unprocessed keys retried with backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from lib import capacity, db, timing
+from lib.bulk_load import backoff_delay
+from lib.cache import _MISSING, patient_cache
+from lib.tracing import span
+
+BATCH_GET_LIMIT = 100
+MAX_ATTEMPTS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def executor() -> ThreadPoolExecutor:
+    """The container-wide pool blocking SDK calls run on (created on first use)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=db.MAX_POOL_CONNECTIONS, thread_name_prefix="adb"
+                )
+    return _executor
+
+
+async def call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs a blocking call on the shared pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def get_patient(patient_id: str, consistent: bool = False) -> Optional[Dict[str, Any]]:
+    """Gets a patient by primary key through the container cache."""
+    key = (db.table_name(), patient_id)
+    if patient_cache.enabled and not consistent:
+        value = patient_cache.get(key)
+        if value is not _MISSING:
+            timing.count("cache_hits")
+            cached: Optional[Dict[str, Any]] = value
+            return cached
+    timing.count("cache_misses")
+    kwargs = capacity.request()
+    if consistent:
+        kwargs["ConsistentRead"] = True
+    with span("DynamoDB.GetItem", namespace="aws"):
+        resp = await call(db._get_table().get_item, Key={"patient_id": patient_id}, **kwargs)
+    item: Optional[Dict[str, Any]] = capacity.record("GetItem", resp).get("Item")
+    patient_cache.put(key, item)
+    return item
+
+
+async def _scan_segment(table: Any, segment: int, segments: int) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    kwargs: Dict[str, Any] = capacity.request()
+    if segments > 1:
+        kwargs.update(Segment=segment, TotalSegments=segments)
+    while True:
+        with span("DynamoDB.Scan", namespace="aws", segment=segment):
+            resp = capacity.record("Scan", await call(table.scan, **kwargs))
+        items.extend(resp.get("Items", []))
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            return items
+        kwargs["ExclusiveStartKey"] = lek
+
+
+async def scan_patients(segments: int = 4) -> List[Dict[str, Any]]:
+    """Scans all patients, reading ``segments`` parallel scan segments at once."""
+    table = db._get_table()
+    parts = await asyncio.gather(*(_scan_segment(table, s, segments) for s in range(segments)))
+    return [item for part in parts for item in part]
+
+
+async def _batch_get(name: str, ids: List[str], consistent: bool) -> List[Dict[str, Any]]:
+    resource = db._boto3_resource()
+    request: Dict[str, Any] = {"Keys": [{"patient_id": pid} for pid in ids]}
+    if consistent:
+        request["ConsistentRead"] = True
+    found: List[Dict[str, Any]] = []
+    for attempt in range(MAX_ATTEMPTS):
+        with span("DynamoDB.BatchGetItem", namespace="aws", keys=len(request["Keys"])):
+            resp = await call(
+                resource.batch_get_item, RequestItems={name: request}, **capacity.request()
+            )
+        capacity.record("BatchGetItem", resp)
+        found.extend(resp.get("Responses", {}).get(name, []))
+        pending = resp.get("UnprocessedKeys", {}).get(name)
+        if not pending or not pending.get("Keys"):
+            return found
+        request = pending
+        timing.count("unprocessed_retries")
+        await asyncio.sleep(backoff_delay(attempt + 1))
+    raise RuntimeError(
+        f"{len(request['Keys'])} keys still unprocessed after {MAX_ATTEMPTS} attempts"
+    )
+
+
+async def batch_get_patients(
+    patient_ids: Iterable[str], consistent: bool = False
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Gets many patients; returns ``{patient_id: item or None}`` in request order.
+
+    Cached entries are served without I/O unless ``consistent``; the rest are
+    fetched in concurrent ``BatchGetItem`` chunks and cached (misses as
+    ``None``).
+    """
+    name = db.table_name()
+    result: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing: List[str] = []
+    for pid in dict.fromkeys(patient_ids):
+        value: Any = _MISSING
+        if patient_cache.enabled and not consistent:
+            value = patient_cache.get((name, pid))
+        if value is _MISSING:
+            missing.append(pid)
+            result[pid] = None
+        else:
+            timing.count("cache_hits")
+            result[pid] = value
+    if not missing:
+        return result
+    timing.count("cache_misses", len(missing))
+    chunks = [missing[i : i + BATCH_GET_LIMIT] for i in range(0, len(missing), BATCH_GET_LIMIT)]
+    for items in await asyncio.gather(*(_batch_get(name, c, consistent) for c in chunks)):
+        for item in items:
+            result[item["patient_id"]] = item
+    for pid in missing:
+        patient_cache.put((name, pid), result[pid])
+    return result
+
+
+def run(awaitable: Awaitable[Any]) -> Any:
+    """Runs ``awaitable`` to completion on this thread's event loop (kept between calls)."""
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(awaitable)
+
+
+def async_handler(fn: Callable[[Any, Any], Awaitable[Any]]) -> Callable[[Any, Any], Any]:
+    """Adapts ``async def handler(event, context)`` to the synchronous Lambda signature."""
+
+    @functools.wraps(fn)
+    def wrapper(event: Any, context: Any) -> Any:
+        return run(fn(event, context))
+
+    return wrapper
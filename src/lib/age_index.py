@@ -0,0 +1,499 @@
+"""Birth-date index that answers admin age-window queries in O(log n).
+
+Ages change every day, so bucketing patients by age goes stale; birth dates
+do not. The index keeps Fenwick trees over birth-date ordinals (one slot per
+day from ``BASE_DATE``) holding the patient count and the BMI sum in
+hundredths. Each term (``sex:F``, ``diseases:flu``, ``medications:...``)
+only keeps the sorted slots of the patients carrying it, so its size
+follows its patients rather than the calendar. ``compute_age_years`` is
+monotone in the birth date, so any ``min_age``/``max_age`` pair is exactly
+one birth-date range for today's date, found by binary search on the same
+rounding; every sum over it is two prefix queries and every term count two
+bisections. Nothing is rebuilt when the date changes.
+
+The age total needs each patient's age rounded as the scan rounds it, which
+is not a sum over birth dates, so it comes from a prefix array over the
+per-day counts computed once per date (and after changes). Every body is
+byte-identical to ``lib.aggregate``'s on a scan.
+
+The index is kept as a snapshot (``lib.snapshots``) named after the table
+and maintained incrementally: ``handlers.age_index_stream`` applies the
+table's DynamoDB stream (old image out, new image in) and saves with the
+ETag it loaded, retrying on a concurrent save. Stream delivery is
+at-least-once, so the snapshot remembers the last sequence number applied
+per item key (every change to an item comes through the same shard, in
+order) and skips anything at or below it; entries older than the stream's
+24 hour retention are dropped. ``handlers.precompute_cohorts`` rebuilds the
+index from its full scan on every run and republishes it, which repairs any
+drift. With ``AGE_INDEX_URL`` set, the admin handlers load the snapshot once
+per container and re-check it (conditional GET) every ``AGE_INDEX_REFRESH``
+seconds.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_left, insort
+from datetime import date
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from lib import snapshots, timing
+from lib.utils import age_units, bmi_units, overview_body, parse_iso_date, ranked
+
+AGE_INDEX_URL = os.getenv("AGE_INDEX_URL", "")
+AGE_INDEX_REFRESH = float(os.getenv("AGE_INDEX_REFRESH", "60"))
+
+BASE_DATE = date(1880, 1, 1)
+BASE = BASE_DATE.toordinal()
+SLOTS = 1 << 16  # days covered from BASE_DATE (until mid-2059); others go to ``overflow``
+DAYS_PER_YEAR = 365.2425  # as in compute_age_years
+TERM_FIELDS = ("diseases", "medications")
+MAGIC = b"AIX3"
+SAVE_ATTEMPTS = 5
+STREAM_RETENTION = 24 * 3600  # seconds a DynamoDB stream record can be redelivered for
+
+Entry = Tuple[int, int, Tuple[str, ...]]
+
+_deserializer = TypeDeserializer()
+
+
+class Fenwick:
+    """Binary indexed tree over slots ``0..size-1`` stored in a typed array."""
+
+    __slots__ = ("tree",)
+
+    def __init__(self, typecode: str, size: int = SLOTS) -> None:
+        self.tree = array(typecode, bytes(array(typecode).itemsize * (size + 1)))
+
+    def add(self, slot: int, delta: Any) -> None:
+        tree = self.tree
+        i, n = slot + 1, len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, end: int) -> Any:
+        """Sum of slots ``[0, end)``."""
+        tree = self.tree
+        total = 0
+        i = end
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def sum(self, lo: int, hi: int) -> Any:
+        """Sum of slots ``[lo, hi)``."""
+        return self.prefix(hi) - self.prefix(lo) if hi > lo else 0
+
+    @classmethod
+    def from_slots(cls, values: array) -> "Fenwick":
+        """Builds the tree from per-slot values in O(n)."""
+        tree = cls(values.typecode, len(values))
+        t = tree.tree
+        t[1:] = values
+        n = len(t)
+        for i in range(1, n):
+            j = i + (i & -i)
+            if j < n:
+                t[j] += t[i]
+        return tree
+
+
+def entry(record: Dict[str, Any]) -> Optional[Entry]:
+    """Birth ordinal, BMI (hundredths) and terms of one patient (``None`` without a birth date)."""
+    try:
+        born = parse_iso_date(record["date_of_birth"]).toordinal()
+    except (KeyError, TypeError, ValueError):
+        return None
+    terms = ["sex:" + str(record.get("sex") or "")]
+    for field in TERM_FIELDS:
+        terms.extend(f"{field}:{v}" for v in record.get(field) or [] if v)
+    return born, bmi_units(record.get("bmi", 0.0)), tuple(terms)
+
+
+def _age(today: int, born: int) -> float:
+    return round((today - born) / DAYS_PER_YEAR, 2)
+
+
+def birth_range(
+    min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+) -> Tuple[int, int]:
+    """
+    Returns the inclusive birth-ordinal range ``(first, last)`` whose
+    ``compute_age_years`` lies within ``[min_age, max_age]`` on ``today``
+    (``first > last`` when empty).
+    """
+    t = (today or date.today()).toordinal()
+    first, last = 1, date.max.toordinal()
+    if max_age is not None:
+        lo, hi = first, last + 1  # smallest born with age <= max_age
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _age(t, mid) <= max_age:
+                hi = mid
+            else:
+                lo = mid + 1
+        first = lo
+    if min_age is not None:
+        lo, hi = 0, last  # largest born with age >= min_age
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if _age(t, mid) >= min_age:
+                lo = mid
+            else:
+                hi = mid - 1
+        last = lo
+    return first, last
+
+
+class AgeIndex:
+    """Count and BMI Fenwick trees plus sorted per-term slots, keyed by birth date."""
+
+    def __init__(self) -> None:
+        self.count = Fenwick("q")
+        self.bmi = Fenwick("q")  # hundredths
+        self.per_day = array("i", bytes(4 * SLOTS))  # patients born on each slot's day
+        self.terms: Dict[str, array] = {}  # sorted slot of each patient carrying the term
+        self.overflow: List[Entry] = []  # birth dates outside the slots, scanned per query
+        self.records = 0
+        self.applied: Dict[str, Tuple[int, float]] = {}  # item key -> (sequence number, time)
+        self._ages: Optional[Tuple[int, array]] = None  # (today, age-unit prefix sums)
+
+    # ------------------------------------------------------------------ updates
+
+    def _apply(self, e: Entry, sign: int) -> None:
+        born, bmi, terms = e
+        self.records += sign
+        self._ages = None
+        slot = born - BASE
+        if not 0 <= slot < SLOTS:
+            if sign > 0:
+                self.overflow.append(e)
+            elif e in self.overflow:
+                self.overflow.remove(e)
+            return
+        self.count.add(slot, sign)
+        self.bmi.add(slot, sign * bmi)
+        self.per_day[slot] += sign
+        for name in terms:
+            slots = self.terms.get(name)
+            if slots is None:
+                slots = self.terms[name] = array("i")
+            if sign > 0:
+                insort(slots, slot)
+            else:
+                i = bisect_left(slots, slot)
+                if i < len(slots) and slots[i] == slot:
+                    del slots[i]
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Indexes a patient record (records without a birth date are ignored)."""
+        e = entry(record)
+        if e is not None:
+            self._apply(e, 1)
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        """Removes a previously indexed record (pass the record as it was indexed)."""
+        e = entry(record)
+        if e is not None:
+            self._apply(e, -1)
+
+    def seen(self, record: Dict[str, Any]) -> bool:
+        """
+        Records a stream record's sequence number against its item key;
+        ``True`` if that key already had this or a later one applied.
+        """
+        change = record.get("dynamodb") or {}
+        keys, sequence = change.get("Keys"), change.get("SequenceNumber")
+        if not keys or not sequence:
+            return False
+        key = json.dumps(keys, sort_keys=True)
+        last = self.applied.get(key)
+        if last is not None and int(sequence) <= last[0]:
+            return True
+        created = change.get("ApproximateCreationDateTime")
+        self.applied[key] = (int(sequence), float(created or time.time()))
+        return False
+
+    def forget_before(self, cutoff: float) -> None:
+        """Drops sequence numbers recorded before ``cutoff`` (epoch seconds)."""
+        self.applied = {k: v for k, v in self.applied.items() if v[1] >= cutoff}
+
+    def apply_stream_record(self, record: Dict[str, Any]) -> None:
+        """Applies one DynamoDB stream record (``NEW_AND_OLD_IMAGES``) unless already applied."""
+        if self.seen(record):
+            timing.count("stream_duplicates")
+            return
+        change = record.get("dynamodb") or {}
+        for image, sign in ((change.get("OldImage"), -1), (change.get("NewImage"), 1)):
+            if image:
+                e = entry({k: _deserializer.deserialize(v) for k, v in image.items()})
+                if e is not None:
+                    self._apply(e, sign)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "AgeIndex":
+        """Builds an index in O(records log records + slots)."""
+        index = cls()
+        count, bmi = array("q", bytes(8 * SLOTS)), array("q", bytes(8 * SLOTS))
+        terms: Dict[str, List[int]] = {}
+        for record in records:
+            e = entry(record)
+            if e is None:
+                continue
+            slot = e[0] - BASE
+            if not 0 <= slot < SLOTS:
+                index._apply(e, 1)
+                continue
+            index.records += 1
+            count[slot] += 1
+            bmi[slot] += e[1]
+            for name in e[2]:
+                terms.setdefault(name, []).append(slot)
+        index.count, index.bmi = Fenwick.from_slots(count), Fenwick.from_slots(bmi)
+        index.per_day = array("i", count)
+        index.terms = {name: array("i", sorted(slots)) for name, slots in terms.items()}
+        return index
+
+    # ------------------------------------------------------------------ queries
+
+    def window(
+        self, min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+    ) -> Tuple[int, int, List[Entry]]:
+        """Returns the slot range ``[lo, hi)`` and the overflow entries of an age window."""
+        first, last = birth_range(min_age, max_age, today)
+        lo, hi = max(0, first - BASE), min(SLOTS, last - BASE + 1)
+        extra = [e for e in self.overflow if first <= e[0] <= last]
+        return lo, max(lo, hi), extra
+
+    def _counts(self, field: str, lo: int, hi: int, extra: List[Entry]) -> Dict[str, int]:
+        prefix = field + ":"
+        counts: Dict[str, int] = {}
+        for name, slots in self.terms.items():
+            if name.startswith(prefix):
+                n = bisect_left(slots, hi) - bisect_left(slots, lo)
+                if n:
+                    counts[name[len(prefix) :]] = n
+        for e in extra:
+            for name in e[2]:
+                if name.startswith(prefix):
+                    key = name[len(prefix) :]
+                    counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _age_prefix(self, today: int) -> array:
+        """Prefix sums over slots of the patients' ages (hundredths) on ``today``."""
+        cached = self._ages
+        if cached is None or cached[0] != today:
+            shift = today - BASE
+            ages = (n * age_units(shift - slot) if n else 0 for slot, n in enumerate(self.per_day))
+            cached = self._ages = (today, array("q", accumulate(ages, initial=0)))
+        return cached[1]
+
+    def term_counts(
+        self,
+        field: str,
+        min_age: Optional[float],
+        max_age: Optional[float],
+        today: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Counts of each value of ``field`` (``sex``, ``diseases``, ...) within the window."""
+        return self._counts(field, *self.window(min_age, max_age, today))
+
+    def overview(
+        self, min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """The /admin/overview body for the window."""
+        t = (today or date.today()).toordinal()
+        lo, hi, extra = self.window(min_age, max_age, today)
+        ages = self._age_prefix(t)
+        body: Dict[str, Any] = overview_body(
+            self.count.sum(lo, hi) + len(extra),
+            self.bmi.sum(lo, hi) + sum(e[1] for e in extra),
+            ages[hi] - ages[lo] + sum(age_units(t - e[0]) for e in extra),
+            self._counts("sex", lo, hi, extra),
+            self._counts("diseases", lo, hi, extra),
+        )
+        return body
+
+    # ------------------------------------------------------------------ snapshots
+
+    def to_bytes(self) -> bytes:
+        """Serialises the index (JSON header plus zlib-compressed arrays)."""
+        header = json.dumps(
+            {
+                "base": BASE,
+                "slots": SLOTS,
+                "records": self.records,
+                "terms": {name: len(slots) for name, slots in self.terms.items()},
+                "overflow": [[b, m, list(t)] for b, m, t in self.overflow],
+                "applied": {k: [seq, at] for k, (seq, at) in self.applied.items()},
+            }
+        ).encode("utf-8")
+        arrays = [self.count.tree, self.bmi.tree, self.per_day, *self.terms.values()]
+        body = zlib.compress(b"".join(a.tobytes() for a in arrays), 1)
+        return MAGIC + struct.pack(">I", len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AgeIndex":
+        """Loads an index written by ``to_bytes``."""
+        if data[:4] != MAGIC:
+            raise ValueError("not an age index snapshot")
+        (size,) = struct.unpack(">I", data[4:8])
+        header = json.loads(data[8 : 8 + size])
+        if header["base"] != BASE or header["slots"] != SLOTS:
+            raise ValueError("age index snapshot has a different layout")
+        body = memoryview(zlib.decompress(data[8 + size :]))
+        index = cls()
+        index.records = header["records"]
+        index.overflow = [(b, m, tuple(t)) for b, m, t in header["overflow"]]
+        index.applied = {k: (seq, at) for k, (seq, at) in header.get("applied", {}).items()}
+        offset = 0
+
+        def take(typecode: str, n: int) -> array:
+            nonlocal offset
+            values = array(typecode)
+            width = n * values.itemsize
+            values.frombytes(body[offset : offset + width])
+            offset += width
+            return values
+
+        index.count.tree = take("q", SLOTS + 1)
+        index.bmi.tree = take("q", SLOTS + 1)
+        index.per_day = take("i", SLOTS)
+        index.terms = {name: take("i", n) for name, n in header["terms"].items()}
+        return index
+
+
+BODIES: Dict[str, Callable[[AgeIndex, Optional[float], Optional[float]], Dict[str, Any]]] = {
+    "admin_overview": lambda index, lo, hi: index.overview(lo, hi),
+    "admin_diseases": lambda index, lo, hi: {
+        "diseases": ranked(index.term_counts("diseases", lo, hi))
+    },
+    "admin_medications": lambda index, lo, hi: {
+        "medications": ranked(index.term_counts("medications", lo, hi))
+    },
+}
+
+
+def snapshot_name(table: str) -> str:
+    """The snapshot holding ``table``'s index."""
+    return f"{table}.age-index"
+
+
+_store: Optional[snapshots.SnapshotStore] = None
+_cache = snapshots.Cached(AgeIndex.from_bytes, AGE_INDEX_REFRESH)
+
+
+def store() -> snapshots.SnapshotStore:
+    """The snapshot store named by ``AGE_INDEX_URL`` (created on first use)."""
+    global _store
+    if _store is None:
+        _store = snapshots.from_url(AGE_INDEX_URL)
+    return _store
+
+
+def current(table: str) -> Optional[AgeIndex]:
+    """
+    Returns this container's copy of ``table``'s index, or ``None`` when
+    ``AGE_INDEX_URL`` is unset or no snapshot exists yet (re-checked every
+    ``AGE_INDEX_REFRESH`` seconds).
+    """
+    if not AGE_INDEX_URL:
+        return None
+    index: Optional[AgeIndex] = _cache.get(store(), snapshot_name(table))
+    return index
+
+
+def indexed(
+    endpoint: str, table: str, min_age: Optional[float], max_age: Optional[float]
+) -> Optional[Dict[str, Any]]:
+    """The ``endpoint`` body answered from the index, or ``None`` to scan instead."""
+    index = current(table)
+    if index is None:
+        timing.count("index_misses")
+        return None
+    timing.count("index_hits")
+    return BODIES[endpoint](index, min_age, max_age)
+
+
+def _load(snap: Optional[snapshots.Snapshot]) -> Optional[AgeIndex]:
+    """The index in ``snap``, or ``None`` if there is none or it has an older layout."""
+    try:
+        return AgeIndex.from_bytes(snap.data) if snap and snap.data else None
+    except ValueError:
+        return None
+
+
+def _save(
+    target: snapshots.SnapshotStore, name: str, update: Callable[[Optional[AgeIndex]], AgeIndex]
+) -> AgeIndex:
+    """Saves ``update(current index)`` conditionally, retrying on a concurrent save."""
+    for _ in range(SAVE_ATTEMPTS):
+        snap = target.load(name)
+        index = update(_load(snap))
+        index.forget_before(time.time() - STREAM_RETENTION)
+        try:
+            target.save(name, index.to_bytes(), snap.etag if snap else None)
+            return index
+        except snapshots.SnapshotConflict:
+            timing.count("snapshot_conflicts")
+    raise snapshots.SnapshotConflict(name)
+
+
+def apply_changes(
+    table: str,
+    records: List[Dict[str, Any]],
+    rebuild: Callable[[], Iterable[Dict[str, Any]]],
+    store_: Optional[snapshots.SnapshotStore] = None,
+) -> AgeIndex:
+    """
+    Applies stream ``records`` to ``table``'s snapshot and saves it.
+
+    Without a readable snapshot the index is built from ``rebuild()`` (a
+    table scan, which already reflects these changes, so they are only
+    marked as applied). A concurrent save makes this reload and retry, up
+    to ``SAVE_ATTEMPTS`` times.
+    """
+
+    def update(index: Optional[AgeIndex]) -> AgeIndex:
+        if index is None:
+            index = AgeIndex.build(rebuild())
+            timing.count("index_rebuilds")
+            for record in records:
+                index.seen(record)
+        else:
+            for record in records:
+                index.apply_stream_record(record)
+        return index
+
+    return _save(store_ or store(), snapshot_name(table), update)
+
+
+def publish(
+    table: str,
+    records: Iterable[Dict[str, Any]],
+    store_: Optional[snapshots.SnapshotStore] = None,
+) -> AgeIndex:
+    """
+    Rebuilds ``table``'s index from a full scan and saves it over the
+    current snapshot, keeping that snapshot's sequence numbers so records
+    the scan already reflects are still skipped if redelivered. A change
+    racing the scan may be missed; the next rebuild picks it up.
+    """
+    fresh = AgeIndex.build(records)
+
+    def update(index: Optional[AgeIndex]) -> AgeIndex:
+        fresh.applied = dict(index.applied) if index is not None else {}
+        return fresh
+
+    return _save(store_ or store(), snapshot_name(table), update)
@@ -0,0 +1,278 @@
+"""Cohort aggregations for the admin endpoints, live and precomputed.
+
+``overview``, ``disease_counts`` and ``medication_counts`` build the bodies
+of /admin/overview, /admin/diseases and /admin/medications from the patients
+picked by ``select`` (or the streaming ``within``). The handlers call them
+on a live scan; the scheduled ``handlers.precompute_cohorts`` job calls them
+on one scan for every cohort in ``PRECOMPUTE_COHORTS`` and stores the
+serialised bodies in the aggregates table (hash key ``aggKey`` =
+``<endpoint>#<min_age>#<max_age>``) with ``computedAt`` and the ``asOf`` date
+the ages were computed for. Keys are ordered by count, then name, and
+averages come from exact sums in hundredths (``lib.utils.overview_body``), as
+in every other serving layer, so all of them return byte-identical bodies.
+
+A handler whose (quantised) bounds name a configured cohort serves the
+stored body when it was computed today and at most ``PRECOMPUTE_MAX_AGE``
+seconds ago (by default two ``PRECOMPUTE_INTERVAL_MINUTES`` schedule
+periods, so one missed run is tolerated and two are not); anything else,
+including an unreachable table, falls back to the live computation. Without
+``AGGREGATES_TABLE`` (or ``AGG_TABLE``) nothing is looked up. Cohort tokens:
+
+    all          every patient
+    decades      0-9.99, 10-19.99, ..., 90-99.99 and 100-
+    18-65        inclusive age band; either end may be left open (65-, -17.99)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lib import capacity, db, log, timing
+from lib.result_cache import quantize_bounds
+from lib.utils import (
+    UNITS,
+    bmi_units,
+    compute_age_years,
+    overview_body,
+    ranked,
+    text_response,
+)
+
+Bounds = Tuple[Optional[float], Optional[float]]
+
+DEFAULT_COHORTS = "all,decades,0-17.99,18-64.99,65-,18-65"
+PRECOMPUTE_INTERVAL_MINUTES = float(os.getenv("PRECOMPUTE_INTERVAL_MINUTES", "30"))
+PRECOMPUTE_MAX_AGE = float(
+    os.getenv("PRECOMPUTE_MAX_AGE", str(2 * 60 * PRECOMPUTE_INTERVAL_MINUTES))
+)
+_TIMESTAMP = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def aggregates_table() -> str:
+    """Returns the aggregates table shared with /admin/stats (``""`` if not configured)."""
+    return os.getenv("AGG_TABLE") or os.getenv("AGGREGATES_TABLE") or ""
+
+
+def parse_cohorts(raw: str) -> List[Bounds]:
+    """Parses cohort tokens into quantised, de-duplicated ``(min_age, max_age)`` bounds."""
+    cohorts: List[Bounds] = []
+    for token in (t.strip() for t in raw.split(",")):
+        if not token:
+            continue
+        if token == "all":
+            found: List[Bounds] = [(None, None)]
+        elif token == "decades":
+            found = [(float(d), d + 9.99) for d in range(0, 100, 10)] + [(100.0, None)]
+        else:
+            low, sep, high = token.partition("-")
+            if not sep:
+                raise ValueError(f"invalid cohort {token!r}")
+            found = [(float(low) if low else None, float(high) if high else None)]
+        for bounds in found:
+            bounds = quantize_bounds(*bounds)
+            if bounds not in cohorts:
+                cohorts.append(bounds)
+    return cohorts
+
+
+COHORTS = parse_cohorts(os.getenv("PRECOMPUTE_COHORTS", DEFAULT_COHORTS))
+
+
+def cohort_key(endpoint: str, min_age: Optional[float], max_age: Optional[float]) -> str:
+    """The ``aggKey`` of a precomputed result; bounds must already be quantised."""
+
+    def fmt(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:.2f}"
+
+    return f"{endpoint}#{fmt(min_age)}#{fmt(max_age)}"
+
+
+def ages_of(items: Iterable[Dict[str, Any]]) -> List[float]:
+    """Computes every patient's age once, for reuse across cohorts."""
+    return [compute_age_years(it["date_of_birth"]) for it in items]
+
+
+def within(
+    items: Iterable[Dict[str, Any]], min_age: Optional[float], max_age: Optional[float]
+) -> Iterator[Dict[str, Any]]:
+    """Yields the patients within the inclusive age window without building a list."""
+    for it in items:
+        age = compute_age_years(it["date_of_birth"])
+        if min_age is not None and age < min_age:
+            continue
+        if max_age is not None and age > max_age:
+            continue
+        yield it
+
+
+def select(
+    items: Sequence[Dict[str, Any]],
+    min_age: Optional[float],
+    max_age: Optional[float],
+    ages: Optional[Sequence[float]] = None,
+) -> Tuple[List[Dict[str, Any]], Sequence[float]]:
+    """Returns the patients (and their ages) within the window; ``ages`` may be precomputed."""
+    chosen: List[Dict[str, Any]] = []
+    chosen_ages = array("d")  # 8 bytes per age instead of a float object
+    for i, it in enumerate(items):
+        age = ages[i] if ages is not None else compute_age_years(it["date_of_birth"])
+        if min_age is not None and age < min_age:
+            continue
+        if max_age is not None and age > max_age:
+            continue
+        chosen.append(it)
+        chosen_ages.append(age)
+    return chosen, chosen_ages
+
+
+def overview(items: Sequence[Dict[str, Any]], ages: Sequence[float]) -> Dict[str, Any]:
+    """Builds the /admin/overview body for the selected patients."""
+    counts_by_sex: Dict[str, int] = {}
+    bmi_total = 0
+    for it in items:
+        sex = it.get("sex") or ""
+        counts_by_sex[sex] = counts_by_sex.get(sex, 0) + 1
+        bmi_total += bmi_units(it.get("bmi", 0.0))
+    age_total = sum(round(age * UNITS) for age in ages)
+    body: Dict[str, Any] = overview_body(
+        len(items), bmi_total, age_total, counts_by_sex, _counts(items, "diseases")
+    )
+    return body
+
+
+def _counts(items: Iterable[Dict[str, Any]], field: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for it in items:
+        for value in it.get(field, []):
+            if value:
+                counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def disease_counts(items: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Builds the /admin/diseases body for the selected patients."""
+    return {"diseases": ranked(_counts(items, "diseases"))}
+
+
+def medication_counts(items: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Builds the /admin/medications body for the selected patients."""
+    return {"medications": ranked(_counts(items, "medications"))}
+
+
+def scan_counts(field: str, min_age: Optional[float], max_age: Optional[float]) -> Dict[str, Any]:
+    """
+    Builds the /admin/diseases or /admin/medications body for ``field`` from
+    a scan that reads only birth dates and ``field`` and keeps one page alive.
+    """
+    scanned = 0
+
+    def items() -> Iterator[Dict[str, Any]]:
+        nonlocal scanned
+        for page in db.scan_pages(("date_of_birth", field)):
+            scanned += len(page)
+            yield from page
+
+    with timing.phase("scan"):  # counts each page as it arrives
+        counts = _counts(within(items(), min_age, max_age), field)
+    timing.count("items", scanned)
+    with timing.phase("aggregate"):
+        return {field: ranked(counts)}
+
+
+BUILDERS: Dict[str, Callable[[List[Dict[str, Any]], Sequence[float]], Dict[str, Any]]] = {
+    "admin_overview": overview,
+    "admin_diseases": lambda items, ages: disease_counts(items),
+    "admin_medications": lambda items, ages: medication_counts(items),
+}
+
+
+def _aggregates() -> Any:
+    return db._boto3_resource().Table(aggregates_table())
+
+
+def store(
+    items: Sequence[Dict[str, Any]],
+    cohorts: Sequence[Bounds],
+    now: Optional[datetime] = None,
+) -> int:
+    """Computes every endpoint body for ``cohorts`` and writes them; returns the item count."""
+    now = now or datetime.now(timezone.utc)
+    computed_at = now.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    as_of = date.today().isoformat()
+    with timing.phase("aggregate"):
+        ages = ages_of(items)
+        rows: List[Dict[str, Any]] = []
+        for min_age, max_age in cohorts:
+            chosen, chosen_ages = select(items, min_age, max_age, ages)
+            for endpoint, build in BUILDERS.items():
+                rows.append(
+                    {
+                        "aggKey": cohort_key(endpoint, min_age, max_age),
+                        "body": json.dumps(build(chosen, chosen_ages)),
+                        "computedAt": computed_at,
+                        "asOf": as_of,
+                        "patients": len(chosen),
+                    }
+                )
+    with timing.phase("put_items"):
+        with _aggregates().batch_writer(overwrite_by_pkeys=["aggKey"]) as writer:
+            for row in rows:
+                writer.put_item(Item=row)
+    return len(rows)
+
+
+def is_fresh(item: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    """True if ``item`` was computed today and within ``PRECOMPUTE_MAX_AGE`` seconds."""
+    if item.get("asOf") != date.today().isoformat():
+        return False
+    try:
+        computed = datetime.strptime(str(item.get("computedAt")), _TIMESTAMP)
+    except ValueError:
+        return False
+    now = now or datetime.now(timezone.utc)
+    age = (now.replace(tzinfo=None) - computed).total_seconds()
+    return age <= PRECOMPUTE_MAX_AGE
+
+
+def precomputed(
+    endpoint: str, min_age: Optional[float], max_age: Optional[float]
+) -> Optional[Dict[str, Any]]:
+    """Returns the stored 200 response for a configured cohort if it is fresh, else ``None``."""
+    if PRECOMPUTE_MAX_AGE <= 0 or not aggregates_table() or (min_age, max_age) not in COHORTS:
+        return None
+    try:
+        with timing.phase("get_item"):
+            resp = _aggregates().get_item(
+                Key={"aggKey": cohort_key(endpoint, min_age, max_age)}, **capacity.request()
+            )
+    except (ClientError, BotoCoreError) as e:
+        log.warning("precomputed cohort unavailable", error=str(e))
+        return None
+    item = capacity.record("GetItem", resp).get("Item")
+    if item is None or not is_fresh(item):
+        timing.count("precomputed_misses")
+        return None
+    timing.count("precomputed_hits")
+    response: Dict[str, Any] = text_response(200, str(item["body"]))
+    return response
+
+
+def precomputed_or(
+    endpoint: str,
+    min_age: Optional[float],
+    max_age: Optional[float],
+    compute: Callable[[], Dict[str, Any]],
+    consistent: bool = False,
+) -> Dict[str, Any]:
+    """Serves the fresh precomputed cohort, else ``compute()``; ``consistent`` always computes."""
+    if not consistent:
+        response = precomputed(endpoint, min_age, max_age)
+        if response is not None:
+            return response
+    return compute()
@@ -0,0 +1,238 @@
+"""Sparse medication x disease co-occurrence matrix with age filtering.
+
+The matrix is CSR: ``indptr`` delimits each medication's row, ``indices``
+holds the diseases co-occurring with it. Instead of one count, every stored
+cell (and every medication, every disease and the patient total) keeps a
+series of the distinct birth ordinals of its patients with cumulative
+counts. An age window is one birth-date range for today
+(``age_index.birth_range``), so any count in it is two bisections of one
+series, and the series are bounded by the calendar rather than by the
+number of patients.
+
+For a medication M and a disease D among the N patients in the window:
+
+    support    = patients(M and D) / N
+    confidence = patients(M and D) / patients(M)      P(D | M)
+    lift       = confidence / (patients(D) / N)
+
+The matrix is built in one pass and published by
+``handlers.precompute_cohorts`` next to the disease bitmaps (same
+``BITMAP_INDEX_URL`` store, same freshness rule); without a fresh snapshot
+/admin/metrics/associations builds it from a scan.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from lib import bitmaps, snapshots, timing
+from lib.age_index import birth_range
+from lib.aggregate import PRECOMPUTE_MAX_AGE
+from lib.utils import parse_iso_date
+
+MAGIC = b"ASM1"
+
+_TYPECODES = ("i", "i", "i", "i", "i")  # indptr, indices, offsets, days, cum
+
+
+def _series(counts: Dict[int, int], days: array, cum: array) -> None:
+    total = 0
+    for born in sorted(counts):
+        total += counts[born]
+        days.append(born)
+        cum.append(total)
+
+
+class AssociationMatrix:
+    """
+    CSR medication x disease matrix of birth-ordinal series.
+
+    Series ``0`` is every patient, ``1 + m`` medication ``m``, ``1 + M + d``
+    disease ``d`` and ``1 + M + D + k`` the ``k``-th stored cell; ``offsets``
+    delimits each series in ``days``/``cum``.
+    """
+
+    def __init__(self, built_at: Optional[float] = None) -> None:
+        self.medications: List[str] = []
+        self.diseases: List[str] = []
+        self.indptr = array("i", [0])
+        self.indices = array("i")
+        self.offsets = array("i", [0])
+        self.days = array("i")
+        self.cum = array("i")
+        self.built_at = time.time() if built_at is None else built_at
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "AssociationMatrix":
+        """Builds the matrix in one pass over ``records``."""
+        parsed: Dict[str, int] = {}  # many patients share a birth date
+        total: Dict[int, int] = {}
+        meds: Dict[str, Dict[int, int]] = {}
+        diseases: Dict[str, Dict[int, int]] = {}
+        cells: Dict[str, Dict[str, Dict[int, int]]] = {}
+        for record in records:
+            raw = record.get("date_of_birth")
+            if not isinstance(raw, str):
+                continue
+            born = parsed.get(raw)
+            if born is None:
+                try:
+                    born = parsed[raw] = parse_iso_date(raw).toordinal()
+                except ValueError:
+                    continue
+            total[born] = total.get(born, 0) + 1
+            ds = {d for d in record.get("diseases") or [] if d}
+            for d in ds:
+                series = diseases.setdefault(d, {})
+                series[born] = series.get(born, 0) + 1
+            for m in {m for m in record.get("medications") or [] if m}:
+                series = meds.setdefault(m, {})
+                series[born] = series.get(born, 0) + 1
+                row = cells.setdefault(m, {})
+                for d in ds:
+                    series = row.setdefault(d, {})
+                    series[born] = series.get(born, 0) + 1
+
+        matrix = cls()
+        matrix.medications = sorted(meds)
+        matrix.diseases = sorted(diseases)
+        column = {d: i for i, d in enumerate(matrix.diseases)}
+        ordered = [total] + [meds[m] for m in matrix.medications]
+        ordered += [diseases[d] for d in matrix.diseases]
+        for m in matrix.medications:
+            row = cells.get(m, {})
+            for d in sorted(row, key=column.__getitem__):
+                matrix.indices.append(column[d])
+                ordered.append(row[d])
+            matrix.indptr.append(len(matrix.indices))
+        for counts in ordered:
+            _series(counts, matrix.days, matrix.cum)
+            matrix.offsets.append(len(matrix.days))
+        return matrix
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def _count(self, series: int, first: int, last: int) -> int:
+        lo, hi = self.offsets[series], self.offsets[series + 1]
+        i = bisect_left(self.days, first, lo, hi)
+        j = bisect_right(self.days, last, lo, hi)
+        if j <= i:
+            return 0
+        return self.cum[j - 1] - (self.cum[i - 1] if i > lo else 0)
+
+    def associations(
+        self,
+        min_age: Optional[float],
+        max_age: Optional[float],
+        top: int,
+        medication: Optional[str] = None,
+        today: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """The /admin/metrics/associations body: top ``top`` diseases per medication row."""
+        first, last = birth_range(min_age, max_age, today)
+        n_meds = len(self.medications)
+        total = self._count(0, first, last)
+        rows: List[Dict[str, Any]] = []
+        disease_counts: Dict[int, int] = {}
+        for m, name in enumerate(self.medications):
+            if medication is not None and name != medication:
+                continue
+            with_med = self._count(1 + m, first, last)
+            if not with_med:
+                continue
+            found: List[Dict[str, Any]] = []
+            for k in range(self.indptr[m], self.indptr[m + 1]):
+                both = self._count(1 + n_meds + len(self.diseases) + k, first, last)
+                if not both:
+                    continue
+                d = self.indices[k]
+                if d not in disease_counts:
+                    disease_counts[d] = self._count(1 + n_meds + d, first, last)
+                confidence = both / with_med
+                found.append(
+                    {
+                        "disease": self.diseases[d],
+                        "count": both,
+                        "support": round(both / total, 4),
+                        "confidence": round(confidence, 4),
+                        "lift": round(confidence * total / disease_counts[d], 3),
+                    }
+                )
+            found.sort(key=lambda r: (-r["count"], r["disease"]))
+            rows.append({"medication": name, "patients": with_med, "diseases": found[:top]})
+        rows.sort(key=lambda r: (-r["patients"], r["medication"]))
+        return {"patients": total, "associations": rows}
+
+    # ------------------------------------------------------------------ snapshots
+
+    def to_bytes(self) -> bytes:
+        """Serialises the matrix (JSON header plus zlib-compressed CSR arrays)."""
+        columns = [self.indptr, self.indices, self.offsets, self.days, self.cum]
+        header = json.dumps(
+            {
+                "built_at": self.built_at,
+                "medications": self.medications,
+                "diseases": self.diseases,
+                "lengths": [len(c) for c in columns],
+            }
+        ).encode("utf-8")
+        body = zlib.compress(b"".join(c.tobytes() for c in columns), 6)
+        return MAGIC + struct.pack(">I", len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AssociationMatrix":
+        """Loads a matrix written by ``to_bytes``."""
+        if data[:4] != MAGIC:
+            raise ValueError("not an association matrix snapshot")
+        (size,) = struct.unpack(">I", data[4:8])
+        header = json.loads(data[8 : 8 + size])
+        body = memoryview(zlib.decompress(data[8 + size :]))
+        matrix = cls(built_at=header["built_at"])
+        matrix.medications, matrix.diseases = header["medications"], header["diseases"]
+        columns = []
+        offset = 0
+        lengths = header["lengths"]
+        for i, typecode in enumerate(_TYPECODES):
+            column = array(typecode)
+            width = lengths[i] * column.itemsize
+            column.frombytes(body[offset : offset + width])
+            offset += width
+            columns.append(column)
+        matrix.indptr, matrix.indices, matrix.offsets, matrix.days, matrix.cum = columns
+        return matrix
+
+
+def snapshot_name(table: str) -> str:
+    """The snapshot holding ``table``'s association matrix."""
+    return f"{table}.associations"
+
+
+_cache = snapshots.Cached(AssociationMatrix.from_bytes, bitmaps.BITMAP_INDEX_REFRESH)
+
+
+def publish(table: str, matrix: AssociationMatrix) -> int:
+    """Replaces ``table``'s matrix snapshot (in the bitmap store); returns its size in bytes."""
+    data = matrix.to_bytes()
+    snapshots.publish(bitmaps.store(), snapshot_name(table), data)
+    return len(data)
+
+
+def current(table: str) -> Optional[AssociationMatrix]:
+    """Returns the published matrix if it is fresh, else ``None`` (build from a scan)."""
+    if not bitmaps.BITMAP_INDEX_URL or PRECOMPUTE_MAX_AGE <= 0:
+        return None
+    matrix: Optional[AssociationMatrix] = _cache.get(bitmaps.store(), snapshot_name(table))
+    if matrix is None or time.time() - matrix.built_at > PRECOMPUTE_MAX_AGE:
+        timing.count("association_misses")
+        return None
+    timing.count("association_hits")
+    return matrix
@@ -1,6 +1,17 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from lib import log
 
 
 def extract_claims(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -11,6 +22,8 @@ def extract_claims(event: Dict[str, Any]) -> Dict[str, Any]:
     authorizer = ctx.get("authorizer", {})
     jwt = authorizer.get("jwt", {})
     claims = jwt.get("claims") or {}
+    if not claims:
+        claims = verified_claims(event)
     return claims
 
 
@@ -33,7 +46,257 @@ def get_caller_sub(claims: Dict[str, Any]) -> str:
     """
     Returns the caller's Cognito subject (sub).
     """
-    sub = claims.get("sub")
+    sub: str = claims.get("sub") or ""
     if not sub:
         raise PermissionError("Missing subject in token.")
     return sub
+
+
+# --- in-function JWT verification -----------------------------------------------------
+#
+# Behind the API Gateway JWT authorizer the claims arrive verified in the event.
+# For front doors without an authorizer (Function URLs, ALB) set JWT_VERIFY=true
+# and the bearer token is verified here: RS256 against the Cognito JWKS, which is
+# cached per container and re-fetched when a token names an unknown ``kid``.
+# Verified claims are memoised by token hash until ``exp`` so repeat requests
+# skip the RSA operation.
+
+JWT_VERIFY = os.getenv("JWT_VERIFY", "false").lower() == "true"
+JWT_ISSUER = os.getenv("JWT_ISSUER", "")
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "")
+JWKS_PATH = os.getenv("JWKS_PATH", "")
+JWKS_URL = os.getenv("JWKS_URL", "")
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+JWT_LEEWAY_SECONDS = 30
+JWKS_MIN_REFRESH_SECONDS = 60.0
+
+# ASN.1 DigestInfo prefix for SHA-256 (RFC 8017, section 9.2, note 1).
+_SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+class TokenError(PermissionError):
+    """The bearer token is malformed, badly signed, expired or not for us."""
+
+
+def b64url_decode(value: str) -> bytes:
+    """Decodes unpadded base64url."""
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64url_int(value: str) -> int:
+    return int.from_bytes(b64url_decode(value), "big")
+
+
+def rsa_pkcs1_sha256_verify(n: int, e: int, message: bytes, signature: bytes) -> bool:
+    """Verifies an RSASSA-PKCS1-v1_5 SHA-256 signature with the public key ``(n, e)``."""
+    k = (n.bit_length() + 7) // 8
+    if len(signature) != k:
+        return False
+    s = int.from_bytes(signature, "big")
+    if s >= n:
+        return False
+    em = pow(s, e, n).to_bytes(k, "big")
+    suffix = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    expected = b"\x00\x01" + b"\xff" * (k - len(suffix) - 3) + b"\x00" + suffix
+    return hmac.compare_digest(em, expected)
+
+
+class JwksCache:
+    """Per-container ``kid -> (n, e)`` map loaded from a file or URL."""
+
+    def __init__(
+        self,
+        path: str = "",
+        url: str = "",
+        min_refresh_seconds: float = JWKS_MIN_REFRESH_SECONDS,
+        fetch: Optional[Callable[[], Dict[str, Any]]] = None,
+    ) -> None:
+        self.path = path
+        self.url = url
+        self.min_refresh_seconds = min_refresh_seconds
+        self._fetch = fetch
+        self._keys: Dict[str, Tuple[int, int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def _load_document(self) -> Dict[str, Any]:
+        if self._fetch is not None:
+            return self._fetch()
+        document: Dict[str, Any]
+        if self.path:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                document = json.load(fh)
+            return document
+        if self.url:
+            with urllib.request.urlopen(self.url, timeout=3) as resp:  # noqa: S310
+                document = json.loads(resp.read())
+            return document
+        raise TokenError("No JWKS source configured (JWKS_PATH, JWKS_URL or JWT_ISSUER).")
+
+    def refresh(self) -> None:
+        """Reloads the key set, at most once per ``min_refresh_seconds``."""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is not None and now - self._loaded_at < self.min_refresh_seconds:
+                return
+            doc = self._load_document()
+            self.fetches += 1
+            self._loaded_at = now
+            self._keys = {
+                k["kid"]: (_b64url_int(k["n"]), _b64url_int(k["e"]))
+                for k in doc.get("keys", [])
+                if k.get("kty") == "RSA" and k.get("kid")
+            }
+
+    def get(self, kid: str) -> Tuple[int, int]:
+        """Returns the key for ``kid``, refreshing once if it is not known yet."""
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenError("Unknown signing key.")
+        return key
+
+
+class VerifiedTokenCache:
+    """LRU of ``sha256(token) -> (exp, claims)``; entries die at ``exp``."""
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes, now: float) -> Optional[Dict[str, Any]]:
+        """Returns cached claims that are still valid at ``now``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: bytes, exp: float, claims: Dict[str, Any]) -> None:
+        """Stores claims, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (exp, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _default_jwks_url() -> str:
+    if JWKS_URL:
+        return JWKS_URL
+    return JWT_ISSUER.rstrip("/") + "/.well-known/jwks.json" if JWT_ISSUER else ""
+
+
+_jwks = JwksCache(path=JWKS_PATH, url=_default_jwks_url())
+_verified = VerifiedTokenCache()
+
+
+def _check_claims(claims: Dict[str, Any], now: float, issuer: str, audience: str) -> float:
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or exp + JWT_LEEWAY_SECONDS <= now:
+        raise TokenError("Token expired.")
+    nbf = claims.get("nbf")
+    if isinstance(nbf, (int, float)) and nbf - JWT_LEEWAY_SECONDS > now:
+        raise TokenError("Token not yet valid.")
+    if issuer and claims.get("iss") != issuer:
+        raise TokenError("Token issuer mismatch.")
+    if audience:
+        # Cognito ID tokens carry ``aud``; access tokens carry ``client_id``.
+        aud = claims.get("aud", claims.get("client_id"))
+        allowed = aud if isinstance(aud, list) else [aud]
+        if audience not in allowed:
+            raise TokenError("Token audience mismatch.")
+    return float(exp) + JWT_LEEWAY_SECONDS
+
+
+def verify_token(
+    token: str,
+    jwks: Optional[JwksCache] = None,
+    cache: Optional[VerifiedTokenCache] = None,
+    now: Optional[float] = None,
+    issuer: Optional[str] = None,
+    audience: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Verifies an RS256 JWT and returns its claims.
+
+    Raises ``TokenError`` for malformed, unsigned, wrongly signed, expired or
+    foreign tokens. Successful results are cached until the token expires.
+    """
+    jwks = jwks or _jwks
+    cache = _verified if cache is None else cache
+    now = time.time() if now is None else now
+    digest = hashlib.sha256(token.encode()).digest()
+    hit = cache.get(digest, now)
+    if hit is not None:
+        return hit
+
+    try:
+        header_b64, payload_b64, sig_b64 = token.split(".")
+        header = json.loads(b64url_decode(header_b64))
+        claims = json.loads(b64url_decode(payload_b64))
+        signature = b64url_decode(sig_b64)
+    except (ValueError, TypeError) as exc:
+        raise TokenError("Malformed token.") from exc
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise TokenError("Malformed token.")
+    if header.get("alg") != "RS256":
+        raise TokenError("Unsupported token algorithm.")
+
+    n, e = jwks.get(str(header.get("kid", "")))
+    signed = f"{header_b64}.{payload_b64}".encode("ascii")
+    if not rsa_pkcs1_sha256_verify(n, e, signed, signature):
+        raise TokenError("Bad token signature.")
+    expires = _check_claims(
+        claims,
+        now,
+        JWT_ISSUER if issuer is None else issuer,
+        JWT_AUDIENCE if audience is None else audience,
+    )
+    cache.put(digest, expires, claims)
+    return claims
+
+
+def bearer_token(event: Dict[str, Any]) -> Optional[str]:
+    """Returns the bearer token from the Authorization header, if any."""
+    headers = event.get("headers") or {}
+    value = headers.get("authorization") or headers.get("Authorization") or ""
+    scheme, _, token = value.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+
+def verified_claims(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns claims from the event's bearer token when ``JWT_VERIFY`` is on.
+
+    Returns ``{}`` when verification is off, no token is sent or the token is
+    rejected, so callers treat it exactly like a request without claims.
+    """
+    if not JWT_VERIFY:
+        return {}
+    token = bearer_token(event)
+    if not token:
+        return {}
+    try:
+        return verify_token(token)
+    except TokenError as exc:
+        log.warning("bearer token rejected", reason=str(exc))
+        return {}
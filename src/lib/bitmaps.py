@@ -0,0 +1,197 @@
+"""Per-disease bitmaps over birth-ordered patients, for co-occurrence queries.
+
+Patients get dense ordinals in birth-date order, and each disease is one
+Python ``int`` with bit ``i`` set when patient ``i`` has it. Because the
+ordinals follow birth dates, an age window (one birth-date range for today,
+``age_index.birth_range``) is a contiguous run of bits, so its mask comes
+from two bisections. Co-occurrence of X with every other disease Y in the
+window is then one AND and one popcount per Y on machine-word runs instead
+of a pass over every patient's disease list.
+
+    lift(X, Y) = P(X and Y) / (P(X) P(Y))   within the window
+
+``handlers.precompute_cohorts`` builds the index on its scheduled scan and
+publishes it as a snapshot (``lib.snapshots``) at ``BITMAP_INDEX_URL``;
+/admin/metrics/comorbidity loads it once per container, re-checks it every
+``BITMAP_INDEX_REFRESH`` seconds and uses it while it is at most
+``PRECOMPUTE_MAX_AGE`` seconds old, otherwise it builds one from a scan.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lib import snapshots, timing
+from lib.age_index import birth_range
+from lib.aggregate import PRECOMPUTE_MAX_AGE
+from lib.utils import parse_iso_date
+
+BITMAP_INDEX_URL = os.getenv("BITMAP_INDEX_URL", "")
+BITMAP_INDEX_REFRESH = float(os.getenv("BITMAP_INDEX_REFRESH", "60"))
+MAGIC = b"BMX1"
+
+_BIT_COUNT = hasattr(int, "bit_count")  # Python 3.10+; the Lambda runtime is 3.9
+
+
+def popcount(x: int) -> int:
+    """Number of set bits in ``x``."""
+    return x.bit_count() if _BIT_COUNT else bin(x).count("1")
+
+
+def _to_bytes(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+class BitmapIndex:
+    """Sorted birth ordinals plus one bitset per disease."""
+
+    def __init__(self, built_at: Optional[float] = None) -> None:
+        self.born = array("i")  # birth ordinal of each patient, ascending
+        self.diseases: Dict[str, int] = {}
+        self.built_at = time.time() if built_at is None else built_at
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "BitmapIndex":
+        """Builds the index in O(patients x diseases per patient + bitmap bytes)."""
+        rows: List[Tuple[int, Any]] = []
+        for record in records:
+            try:
+                born = parse_iso_date(record["date_of_birth"]).toordinal()
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((born, record.get("diseases") or []))
+        rows.sort(key=lambda row: row[0])
+        index = cls()
+        index.born = array("i", (born for born, _ in rows))
+        size = (len(rows) + 7) // 8
+        buffers: Dict[str, bytearray] = {}
+        for i, (_, diseases) in enumerate(rows):
+            for name in diseases:
+                if not name:
+                    continue
+                buf = buffers.get(name)
+                if buf is None:
+                    buf = buffers[name] = bytearray(size)
+                buf[i >> 3] |= 1 << (i & 7)
+        index.diseases = {name: int.from_bytes(buf, "little") for name, buf in buffers.items()}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.born)
+
+    def window(
+        self, min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+    ) -> int:
+        """The mask of patients whose age lies within ``[min_age, max_age]``."""
+        first, last = birth_range(min_age, max_age, today)
+        lo, hi = bisect_left(self.born, first), bisect_right(self.born, last)
+        return ((1 << hi) - 1) ^ ((1 << lo) - 1) if hi > lo else 0
+
+    def comorbidity(
+        self,
+        disease: str,
+        min_age: Optional[float],
+        max_age: Optional[float],
+        today: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """Co-occurrence counts and lift of ``disease`` with every other disease in the window."""
+        mask = self.window(min_age, max_age, today)
+        total = popcount(mask)
+        base = self.diseases.get(disease, 0) & mask
+        with_disease = popcount(base)
+        rows: List[Dict[str, Any]] = []
+        if with_disease:
+            for name, bits in self.diseases.items():
+                if name == disease:
+                    continue
+                both = popcount(base & bits)
+                if both:
+                    with_other = popcount(bits & mask)
+                    lift = both * total / (with_disease * with_other)
+                    rows.append({"disease": name, "count": both, "lift": round(lift, 3)})
+        rows.sort(key=lambda r: (-r["count"], r["disease"]))
+        return {
+            "disease": disease,
+            "patients": total,
+            "with_disease": with_disease,
+            "comorbidities": rows,
+        }
+
+    # ------------------------------------------------------------------ snapshots
+
+    def to_bytes(self) -> bytes:
+        """Serialises the index (JSON header plus zlib-compressed ordinals and bitmaps)."""
+        names = list(self.diseases)
+        blobs = [_to_bytes(self.diseases[n]) for n in names]
+        header = json.dumps(
+            {
+                "built_at": self.built_at,
+                "patients": len(self.born),
+                "diseases": names,
+                "sizes": [len(b) for b in blobs],
+            }
+        ).encode("utf-8")
+        body = zlib.compress(self.born.tobytes() + b"".join(blobs), 6)
+        return MAGIC + struct.pack(">I", len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BitmapIndex":
+        """Loads an index written by ``to_bytes``."""
+        if data[:4] != MAGIC:
+            raise ValueError("not a bitmap index snapshot")
+        (size,) = struct.unpack(">I", data[4:8])
+        header = json.loads(data[8 : 8 + size])
+        body = memoryview(zlib.decompress(data[8 + size :]))
+        index = cls(built_at=header["built_at"])
+        offset = header["patients"] * index.born.itemsize
+        index.born.frombytes(body[:offset])
+        sizes = header["sizes"]
+        for i, name in enumerate(header["diseases"]):
+            n = sizes[i]
+            index.diseases[name] = int.from_bytes(body[offset : offset + n], "little")
+            offset += n
+        return index
+
+
+def snapshot_name(table: str) -> str:
+    """The snapshot holding ``table``'s bitmap index."""
+    return f"{table}.bitmaps"
+
+
+_store: Optional[snapshots.SnapshotStore] = None
+_cache = snapshots.Cached(BitmapIndex.from_bytes, BITMAP_INDEX_REFRESH)
+
+
+def store() -> snapshots.SnapshotStore:
+    """The snapshot store named by ``BITMAP_INDEX_URL`` (created on first use)."""
+    global _store
+    if _store is None:
+        _store = snapshots.from_url(BITMAP_INDEX_URL)
+    return _store
+
+
+def publish(table: str, index: BitmapIndex) -> int:
+    """Replaces ``table``'s bitmap snapshot; returns its size in bytes."""
+    data = index.to_bytes()
+    snapshots.publish(store(), snapshot_name(table), data)
+    return len(data)
+
+
+def current(table: str) -> Optional[BitmapIndex]:
+    """Returns the published index if it is fresh, else ``None`` (build from a scan)."""
+    if not BITMAP_INDEX_URL or PRECOMPUTE_MAX_AGE <= 0:
+        return None
+    index: Optional[BitmapIndex] = _cache.get(store(), snapshot_name(table))
+    if index is None or time.time() - index.built_at > PRECOMPUTE_MAX_AGE:
+        timing.count("bitmap_misses")
+        return None
+    timing.count("bitmap_hits")
+    return index
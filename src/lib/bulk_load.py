@@ -0,0 +1,295 @@
+"""Parallel, resumable BatchWriteItem loader for patient records.
+
+Input is streamed (NDJSON or CSV, optionally gzip) and processed in
+validation chunks; each chunk is validated in one pydantic call, split into
+25-item ``BatchWriteItem`` requests and handed to a bounded worker pool.
+Unprocessed items and throttling errors are retried with capped exponential
+backoff and full jitter. The checkpoint stores how many input records are
+durably written, counted as a contiguous prefix so out-of-order completion
+never skips data on resume.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from pydantic import TypeAdapter, ValidationError
+
+from lib import result_cache
+from lib.models import PatientRecord
+
+BATCH_LIMIT = 25
+RETRYABLE_ERRORS = frozenset(
+    {
+        "ProvisionedThroughputExceededException",
+        "ThrottlingException",
+        "RequestLimitExceeded",
+        "InternalServerError",
+    }
+)
+
+_serializer = TypeSerializer()
+_records_adapter = TypeAdapter(List[PatientRecord])
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_records(path: str, skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Streams records from NDJSON (``.ndjson``/``.jsonl``) or CSV, skipping ``skip`` rows.
+
+    CSV list columns use ``;`` as separator, matching ``lib.export``.
+    """
+    is_csv = ".csv" in os.path.basename(path)
+    with _open_text(path) as fh:
+        rows: Iterable[Dict[str, Any]]
+        if is_csv:
+            rows = csv.DictReader(fh)
+        else:
+            rows = (json.loads(line) for line in fh if line.strip())
+        for idx, row in enumerate(rows):
+            if idx < skip:
+                continue
+            if is_csv:
+                row = {k: v for k, v in row.items() if v != ""}
+                for col in ("diseases", "medications"):
+                    if col in row:
+                        row[col] = [x for x in row[col].split(";") if x]
+            yield row
+
+
+def _to_dynamo(value: Any) -> Any:
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    return value
+
+
+def validate_chunk(
+    rows: List[Dict[str, Any]], key_attr: str = "patient_id"
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validates a chunk against ``PatientRecord`` and returns ``(attribute_maps, rejects)``.
+
+    The whole chunk is validated in one call; only when it fails are rows
+    re-validated individually to separate good rows from bad ones.
+    """
+    try:
+        models = _records_adapter.validate_python(rows)
+        rejects: List[Dict[str, Any]] = []
+    except ValidationError:
+        models, rejects = [], []
+        for row in rows:
+            try:
+                models.append(PatientRecord.model_validate(row))
+            except ValidationError as e:
+                rejects.append({"row": row, "error": e.errors(include_url=False)})
+    items = []
+    for m in models:
+        doc = m.model_dump()
+        if key_attr != "patient_id":
+            doc[key_attr] = doc["patient_id"]
+        items.append({k: _serializer.serialize(_to_dynamo(v)) for k, v in doc.items()})
+    return items, rejects
+
+
+def backoff_delay(attempt: int, base: float = 0.05, cap: float = 5.0) -> float:
+    """Full-jitter exponential backoff delay for the given attempt."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def write_batch(
+    client: Any,
+    table_name: str,
+    items: List[Dict[str, Any]],
+    max_attempts: int = 10,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """
+    Writes up to 25 items, retrying unprocessed items and throttling errors.
+
+    Returns the number of retry rounds that were needed.
+    """
+    if len(items) > BATCH_LIMIT:
+        raise ValueError(f"at most {BATCH_LIMIT} items per BatchWriteItem")
+    pending = [{"PutRequest": {"Item": it}} for it in items]
+    attempt = 0
+    while pending:
+        try:
+            resp = client.batch_write_item(RequestItems={table_name: pending})
+            pending = resp.get("UnprocessedItems", {}).get(table_name, [])
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in RETRYABLE_ERRORS:
+                raise
+        else:
+            if not pending:
+                break
+        attempt += 1
+        if attempt >= max_attempts:
+            raise RuntimeError(f"{len(pending)} items still unprocessed after {attempt} attempts")
+        sleep(backoff_delay(attempt))
+    return attempt
+
+
+class LoadStats:
+    """Thread-safe counters with an items/sec readout."""
+
+    def __init__(self, start_offset: int = 0) -> None:
+        self.started = time.monotonic()
+        self.written = 0
+        self.rejected = 0
+        self.retries = 0
+        self.committed_offset = start_offset
+        self._lock = threading.Lock()
+
+    def add(self, written: int = 0, rejected: int = 0, retries: int = 0) -> None:
+        """Adds to the running counters."""
+        with self._lock:
+            self.written += written
+            self.rejected += rejected
+            self.retries += retries
+
+    @property
+    def rate(self) -> float:
+        """Items written per second since start."""
+        elapsed = time.monotonic() - self.started
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the counters as a JSON-ready dict."""
+        return {
+            "written": self.written,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "offset": self.committed_offset,
+            "itemsPerSec": round(self.rate, 1),
+        }
+
+
+def load_checkpoint(path: Optional[str]) -> int:
+    """Returns the committed input offset stored at ``path`` (0 if missing)."""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return int(json.load(f).get("offset", 0))
+
+
+def save_checkpoint(path: Optional[str], stats: LoadStats) -> None:
+    """Atomically writes the loader state."""
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stats.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dedupe(items: List[Dict[str, Any]], key_attr: str) -> List[Dict[str, Any]]:
+    """Keeps the last item per key; BatchWriteItem rejects duplicate keys in one call."""
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for it in items:
+        by_key[json.dumps(it[key_attr], sort_keys=True)] = it
+    return list(by_key.values())
+
+
+def load(
+    client: Any,
+    table_name: str,
+    rows: Iterable[Dict[str, Any]],
+    workers: int = 16,
+    chunk_size: int = 1000,
+    key_attr: str = "patient_id",
+    checkpoint_path: Optional[str] = None,
+    start_offset: int = 0,
+    on_progress: Optional[Callable[[LoadStats], None]] = None,
+    on_reject: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_interval: float = 1.0,
+) -> LoadStats:
+    """
+    Loads ``rows`` (already positioned after ``start_offset``) into ``table_name``.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded by
+    the chunk size regardless of input size. With a shared ``CACHE_URL``
+    backend, cached admin results for the table are invalidated once the load
+    finishes; otherwise they expire after ``RESULT_CACHE_TTL``.
+    """
+    stats = LoadStats(start_offset)
+    done: Set[int] = set()
+    sizes: Dict[int, int] = {}
+    next_commit = 0
+    last_report = time.monotonic()
+
+    def _write_chunk(items: List[Dict[str, Any]]) -> None:
+        for i in range(0, len(items), BATCH_LIMIT):
+            part = items[i : i + BATCH_LIMIT]
+            retries = write_batch(client, table_name, part)
+            stats.add(written=len(part), retries=retries)
+
+    def _advance(fut_seq: int) -> None:
+        nonlocal next_commit
+        done.add(fut_seq)
+        moved = False
+        while next_commit in done:
+            done.discard(next_commit)
+            stats.committed_offset += sizes.pop(next_commit)
+            next_commit += 1
+            moved = True
+        if moved:
+            save_checkpoint(checkpoint_path, stats)
+
+    in_flight: Dict[Future, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for seq, chunk in enumerate(_chunks(iter(rows), chunk_size)):
+            items, rejects = validate_chunk(chunk, key_attr)
+            stats.add(rejected=len(rejects))
+            if on_reject:
+                for rej in rejects:
+                    on_reject(rej)
+            sizes[seq] = len(chunk)
+            in_flight[pool.submit(_write_chunk, _dedupe(items, key_attr))] = seq
+            while len(in_flight) >= 2 * workers:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    fut.result()
+                    _advance(in_flight.pop(fut))
+            if on_progress and time.monotonic() - last_report >= progress_interval:
+                on_progress(stats)
+                last_report = time.monotonic()
+        for fut in list(in_flight):
+            fut.result()
+            _advance(in_flight.pop(fut))
+    if result_cache.SHARED:
+        # A local cache lives in this process only; nobody else would see the bump.
+        result_cache.bump_data_version(table_name)
+    if on_progress:
+        on_progress(stats)
+    return stats
@@ -0,0 +1,300 @@
+"""Read-through caching over interchangeable backends.
+
+``Cache`` adds a namespace, TTL policy, JSON serialisation and hit/miss
+counters on top of a byte-oriented ``CacheBackend``:
+
+* ``LocalBackend`` - per-container LRU with per-entry expiry (default);
+* ``RedisBackend`` - any Redis-protocol server (``lib.cache_backends``);
+* ``DynamoBackend`` - items in a DynamoDB table through a DynamoDB- or
+  DAX-shaped client (``lib.cache_backends``).
+
+``CACHE_URL`` picks the backend shared by every cache in the container:
+``local`` (default), ``redis://host:6379/0`` or ``dynamodb://<table>``
+(``dax://<cluster-endpoint>/<table>`` when ``amazondax`` is installed).
+
+``read_through(patient_cache, (table, key), loader)`` returns the cached item
+or calls ``loader`` (one ``get_item``) and remembers the result. Misses
+(``None``) are cached too, for a shorter ``PATIENT_CACHE_NEGATIVE_TTL``, so
+polling clients without a record do not hit DynamoDB on every request.
+Writers call ``invalidate``; with a shared backend that is visible to every
+container, with the local backend only to this one (others catch up within
+``PATIENT_CACHE_TTL``). ``consistent=True`` (see ``wants_consistent``)
+bypasses the cache and refreshes it. ``PATIENT_CACHE_TTL=0`` disables it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from lib import log, timing
+
+CACHE_URL = os.getenv("CACHE_URL", "local")
+PATIENT_CACHE_TTL = float(os.getenv("PATIENT_CACHE_TTL", "15"))
+PATIENT_CACHE_NEGATIVE_TTL = float(os.getenv("PATIENT_CACHE_NEGATIVE_TTL", "5"))
+PATIENT_CACHE_SIZE = int(os.getenv("PATIENT_CACHE_SIZE", "2048"))
+METRICS_CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """
+    Byte store with per-entry TTL and compare-and-set.
+
+    ``gets`` returns ``(data, version)``; ``cas`` writes only if the entry's
+    version is still ``version`` (``None``: only if absent). Versions are
+    opaque to callers.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the stored bytes or ``None``."""
+        raise NotImplementedError
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        """Stores ``data`` for ``ttl`` seconds."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Removes ``key`` if present."""
+        raise NotImplementedError
+
+    def gets(self, key: str) -> Tuple[Optional[bytes], Any]:
+        """Returns ``(data, version)``; ``(None, None)`` when absent."""
+        raise NotImplementedError
+
+    def cas(self, key: str, version: Any, data: bytes, ttl: float) -> bool:
+        """Stores ``data`` if the version still matches; returns whether it did."""
+        raise NotImplementedError
+
+
+class LocalBackend(CacheBackend):
+    """Thread-safe in-process LRU with per-entry expiry and integer versions."""
+
+    def __init__(
+        self, max_size: int = PATIENT_CACHE_SIZE, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_size = max_size
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, bytes, int]]" = OrderedDict()
+        self._versions = 0
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[float, bytes, int]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, data: bytes, ttl: float) -> None:
+        self._versions += 1
+        self._entries[key] = (self.clock() + ttl, data, self._versions)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[1]
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        with self._lock:
+            self._store(key, data, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def gets(self, key: str) -> Tuple[Optional[bytes], Any]:
+        with self._lock:
+            entry = self._live(key)
+            return (None, None) if entry is None else (entry[1], entry[2])
+
+    def cas(self, key: str, version: Any, data: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._live(key)
+            if (entry[2] if entry else None) != version:
+                return False
+            self._store(key, data, ttl)
+            return True
+
+    def clear(self) -> None:
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _encode_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return {"$d": str(obj)}
+    if isinstance(obj, (set, frozenset)):
+        return {"$s": sorted(obj, key=str)}
+    if isinstance(obj, bytes):
+        return {"$b": obj.decode("latin-1")}
+    raise TypeError(f"Object of type {type(obj).__name__} is not cacheable")
+
+
+def _decode_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "$d" in obj:
+            return Decimal(obj["$d"])
+        if "$s" in obj:
+            return set(obj["$s"])
+        if "$b" in obj:
+            return obj["$b"].encode("latin-1")
+    return obj
+
+
+def dumps(value: Any) -> bytes:
+    """Serialises a DynamoDB-shaped value (Decimals and sets survive the round trip)."""
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Inverse of ``dumps``."""
+    return json.loads(data, object_hook=_decode_hook)
+
+
+class Cache:
+    """Namespaced, serialising view of a backend with TTL and negative-TTL policy."""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        namespace: str,
+        ttl: float,
+        negative_ttl: float = 0.0,
+    ) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """False when the TTL is zero (caching switched off)."""
+        return self.ttl > 0
+
+    def key(self, key: Hashable) -> str:
+        """Returns the backend key for ``key`` (tuples are joined with ``:``)."""
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, *map(str, parts)])
+
+    def _ttl_for(self, value: Any) -> float:
+        return self.negative_ttl if value is None else self.ttl
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value (possibly ``None``) or the ``_MISSING`` sentinel."""
+        try:
+            data = self.backend.get(self.key(key))
+        except OSError as exc:
+            log.warning("cache get failed", namespace=self.namespace, error=str(exc))
+            data = None
+        if data is None:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        return loads(data)
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores ``value``; ``None`` marks a known-absent item. ``ttl`` overrides the policy."""
+        ttl = self._ttl_for(value) if ttl is None else ttl
+        if not self.enabled or ttl <= 0:
+            return
+        try:
+            self.backend.set(self.key(key), dumps(value), ttl)
+        except OSError as exc:
+            log.warning("cache set failed", namespace=self.namespace, error=str(exc))
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drops one entry (after a write to the underlying item)."""
+        try:
+            self.backend.delete(self.key(key))
+        except OSError as exc:
+            log.error("cache invalidation failed", namespace=self.namespace, error=str(exc))
+
+    def gets(self, key: Hashable) -> Tuple[Any, Any]:
+        """Returns ``(value or _MISSING, version)`` for a later ``cas``."""
+        try:
+            data, version = self.backend.gets(self.key(key))
+        except OSError as exc:
+            log.warning("cache gets failed", namespace=self.namespace, error=str(exc))
+            return _MISSING, None
+        return (_MISSING if data is None else loads(data)), version
+
+    def cas(self, key: Hashable, version: Any, value: Any) -> bool:
+        """Stores ``value`` only if nobody changed the entry since ``gets``."""
+        try:
+            return self.backend.cas(self.key(key), version, dumps(value), self._ttl_for(value))
+        except OSError as exc:
+            log.warning("cache cas failed", namespace=self.namespace, error=str(exc))
+            return False
+
+    def clear(self) -> None:
+        """Drops every entry of a local backend and resets the counters."""
+        if isinstance(self.backend, LocalBackend):
+            self.backend.clear()
+        self.hits = self.misses = 0
+
+
+def backend_from_url(url: str) -> CacheBackend:
+    """Builds the backend named by a ``CACHE_URL`` value."""
+    if url in ("", "local"):
+        return LocalBackend()
+    from lib import cache_backends
+
+    shared: CacheBackend = cache_backends.from_url(url)
+    return shared
+
+
+backend = backend_from_url(CACHE_URL)
+patient_cache = Cache(backend, "patient", PATIENT_CACHE_TTL, PATIENT_CACHE_NEGATIVE_TTL)
+metrics_cache = Cache(backend, "metrics", METRICS_CACHE_TTL)
+
+
+def read_through(
+    cache: Cache,
+    key: Hashable,
+    loader: Callable[[], Any],
+    consistent: bool = False,
+) -> Any:
+    """
+    Returns ``cache[key]`` or loads, stores and returns it.
+
+    ``consistent=True`` always calls ``loader`` (which should then read with
+    ``ConsistentRead``) and refreshes the entry with the result.
+    """
+    if cache.enabled and not consistent:
+        value = cache.get(key)
+        if value is not _MISSING:
+            timing.count("cache_hits")
+            return value
+    timing.count("cache_misses")
+    value = loader()
+    cache.put(key, value)
+    return value
+
+
+def wants_consistent(event: Dict[str, Any]) -> bool:
+    """True for ``?consistent=true`` or ``Cache-Control: no-cache`` requests."""
+    params = event.get("queryStringParameters") or {}
+    if str(params.get("consistent", "")).lower() in ("1", "true"):
+        return True
+    headers = event.get("headers") or {}
+    control = headers.get("cache-control") or headers.get("Cache-Control") or ""
+    return "no-cache" in control.lower()
@@ -0,0 +1,261 @@
+"""Shared cache backends: Redis protocol and DynamoDB/DAX items.
+
+Both implement ``lib.cache.CacheBackend`` and raise ``CacheUnavailable`` (an
+``OSError``) when the store cannot be reached, which ``lib.cache.Cache``
+treats as a miss so a cache outage degrades to direct reads.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lib.cache import CacheBackend
+
+
+class CacheUnavailable(OSError):
+    """The cache store could not be reached or answered with an error."""
+
+
+class RedisError(CacheUnavailable):
+    """The server replied with a RESP error."""
+
+
+class RespConnection:
+    """Minimal RESP2 client: one socket, blocking request/response."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 0.5,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Any = None
+
+    def _connect(self) -> None:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._reader = sock, sock.makefile("rb")
+        if self.password:
+            self._roundtrip(("AUTH", self.password))
+        if self.db:
+            self._roundtrip(("SELECT", self.db))
+
+    def close(self) -> None:
+        """Closes the socket; the next command reconnects."""
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            finally:
+                self._sock = self._reader = None
+
+    @staticmethod
+    def encode(args: Tuple[Any, ...]) -> bytes:
+        """Encodes a command as a RESP array of bulk strings."""
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise CacheUnavailable("connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise CacheUnavailable(f"unexpected RESP reply {line!r}")
+
+    def _roundtrip(self, args: Tuple[Any, ...]) -> Any:
+        assert self._sock is not None
+        self._sock.sendall(self.encode(args))
+        return self._read()
+
+    def command(self, *args: Any) -> Any:
+        """Sends one command and returns the decoded reply."""
+        try:
+            if self._sock is None:
+                self._connect()
+            return self._roundtrip(args)
+        except RedisError:
+            raise
+        except OSError as exc:
+            self.close()
+            raise CacheUnavailable(str(exc)) from exc
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis-protocol backend; one connection per thread.
+
+    The version used for compare-and-set is the stored value itself, checked
+    under ``WATCH``/``MULTI``/``EXEC``.
+    """
+
+    def __init__(self, host: str, port: int = 6379, db: int = 0, **kw: Any) -> None:
+        self._params = dict(host=host, port=port, db=db, **kw)
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> RespConnection:
+        """This thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = RespConnection(**self._params)
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        data: Optional[bytes] = self.conn.command("GET", key)
+        return data
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        self.conn.command("SET", key, data, "PX", max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.conn.command("DEL", key)
+
+    def gets(self, key: str) -> Tuple[Optional[bytes], Any]:
+        data = self.get(key)
+        return data, data
+
+    def cas(self, key: str, version: Any, data: bytes, ttl: float) -> bool:
+        conn = self.conn
+        try:
+            conn.command("WATCH", key)
+            if conn.command("GET", key) != version:
+                conn.command("UNWATCH")
+                return False
+            conn.command("MULTI")
+            conn.command("SET", key, data, "PX", max(1, int(ttl * 1000)))
+            return conn.command("EXEC") is not None
+        except RedisError:
+            # The connection may still be in WATCH/MULTI state; the next command
+            # on this thread would run inside it, so start over on a new one.
+            conn.close()
+            raise
+
+
+class DynamoBackend(CacheBackend):
+    """
+    Cache entries as items ``{cacheKey, v (B), ver, expiresAt}`` in a DynamoDB table.
+
+    ``client`` is a low-level DynamoDB client or an API-compatible DAX client,
+    so reads are served from the DAX item cache when one is configured.
+    Enable DynamoDB TTL on ``expiresAt``; expired items still present are
+    ignored on read.
+    """
+
+    def __init__(self, client: Any, table: str, key_attr: str = "cacheKey") -> None:
+        self.client = client
+        self.table = table
+        self.key_attr = key_attr
+
+    def _call(self, op: str, **kw: Any) -> Any:
+        try:
+            return getattr(self.client, op)(TableName=self.table, **kw)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                raise
+            raise CacheUnavailable(str(exc)) from exc
+        except BotoCoreError as exc:
+            raise CacheUnavailable(str(exc)) from exc
+
+    def _key(self, key: str) -> dict:
+        return {self.key_attr: {"S": key}}
+
+    def _item(self, key: str, data: bytes, ttl: float, version: str) -> dict:
+        return {
+            self.key_attr: {"S": key},
+            "v": {"B": data},
+            "ver": {"S": version},
+            "expiresAt": {"N": str(int(time.time() + ttl) + 1)},
+        }
+
+    def gets(self, key: str) -> Tuple[Optional[bytes], Any]:
+        item = self._call("get_item", Key=self._key(key)).get("Item")
+        if not item or int(item["expiresAt"]["N"]) <= time.time():
+            return None, None
+        return bytes(item["v"]["B"]), item["ver"]["S"]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.gets(key)[0]
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        self._call("put_item", Item=self._item(key, data, ttl, os.urandom(8).hex()))
+
+    def delete(self, key: str) -> None:
+        self._call("delete_item", Key=self._key(key))
+
+    def cas(self, key: str, version: Any, data: bytes, ttl: float) -> bool:
+        values: dict = {":now": {"N": str(int(time.time()))}}
+        if version is None:
+            condition = "attribute_not_exists(#k) OR expiresAt <= :now"
+        else:
+            condition = "#k = :k AND ver = :ver AND expiresAt > :now"
+            values.update({":k": {"S": key}, ":ver": {"S": version}})
+        try:
+            self._call(
+                "put_item",
+                Item=self._item(key, data, ttl, os.urandom(8).hex()),
+                ConditionExpression=condition,
+                ExpressionAttributeNames={"#k": self.key_attr},
+                ExpressionAttributeValues=values,
+            )
+        except ClientError:
+            return False
+        return True
+
+
+def from_url(url: str) -> CacheBackend:
+    """Builds a backend from ``redis://``, ``dynamodb://`` or ``dax://`` URLs."""
+    parsed = urlparse(url)
+    if parsed.scheme in ("redis", "rediss"):
+        if parsed.scheme == "rediss":
+            raise ValueError("TLS Redis is not supported; use redis:// inside the VPC")
+        db = int(parsed.path.strip("/") or 0)
+        return RedisBackend(
+            parsed.hostname or "127.0.0.1", parsed.port or 6379, db, password=parsed.password
+        )
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "eu-central-1"
+    if parsed.scheme == "dynamodb":
+        import boto3
+
+        return DynamoBackend(boto3.client("dynamodb", region_name=region), parsed.netloc)
+    if parsed.scheme == "dax":
+        try:
+            from amazondax import AmazonDaxClient
+        except ImportError as exc:
+            raise RuntimeError("dax:// cache URLs need the amazon-dax-client package") from exc
+        parts: List[str] = parsed.path.strip("/").split("/")
+        client = AmazonDaxClient(endpoint_url=f"daxs://{parsed.netloc}", region_name=region)
+        return DynamoBackend(client, parts[0])
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
@@ -0,0 +1,58 @@
+"""DynamoDB read/write capacity accounting for the active invocation.
+
+Data calls pass ``**capacity.request()`` so DynamoDB returns
+``ConsumedCapacity``, then hand the response to ``capacity.record(op, resp)``.
+The consumed units, pages and scanned items are added to the
+``lib.timing`` counters, so they land in the per-invocation EMF line
+(``read_units``, ``write_units``, ``pages``, ``scanned_items``) and, with
+``CAPACITY_HEADER=true``, in an ``X-Consumed-Capacity`` response header
+(see ``lib.timing``).
+
+``RETURN_CONSUMED_CAPACITY=NONE`` turns the request parameter off entirely.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List
+
+from lib import timing
+
+MODE = os.getenv("RETURN_CONSUMED_CAPACITY", "TOTAL").upper()
+
+_WRITES = frozenset({"PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem"})
+_PAGED = frozenset({"Scan", "Query"})
+
+
+def request() -> Dict[str, Any]:
+    """Returns the keyword arguments that ask DynamoDB for consumed capacity."""
+    if MODE == "NONE":
+        return {}
+    return {"ReturnConsumedCapacity": MODE}
+
+
+def units(resp: Dict[str, Any]) -> float:
+    """Sums ``CapacityUnits`` of a response (single entry or per-table list)."""
+    consumed = resp.get("ConsumedCapacity")
+    if not consumed:
+        return 0.0
+    entries: List[Dict[str, Any]] = consumed if isinstance(consumed, list) else [consumed]
+    return float(sum(e.get("CapacityUnits", 0.0) for e in entries))
+
+
+def record(op: str, resp: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Adds a response's capacity and page statistics to the active invocation.
+
+    Returns ``resp`` so calls can be wrapped inline. Does nothing outside an
+    instrumented handler.
+    """
+    if timing.current() is None:
+        return resp
+    used = units(resp)
+    if used:
+        timing.count("write_units" if op in _WRITES else "read_units", used)
+    if op in _PAGED:
+        timing.count("pages")
+        timing.count("scanned_items", resp.get("ScannedCount", len(resp.get("Items", ()))))
+    return resp
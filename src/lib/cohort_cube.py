@@ -0,0 +1,318 @@
+"""Sparse sex x birth year x term cube that answers the admin routes by summing cells.
+
+Each cell holds the patient count and BMI sum (in hundredths) of the
+patients with one sex, born in one year, carrying one term
+(``diseases:flu``, ``medications:insulin``; the empty term is every
+patient). Only non-empty cells exist, so the cube grows with the
+vocabulary and the calendar, not with the number of patients.
+
+An age window is one birth-date range for today (``age_index.birth_range``).
+Birth years lying wholly inside it are summed from the year cells; the one
+or two partial years at its ends are corrected exactly from day cells
+(same dimensions, one birth day per cell). ``avg_age_years`` averages each
+patient's age rounded as the scan rounds it, summed from the all-patient
+day cells once per date. Every body is byte-identical to
+``lib.aggregate``'s on a scan.
+
+``handlers.precompute_cohorts`` builds the cube on its scheduled scan and
+publishes it as a snapshot (``lib.snapshots``) at ``COHORT_CUBE_URL``; the
+admin handlers load it once per container, re-check it every
+``COHORT_CUBE_REFRESH`` seconds and use it while it is at most
+``PRECOMPUTE_MAX_AGE`` seconds old.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lib import snapshots, timing
+from lib.age_index import birth_range, entry
+from lib.aggregate import PRECOMPUTE_MAX_AGE
+from lib.utils import age_units, overview_body, ranked
+
+COHORT_CUBE_URL = os.getenv("COHORT_CUBE_URL", "")
+COHORT_CUBE_REFRESH = float(os.getenv("COHORT_CUBE_REFRESH", "60"))
+MAGIC = b"CCB2"
+
+Key = Tuple[int, int, int]  # (sex id, birth year or birth ordinal, term id)
+
+_TYPECODES = ("i", "i", "i", "q", "q")  # column order of ``Cells.columns``
+
+
+class Cells:
+    """One level of the cube: sparse cells stored as parallel typed columns."""
+
+    __slots__ = ("rows", "sex", "period", "term", "count", "bmi", "_order")
+
+    def __init__(self) -> None:
+        self.rows: Dict[Key, int] = {}
+        self.sex, self.period, self.term = array("i"), array("i"), array("i")
+        self.count = array("q")
+        self.bmi = array("q")  # hundredths
+        self._order: Optional[Tuple[array, array]] = None  # (sorted periods, their rows)
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def add(self, key: Key, bmi: int) -> None:
+        i = self.rows.get(key)
+        if i is None:
+            i = self.rows[key] = len(self.count)
+            self._order = None
+            self.sex.append(key[0])
+            self.period.append(key[1])
+            self.term.append(key[2])
+            self.count.append(0)
+            self.bmi.append(0)
+        self.count[i] += 1
+        self.bmi[i] += bmi
+
+    def between(self, first: int, last: int) -> array:
+        """The rows whose period lies in ``[first, last]``, by bisection."""
+        if self._order is None:
+            period = self.period
+            order = sorted(range(len(period)), key=period.__getitem__)
+            self._order = array("i", (period[i] for i in order)), array("i", order)
+        periods, rows = self._order
+        return rows[bisect_left(periods, first) : bisect_right(periods, last)]
+
+    def columns(self) -> List[array]:
+        return [self.sex, self.period, self.term, self.count, self.bmi]
+
+    @classmethod
+    def from_columns(cls, columns: List[array]) -> "Cells":
+        cells = cls()
+        cells.sex, cells.period, cells.term, cells.count, cells.bmi = columns
+        sex, period, term = cells.sex, cells.period, cells.term
+        cells.rows = {(sex[i], period[i], term[i]): i for i in range(len(period))}
+        return cells
+
+
+class CohortCube:
+    """Year cells for whole birth years plus day cells for the partial ones."""
+
+    def __init__(self, built_at: Optional[float] = None) -> None:
+        self.sexes: List[str] = []
+        self.terms: List[str] = [""]  # term 0: every patient
+        self._ids: Tuple[Dict[str, int], Dict[str, int]] = ({}, {"": 0})
+        self.years = Cells()
+        self.days = Cells()
+        self._ages: Optional[Tuple[int, array, array]] = None  # (today, birth days, prefix)
+        self.built_at = time.time() if built_at is None else built_at
+        self.patients = 0
+
+    def _id(self, names: List[str], ids: Dict[str, int], name: str) -> int:
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+        return i
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Adds one patient (records without a birth date are ignored)."""
+        e = entry(record)
+        if e is None:
+            return
+        born, bmi, terms = e
+        sex = self._id(self.sexes, self._ids[0], terms[0][len("sex:") :])
+        year = date.fromordinal(born).year
+        self.patients += 1
+        self._ages = None
+        for term in (0, *(self._id(self.terms, self._ids[1], t) for t in terms[1:])):
+            self.years.add((sex, year, term), bmi)
+            self.days.add((sex, born, term), bmi)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]]) -> "CohortCube":
+        """Builds the cube from one pass over ``records``."""
+        cube = cls()
+        for record in records:
+            cube.add(record)
+        return cube
+
+    # ------------------------------------------------------------------ queries
+
+    def _age_total(self, first: int, last: int, today: int) -> int:
+        """Sum of the ages (hundredths) on ``today`` of the patients born in ``[first, last]``."""
+        cached = self._ages
+        if cached is None or cached[0] != today:
+            per_day: Dict[int, int] = {}
+            days = self.days
+            for i, term in enumerate(days.term):
+                if term == 0:
+                    born = days.period[i]
+                    per_day[born] = per_day.get(born, 0) + days.count[i]
+            borns = array("i", sorted(per_day))
+            ages = accumulate((per_day[b] * age_units(today - b) for b in borns), initial=0)
+            cached = self._ages = (today, borns, array("q", ages))
+        _, borns, prefix = cached
+        total: int = prefix[bisect_right(borns, last)] - prefix[bisect_left(borns, first)]
+        return total
+
+    @staticmethod
+    def _range(min_age: Optional[float], max_age: Optional[float], today: date) -> Tuple[int, int]:
+        first, last = birth_range(min_age, max_age, today)
+        return max(first, 1), min(last, date.max.toordinal())
+
+    def _slice(self, first: int, last: int) -> Iterator[Tuple[Cells, int]]:
+        """Yields the ``(level, row)`` cells that exactly cover the birth range."""
+        if first > last:
+            return
+        y0, y1 = date.fromordinal(first).year, date.fromordinal(last).year
+        full_lo = y0 if first == date(y0, 1, 1).toordinal() else y0 + 1
+        full_hi = y1 if last == date(y1, 12, 31).toordinal() else y1 - 1
+        for i in self.years.between(full_lo, full_hi):
+            yield self.years, i
+        for year in sorted({y0, y1}):
+            if not full_lo <= year <= full_hi:
+                lo = max(first, date(year, 1, 1).toordinal())
+                hi = min(last, date(year, 12, 31).toordinal())
+                for i in self.days.between(lo, hi):
+                    yield self.days, i
+
+    def _counts(self, cells: List[Tuple[Cells, int]], field: str) -> Dict[str, int]:
+        prefix = field + ":"
+        counts: Dict[str, int] = {}
+        for level, i in cells:
+            name = self.terms[level.term[i]]
+            if name.startswith(prefix):
+                key = name[len(prefix) :]
+                counts[key] = counts.get(key, 0) + level.count[i]
+        return counts
+
+    def term_counts(
+        self,
+        field: str,
+        min_age: Optional[float],
+        max_age: Optional[float],
+        today: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Counts of each ``diseases`` or ``medications`` value within the window."""
+        cells = self._slice(*self._range(min_age, max_age, today or date.today()))
+        return self._counts(list(cells), field)
+
+    def overview(
+        self, min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """The /admin/overview body for the window."""
+        today = today or date.today()
+        first, last = self._range(min_age, max_age, today)
+        cells = list(self._slice(first, last))
+        total, bmi = 0, 0
+        by_sex: Dict[str, int] = {}
+        for level, i in cells:
+            if level.term[i] == 0:
+                n = level.count[i]
+                total += n
+                bmi += level.bmi[i]
+                sex = self.sexes[level.sex[i]]
+                by_sex[sex] = by_sex.get(sex, 0) + n
+        ages = self._age_total(first, last, today.toordinal()) if first <= last else 0
+        body: Dict[str, Any] = overview_body(
+            total, bmi, ages, by_sex, self._counts(cells, "diseases")
+        )
+        return body
+
+    # ------------------------------------------------------------------ snapshots
+
+    def to_bytes(self) -> bytes:
+        """Serialises the cube (JSON header plus zlib-compressed cell columns)."""
+        header = json.dumps(
+            {
+                "sexes": self.sexes,
+                "terms": self.terms,
+                "built_at": self.built_at,
+                "patients": self.patients,
+                "cells": [len(self.years), len(self.days)],
+            }
+        ).encode("utf-8")
+        columns = self.years.columns() + self.days.columns()
+        body = zlib.compress(b"".join(c.tobytes() for c in columns), 6)
+        return MAGIC + struct.pack(">I", len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CohortCube":
+        """Loads a cube written by ``to_bytes``."""
+        if data[:4] != MAGIC:
+            raise ValueError("not a cohort cube snapshot")
+        (size,) = struct.unpack(">I", data[4:8])
+        header = json.loads(data[8 : 8 + size])
+        body = memoryview(zlib.decompress(data[8 + size :]))
+        cube = cls(built_at=header["built_at"])
+        cube.sexes, cube.terms = header["sexes"], header["terms"]
+        cube._ids = (
+            {s: i for i, s in enumerate(cube.sexes)},
+            {t: i for i, t in enumerate(cube.terms)},
+        )
+        cube.patients = header["patients"]
+        offset = 0
+        levels = []
+        for n in header["cells"]:
+            columns = []
+            for typecode in _TYPECODES:
+                column = array(typecode)
+                width = n * column.itemsize
+                column.frombytes(body[offset : offset + width])
+                offset += width
+                columns.append(column)
+            levels.append(Cells.from_columns(columns))
+        cube.years, cube.days = levels
+        return cube
+
+
+BODIES: Dict[str, Callable[[CohortCube, Optional[float], Optional[float]], Dict[str, Any]]] = {
+    "admin_overview": lambda cube, lo, hi: cube.overview(lo, hi),
+    "admin_diseases": lambda cube, lo, hi: {
+        "diseases": ranked(cube.term_counts("diseases", lo, hi))
+    },
+    "admin_medications": lambda cube, lo, hi: {
+        "medications": ranked(cube.term_counts("medications", lo, hi))
+    },
+}
+
+
+def snapshot_name(table: str) -> str:
+    """The snapshot holding ``table``'s cube."""
+    return f"{table}.cohort-cube"
+
+
+_store: Optional[snapshots.SnapshotStore] = None
+_cache = snapshots.Cached(CohortCube.from_bytes, COHORT_CUBE_REFRESH)
+
+
+def store() -> snapshots.SnapshotStore:
+    """The snapshot store named by ``COHORT_CUBE_URL`` (created on first use)."""
+    global _store
+    if _store is None:
+        _store = snapshots.from_url(COHORT_CUBE_URL)
+    return _store
+
+
+def publish(table: str, cube: CohortCube) -> int:
+    """Replaces ``table``'s cube snapshot; returns its size in bytes."""
+    data = cube.to_bytes()
+    snapshots.publish(store(), snapshot_name(table), data)
+    return len(data)
+
+
+def cubed(
+    endpoint: str, table: str, min_age: Optional[float], max_age: Optional[float]
+) -> Optional[Dict[str, Any]]:
+    """The ``endpoint`` body summed from a fresh cube, or ``None`` to scan instead."""
+    if not COHORT_CUBE_URL or PRECOMPUTE_MAX_AGE <= 0:
+        return None
+    cube = _cache.get(store(), snapshot_name(table))
+    if cube is None or time.time() - cube.built_at > PRECOMPUTE_MAX_AGE:
+        timing.count("cube_misses")
+        return None
+    timing.count("cube_hits")
+    return BODIES[endpoint](cube, min_age, max_age)
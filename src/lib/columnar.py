@@ -0,0 +1,151 @@
+"""Compact column store for scans that only aggregate.
+
+``scan_patients`` keeps every item as a boto3 dict of ``Decimal`` numbers
+with its own copies of every disease and medication string, which at a few
+hundred thousand patients no longer fits a 256 MB function.
+``PatientColumns`` keeps what the admin aggregations read in parallel typed
+arrays instead: birth dates as ordinals, BMI in hundredths, and sex, diseases
+and medications as small ints from a ``Vocabulary`` owned by that build, with
+CSR-style offsets for the term lists. The vocabulary goes away with the
+columns, so free-text values cannot grow it for the life of a warm container.
+``db.scan_columns`` appends each page as it arrives, so only one page of
+dicts is alive at a time, and reads only the term fields asked for
+(/admin/overview needs ``diseases`` but not ``medications``). Routes that
+only count one term field do not keep columns at all; see
+``aggregate.scan_counts``.
+
+The aggregations mirror ``lib.aggregate`` step for step (same ages, same
+exact sums, same key order), so bodies are byte-identical to the dict path
+and to the precomputed cohorts.
+"""
+
+from __future__ import annotations
+
+import threading
+from array import array
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lib.utils import UNITS, bmi_units, overview_body, parse_iso_date, ranked
+
+TERM_FIELDS = ("diseases", "medications")
+ATTRIBUTES = ("date_of_birth", "sex", "bmi") + TERM_FIELDS
+
+
+class Vocabulary:
+    """Interns strings to small ints; ids never change once assigned."""
+
+    __slots__ = ("ids", "names", "_lock")
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id(self, name: str) -> int:
+        i = self.ids.get(name)
+        if i is None:
+            with self._lock:
+                i = self.ids.get(name)
+                if i is None:
+                    i = self.ids[name] = len(self.names)
+                    self.names.append(name)
+        return i
+
+
+class PatientColumns:
+    """Parallel arrays with one row per patient."""
+
+    __slots__ = ("vocab", "fields", "born", "bmi", "sex", "term_offsets", "term_ids")
+
+    def __init__(
+        self, vocab: Optional[Vocabulary] = None, fields: Sequence[str] = TERM_FIELDS
+    ) -> None:
+        self.vocab = Vocabulary() if vocab is None else vocab
+        self.fields = tuple(fields)  # the term fields kept
+        self.born = array("i")  # date ordinal
+        self.bmi = array("q")  # hundredths
+        self.sex = array("i")  # vocabulary id
+        self.term_offsets = {f: array("i", [0]) for f in self.fields}
+        self.term_ids = {f: array("i") for f in self.fields}
+
+    def __len__(self) -> int:
+        return len(self.born)
+
+    def append(self, item: Dict[str, Any]) -> None:
+        """Adds one patient item (``KeyError`` without ``date_of_birth``, like the dict path)."""
+        vocab = self.vocab
+        self.born.append(parse_iso_date(item["date_of_birth"]).toordinal())
+        self.bmi.append(bmi_units(item.get("bmi", 0.0)))
+        self.sex.append(vocab.id(item.get("sex") or ""))
+        for field in self.fields:
+            ids = self.term_ids[field]
+            ids.extend(vocab.id(v) for v in item.get(field, []) if v)
+            self.term_offsets[field].append(len(ids))
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Adds every item of one scan page."""
+        for item in items:
+            self.append(item)
+
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers."""
+        columns: List[array] = [self.born, self.bmi, self.sex]
+        columns += list(self.term_offsets.values()) + list(self.term_ids.values())
+        return sum(c.buffer_info()[1] * c.itemsize for c in columns)
+
+    # ------------------------------------------------------------------ aggregations
+
+    def select(
+        self, min_age: Optional[float], max_age: Optional[float], today: Optional[date] = None
+    ) -> Tuple[array, array]:
+        """Returns the rows (and their ages) within the window, as ``aggregate.select``."""
+        t = (today or date.today()).toordinal()
+        rows, ages = array("i"), array("d")
+        for i, born in enumerate(self.born):
+            age = round((t - born) / 365.2425, 2)  # compute_age_years
+            if min_age is not None and age < min_age:
+                continue
+            if max_age is not None and age > max_age:
+                continue
+            rows.append(i)
+            ages.append(age)
+        return rows, ages
+
+    def term_counts(self, field: str, rows: Iterable[int]) -> Dict[str, int]:
+        """Counts of each ``field`` value over ``rows``."""
+        offsets, ids = self.term_offsets[field], self.term_ids[field]
+        counts: Dict[int, int] = {}
+        for i in rows:
+            for k in range(offsets[i], offsets[i + 1]):
+                t = ids[k]
+                counts[t] = counts.get(t, 0) + 1
+        names = self.vocab.names
+        return {names[t]: n for t, n in counts.items()}
+
+    def overview(self, rows: array, ages: array) -> Dict[str, Any]:
+        """Builds the /admin/overview body, as ``aggregate.overview``."""
+        names = self.vocab.names
+        by_sex: Dict[int, int] = {}
+        for i in rows:
+            s = self.sex[i]
+            by_sex[s] = by_sex.get(s, 0) + 1
+        body: Dict[str, Any] = overview_body(
+            len(rows),
+            sum(self.bmi[i] for i in rows),
+            sum(round(age * UNITS) for age in ages),
+            {names[s]: n for s, n in by_sex.items()},
+            self.term_counts("diseases", rows),
+        )
+        return body
+
+    def disease_counts(self, rows: Iterable[int]) -> Dict[str, Any]:
+        """Builds the /admin/diseases body."""
+        return {"diseases": ranked(self.term_counts("diseases", rows))}
+
+    def medication_counts(self, rows: Iterable[int]) -> Dict[str, Any]:
+        """Builds the /admin/medications body."""
+        return {"medications": ranked(self.term_counts("medications", rows))}
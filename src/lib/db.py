@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 
 import boto3
 from botocore.config import Config
 
+from lib import capacity
+from lib.cache import patient_cache, read_through
+from lib.columnar import TERM_FIELDS, PatientColumns
+from lib.tracing import span
+
+# Connections per client; also sizes the ``lib.adb`` thread pool.
+MAX_POOL_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "16"))
+
 _dynamodb = None
 _table = None
 
@@ -22,37 +30,87 @@ def _boto3_resource():
         _dynamodb = boto3.resource(
             "dynamodb",
             region_name=region,
-            config=Config(retries={"max_attempts": 3, "mode": "standard"}),
+            config=Config(
+                retries={"max_attempts": 3, "mode": "standard"},
+                max_pool_connections=MAX_POOL_CONNECTIONS,
+            ),
         )
     return _dynamodb
 
 
+def table_name() -> str:
+    """Returns the patients table used by this module."""
+    return os.environ.get("DYNAMODB_TABLE") or "unit-tests"
+
+
 def _get_table():
     """Returns a cached DynamoDB table handle; initializes lazily."""
     global _table
     if _table is None:
-        table_name = os.environ.get("DYNAMODB_TABLE") or "unit-tests"
-        _table = _boto3_resource().Table(table_name)
+        _table = _boto3_resource().Table(table_name())
     return _table
 
 
-def get_patient(patient_id: str) -> Optional[Dict[str, Any]]:
-    """Gets a patient by primary key."""
+def get_patient(patient_id: str, consistent: bool = False) -> Optional[Dict[str, Any]]:
+    """Gets a patient by primary key through the container cache."""
     table = _get_table()
-    resp = table.get_item(Key={"patient_id": patient_id})
-    return resp.get("Item")
+
+    def load() -> Optional[Dict[str, Any]]:
+        kwargs = capacity.request()
+        if consistent:
+            kwargs["ConsistentRead"] = True
+        with span("DynamoDB.GetItem", namespace="aws"):
+            resp = table.get_item(Key={"patient_id": patient_id}, **kwargs)
+        item: Optional[Dict[str, Any]] = capacity.record("GetItem", resp).get("Item")
+        return item
+
+    cached: Optional[Dict[str, Any]] = read_through(
+        patient_cache, (table_name(), patient_id), load, consistent
+    )
+    return cached
 
 
 def scan_patients() -> List[Dict[str, Any]]:
     """Scans all patients with pagination."""
     table = _get_table()
     items: List[Dict[str, Any]] = []
-    kwargs: Dict[str, Any] = {}
+    kwargs: Dict[str, Any] = capacity.request()
     while True:
-        resp = table.scan(**kwargs)
+        with span("DynamoDB.Scan", namespace="aws"):
+            resp = capacity.record("Scan", table.scan(**kwargs))
         items.extend(resp.get("Items", []))
         lek = resp.get("LastEvaluatedKey")
         if not lek:
             break
         kwargs["ExclusiveStartKey"] = lek
     return items
+
+
+def scan_pages(attributes: Sequence[str]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Scans all patients reading only ``attributes`` and yields one page of
+    items at a time, for callers that aggregate as they go.
+    """
+    table = _get_table()
+    kwargs: Dict[str, Any] = capacity.request()
+    kwargs["ProjectionExpression"] = ", ".join(f"#a{i}" for i in range(len(attributes)))
+    kwargs["ExpressionAttributeNames"] = {f"#a{i}": a for i, a in enumerate(attributes)}
+    while True:
+        with span("DynamoDB.Scan", namespace="aws"):
+            resp = capacity.record("Scan", table.scan(**kwargs))
+        yield resp.get("Items", [])
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            break
+        kwargs["ExclusiveStartKey"] = lek
+
+
+def scan_columns(fields: Sequence[str] = TERM_FIELDS) -> PatientColumns:
+    """
+    Scans all patients into ``PatientColumns`` keeping the term ``fields``,
+    reading only the attributes they need and one page of items at a time.
+    """
+    columns = PatientColumns(fields=fields)
+    for page in scan_pages(("date_of_birth", "sex", "bmi", *fields)):
+        columns.extend(page)
+    return columns
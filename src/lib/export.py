@@ -0,0 +1,346 @@
+"""Streaming bulk export of the patient table to chunked NDJSON/CSV parts.
+
+The export is a generator pipeline per scan segment::
+
+    scan_pages -> deserialize -> redact -> PartWriter
+
+Each segment owns its own part files and checkpoint, so segments never share
+state and throughput grows with ``TotalSegments``. Parts are only closed on
+page boundaries, which keeps memory bounded by one scan page per segment and
+lets a checkpoint record the exact ``LastEvaluatedKey`` to resume from.
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from lib.models import PatientRecord
+
+FORMATS = ("ndjson", "csv")
+DEFAULT_PHI_FIELDS: Tuple[str, ...] = (
+    "name",
+    "full_name",
+    "date_of_birth",
+    "dob",
+    "email",
+    "policy_no",
+    "notes",
+)
+DEFAULT_CSV_COLUMNS: Tuple[str, ...] = tuple(PatientRecord.model_fields)
+MANIFEST_NAME = "manifest.json"
+CHECKPOINT_DIR = "_checkpoints"
+
+_deserializer = TypeDeserializer()
+
+
+def _plain(value: Any) -> Any:
+    """Converts DynamoDB Decimals and sets into JSON-friendly values."""
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def scan_pages(
+    client: Any,
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    start_key: Optional[Dict[str, Any]] = None,
+    page_size: Optional[int] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """
+    Yields ``(items, last_evaluated_key)`` for one parallel-scan segment.
+    """
+    kwargs: Dict[str, Any] = {
+        "TableName": table_name,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+    }
+    if page_size:
+        kwargs["Limit"] = page_size
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    while True:
+        resp = client.scan(**kwargs)
+        lek = resp.get("LastEvaluatedKey")
+        yield resp.get("Items", []), lek
+        if not lek:
+            return
+        kwargs["ExclusiveStartKey"] = lek
+
+
+def deserialize(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Converts low-level attribute maps into plain JSON-ready dicts.
+    """
+    for item in items:
+        yield {k: _plain(_deserializer.deserialize(v)) for k, v in item.items()}
+
+
+def redact(records: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Drops PHI fields from each record; a no-op passthrough when ``fields`` is empty.
+    """
+    if not fields:
+        yield from records
+        return
+    drop = frozenset(fields)
+    for rec in records:
+        yield {k: v for k, v in rec.items() if k not in drop}
+
+
+class PartWriter:
+    """Writes gzip-compressed NDJSON or CSV part files for a single segment."""
+
+    def __init__(
+        self,
+        out_dir: str,
+        segment: int,
+        fmt: str = "ndjson",
+        columns: Sequence[str] = DEFAULT_CSV_COLUMNS,
+        next_part: int = 0,
+    ) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+        self.out_dir = out_dir
+        self.segment = segment
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.next_part = next_part
+        self.rows = 0
+        self._fh: Optional[gzip.GzipFile] = None
+        self._text: Optional[io.TextIOWrapper] = None
+        self._csv: Optional[Any] = None
+        self._path = ""
+
+    def part_name(self, index: int) -> str:
+        """Returns the file name of the given part index."""
+        return f"segment-{self.segment:04d}-part-{index:05d}.{self.fmt}.gz"
+
+    def _open(self) -> None:
+        self._path = os.path.join(self.out_dir, self.part_name(self.next_part))
+        self._fh = gzip.GzipFile(self._path + ".tmp", mode="wb", mtime=0)
+        self._text = io.TextIOWrapper(self._fh, encoding="utf-8", newline="")
+        self.rows = 0
+        if self.fmt == "csv":
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(self.columns)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Appends one record to the open part, opening a new part if needed."""
+        if self._text is None:
+            self._open()
+        assert self._text is not None
+        if self._csv is not None:
+            row = []
+            for col in self.columns:
+                val = record.get(col)
+                if isinstance(val, list):
+                    val = ";".join(str(v) for v in val)
+                row.append("" if val is None else val)
+            self._csv.writerow(row)
+        else:
+            self._text.write(json.dumps(record, separators=(",", ":")))
+            self._text.write("\n")
+        self.rows += 1
+
+    @property
+    def is_open(self) -> bool:
+        """True while a part is being written."""
+        return self._text is not None
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Finalizes the open part and returns its manifest entry."""
+        if self._text is None:
+            return None
+        self._text.close()
+        os.replace(self._path + ".tmp", self._path)
+        entry = {
+            "path": os.path.basename(self._path),
+            "segment": self.segment,
+            "rows": self.rows,
+            "bytes": os.path.getsize(self._path),
+        }
+        self._text = None
+        self._fh = None
+        self._csv = None
+        self.next_part += 1
+        return entry
+
+
+def _checkpoint_path(out_dir: str, segment: int) -> str:
+    return os.path.join(out_dir, CHECKPOINT_DIR, f"segment-{segment:04d}.json")
+
+
+def load_checkpoint(out_dir: str, segment: int) -> Dict[str, Any]:
+    """
+    Returns the saved state of a segment or a fresh state.
+    """
+    path = _checkpoint_path(out_dir, segment)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            state: Dict[str, Any] = json.load(f)
+        return state
+    return {"segment": segment, "last_key": None, "next_part": 0, "parts": [], "done": False}
+
+
+def save_checkpoint(out_dir: str, state: Dict[str, Any]) -> str:
+    """
+    Atomically persists segment state and returns the checkpoint path.
+    """
+    path = _checkpoint_path(out_dir, state["segment"])
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return path
+
+
+def export_segment(
+    client: Any,
+    table_name: str,
+    out_dir: str,
+    segment: int,
+    total_segments: int,
+    fmt: str = "ndjson",
+    chunk_rows: int = 100_000,
+    redact_fields: Sequence[str] = (),
+    columns: Sequence[str] = DEFAULT_CSV_COLUMNS,
+    page_size: Optional[int] = None,
+    on_part: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+    on_checkpoint: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Exports one scan segment, resuming from its checkpoint if present.
+
+    A checkpoint is written each time a part is closed, so a restart repeats at
+    most ``chunk_rows`` rows plus one page. ``on_checkpoint`` runs after each
+    save (after ``on_part`` for the part it records), e.g. to copy it to S3.
+    """
+    state = load_checkpoint(out_dir, segment)
+    if state["done"]:
+        return state
+
+    writer = PartWriter(out_dir, segment, fmt, columns, next_part=state["next_part"])
+    pages = scan_pages(client, table_name, segment, total_segments, state["last_key"], page_size)
+
+    def _save() -> None:
+        path = save_checkpoint(out_dir, state)
+        if on_checkpoint:
+            on_checkpoint(path, state)
+
+    def _commit(last_key: Optional[Dict[str, Any]]) -> None:
+        entry = writer.close()
+        if entry:
+            state["parts"].append(entry)
+            if on_part:
+                on_part(os.path.join(out_dir, entry["path"]), entry)
+        state["next_part"] = writer.next_part
+        state["last_key"] = last_key
+        _save()
+
+    for items, lek in pages:
+        for rec in redact(deserialize(items), redact_fields):
+            writer.write(rec)
+        if lek is None:
+            break
+        if writer.rows >= chunk_rows:
+            _commit(lek)
+        if should_stop():
+            if writer.is_open:
+                _commit(lek)
+            return state
+
+    _commit(None)
+    state["done"] = True
+    _save()
+    return state
+
+
+def write_manifest(out_dir: str, manifest: Dict[str, Any]) -> str:
+    """Writes ``manifest.json`` next to the parts and returns its path."""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def export_table(
+    client: Any,
+    table_name: str,
+    out_dir: str,
+    segments: int = 4,
+    fmt: str = "ndjson",
+    chunk_rows: int = 100_000,
+    redact_fields: Sequence[str] = (),
+    columns: Sequence[str] = DEFAULT_CSV_COLUMNS,
+    page_size: Optional[int] = None,
+    on_part: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+    on_checkpoint: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Runs a parallel segmented export and returns the manifest.
+
+    The manifest is only written once every segment has finished; an
+    interrupted export reports ``complete: False`` and can be re-run with the
+    same ``out_dir`` to resume.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    if segments < 1:
+        raise ValueError("segments must be >= 1")
+    os.makedirs(os.path.join(out_dir, CHECKPOINT_DIR), exist_ok=True)
+    started = time.time()
+
+    def _run(seg: int) -> Dict[str, Any]:
+        return export_segment(
+            client,
+            table_name,
+            out_dir,
+            seg,
+            segments,
+            fmt=fmt,
+            chunk_rows=chunk_rows,
+            redact_fields=redact_fields,
+            columns=columns,
+            page_size=page_size,
+            on_part=on_part,
+            should_stop=should_stop,
+            on_checkpoint=on_checkpoint,
+        )
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        states = list(pool.map(_run, range(segments)))
+
+    parts = [p for st in states for p in st["parts"]]
+    manifest = {
+        "table": table_name,
+        "format": fmt,
+        "compression": "gzip",
+        "segments": segments,
+        "redacted": list(redact_fields),
+        "columns": list(columns) if fmt == "csv" else None,
+        "rows": sum(p["rows"] for p in parts),
+        "parts": parts,
+        "complete": all(st["done"] for st in states),
+        "elapsedSeconds": round(time.time() - started, 3),
+    }
+    if manifest["complete"]:
+        write_manifest(out_dir, manifest)
+    return manifest
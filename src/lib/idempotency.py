@@ -0,0 +1,222 @@
+"""Idempotency keys for write handlers.
+
+A client that sends ``Idempotency-Key: <uuid>`` gets exactly one execution
+per key. The first request claims the key with a conditional ``PutItem`` in
+``IDEMPOTENCY_TABLE`` (hash key ``id``, DynamoDB TTL on ``expiresAt``), runs
+the write and stores the response in the same item. Duplicates never run
+the handler:
+
+* a finished key replays the stored response (``idempotent-replayed: true``),
+  served from ``lib.cache`` once this container has seen it;
+* a key that is still in progress is polled until the first request finishes
+  (``IDEMPOTENCY_WAIT`` seconds), so concurrent retries coalesce; after that
+  the answer is 409 with ``Retry-After``;
+* reusing a key with a different body is rejected with 422.
+
+Responses with status >= 500 and exceptions release the key so the client
+can retry. A claim whose owner died is taken over after
+``IDEMPOTENCY_LOCK_SECONDS``. Storing the response after a successful write
+is retried ``COMPLETE_ATTEMPTS`` times; if every attempt fails the response
+is still returned (and replayed by this container), but the key stays in
+progress until its lock expires, after which a retry elsewhere runs the
+write again. Without ``IDEMPOTENCY_TABLE`` writes run as before.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lib import cache, log, timing
+
+IDEMPOTENCY_TABLE = os.getenv("IDEMPOTENCY_TABLE", "")
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "15"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "2"))
+POLL_INTERVAL = 0.05
+COMPLETE_ATTEMPTS = 3
+
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+
+_CLAIM_CONDITION = (
+    "attribute_not_exists(id) OR expiresAt < :now OR (#s = :in_progress AND lockedUntil < :now)"
+)
+
+responses = cache.Cache(cache.backend, "idempotency", min(IDEMPOTENCY_TTL, 3600))
+
+
+def header_key(event: Dict[str, Any]) -> Optional[str]:
+    """Returns the ``Idempotency-Key`` header value, if any."""
+    for name, value in (event.get("headers") or {}).items():
+        if name.lower() == "idempotency-key" and value:
+            return str(value)
+    return None
+
+
+def fingerprint(body: Optional[str]) -> str:
+    """Hash of the request body; a key may only be reused with the same body."""
+    return hashlib.sha256((body or "").encode("utf-8")).hexdigest()
+
+
+def _json(status: int, body: Dict[str, Any], **headers: str) -> Dict[str, Any]:
+    return {
+        "statusCode": status,
+        "headers": {"content-type": "application/json", **headers},
+        "body": json.dumps(body),
+    }
+
+
+class IdempotencyStore:
+    """Claims, completes and releases keys in one DynamoDB table (low-level client)."""
+
+    def __init__(
+        self,
+        client: Any,
+        table: str = IDEMPOTENCY_TABLE,
+        ttl: int = IDEMPOTENCY_TTL,
+        lock_seconds: float = IDEMPOTENCY_LOCK_SECONDS,
+        wait: float = IDEMPOTENCY_WAIT,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.client = client
+        self.table = table
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.wait = wait
+        self.clock = clock
+
+    def claim(self, key: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Claims ``key``; returns ``None`` on success or the existing record (plain dict)."""
+        now = self.clock()
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={
+                    "id": {"S": key},
+                    "status": {"S": IN_PROGRESS},
+                    "fingerprint": {"S": digest},
+                    "lockedUntil": {"N": str(int(now + self.lock_seconds))},
+                    "expiresAt": {"N": str(int(now + self.ttl))},
+                },
+                ConditionExpression=_CLAIM_CONDITION,
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":now": {"N": str(int(now))},
+                    ":in_progress": {"S": IN_PROGRESS},
+                },
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+            item = e.response.get("Item") or self._get(key)
+            return _plain(item) if item else {"status": IN_PROGRESS}
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        resp = self.client.get_item(
+            TableName=self.table, Key={"id": {"S": key}}, ConsistentRead=True
+        )
+        item: Optional[Dict[str, Any]] = resp.get("Item")
+        return item
+
+    def complete(self, key: str, response: Dict[str, Any]) -> None:
+        """Stores the response of the claimed request."""
+        self.client.update_item(
+            TableName=self.table,
+            Key={"id": {"S": key}},
+            UpdateExpression="SET #s = :done, #r = :resp REMOVE lockedUntil",
+            ExpressionAttributeNames={"#s": "status", "#r": "response"},
+            ExpressionAttributeValues={
+                ":done": {"S": COMPLETED},
+                ":resp": {"S": json.dumps(response)},
+            },
+        )
+
+    def release(self, key: str) -> None:
+        """Drops a claim so the request can be retried."""
+        self.client.delete_item(TableName=self.table, Key={"id": {"S": key}})
+
+    def await_completion(self, key: str) -> Optional[Dict[str, Any]]:
+        """Polls an in-progress key until it completes or ``wait`` runs out."""
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            item = self._get(key)
+            if item is None:
+                return None
+            record = _plain(item)
+            if record.get("status") == COMPLETED:
+                return record
+        return None
+
+
+def _plain(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: next(iter(v.values())) for k, v in item.items()}
+
+
+def _replay(response: Dict[str, Any]) -> Dict[str, Any]:
+    timing.count("idempotent_replays")
+    headers = dict(response.get("headers") or {})
+    headers["idempotent-replayed"] = "true"
+    return {**response, "headers": headers}
+
+
+def _complete(store: IdempotencyStore, key: str, response: Dict[str, Any]) -> None:
+    """Stores the response, retrying briefly: the write has already happened."""
+    for attempt in range(COMPLETE_ATTEMPTS):
+        try:
+            store.complete(key, response)
+            return
+        except (BotoCoreError, ClientError) as exc:
+            error = exc
+            if attempt + 1 < COMPLETE_ATTEMPTS:
+                time.sleep(POLL_INTERVAL * 2**attempt)
+    timing.count("idempotency_complete_failures")
+    log.error("idempotency response not stored", key=key, error=str(error))
+
+
+def run(
+    store: IdempotencyStore,
+    key: str,
+    body: Optional[str],
+    handler: Callable[[], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Runs ``handler`` at most once per ``key`` and returns its (possibly stored) response."""
+    digest = fingerprint(body)
+    cached = responses.get(key)
+    if cached is not cache._MISSING and cached is not None:
+        if cached["fingerprint"] != digest:
+            return _json(422, {"error": "Idempotency-Key reused with a different body"})
+        return _replay(cached["response"])
+
+    existing = store.claim(key, digest)
+    if existing is not None:
+        if existing.get("fingerprint", digest) != digest:
+            return _json(422, {"error": "Idempotency-Key reused with a different body"})
+        if existing.get("status") != COMPLETED:
+            existing = store.await_completion(key)
+        if existing is None:
+            log.info("idempotent request still in progress", key=key)
+            return _json(409, {"error": "request in progress"}, **{"Retry-After": "1"})
+        response = json.loads(existing["response"])
+        responses.put(key, {"fingerprint": digest, "response": response})
+        return _replay(response)
+
+    try:
+        response = handler()
+    except Exception:
+        store.release(key)
+        raise
+    if response.get("statusCode", 500) >= 500:
+        store.release(key)
+        return response
+    _complete(store, key, response)
+    responses.put(key, {"fingerprint": digest, "response": response})
+    return response
@@ -0,0 +1,143 @@
+"""Structured JSON logging with per-level sampling and per-invocation buffering.
+
+``log.info("patient loaded", found=True, fields=lambda: len(item))`` builds
+one JSON object per line. Work is skipped as early as possible: records
+below ``LOG_LEVEL`` or not selected by ``LOG_SAMPLE_RATES`` (for example
+``DEBUG=0.01,INFO=0.25``) return before any formatting, and callable field
+values are only evaluated for records that are written.
+
+Inside an ``@instrumented`` handler every record carries the request context
+(``function``, ``request_id``, ``route``, ``cold_start`` plus anything added
+with ``bind``), sampling is decided once per invocation so a sampled request
+keeps all of its lines, and lines are buffered and written with a single
+``write`` when the handler returns. ERROR records flush immediately.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+_BY_NAME = {name: level for level, name in LEVEL_NAMES.items()}
+
+MAX_BUFFERED = 256
+
+_encode = json.JSONEncoder(default=str, separators=(",", ":"), check_circular=False).encode
+
+
+def _parse_rates(raw: str) -> Dict[int, float]:
+    rates: Dict[int, float] = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        level = _BY_NAME.get(name.strip().upper())
+        if level is not None and value.strip():
+            rates[level] = min(1.0, max(0.0, float(value)))
+    return rates
+
+
+LEVEL = _BY_NAME.get(os.getenv("LOG_LEVEL", "INFO").upper(), INFO)
+SAMPLE_RATES = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+class _Request:
+    __slots__ = ("context", "buffer", "sampled")
+
+    def __init__(self, context: Dict[str, Any]) -> None:
+        self.context = context
+        self.buffer: List[str] = []
+        self.sampled = {level: random.random() < rate for level, rate in SAMPLE_RATES.items()}
+
+
+_request: ContextVar[Optional[_Request]] = ContextVar("log_request", default=None)
+
+
+def enabled(level: int) -> bool:
+    """Returns whether a record at ``level`` would be written right now."""
+    if level < LEVEL:
+        return False
+    if level not in SAMPLE_RATES:
+        return True
+    req = _request.get()
+    if req is not None:
+        return req.sampled[level]
+    return random.random() < SAMPLE_RATES[level]
+
+
+def _write(text: str) -> None:
+    sys.stdout.write(text)
+
+
+def _emit(level: int, msg: str, fields: Dict[str, Any]) -> None:
+    if level < LEVEL or (level in SAMPLE_RATES and not enabled(level)):
+        return
+    req = _request.get()
+    record: Dict[str, Any] = {
+        "ts": int(time.time() * 1000),
+        "level": LEVEL_NAMES[level],
+        "msg": msg,
+    }
+    if req is not None:
+        record.update(req.context)
+    for key, value in fields.items():
+        record[key] = value() if callable(value) else value
+    line = _encode(record) + "\n"
+    if req is None:
+        _write(line)
+        return
+    req.buffer.append(line)
+    if level >= ERROR or len(req.buffer) >= MAX_BUFFERED:
+        flush()
+
+
+def debug(msg: str, **fields: Any) -> None:
+    """Logs at DEBUG; callable field values are evaluated lazily."""
+    _emit(DEBUG, msg, fields)
+
+
+def info(msg: str, **fields: Any) -> None:
+    """Logs at INFO; callable field values are evaluated lazily."""
+    _emit(INFO, msg, fields)
+
+
+def warning(msg: str, **fields: Any) -> None:
+    """Logs at WARNING; callable field values are evaluated lazily."""
+    _emit(WARNING, msg, fields)
+
+
+def error(msg: str, **fields: Any) -> None:
+    """Logs at ERROR and flushes the buffer."""
+    _emit(ERROR, msg, fields)
+
+
+def bind(**fields: Any) -> None:
+    """Adds fields to every later record of the current invocation."""
+    req = _request.get()
+    if req is not None:
+        req.context.update(fields)
+
+
+def flush() -> None:
+    """Writes buffered records of the current invocation in one call."""
+    req = _request.get()
+    if req is not None and req.buffer:
+        text = "".join(req.buffer)
+        req.buffer.clear()
+        _write(text)
+
+
+def begin(**context: Any) -> Any:
+    """Starts buffering for one invocation with the given request context."""
+    return _request.set(_Request({k: v for k, v in context.items() if v is not None}))
+
+
+def end(token: Any) -> None:
+    """Flushes and closes the invocation opened by ``begin``."""
+    flush()
+    _request.reset(token)
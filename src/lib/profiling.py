@@ -0,0 +1,170 @@
+"""Sampled, on-demand cProfile + tracemalloc capture for single invocations.
+
+``@profiled("admin_overview")`` (below ``@instrumented``) profiles an
+invocation when either
+
+* ``PROFILE_SAMPLE_RATE`` (0..1) selects it at random, or
+* the request carries ``X-Profile-Token: <expires>.<hmac>`` signed with
+  ``PROFILE_SECRET`` for this function (see ``sign_token``).
+
+A profiled call records cProfile stats and the tracemalloc top allocation
+sites, then writes a compact JSON summary: to stdout by default, or as
+``<function>-<ms>.json`` plus the raw ``.prof`` into ``PROFILE_DIR``, after
+which the upload hook runs (S3 when ``PROFILE_BUCKET`` is set).
+
+With neither variable set the decorator returns the handler unchanged.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from lib import timing
+
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0)
+SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+BUCKET = os.getenv("PROFILE_BUCKET", "")
+TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+TOKEN_HEADER = "x-profile-token"
+
+Handler = TypeVar("Handler", bound=Callable[..., Any])
+UploadHook = Callable[[List[str], Dict[str, Any]], None]
+
+_upload_hook: Optional[UploadHook] = None
+
+
+def sign_token(secret: str, function: str, expires: int) -> str:
+    """Returns a header value allowing one function to be profiled until ``expires``."""
+    sig = hmac.new(secret.encode(), f"{function}:{expires}".encode(), hashlib.sha256)
+    return f"{expires}.{sig.hexdigest()}"
+
+
+def verify_token(secret: str, function: str, token: str, now: Optional[float] = None) -> bool:
+    """Checks a token's signature and expiry."""
+    expires, _, _sig = token.partition(".")
+    if not secret or not expires.isdigit():
+        return False
+    if int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(sign_token(secret, function, int(expires)), token)
+
+
+def _requested(event: Any, function: str) -> bool:
+    if SECRET and isinstance(event, dict):
+        headers = event.get("headers") or {}
+        token = headers.get(TOKEN_HEADER) or headers.get("X-Profile-Token")
+        if token and verify_token(SECRET, function, token):
+            return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _location(filename: str, line: int, name: str) -> str:
+    parts = filename.replace("\\", "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{line}({name})"
+
+
+def summarize(
+    prof: cProfile.Profile, snapshot: tracemalloc.Snapshot, peak: int, top_n: int = TOP_N
+) -> Dict[str, Any]:
+    """Reduces cProfile stats and a tracemalloc snapshot to the top entries."""
+    stats = pstats.Stats(prof, stream=io.StringIO()).stats  # type: ignore[attr-defined]
+    rows = [
+        {
+            "function": _location(*key),
+            "calls": nc,
+            "self_ms": round(tt * 1000.0, 3),
+            "cumulative_ms": round(ct * 1000.0, 3),
+        }
+        for key, (_cc, nc, tt, ct, _callers) in stats.items()
+    ]
+    by_self = sorted(rows, key=lambda r: r["self_ms"], reverse=True)[:top_n]
+    by_cum = sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top_n]
+    allocations = [
+        {
+            "site": f"{stat.traceback[0].filename.rsplit('/', 2)[-1]}:{stat.traceback[0].lineno}",
+            "kb": round(stat.size / 1024.0, 1),
+            "blocks": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:top_n]
+    ]
+    return {
+        "top_self": by_self,
+        "top_cumulative": by_cum,
+        "allocations": allocations,
+        "peak_kb": round(peak / 1024.0, 1),
+    }
+
+
+def set_upload_hook(hook: Optional[UploadHook]) -> None:
+    """Installs a callable receiving ``(paths, summary)`` after files are written."""
+    global _upload_hook
+    _upload_hook = hook
+
+
+def _s3_upload(paths: List[str], summary: Dict[str, Any]) -> None:
+    import boto3
+
+    s3 = boto3.client("s3")
+    for path in paths:
+        s3.upload_file(path, BUCKET, f"profiles/{os.path.basename(path)}")
+
+
+def _write(function: str, prof: cProfile.Profile, summary: Dict[str, Any]) -> None:
+    if not PROFILE_DIR:
+        sys.stdout.write(json.dumps({"profile": summary}) + "\n")
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{function}-{int(time.time() * 1000)}")
+    with open(base + ".json", "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=1)
+    prof.dump_stats(base + ".prof")
+    paths = [base + ".json", base + ".prof"]
+    hook = _upload_hook or (_s3_upload if BUCKET else None)
+    if hook is not None:
+        hook(paths, summary)
+
+
+def profiled(function: str) -> Callable[[Handler], Handler]:
+    """Decorates a handler so selected invocations are profiled."""
+
+    def decorator(fn: Handler) -> Handler:
+        if SAMPLE_RATE <= 0 and not SECRET:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(event: Any, context: Any) -> Any:
+            if not _requested(event, function) or tracemalloc.is_tracing():
+                return fn(event, context)
+            prof = cProfile.Profile()
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            prof.enable()
+            try:
+                return fn(event, context)
+            finally:
+                prof.disable()
+                elapsed = (time.perf_counter() - t0) * 1000.0
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                summary = {"function": function, "wall_ms": round(elapsed, 3)}
+                summary.update(summarize(prof, snapshot, peak))
+                timing.set_property("profiled", True)
+                _write(function, prof, summary)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,251 @@
+"""Per-caller rate limiting for handlers.
+
+``@rate_limited("admin_overview", "scan")`` limits each caller (Cognito
+``sub``, else email, else source IP) per handler. ``RATE_LIMITS`` sets the
+budget per class as ``requests/seconds``; the defaults make full-table admin
+scans far scarcer than point reads:
+
+    RATE_LIMITS=read=600/60,write=60/60,scan=30/60
+
+Two layers enforce it:
+
+* an in-container token bucket (capacity ``requests``, refilled at
+  ``requests/seconds`` per second) that rejects bursts without any I/O;
+* with ``RATE_LIMIT_TABLE`` set, a fixed-window counter shared by all
+  containers: one atomic ``UpdateItem ADD`` (conditional on the window not
+  being exhausted) leases a small block of requests into the container, so
+  cheap routes pay one write per block rather than per request, and scans
+  (budget 30) lease one at a time. Once the window is used up, the
+  container refuses locally until the next window starts.
+
+Over the limit the handler is not called and the caller gets 429 with
+``Retry-After``. If the counter table cannot be reached, requests are
+allowed (fail open) and a warning is logged. ``RATE_LIMIT_ENABLED=true``
+switches limiting on (the template does).
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lib import log, timing
+from lib.auth import extract_claims
+
+Handler = Callable[[Any, Any], Any]
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+RATE_LIMIT_TABLE = os.getenv("RATE_LIMIT_TABLE", "")
+DEFAULT_LIMITS = "read=600/60,write=60/60,scan=30/60"
+MAX_TRACKED = 10_000
+# Share of a window's budget one container leases with a single counter update.
+LEASE_FRACTION = 0.05
+
+
+def parse_limits(raw: str) -> Dict[str, Tuple[int, float]]:
+    """Parses ``class=requests/seconds`` pairs."""
+    limits: Dict[str, Tuple[int, float]] = {}
+    for part in raw.split(","):
+        name, _, spec = part.partition("=")
+        if not spec.strip():
+            continue
+        count, _, seconds = spec.partition("/")
+        limits[name.strip()] = (int(count), float(seconds or 1))
+    return limits
+
+
+LIMITS = {**parse_limits(DEFAULT_LIMITS), **parse_limits(os.getenv("RATE_LIMITS", ""))}
+
+
+class TokenBucket:
+    """Classic token bucket; ``take`` returns 0 when allowed, else seconds to wait."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Lease:
+    __slots__ = ("window", "remaining", "exhausted")
+
+    def __init__(self) -> None:
+        self.window = -1
+        self.remaining = 0
+        self.exhausted = False
+
+
+class WindowCounter:
+    """Fixed-window counters in DynamoDB (hash key ``id``, TTL on ``expiresAt``)."""
+
+    def __init__(self, client: Any, table: str) -> None:
+        self.client = client
+        self.table = table
+
+    def lease(self, key: str, window: int, seconds: float, limit: int, want: int) -> int:
+        """Atomically reserves up to ``want`` requests of the window; returns how many."""
+        try:
+            resp = self.client.update_item(
+                TableName=self.table,
+                Key={"id": {"S": f"{key}#{window}"}},
+                UpdateExpression="ADD hits :n SET expiresAt = :exp",
+                ConditionExpression="attribute_not_exists(hits) OR hits < :limit",
+                ExpressionAttributeValues={
+                    ":n": {"N": str(want)},
+                    ":limit": {"N": str(limit)},
+                    ":exp": {"N": str(int((window + 2) * seconds))},
+                },
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return 0
+            raise
+        hits = int(resp["Attributes"]["hits"]["N"])
+        return max(0, min(want, limit - (hits - want)))
+
+
+class RateLimiter:
+    """Local buckets plus optional shared window leases, keyed by ``caller#route``."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, float]],
+        counter: Optional[WindowCounter] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.limits = limits
+        self.counter = counter
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[TokenBucket, _Lease]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(
+        self, key: str, count: int, seconds: float, now: float
+    ) -> Tuple[TokenBucket, _Lease]:
+        state = self._buckets.get(key)
+        if state is None:
+            state = self._buckets[key] = (TokenBucket(count, count / seconds, now), _Lease())
+            while len(self._buckets) > MAX_TRACKED:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return state
+
+    def check(self, key: str, kind: str) -> float:
+        """Returns 0 if the request may proceed, else the seconds until it may."""
+        if kind not in self.limits:
+            return 0.0
+        count, seconds = self.limits[kind]
+        now = self.clock()
+        with self._lock:
+            bucket, lease = self._state(key, count, seconds, now)
+            wait = bucket.take(now)
+            if wait or self.counter is None:
+                return wait
+            window = int(now // seconds)
+            if lease.window == window:
+                if lease.exhausted:
+                    return (window + 1) * seconds - now
+                if lease.remaining > 0:
+                    lease.remaining -= 1
+                    return 0.0
+        want = max(1, int(count * LEASE_FRACTION))
+        try:
+            granted = self.counter.lease(key, window, seconds, count, want)
+        except (ClientError, BotoCoreError) as e:
+            log.warning("rate limit counter unavailable", error=str(e))
+            return 0.0
+        timing.count("ratelimit_leases")
+        with self._lock:
+            # A refused lease closes the window for this container: no more I/O until it ends.
+            lease.window, lease.exhausted = window, not granted
+            lease.remaining = max(0, granted - 1)
+        return 0.0 if granted else (window + 1) * seconds - now
+
+    def reset(self) -> None:
+        """Forgets all local state."""
+        with self._lock:
+            self._buckets.clear()
+
+
+def caller(event: Dict[str, Any]) -> str:
+    """Identifies the caller: Cognito ``sub``, then email, then source IP."""
+    claims = extract_claims(event)
+    ident = claims.get("sub") or claims.get("email")
+    if ident:
+        return str(ident)
+    http = event.get("requestContext", {}).get("http", {})
+    return "ip:" + str(http.get("sourceIp") or "unknown")
+
+
+def too_many_requests(wait: float) -> Dict[str, Any]:
+    """The 429 response with a whole-second ``Retry-After``."""
+    return {
+        "statusCode": 429,
+        "headers": {
+            "Content-Type": "application/json",
+            "Retry-After": str(max(1, math.ceil(wait))),
+        },
+        "body": json.dumps({"message": "Too Many Requests"}),
+    }
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def limiter() -> RateLimiter:
+    """The container-wide limiter (created on first use)."""
+    global _limiter
+    if _limiter is None:
+        counter = None
+        if RATE_LIMIT_TABLE:
+            import boto3
+
+            region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "eu-central-1"
+            counter = WindowCounter(boto3.client("dynamodb", region_name=region), RATE_LIMIT_TABLE)
+        _limiter = RateLimiter(LIMITS, counter)
+    return _limiter
+
+
+def rate_limited(
+    function: str, kind: Union[str, Callable[[Dict[str, Any]], str]]
+) -> Callable[[Handler], Handler]:
+    """Limits a handler per caller; ``kind`` is a limit class or a function of the event."""
+
+    def decorator(fn: Handler) -> Handler:
+        if not RATE_LIMIT_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(event: Any, context: Any) -> Any:
+            cls = kind(event) if callable(kind) else kind
+            wait = limiter().check(f"{caller(event)}#{function}", cls)
+            if wait:
+                timing.count("throttled")
+                log.info("rate limited", limit_class=cls, retry_after=round(wait, 3))
+                return too_many_requests(wait)
+            return fn(event, context)
+
+        return wrapper
+
+    return decorator
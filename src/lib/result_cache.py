@@ -0,0 +1,118 @@
+"""Response cache for the admin aggregate endpoints.
+
+An admin result depends only on ``(endpoint, min_age, max_age, data version,
+today's date)``: ages come from ``compute_age_years``, which uses
+``date.today()`` and rounds to 0.01 years. So:
+
+* bounds are canonicalised to that precision (``min_age`` rounded up,
+  ``max_age`` down), which selects exactly the same records, so ``30``,
+  ``30.0`` and ``29.995`` share one entry;
+* the key carries today's date and entries expire at the next local midnight
+  (or after ``RESULT_CACHE_TTL`` seconds, whichever comes first);
+* writers call ``bump_data_version(table)``, which changes the version in
+  every later key, so results computed before a write are never served after
+  it. That only holds across containers with a shared ``CACHE_URL`` backend;
+  with the default per-container cache other containers keep their entries,
+  so the default TTL is then ``METRICS_CACHE_TTL`` (60 s) instead of an hour.
+
+Entries hold the serialised response body, so a hit skips the scan, the
+aggregation and JSON encoding. ``RESULT_CACHE_TTL=0`` disables the cache.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from lib import cache, timing
+
+SHARED = not isinstance(cache.backend, cache.LocalBackend)  # see bump_data_version
+RESULT_CACHE_TTL = float(
+    os.getenv("RESULT_CACHE_TTL", "3600" if SHARED else str(cache.METRICS_CACHE_TTL))
+)
+AGE_PRECISION = 100  # compute_age_years rounds to 1/100 year
+# Long enough that a version outlives every result keyed on it (results live <= 1 day).
+VERSION_TTL = 2 * 24 * 3600.0
+
+result_cache = cache.Cache(cache.backend, "result", RESULT_CACHE_TTL)
+_versions = cache.Cache(cache.backend, "dataver", VERSION_TTL)
+
+
+def quantize_bounds(
+    min_age: Optional[float], max_age: Optional[float]
+) -> Tuple[Optional[float], Optional[float]]:
+    """Rounds ``min_age`` up and ``max_age`` down to the precision of computed ages."""
+    if min_age is not None:
+        min_age = math.ceil(round(min_age * AGE_PRECISION, 6)) / AGE_PRECISION
+    if max_age is not None:
+        max_age = math.floor(round(max_age * AGE_PRECISION, 6)) / AGE_PRECISION
+    return min_age, max_age
+
+
+def data_version(table: str) -> str:
+    """Returns the current data version of ``table`` (``"0"`` before any write)."""
+    version = _versions.get(table)
+    return "0" if version is cache._MISSING or version is None else version
+
+
+def bump_data_version(table: str) -> None:
+    """Marks every cached result computed from ``table`` as stale."""
+    _versions.put(table, os.urandom(6).hex())
+
+
+def seconds_until_midnight(now: Optional[datetime] = None) -> float:
+    """Seconds until the local date changes (and with it every computed age)."""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), dtime())
+    return (midnight - now).total_seconds()
+
+
+def result_key(
+    endpoint: str, table: str, min_age: Optional[float], max_age: Optional[float]
+) -> Tuple[str, ...]:
+    """Builds the cache key; bounds must already be quantised."""
+
+    def fmt(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:.2f}"
+
+    return (
+        endpoint,
+        table,
+        data_version(table),
+        date.today().isoformat(),
+        fmt(min_age),
+        fmt(max_age),
+    )
+
+
+def cached_response(
+    endpoint: str,
+    table: str,
+    min_age: Optional[float],
+    max_age: Optional[float],
+    build: Callable[[], Dict[str, Any]],
+    consistent: bool = False,
+) -> Dict[str, Any]:
+    """
+    Returns the cached 200 response for the query or builds and stores it.
+
+    ``consistent=True`` rebuilds and refreshes the entry. Non-200 responses
+    are returned but not cached.
+    """
+    if not result_cache.enabled:
+        return build()
+    key = result_key(endpoint, table, min_age, max_age)
+    if not consistent:
+        hit = result_cache.get(key)
+        if hit is not cache._MISSING:
+            timing.count("cache_hits")
+            return {"statusCode": 200, "headers": hit["headers"], "body": hit["body"]}
+    timing.count("cache_misses")
+    response = build()
+    if response.get("statusCode") == 200:
+        ttl = min(RESULT_CACHE_TTL, seconds_until_midnight())
+        result_cache.put(key, {"headers": response["headers"], "body": response["body"]}, ttl)
+    return response
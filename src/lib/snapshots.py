@@ -0,0 +1,210 @@
+"""Versioned binary snapshots for in-memory indexes (``file://`` or ``s3://``).
+
+A snapshot is one opaque blob per name plus an ETag. Readers pass the ETag
+they already hold and get ``data=None`` back when nothing changed, so a
+warm container checks for a newer copy with a conditional GET instead of
+downloading it again. Writers pass the ETag they loaded: ``save`` fails
+with ``SnapshotConflict`` when someone else saved in between (or, with
+``if_match=None``, when the snapshot already exists), so concurrent
+incremental updates never overwrite each other; the loser reloads and
+retries. ``Cached`` keeps a parsed copy per container and re-checks it at
+most every ``refresh`` seconds.
+
+    s3://my-bucket/indexes     # conditional PutObject/GetObject
+    file:///tmp/indexes        # local runs and tests
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from lib import log, timing
+
+
+class SnapshotConflict(Exception):
+    """The snapshot changed since it was loaded (or already exists)."""
+
+
+class Snapshot:
+    """A loaded snapshot; ``data`` is ``None`` when the caller's copy is current."""
+
+    __slots__ = ("data", "etag")
+
+    def __init__(self, data: Optional[bytes], etag: str) -> None:
+        self.data = data
+        self.etag = etag
+
+
+class SnapshotStore:
+    """Interface of the snapshot stores."""
+
+    def load(self, name: str, etag: Optional[str] = None) -> Optional[Snapshot]:
+        """Returns the snapshot (``None`` if missing); ``data`` is ``None`` if ``etag`` matches."""
+        raise NotImplementedError
+
+    def save(self, name: str, data: bytes, if_match: Optional[str]) -> str:
+        """Stores ``data`` if the current ETag is ``if_match`` (absent for ``None``)."""
+        raise NotImplementedError
+
+
+class FileSnapshots(SnapshotStore):
+    """Snapshots as files in a directory; ETags are content hashes."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _etag(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    @contextmanager
+    def _locked(self, name: str) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(name) + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def load(self, name: str, etag: Optional[str] = None) -> Optional[Snapshot]:
+        data = self._read(name)
+        if data is None:
+            return None
+        current = self._etag(data)
+        return Snapshot(None if current == etag else data, current)
+
+    def save(self, name: str, data: bytes, if_match: Optional[str]) -> str:
+        with self._locked(name):
+            existing = self._read(name)
+            current = None if existing is None else self._etag(existing)
+            if current != if_match:
+                raise SnapshotConflict(name)
+            tmp = f"{self._path(name)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(name))
+        return self._etag(data)
+
+
+_CONFLICTS = frozenset({"PreconditionFailed", "ConditionalRequestConflict", "412", "409"})
+
+
+class S3Snapshots(SnapshotStore):
+    """Snapshots as S3 objects under ``prefix``, written with conditional puts."""
+
+    def __init__(self, client: Any, bucket: str, prefix: str = "") -> None:
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def load(self, name: str, etag: Optional[str] = None) -> Optional[Snapshot]:
+        kwargs = {"IfNoneMatch": etag} if etag else {}
+        try:
+            resp = self.client.get_object(Bucket=self.bucket, Key=self._key(name), **kwargs)
+        except ClientError as e:
+            code = str(e.response.get("Error", {}).get("Code"))
+            if code in ("304", "NotModified"):
+                return Snapshot(None, etag or "")
+            if code in ("NoSuchKey", "404"):
+                return None
+            raise
+        return Snapshot(resp["Body"].read(), resp["ETag"])
+
+    def save(self, name: str, data: bytes, if_match: Optional[str]) -> str:
+        condition = {"IfMatch": if_match} if if_match else {"IfNoneMatch": "*"}
+        try:
+            resp = self.client.put_object(
+                Bucket=self.bucket, Key=self._key(name), Body=data, **condition
+            )
+        except ClientError as e:
+            if str(e.response.get("Error", {}).get("Code")) in _CONFLICTS:
+                raise SnapshotConflict(name) from e
+            raise
+        etag: str = resp["ETag"]
+        return etag
+
+
+def from_url(url: str) -> SnapshotStore:
+    """Builds a store from ``s3://bucket/prefix`` or ``file:///path`` URLs."""
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return FileSnapshots(parsed.path)
+    if parsed.scheme == "s3":
+        import boto3
+
+        region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "eu-central-1"
+        return S3Snapshots(boto3.client("s3", region_name=region), parsed.netloc, parsed.path)
+    raise ValueError(f"Unsupported snapshot URL: {url}")
+
+
+def publish(store: SnapshotStore, name: str, data: bytes) -> None:
+    """Replaces snapshot ``name`` with a complete rebuild (a concurrent publish wins)."""
+    snap = store.load(name)
+    try:
+        store.save(name, data, snap.etag if snap else None)
+    except SnapshotConflict:
+        # A concurrent run published its own complete rebuild; either one is valid.
+        log.warning("snapshot publish skipped", name=name)
+
+
+class Cached:
+    """
+    Parsed snapshots kept for the life of the container.
+
+    ``get`` re-checks a snapshot (conditional load) at most every ``refresh``
+    seconds; if the store cannot be reached or the data does not parse, the
+    previous copy keeps serving.
+    """
+
+    def __init__(self, parse: Callable[[bytes], Any], refresh: float) -> None:
+        self.parse = parse
+        self.refresh = refresh
+        self._copies: Dict[str, Tuple[Any, Optional[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, store: SnapshotStore, name: str) -> Any:
+        """Returns the parsed snapshot ``name`` (``None`` if there is none)."""
+        with self._lock:
+            value, etag, checked = self._copies.get(name, (None, None, float("-inf")))
+            if time.monotonic() - checked < self.refresh:
+                return value
+            try:
+                with timing.phase("snapshot_load"):
+                    snap = store.load(name, etag if value is not None else None)
+                    if snap is None:
+                        value, etag = None, None
+                    elif snap.data is not None:
+                        value, etag = self.parse(snap.data), snap.etag
+                        timing.count("snapshot_loads")
+            except (OSError, ClientError, BotoCoreError, ValueError) as e:
+                log.warning("snapshot unavailable", name=name, error=str(e))
+            self._copies[name] = (value, etag, time.monotonic())
+            return value
+
+    def clear(self) -> None:
+        """Forgets every copy, so the next ``get`` loads again."""
+        with self._lock:
+            self._copies.clear()
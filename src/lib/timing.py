@@ -0,0 +1,207 @@
+"""Per-invocation phase timing emitted as CloudWatch Embedded Metric Format.
+
+``@instrumented("admin_overview")`` wraps a Lambda entry point; inside it,
+``with phase("scan"):`` accumulates wall time per named phase and
+``count("items", n)`` records counters. When the handler returns, exactly one
+EMF JSON line is written to stdout, which CloudWatch turns into metrics
+without any API calls. With ``SERVER_TIMING=true`` the same phases are added
+to the response as a ``Server-Timing`` header.
+
+Outside an instrumented call ``phase``/``count`` are no-ops, so library code
+can use them unconditionally.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from lib import log, tracing
+
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "HospitalBackend")
+EMF_ENABLED = os.getenv("EMF_ENABLED", "true").lower() != "false"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+CAPACITY_HEADER = os.getenv("CAPACITY_HEADER", "false").lower() == "true"
+CAPACITY_COUNTERS = ("read_units", "write_units", "pages", "scanned_items")
+
+Handler = TypeVar("Handler", bound=Callable[..., Any])
+
+_cold_start = True
+_current: ContextVar[Optional["Invocation"]] = ContextVar("invocation", default=None)
+
+
+class Invocation:
+    """Mutable timing record for one handler call."""
+
+    __slots__ = ("function", "cold", "started", "phases", "counters", "properties")
+
+    def __init__(self, function: str, cold: bool) -> None:
+        self.function = function
+        self.cold = cold
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.properties: Dict[str, Any] = {}
+
+    def add_phase(self, name: str, ms: float) -> None:
+        """Adds ``ms`` to a phase (phases may be entered several times)."""
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def add(self, name: str, value: float) -> None:
+        """Adds ``value`` to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+def current() -> Optional[Invocation]:
+    """Returns the active invocation, if any."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times the enclosed block under ``name`` for the active invocation."""
+    inv = _current.get()
+    if inv is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        inv.add_phase(name, (time.perf_counter() - t0) * 1000.0)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Adds to a counter of the active invocation."""
+    inv = _current.get()
+    if inv is not None:
+        inv.add(name, value)
+
+
+def set_property(name: str, value: Any) -> None:
+    """Attaches a non-metric property (e.g. query shape) to the EMF record."""
+    inv = _current.get()
+    if inv is not None:
+        inv.properties[name] = value
+
+
+def query_shape(params: Dict[str, Any]) -> str:
+    """Names the filters a request used (``max_age+min_age``), ``all`` when none."""
+    return "+".join(sorted(k for k, v in params.items() if v not in (None, ""))) or "all"
+
+
+def emf_record(
+    inv: Invocation, total_ms: float, status: Any, request_id: Optional[str]
+) -> Dict[str, Any]:
+    """Builds the EMF document for a finished invocation."""
+    values: Dict[str, float] = {"duration_ms": round(total_ms, 3), "cold_start": int(inv.cold)}
+    units: Dict[str, str] = {"duration_ms": "Milliseconds", "cold_start": "Count"}
+    for name, ms in inv.phases.items():
+        values[f"{name}_ms"] = round(ms, 3)
+        units[f"{name}_ms"] = "Milliseconds"
+    for name, val in inv.counters.items():
+        values[name] = round(val, 3) if isinstance(val, float) else val
+        units[name] = "Bytes" if name.endswith("bytes") else "Count"
+    dimensions = [["function"]]
+    if "query_shape" in inv.properties:
+        dimensions.append(["function", "query_shape"])
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": dimensions,
+                    "Metrics": [{"Name": n, "Unit": units[n]} for n in values],
+                }
+            ],
+        },
+        "function": inv.function,
+        "status": status,
+        **inv.properties,
+        **values,
+    }
+    if request_id:
+        record["request_id"] = request_id
+    return record
+
+
+def server_timing(inv: Invocation, total_ms: float) -> str:
+    """Formats phases as a ``Server-Timing`` header value."""
+    parts = [f"{name};dur={ms:.2f}" for name, ms in inv.phases.items()]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+def consumed_capacity(inv: Invocation) -> str:
+    """Formats the capacity counters (see ``lib.capacity``) as a header value."""
+    return ", ".join(
+        f"{name}={round(inv.counters.get(name, 0), 2):g}" for name in CAPACITY_COUNTERS
+    )
+
+
+def _finish(inv: Invocation, resp: Any, context: Any) -> None:
+    total_ms = (time.perf_counter() - inv.started) * 1000.0
+    status = None
+    if isinstance(resp, dict):
+        status = resp.get("statusCode")
+        body = resp.get("body")
+        if isinstance(body, str):
+            inv.add("response_bytes", len(body))
+        if SERVER_TIMING and "statusCode" in resp:
+            headers = resp.setdefault("headers", {})
+            headers["Server-Timing"] = server_timing(inv, total_ms)
+        if CAPACITY_HEADER and "statusCode" in resp:
+            headers = resp.setdefault("headers", {})
+            headers["X-Consumed-Capacity"] = consumed_capacity(inv)
+    if EMF_ENABLED:
+        request_id = getattr(context, "aws_request_id", None)
+        sys.stdout.write(json.dumps(emf_record(inv, total_ms, status, request_id)) + "\n")
+
+
+def _route(event: Any) -> Optional[str]:
+    if not isinstance(event, dict):
+        return None
+    return event.get("routeKey") or event.get("rawPath") or event.get("path")
+
+
+def instrumented(function: str) -> Callable[[Handler], Handler]:
+    """Decorates a Lambda handler with phase timing and one EMF line per call."""
+
+    def decorator(fn: Handler) -> Handler:
+        @functools.wraps(fn)
+        def wrapper(event: Any, context: Any) -> Any:
+            global _cold_start
+            inv = Invocation(function, _cold_start)
+            _cold_start = False
+            token = _current.set(inv)
+            log_token = log.begin(
+                function=function,
+                request_id=getattr(context, "aws_request_id", None),
+                route=_route(event),
+                cold_start=inv.cold,
+            )
+            trace = tracing.start(function)
+            active = tracing.current() if trace is not None else None
+            if active is not None:
+                inv.properties["trace_id"] = active.trace_id
+            resp = None
+            try:
+                resp = fn(event, context)
+                return resp
+            finally:
+                tracing.finish(trace)
+                log.end(log_token)
+                _current.reset(token)
+                _finish(inv, resp, context)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,227 @@
+"""Minimal span API exported as AWS X-Ray segment documents.
+
+``with span("scan_page"):`` marks a unit of work. Tracing is off by default
+and ``span`` then returns a shared no-op context manager, so instrumented code
+pays one function call and a flag check. With ``TRACING_ENABLED=true`` the
+spans of one invocation are buffered and flushed when the handler returns
+(``lib.timing.instrumented`` opens and flushes the trace; every
+``timing.phase`` is also a span).
+
+Inside Lambda the spans become subsegments of the function segment named by
+``_X_AMZN_TRACE_ID`` and are sent over UDP to ``AWS_XRAY_DAEMON_ADDRESS``;
+unsampled requests record nothing. Outside Lambda a root segment is created
+locally. ``TRACE_EXPORT=/path/file.jsonl`` writes one document per line
+instead, and ``set_exporter`` installs any callable (used by the tests).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+EXPORT = os.getenv("TRACE_EXPORT", "udp")
+DAEMON_ADDRESS = os.getenv("AWS_XRAY_DAEMON_ADDRESS", "127.0.0.1:2000")
+
+_DAEMON_HEADER = b'{"format": "json", "version": 1}\n'
+
+Exporter = Callable[[List[Dict[str, Any]]], None]
+
+
+class Span:
+    """One timed unit of work."""
+
+    __slots__ = ("name", "id", "parent_id", "start", "end", "namespace", "metadata", "fault")
+
+    def __init__(
+        self, name: str, parent_id: Optional[str], namespace: Optional[str], metadata: Dict
+    ) -> None:
+        self.name = name
+        self.id = new_id()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = 0.0
+        self.namespace = namespace
+        self.metadata = metadata
+        self.fault = False
+
+
+class Trace:
+    """Buffered spans of one invocation plus the X-Ray ids they hang off."""
+
+    __slots__ = ("trace_id", "root", "parent_id", "spans")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], root: Optional[Span]) -> None:
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.root = root
+        self.spans: List[Span] = []
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("trace_parent", default=None)
+_exporter: Optional[Exporter] = None
+
+
+def new_id() -> str:
+    """Returns a 64-bit segment id in hex."""
+    return os.urandom(8).hex()
+
+
+def new_trace_id() -> str:
+    """Returns an X-Ray trace id (``1-<epoch hex>-<96 random bits>``)."""
+    return f"1-{int(time.time()):08x}-{os.urandom(12).hex()}"
+
+
+def parse_trace_header(value: str) -> Tuple[Optional[str], Optional[str], bool]:
+    """Parses ``Root=...;Parent=...;Sampled=1`` into ``(root, parent, sampled)``."""
+    fields = dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+    return fields.get("Root"), fields.get("Parent"), fields.get("Sampled", "1") != "0"
+
+
+def current() -> Optional[Trace]:
+    """Returns the active trace, if any."""
+    return _trace.get()
+
+
+@contextmanager
+def _record(trace: Trace, name: str, namespace: Optional[str], metadata: Dict) -> Iterator[Span]:
+    parent = _parent.get()
+    s = Span(name, parent, namespace, metadata)
+    token = _parent.set(s.id)
+    try:
+        yield s
+    except BaseException:
+        s.fault = True
+        raise
+    finally:
+        s.end = time.time()
+        _parent.reset(token)
+        trace.spans.append(s)
+
+
+def span(name: str, namespace: Optional[str] = None, **metadata: Any) -> Any:
+    """
+    Returns a context manager timing ``name`` as a subsegment.
+
+    ``namespace="aws"`` marks AWS SDK calls; keyword arguments are attached as
+    metadata. A no-op unless tracing is enabled and a trace is active.
+    """
+    if not ENABLED:
+        return _NOOP
+    trace = _trace.get()
+    if trace is None:
+        return _NOOP
+    return _record(trace, name, namespace, metadata)
+
+
+def start(function: str) -> Optional[Any]:
+    """Opens a trace for one invocation; returns a token for ``finish``."""
+    if not ENABLED:
+        return None
+    root_id, parent, sampled = parse_trace_header(os.getenv("_X_AMZN_TRACE_ID", ""))
+    if not sampled:
+        return None
+    root = None
+    if root_id is None:
+        root = Span(function, None, None, {})
+        root_id, parent = new_trace_id(), root.id
+    trace = Trace(root_id, parent, root)
+    return _trace.set(trace), _parent.set(parent)
+
+
+def finish(token: Optional[Any]) -> None:
+    """Closes the invocation's trace and exports its documents."""
+    if token is None:
+        return
+    trace_token, parent_token = token
+    trace = _trace.get()
+    _trace.reset(trace_token)
+    _parent.reset(parent_token)
+    if trace is None:
+        return
+    if trace.root is not None:
+        trace.root.end = time.time()
+    try:
+        export(documents(trace))
+    except OSError as exc:
+        sys.stderr.write(f"trace export failed: {exc}\n")
+
+
+def _document(trace: Trace, s: Span) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {
+        "name": s.name,
+        "id": s.id,
+        "trace_id": trace.trace_id,
+        "start_time": s.start,
+        "end_time": s.end,
+    }
+    if s is not trace.root:
+        doc["type"] = "subsegment"
+        doc["parent_id"] = s.parent_id or trace.parent_id
+    if s.namespace:
+        doc["namespace"] = s.namespace
+    if s.metadata:
+        doc["metadata"] = {"default": s.metadata}
+    if s.fault:
+        doc["fault"] = True
+    return doc
+
+
+def documents(trace: Trace) -> List[Dict[str, Any]]:
+    """Converts buffered spans (and a local root, if any) to segment documents."""
+    docs = [_document(trace, s) for s in trace.spans]
+    if trace.root is not None:
+        docs.append(_document(trace, trace.root))
+    return docs
+
+
+def set_exporter(exporter: Optional[Exporter]) -> None:
+    """Replaces the exporter chosen by ``TRACE_EXPORT``; ``None`` restores it."""
+    global _exporter
+    _exporter = exporter
+
+
+def export(docs: List[Dict[str, Any]]) -> None:
+    """Sends documents to the configured exporter."""
+    if not docs:
+        return
+    if _exporter is not None:
+        _exporter(docs)
+    elif EXPORT == "udp":
+        send_udp(docs, DAEMON_ADDRESS)
+    else:
+        with open(EXPORT, "a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(d) + "\n" for d in docs)
+
+
+def send_udp(docs: List[Dict[str, Any]], address: str) -> None:
+    """
+    Sends one datagram per document to an X-Ray daemon.
+
+    ``address`` is ``host:port`` or the ``tcp:host:port udp:host:port`` form.
+    """
+    for part in address.split():
+        if part.startswith("udp:"):
+            address = part[4:]
+    host, _, port = address.rpartition(":")
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for doc in docs:
+            sock.sendto(_DAEMON_HEADER + json.dumps(doc).encode("utf-8"), (host, int(port)))
@@ -3,14 +3,28 @@ from __future__ import annotations
 import json
 import os
 from datetime import date, datetime
+from decimal import Decimal
+from fractions import Fraction
 from statistics import mean
 from typing import Any, Dict, Iterable, Tuple
 
+from lib.models import MetricsOverview, TopItem
+
+DAYS_PER_YEAR = 365.2425
+UNITS = 100  # BMI and ages are summed as exact integer hundredths
+
 
 def json_response(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """
     Builds a consistent JSON HTTP response with CORS headers.
     """
+    return text_response(status, json.dumps(body))
+
+
+def text_response(status: int, body: str) -> Dict[str, Any]:
+    """
+    Builds the same response around an already serialised JSON body.
+    """
     origin = os.environ.get("ALLOWED_ORIGIN", "*")
     return {
         "statusCode": status,
@@ -20,7 +34,7 @@ def json_response(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
             "Access-Control-Allow-Headers": "*",
             "Access-Control-Allow-Methods": "GET,OPTIONS",
         },
-        "body": json.dumps(body),
+        "body": body,
     }
 
 
@@ -38,7 +52,7 @@ def compute_age_years(born_iso: str) -> float:
     b = parse_iso_date(born_iso)
     today = date.today()
     delta = today.toordinal() - b.toordinal()
-    return round(delta / 365.2425, 2)
+    return round(delta / DAYS_PER_YEAR, 2)
 
 
 def average(values: Iterable[float]) -> float:
@@ -49,6 +63,60 @@ def average(values: Iterable[float]) -> float:
     return round(mean(vals), 2) if vals else 0.0
 
 
+def age_units(days: int) -> int:
+    """
+    Returns ``compute_age_years`` of someone ``days`` old in hundredths of a year.
+    """
+    return round(round(days / DAYS_PER_YEAR, 2) * UNITS)
+
+
+def bmi_units(value: Any) -> int:
+    """
+    Returns a BMI (``Decimal``, float or str) in exact hundredths.
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * UNITS).to_integral_value())
+
+
+def mean_of_units(total: int, count: int) -> float:
+    """
+    Averages an exact sum of hundredths and rounds it like ``average``.
+
+    Every serving layer sums in integer units so that the result does not
+    depend on the order (or grouping) of the additions.
+    """
+    return round(float(Fraction(total, count * UNITS)), 2) if count else 0.0
+
+
+def ranked(counts: Dict[str, int]) -> Dict[str, int]:
+    """
+    Orders counts by count descending, then by name.
+    """
+    return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def overview_body(
+    total: int,
+    bmi_total: int,
+    age_total: int,
+    by_sex: Dict[str, int],
+    diseases: Dict[str, int],
+) -> Dict[str, Any]:
+    """
+    Builds the /admin/overview body from exact totals (BMI and ages in ``UNITS``).
+    """
+    top = list(ranked(diseases).items())[:10]
+    body: Dict[str, Any] = MetricsOverview(
+        total_patients=total,
+        avg_bmi=mean_of_units(bmi_total, total),
+        counts_by_sex=ranked(by_sex),
+        avg_age_years=mean_of_units(age_total, total),
+        top_diseases=[TopItem(name=name, count=n) for name, n in top],
+    ).model_dump()
+    return body
+
+
 def histogram(values: Iterable[str]) -> Dict[str, int]:
     """
     Returns a frequency dictionary for values.
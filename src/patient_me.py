@@ -1,8 +1,13 @@
 import os, json, base64
 from decimal import Decimal
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 import boto3
 from common.helpers import json_response
+from lib import capacity, log
+from lib.auth import verified_claims
+from lib.cache import patient_cache, read_through, wants_consistent
+from lib.ratelimit import rate_limited
+from lib.timing import instrumented, phase
 
 dynamodb = boto3.resource("dynamodb")
 
@@ -24,8 +29,10 @@ def _get_claims(event: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(jwt, dict) and isinstance(jwt.get("claims"), dict):
         return jwt["claims"]
     claims = az.get("claims")
-    return claims if isinstance(claims, dict) else {}
+    return claims if isinstance(claims, dict) else verified_claims(event)
 
+@instrumented("patient_me")
+@rate_limited("patient_me", "read")
 def lambda_handler(event, context):
     table_name = os.environ.get("TABLE_NAME")
     pk_name = os.environ.get("PK_NAME", "patientId")
@@ -37,9 +44,19 @@ def lambda_handler(event, context):
     if not sub:
         return json_response(401, {"error": "No sub in token"})
 
-    table = dynamodb.Table(table_name)
-    resp = table.get_item(Key={pk_name: sub})
-    item = resp.get("Item")
+    consistent = wants_consistent(event)
+
+    def load() -> Optional[Dict[str, Any]]:
+        kwargs = capacity.request()
+        if consistent:
+            kwargs["ConsistentRead"] = True
+        resp = dynamodb.Table(table_name).get_item(Key={pk_name: sub}, **kwargs)
+        item: Optional[Dict[str, Any]] = capacity.record("GetItem", resp).get("Item")
+        return item
+
+    with phase("get_item"):
+        item = read_through(patient_cache, (table_name, sub), load, consistent)
+    log.info("patient lookup", found=bool(item))
     if not item:
         return json_response(404, {"error": "Patient not found", "patientId": sub})
 
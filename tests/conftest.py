@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import pytest
+
+from lib import cache
+
+
+@pytest.fixture(autouse=True)
+def _empty_local_cache():
+    """Cached patients and admin results must not leak between tests."""
+    if isinstance(cache.backend, cache.LocalBackend):
+        cache.backend.clear()
+    yield
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import adb, timing
+
+
+def _emf(out: str):
+    (line,) = [line for line in out.splitlines() if line.startswith('{"_aws"')]
+    return json.loads(line)
+
+
+@pytest.fixture
+def emu(monkeypatch):
+    emu = LocalDynamo(unprocessed_rate=0.3, page_limit_bytes=4096, seed=7)
+    emu.create_table(
+        "records",
+        "patient_id",
+        [{"patient_id": f"p{i}", "notes": "n" * 100} for i in range(400)],
+    )
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setattr(adb, "backoff_delay", lambda attempt: 0.0)
+    return emu
+
+
+def test_gathered_gets_overlap_and_share_the_patient_cache(emu):
+    emu.latency = 0.05
+
+    async def main():
+        return await asyncio.gather(*(adb.get_patient(f"p{i}") for i in range(8)))
+
+    t0 = time.perf_counter()
+    items = adb.run(main())
+    assert time.perf_counter() - t0 < 0.3  # 8 x 50 ms round trips overlapped
+    assert [it["patient_id"] for it in items] == [f"p{i}" for i in range(8)]
+    assert lib.db.get_patient("p3")["patient_id"] == "p3"
+    assert adb.run(adb.get_patient("nope")) is None
+    assert emu.calls["GetItem"] == 9
+
+
+def test_parallel_scan_returns_every_item_once(emu):
+    items = adb.run(adb.scan_patients(segments=4))
+    assert sorted(it["patient_id"] for it in items) == sorted(
+        it["patient_id"] for it in lib.db.scan_patients()
+    )
+    assert len(items) == 400
+    assert adb.run(adb.scan_patients(segments=1)) == lib.db.scan_patients()
+
+
+def test_batch_get_chunks_retries_unprocessed_and_keeps_order(emu):
+    ids = [f"p{i}" for i in range(250, -1, -1)] + ["missing", "p5"]
+    result = adb.run(adb.batch_get_patients(ids))
+    assert list(result) == ids[:-1]
+    assert result["missing"] is None
+    assert all(result[pid]["patient_id"] == pid for pid in ids[:-2])
+    calls = emu.calls["BatchGetItem"]
+    assert calls > 3  # three chunks plus retries of unprocessed keys
+
+    again = adb.run(adb.batch_get_patients(["p0", "missing"]))
+    assert again == {"p0": result["p0"], "missing": None}
+    assert emu.calls["BatchGetItem"] == calls
+
+
+def test_async_handler_records_capacity_on_the_invocation(emu, capsys):
+    @timing.instrumented("adb_test")
+    @adb.async_handler
+    async def handler(event, context):
+        one, many = await asyncio.gather(
+            adb.get_patient("p1"), adb.batch_get_patients(["p2", "p3"])
+        )
+        return {"statusCode": 200, "body": json.dumps([one["patient_id"], sorted(many)])}
+
+    records = []
+    for _ in range(2):
+        resp = handler({}, None)
+        assert json.loads(resp["body"]) == ["p1", ["p2", "p3"]]
+        records.append(_emf(capsys.readouterr().out))
+    assert records[0]["read_units"] > 0 and records[0]["cache_misses"] == 3
+    assert records[1]["cache_hits"] == 3 and "read_units" not in records[1]
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import time
+from array import array
+from datetime import date, timedelta
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import age_index, aggregate, result_cache, snapshots
+from lib.utils import compute_age_years
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+WINDOWS = [(None, None), (18, 65), (30, 39.99), (0, 17.99), (65, None), (None, 30.5), (41.3, 41.3)]
+
+
+def _patients(n, seed=7):
+    rng = random.Random(seed)
+    today = date.today()
+    return [
+        {
+            "patient_id": f"p{i}",
+            "date_of_birth": (today - timedelta(days=rng.randint(0, 100 * 365))).isoformat(),
+            "sex": rng.choice(["F", "M", "X"]),
+            "bmi": rng.randint(16, 40),
+            "diseases": rng.sample(["flu", "asthma", "diabetes", "copd"], rng.randint(0, 2)),
+            "medications": rng.sample(["ibuprofen", "insulin"], rng.randint(0, 1)),
+        }
+        for i in range(n)
+    ]
+
+
+_sequence = itertools.count(10**20)
+
+
+def _stream(old=None, new=None, created=None):
+    ser = TypeSerializer()
+
+    def image(item):
+        return {k: ser.serialize(v) for k, v in item.items()}
+
+    change = {
+        "Keys": image({"patient_id": (old or new)["patient_id"]}),
+        "SequenceNumber": str(next(_sequence)),
+        "ApproximateCreationDateTime": created or time.time(),
+    }
+    if old:
+        change["OldImage"] = image(old)
+    if new:
+        change["NewImage"] = image(new)
+    return {"eventName": "MODIFY", "dynamodb": change}
+
+
+def _assert_matches_scan(index, items, windows=WINDOWS):
+    items = [it for it in items if "date_of_birth" in it]
+    for lo, hi in windows:
+        chosen, ages = aggregate.select(items, lo, hi)
+        for endpoint, build in aggregate.BUILDERS.items():
+            expected = json.dumps(build(chosen, ages))
+            assert json.dumps(age_index.BODIES[endpoint](index, lo, hi)) == expected
+
+
+def test_fenwick_sums_match_brute_force():
+    rng = random.Random(1)
+    values = array("q", [rng.randint(0, 9) for _ in range(300)])
+    tree = age_index.Fenwick.from_slots(values)
+    for _ in range(50):
+        slot, delta = rng.randrange(300), rng.randint(-3, 3)
+        values[slot] += delta
+        tree.add(slot, delta)
+    for _ in range(200):
+        lo, hi = sorted(rng.randrange(301) for _ in range(2))
+        assert tree.sum(lo, hi) == sum(values[lo:hi])
+
+
+def test_birth_range_matches_compute_age_years():
+    rng = random.Random(2)
+    today = date.today().toordinal()
+    for min_age, max_age in WINDOWS + [
+        (rng.uniform(0, 90), rng.uniform(0, 100)) for _ in range(20)
+    ]:
+        first, last = age_index.birth_range(min_age, max_age)
+        for born in [first - 1, first, last, last + 1] + [
+            rng.randint(today - 40000, today) for _ in range(30)
+        ]:
+            if not 1 <= born <= today:
+                continue
+            age = compute_age_years(date.fromordinal(born).isoformat())
+            inside = (min_age is None or age >= min_age) and (max_age is None or age <= max_age)
+            assert inside == (first <= born <= last)
+
+
+def test_index_matches_scan_and_follows_stream_changes():
+    items = _patients(400)
+    items.append({"patient_id": "old", "date_of_birth": "1870-05-01", "sex": "F", "bmi": 22})
+    items.append({"patient_id": "nodob", "sex": "M", "bmi": 30})
+    index = age_index.AgeIndex.build(items)
+    assert index.records == 401 and len(index.overflow) == 1
+    _assert_matches_scan(index, items)
+
+    moved = {**items[0], "date_of_birth": "1990-02-03", "diseases": ["gout"]}
+    new = _patients(1, seed=99)[0]
+    records = [
+        _stream(items[0], moved),
+        _stream(new=new),
+        _stream(old=items[1]),
+        _stream(old=items[-2]),
+    ]
+    for record in records:
+        index.apply_stream_record(record)
+    items = [moved, new] + items[2:-2] + items[-1:]
+    _assert_matches_scan(index, items)
+
+    restored = age_index.AgeIndex.from_bytes(index.to_bytes())
+    _assert_matches_scan(restored, items)
+    with pytest.raises(ValueError):
+        age_index.AgeIndex.from_bytes(b"nope" + bytes(8))
+
+
+def test_index_bodies_equal_the_scan_on_random_windows():
+    rng = random.Random(3)
+    items = _patients(800, seed=5)
+    for it in items[::7]:
+        it["bmi"] = round(rng.uniform(15, 45), 2)  # floats whose sums depend on order
+    index = age_index.AgeIndex.from_bytes(age_index.AgeIndex.build(items).to_bytes())
+    windows = [(None, round(rng.uniform(0, 100), 2)), (round(rng.uniform(0, 100), 2), None)]
+    windows += [tuple(sorted(round(rng.uniform(0, 100), 2) for _ in range(2))) for _ in range(60)]
+    _assert_matches_scan(index, items, windows)
+
+
+def test_term_slots_grow_with_patients_not_with_the_calendar():
+    items = _patients(200)
+    index = age_index.AgeIndex.build(items)
+
+    def carried(patients):
+        return sum(1 + len(it["diseases"]) + len(it["medications"]) for it in patients)
+
+    assert sum(len(slots) for slots in index.terms.values()) == carried(items)
+    for it in items[:50]:
+        index.remove(it)
+    assert sum(len(slots) for slots in index.terms.values()) == carried(items[50:])
+    assert all(list(slots) == sorted(slots) for slots in index.terms.values())
+    _assert_matches_scan(index, items[50:])
+
+
+def test_file_snapshots_detect_concurrent_saves(tmp_path):
+    store = snapshots.from_url(f"file://{tmp_path}")
+    assert store.load("x") is None
+    etag = store.save("x", b"one", None)
+    with pytest.raises(snapshots.SnapshotConflict):
+        store.save("x", b"again", None)
+    assert store.load("x", etag).data is None
+    newer = store.save("x", b"two", etag)
+    with pytest.raises(snapshots.SnapshotConflict):
+        store.save("x", b"stale", etag)
+    snap = store.load("x", etag)
+    assert (snap.data, snap.etag) == (b"two", newer)
+
+
+def test_apply_changes_bootstraps_then_retries_on_conflict(tmp_path, monkeypatch):
+    store = snapshots.FileSnapshots(str(tmp_path))
+    items = _patients(50)
+    index = age_index.apply_changes("records", [_stream(new=items[0])], lambda: items, store)
+    assert index.records == 50  # built from the scan, the batch is already in it
+
+    saves = []
+    real_save = store.save
+
+    def racing_save(name, data, if_match):
+        if not saves:  # someone else saves first
+            real_save(name, age_index.AgeIndex.build(items[1:]).to_bytes(), if_match)
+        saves.append(name)
+        return real_save(name, data, if_match)
+
+    monkeypatch.setattr(store, "save", racing_save)
+    index = age_index.apply_changes("records", [_stream(old=items[1])], lambda: [], store)
+    assert len(saves) == 2 and index.records == 48
+    loaded = age_index.AgeIndex.from_bytes(store.load("records.age-index").data)
+    assert loaded.overview(None, None) == index.overview(None, None)
+
+
+def test_redelivered_stream_records_are_applied_once(tmp_path):
+    store = snapshots.FileSnapshots(str(tmp_path))
+    items = _patients(60)
+    age_index.apply_changes("records", [], lambda: items, store)
+    moved = {**items[0], "date_of_birth": "1950-06-07"}
+    new = {**_patients(1, 9)[0], "patient_id": "new"}
+    batch = [_stream(items[0], moved), _stream(old=items[1]), _stream(new=new)]
+    once = age_index.apply_changes("records", batch, lambda: [], store)
+    again = age_index.apply_changes("records", batch[1:] + batch[:1], lambda: [], store)
+    assert once.records == again.records == 60
+    assert again.overview(None, None) == once.overview(None, None)
+    _assert_matches_scan(again, [moved] + items[2:] + [new])
+
+    stale = _stream(moved, items[0])  # an older change to the same item arriving late
+    stale["dynamodb"]["SequenceNumber"] = batch[0]["dynamodb"]["SequenceNumber"]
+    assert age_index.apply_changes("records", [stale], lambda: [], store).records == 60
+    assert len(again.applied) == 3
+
+    expired = {**new, "patient_id": "expired"}
+    old = _stream(new=expired, created=time.time() - age_index.STREAM_RETENTION - 1)
+    assert len(age_index.apply_changes("records", [old], lambda: [], store).applied) == 3
+
+
+def test_precompute_rebuilds_the_index_and_keeps_sequence_numbers(tmp_path, monkeypatch):
+    from handlers import precompute_cohorts
+
+    emu = LocalDynamo()
+    items = _patients(120)
+    emu.create_table("records", "patient_id", items)
+    emu.create_table("aggs", "aggKey")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("AGGREGATES_TABLE", "aggs")
+    monkeypatch.setattr(age_index, "AGE_INDEX_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(age_index, "_store", None)
+    store = age_index.store()
+
+    drifted = [_stream(old=items[0]), _stream(old=items[0])]  # a bug applied it twice
+    drifted[1]["dynamodb"]["Keys"] = {"patient_id": {"S": "elsewhere"}}
+    age_index.apply_changes("records", [], lambda: items, store)
+    assert age_index.apply_changes("records", drifted, lambda: [], store).records == 118
+
+    assert precompute_cohorts.lambda_handler({}, None)["index_patients"] == 120
+    index = age_index.AgeIndex.from_bytes(store.load("records.age-index").data)
+    _assert_matches_scan(index, items)
+    assert len(index.applied) == 2
+    assert age_index.apply_changes("records", drifted[:1], lambda: [], store).records == 120
+
+
+@pytest.fixture
+def indexed_emu(tmp_path, monkeypatch):
+    emu = LocalDynamo()
+    emu.create_table("records", "patient_id", _patients(300))
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setattr(result_cache.result_cache, "ttl", 0)
+    monkeypatch.setattr(age_index, "AGE_INDEX_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(age_index, "_store", None)
+    age_index._cache.clear()
+    return emu
+
+
+def test_admin_handlers_answer_from_the_index_without_a_scan(indexed_emu):
+    from handlers import admin_diseases, admin_medications, admin_overview, age_index_stream
+
+    emu = indexed_emu
+    assert admin_diseases.lambda_handler({**ADMIN}, None)["statusCode"] == 200  # no snapshot yet
+    assert emu.calls["Scan"] > 0
+    assert age_index_stream.lambda_handler({"Records": []}, None)["patients"] == 300
+    age_index._cache.clear()
+
+    for handler, key in (
+        (admin_diseases, "diseases"),
+        (admin_medications, "medications"),
+        (admin_overview, "total_patients"),
+    ):
+        for lo, hi in WINDOWS[1:4]:
+            event = {**ADMIN, "queryStringParameters": {"min_age": str(lo), "max_age": str(hi)}}
+            scans = emu.calls["Scan"]
+            served = json.loads(handler.lambda_handler(event, None)["body"])
+            assert emu.calls["Scan"] == scans
+            event["queryStringParameters"]["consistent"] = "true"
+            live = json.loads(handler.lambda_handler(event, None)["body"])
+            assert emu.calls["Scan"] > scans
+            assert served[key] == live[key] and served == live
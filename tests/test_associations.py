@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import associations, bitmaps, result_cache
+from lib.utils import compute_age_years
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+DISEASES = ["flu", "asthma", "copd", "diabetes"]
+MEDS = ["ibuprofen", "insulin", "salbutamol"]
+
+
+def _patients(n, seed=9):
+    rng = random.Random(seed)
+    today = date.today()
+    return [
+        {
+            "patient_id": f"p{i}",
+            "date_of_birth": (today - timedelta(days=rng.randint(0, 100 * 365))).isoformat(),
+            "diseases": rng.sample(DISEASES, rng.randint(0, 3)),
+            "medications": rng.sample(MEDS, rng.randint(0, 2)),
+        }
+        for i in range(n)
+    ]
+
+
+def _brute_force(items, min_age, max_age):
+    chosen = [
+        (set(it["medications"]), set(it["diseases"]))
+        for it in items
+        if (min_age is None or compute_age_years(it["date_of_birth"]) >= min_age)
+        and (max_age is None or compute_age_years(it["date_of_birth"]) <= max_age)
+    ]
+    n = len(chosen)
+    rows = {}
+    for m in MEDS:
+        with_m = sum(m in ms for ms, _ in chosen)
+        cells = {}
+        for d in DISEASES:
+            both = sum(m in ms and d in ds for ms, ds in chosen)
+            if both:
+                with_d = sum(d in ds for _, ds in chosen)
+                cells[d] = (
+                    both,
+                    round(both / n, 4),
+                    round(both / with_m, 4),
+                    round(both / with_m * n / with_d, 3),
+                )
+        if with_m:
+            rows[m] = (with_m, cells)
+    return n, rows
+
+
+def test_matrix_matches_brute_force_in_age_windows():
+    items = _patients(900)
+    matrix = associations.AssociationMatrix.build(items)
+    matrix = associations.AssociationMatrix.from_bytes(matrix.to_bytes())
+    assert matrix.nnz == len(MEDS) * len(DISEASES)
+    for lo, hi in [(None, None), (18.0, 65.0), (40.0, 40.5), (80.0, None)]:
+        got = matrix.associations(lo, hi, top=10)
+        total, rows = _brute_force(items, lo, hi)
+        assert got["patients"] == total
+        assert {
+            r["medication"]: (
+                r["patients"],
+                {
+                    c["disease"]: (c["count"], c["support"], c["confidence"], c["lift"])
+                    for c in r["diseases"]
+                },
+            )
+            for r in got["associations"]
+        } == rows
+
+    top = matrix.associations(None, None, top=2, medication="insulin")
+    assert [r["medication"] for r in top["associations"]] == ["insulin"]
+    counts = [c["count"] for c in top["associations"][0]["diseases"]]
+    assert len(counts) == 2 and counts == sorted(counts, reverse=True)
+    with pytest.raises(ValueError):
+        associations.AssociationMatrix.from_bytes(b"nope" + bytes(8))
+
+
+@pytest.fixture
+def emu(tmp_path, monkeypatch):
+    emu = LocalDynamo()
+    emu.create_table("records", "patient_id", _patients(250))
+    emu.create_table("aggs", "aggKey")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("AGGREGATES_TABLE", "aggs")
+    monkeypatch.setattr(result_cache.result_cache, "ttl", 0)
+    monkeypatch.setattr(bitmaps, "BITMAP_INDEX_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(bitmaps, "_store", None)
+    associations._cache.clear()
+    yield emu
+    associations._cache.clear()
+
+
+def _event(**params):
+    return {**ADMIN, "queryStringParameters": params}
+
+
+def test_associations_endpoint_scans_then_uses_published_matrix(emu):
+    from handlers import admin_associations, precompute_cohorts
+
+    assert admin_associations.lambda_handler({}, None)["statusCode"] == 403
+    for bad in ({"top": "0"}, {"top": "x"}, {"min_age": "-1"}):
+        assert admin_associations.lambda_handler(_event(**bad), None)["statusCode"] == 400
+
+    scans = emu.calls["Scan"]
+    live = admin_associations.lambda_handler(_event(min_age="30", top="2"), None)
+    assert live["statusCode"] == 200 and emu.calls["Scan"] > scans
+    body = json.loads(live["body"])
+    assert body["patients"] == _brute_force(emu.items("records"), 30.0, None)[0]
+    assert all(len(r["diseases"]) <= 2 for r in body["associations"])
+
+    assert precompute_cohorts.lambda_handler({}, None)["association_bytes"] > 0
+    associations._cache.clear()  # instead of waiting BITMAP_INDEX_REFRESH for the re-check
+    scans = emu.calls["Scan"]
+    served = admin_associations.lambda_handler(_event(min_age="30", top="2"), None)
+    assert emu.calls["Scan"] == scans and served["body"] == live["body"]
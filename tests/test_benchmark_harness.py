@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.harness import compare, measure, percentile  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    samples = [float(x) for x in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 95) == 95.0
+
+
+def test_measure_reports_all_metrics():
+    result = measure(lambda: [0] * 10_000, repeats=5)
+    assert set(result) >= {"p50_ms", "p95_ms", "cpu_ms", "peak_kb"}
+    assert result["peak_kb"] > 50
+
+
+def test_compare_flags_only_out_of_tolerance_metrics():
+    baseline = {
+        "tolerances": {"p50_ms": 0.5},
+        "results": {"case@1000": {"p50_ms": 10.0, "peak_kb": 100.0}},
+    }
+    ok, _ = compare({"case@1000": {"p50_ms": 14.0, "peak_kb": 110.0}}, baseline)
+    assert ok == []
+    bad, lines = compare({"case@1000": {"p50_ms": 30.0, "peak_kb": 500.0}, "new@1": {}}, baseline)
+    assert len(bad) == 2 and any("no baseline" in line for line in lines)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, List
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lib.bulk_load as bulk
+from lib.bulk_load import load, load_checkpoint, read_records, write_batch
+
+
+class FlakyClient:
+    """Accepts only the first half of each batch and throttles every 5th call per thread."""
+
+    def __init__(self) -> None:
+        self.stored: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+        self.max_batch = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        # Counting per thread keeps the throttle pattern independent of scheduling.
+        calls = self._local.calls = getattr(self._local, "calls", 0) + 1
+        (table, reqs), = RequestItems.items()
+        self.max_batch = max(self.max_batch, len(reqs))
+        if calls % 5 == 0:
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "BatchWriteItem")
+        keep = (len(reqs) + 1) // 2
+        with self._lock:
+            for r in reqs[:keep]:
+                item = r["PutRequest"]["Item"]
+                self.stored[item["patient_id"]["S"]] = item
+        rest = reqs[keep:]
+        return {"UnprocessedItems": {table: rest} if rest else {}}
+
+
+def _row(i: int) -> Dict[str, Any]:
+    return {
+        "patient_id": f"p{i}",
+        "name": "N",
+        "sex": "F",
+        "date_of_birth": "1990-01-01",
+        "bmi": 21.5,
+        "diseases": ["asthma"],
+    }
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep(monkeypatch):
+    monkeypatch.setattr(bulk, "backoff_delay", lambda attempt: 0.0)
+
+
+def test_write_batch_retries_unprocessed_and_throttling():
+    client = FlakyClient()
+    items = bulk.validate_chunk([_row(i) for i in range(25)])[0]
+    retries = write_batch(client, "t", items, sleep=lambda s: None)
+    assert len(client.stored) == 25 and retries > 0
+
+
+def test_load_parallel_with_rejects_and_checkpoint(tmp_path):
+    client = FlakyClient()
+    rows = [_row(i) for i in range(530)]
+    rows[7] = {"patient_id": "bad"}
+    rejected: List[Dict[str, Any]] = []
+    ckpt = str(tmp_path / "ck.json")
+    stats = load(
+        client,
+        "t",
+        rows,
+        workers=4,
+        chunk_size=100,
+        checkpoint_path=ckpt,
+        on_reject=rejected.append,
+    )
+    assert stats.written == 529 and stats.rejected == 1 and len(rejected) == 1
+    assert len(client.stored) == 529
+    assert client.max_batch <= 25
+    assert load_checkpoint(ckpt) == 530
+    assert stats.snapshot()["itemsPerSec"] > 0
+
+
+def test_read_records_resumes_ndjson_and_csv(tmp_path):
+    nd = tmp_path / "in.ndjson"
+    nd.write_text("\n".join(json.dumps(_row(i)) for i in range(5)))
+    assert [r["patient_id"] for r in read_records(str(nd), skip=3)] == ["p3", "p4"]
+
+    cs = tmp_path / "in.csv"
+    cs.write_text(
+        "patient_id,name,sex,date_of_birth,bmi,diseases,medications\n"
+        "p1,N,M,1990-01-01,20.1,a;b,\n"
+    )
+    (rec,) = read_records(str(cs))
+    assert rec["diseases"] == ["a", "b"] and "medications" not in rec
+    items, rejects = bulk.validate_chunk([rec], key_attr="patientId")
+    assert not rejects and items[0]["patientId"] == {"S": "p1"}
+
+
+def test_load_bumps_the_data_version_only_with_a_shared_cache(monkeypatch):
+    from lib import result_cache
+
+    before = result_cache.data_version("t")
+    load(FlakyClient(), "t", [_row(0)], workers=1)
+    assert result_cache.data_version("t") == before
+
+    monkeypatch.setattr(result_cache, "SHARED", True)
+    load(FlakyClient(), "t", [_row(0)], workers=1)
+    assert result_cache.data_version("t") != before
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import cache
+from lib.cache import Cache, LocalBackend, read_through, wants_consistent
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_negative_ttl_and_lru_eviction():
+    clock = Clock()
+    c = Cache(LocalBackend(max_size=2, clock=clock), "t", ttl=10, negative_ttl=2)
+    loads = []
+
+    def loader(value):
+        return lambda: loads.append(value) or value
+
+    assert read_through(c, "a", loader({"id": "a"})) == {"id": "a"}
+    assert read_through(c, "a", loader({"id": "x"})) == {"id": "a"}
+    assert read_through(c, "gone", loader(None)) is None
+    assert read_through(c, "gone", loader(None)) is None
+    assert len(loads) == 2
+
+    clock.now = 3
+    read_through(c, "gone", loader(None))
+    assert len(loads) == 3
+    read_through(c, "b", loader({"id": "b"}))
+    assert c.get("a") is cache._MISSING  # evicted: least recently used of three keys
+    clock.now = 20
+    assert c.get("b") is cache._MISSING
+
+    read_through(c, "b", loader({"id": "b2"}), consistent=True)
+    assert read_through(c, "b", loader({"id": "b3"})) == {"id": "b2"}
+    assert Cache(LocalBackend(), "t", ttl=0).enabled is False
+
+
+def test_wants_consistent():
+    assert wants_consistent({"queryStringParameters": {"consistent": "true"}})
+    assert wants_consistent({"headers": {"cache-control": "no-cache"}})
+    assert not wants_consistent({"headers": {}})
+
+
+def test_patient_paths_share_cache_and_writes_invalidate(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    import handlers.patient_handler as patient_handler
+    import handlers.patient_me as patient_me
+
+    emu = LocalDynamo()
+    emu.create_table("patients", "patientId", [{"patientId": "a@b.c", "diagnosis": "flu"}])
+    monkeypatch.setattr(patient_me, "dynamodb", emu.resource())
+    monkeypatch.setattr(patient_me, "TABLE_NAME", "patients")
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+    monkeypatch.setenv("TABLE_NAME", "patients")
+    cache.patient_cache.clear()
+
+    claims = {"requestContext": {"authorizer": {"jwt": {"claims": {"email": "a@b.c"}}}}}
+    missing = {"requestContext": {"authorizer": {"jwt": {"claims": {"email": "x@y.z"}}}}}
+    for _ in range(3):
+        body = json.loads(patient_me.lambda_handler(claims, None)["body"])
+        assert body["patient"]["diagnosis"] == "flu"
+        assert json.loads(patient_me.lambda_handler(missing, None)["body"])["patient"] is None
+    assert emu.calls["GetItem"] == 2
+
+    put = {
+        "requestContext": {
+            "authorizer": {"jwt": {"claims": {"email": "a@b.c"}}},
+            "http": {"method": "PUT"},
+        },
+        "body": json.dumps({"diagnosis": "cold"}),
+    }
+    assert patient_handler.handler(put, None)["statusCode"] == 200
+    body = json.loads(patient_me.lambda_handler(claims, None)["body"])
+    # The write put the new item into the cache, so the read needs no GetItem.
+    assert body["patient"]["diagnosis"] == "cold" and emu.calls["GetItem"] == 2
+
+    consistent = dict(claims, queryStringParameters={"consistent": "true"})
+    patient_me.lambda_handler(consistent, None)
+    assert emu.calls["GetItem"] == 3
+    cache.patient_cache.clear()
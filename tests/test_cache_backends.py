@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import json
+import socketserver
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import cache
+from lib.cache import Cache, LocalBackend, read_through
+from lib.cache_backends import (
+    CacheUnavailable,
+    DynamoBackend,
+    RedisBackend,
+    RedisError,
+    RespConnection,
+)
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """Enough of a Redis server for the backend: GET/SET PX/DEL/WATCH/MULTI/EXEC."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.data = {}
+        self.versions = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            self.versions[key] = self.versions.get(key, 0) + 1
+            return None
+        return entry[0] if entry else None
+
+    def write(self, key, value, px=None):
+        expires = time.monotonic() + px / 1000.0 if px else None
+        if value is None:
+            self.data.pop(key, None)
+        else:
+            self.data[key] = (value, expires)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(map(_FakeRedisHandler._encode, value))
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _apply(self, server, name, args):
+        if name == "GET":
+            return server.live(args[0])
+        if name == "SET":
+            px = int(args[3]) if len(args) > 3 and args[2].upper() == b"PX" else None
+            server.write(args[0], args[1], px)
+            return "OK"
+        if name == "DEL":
+            existed = server.live(args[0]) is not None
+            server.write(args[0], None)
+            return int(existed)
+        return "OK"
+
+    def handle(self):
+        server = self.server
+        watched, queue = {}, None
+        while True:
+            cmd = self._read_command()
+            if cmd is None:
+                return
+            name, args = cmd[0].decode().upper(), cmd[1:]
+            server.commands.append(name)
+            with server.lock:
+                if name == "WATCH":
+                    watched = {k: server.versions.get(k, 0) for k in args}
+                    reply = "OK"
+                elif name == "UNWATCH":
+                    watched, reply = {}, "OK"
+                elif name == "MULTI":
+                    queue, reply = [], "OK"
+                elif name == "EXEC":
+                    ok = all(server.versions.get(k, 0) == v for k, v in watched.items())
+                    reply = [self._apply(server, n, a) for n, a in queue] if ok else None
+                    if reply is None:
+                        self.wfile.write(b"*-1\r\n")
+                        watched, queue = {}, None
+                        continue
+                    watched, queue = {}, None
+                elif queue is not None:
+                    queue.append((name, args))
+                    reply = "QUEUED"
+                else:
+                    reply = self._apply(server, name, args)
+            self.wfile.write(self._encode(reply))
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedis()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _backends(redis_server):
+    emu = LocalDynamo()
+    emu.create_table("cache", "cacheKey")
+    return {
+        "local": LocalBackend(),
+        "redis": RedisBackend("127.0.0.1", redis_server.server_address[1]),
+        "dynamo": DynamoBackend(emu.client(), "cache"),
+    }
+
+
+def test_common_api_across_backends(redis_server):
+    value = {"bmi": Decimal("22.5"), "tags": {"a"}, "n": [1, None]}
+    for name, backend in _backends(redis_server).items():
+        c = Cache(backend, "ns", ttl=30, negative_ttl=5)
+        assert c.get(("t", "k")) is cache._MISSING, name
+        c.put(("t", "k"), value)
+        assert c.get(("t", "k")) == value, name
+        c.put("absent", None)
+        assert c.get("absent") is None, name
+
+        current, version = c.gets(("t", "k"))
+        assert current == value
+        assert c.cas(("t", "k"), version, {"v": 2}), name
+        assert not c.cas(("t", "k"), version, {"v": 3}), name
+        assert c.get(("t", "k")) == {"v": 2}
+        assert c.cas("new", None, {"v": 1}) and not c.cas("new", None, {"v": 1}), name
+
+        c.invalidate(("t", "k"))
+        assert c.get(("t", "k")) is cache._MISSING, name
+
+
+def test_redis_ttl_and_concurrent_cas(redis_server):
+    backend = RedisBackend("127.0.0.1", redis_server.server_address[1])
+    backend.set("short", b"x", 0.05)
+    assert backend.get("short") == b"x"
+    time.sleep(0.08)
+    assert backend.get("short") is None
+
+    backend.set("counter", b"0", 30)
+    errors = []
+
+    def bump():
+        try:
+            for _ in range(20):
+                while True:
+                    data, version = backend.gets("counter")
+                    if backend.cas("counter", version, str(int(data) + 1).encode(), 30):
+                        break
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and backend.get("counter") == b"80"
+
+
+def test_redis_cas_error_does_not_leak_multi_into_the_next_command(redis_server):
+    backend = RedisBackend("127.0.0.1", redis_server.server_address[1])
+    backend.set("k", b"1", 30)
+    conn = backend.conn
+    command = conn.command
+
+    def failing(*args):
+        if args[0] == "SET":
+            raise RedisError("ERR injected")
+        return command(*args)
+
+    conn.command = failing
+    with pytest.raises(RedisError):
+        backend.cas("k", b"1", b"2", 30)
+    del conn.command
+    assert backend.get("k") == b"1"
+    assert backend.cas("k", b"1", b"2", 30) and backend.get("k") == b"2"
+
+
+def test_unreachable_backend_degrades_to_loader():
+    dead = Cache(RedisBackend("127.0.0.1", 1, timeout=0.05), "ns", ttl=30)
+    assert read_through(dead, "k", lambda: {"ok": True}) == {"ok": True}
+    assert dead.gets("k") == (cache._MISSING, None)
+    assert dead.cas("k", None, {"ok": True}) is False
+    with pytest.raises(CacheUnavailable):
+        RespConnection("127.0.0.1", 1, timeout=0.05).command("PING")
+
+
+def test_admin_metrics_results_go_through_shared_cache(redis_server, monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    import handlers.admin_metrics as admin_metrics
+
+    shared = RedisBackend("127.0.0.1", redis_server.server_address[1])
+    monkeypatch.setattr(admin_metrics, "metrics_cache", Cache(shared, "metrics", ttl=60))
+    emu = LocalDynamo()
+    emu.create_table(
+        "patients", "patientId", [{"patientId": f"p{i}", "status": "active"} for i in range(10)]
+    )
+    monkeypatch.setattr(admin_metrics, "dynamodb", emu.resource())
+    monkeypatch.setattr(admin_metrics, "TABLE_NAME", "patients")
+
+    event = {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "GroupAdmin"}}}}
+    }
+    first = admin_metrics.lambda_handler(event, None)
+    second = admin_metrics.lambda_handler(event, None)
+    assert (
+        json.loads(first["body"])
+        == json.loads(second["body"])
+        == {
+            "totalPatients": 10,
+            "byStatus": {"active": 10},
+        }
+    )
+    assert emu.calls["Scan"] == 1
+    assert redis_server.commands.count("SET") == 1
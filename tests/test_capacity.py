@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import capacity, timing
+
+
+def _emf(out: str):
+    (line,) = [line for line in out.splitlines() if line.startswith('{"_aws"')]
+    return json.loads(line)
+
+
+def test_units_sums_single_and_batch_entries():
+    assert capacity.units({}) == 0.0
+    assert capacity.units({"ConsumedCapacity": {"CapacityUnits": 1.5}}) == 1.5
+    batch = {"ConsumedCapacity": [{"CapacityUnits": 2.0}, {"CapacityUnits": 0.5}]}
+    assert capacity.units(batch) == 2.5
+    assert capacity.record("Scan", {"Items": [1]}) == {"Items": [1]}
+
+
+def test_admin_scan_reports_capacity_in_emf_and_header(monkeypatch, capsys):
+    import lib.db
+    import handlers.admin_diseases as diseases
+
+    emu = LocalDynamo()
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {"patient_id": f"id-{i}", "date_of_birth": "1980-01-01", "notes": "n" * 1000}
+            for i in range(2500)
+        ],
+    )
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(timing, "CAPACITY_HEADER", True)
+
+    admin = {
+        "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}},
+        "queryStringParameters": {"min_age": "18"},
+    }
+    resp = diseases.lambda_handler(admin, None)
+    record = _emf(capsys.readouterr().out)
+
+    assert record["read_units"] == emu.read_units["records"] > 0
+    assert record["pages"] == 3 and record["scanned_items"] == 2500
+    assert record["query_shape"] == "min_age"
+    assert ["function", "query_shape"] in record["_aws"]["CloudWatchMetrics"][0]["Dimensions"]
+    header = resp["headers"]["X-Consumed-Capacity"]
+    assert header.startswith(f"read_units={record['read_units']:g}") and "pages=3" in header
+
+
+def test_mode_none_skips_request_parameter(monkeypatch):
+    monkeypatch.setattr(capacity, "MODE", "NONE")
+    assert capacity.request() == {}
+    monkeypatch.setattr(capacity, "MODE", "INDEXES")
+    assert capacity.request() == {"ReturnConsumedCapacity": "INDEXES"}
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import aggregate, cohort_cube, result_cache
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+
+
+def _patients(n, seed=11):
+    rng = random.Random(seed)
+    today = date.today()
+    return [
+        {
+            "patient_id": f"p{i}",
+            "date_of_birth": (today - timedelta(days=rng.randint(0, 100 * 365))).isoformat(),
+            "sex": rng.choice(["F", "M"]),
+            "bmi": rng.randint(16, 40),
+            "diseases": rng.sample(["flu", "asthma", "copd"], rng.randint(0, 2)),
+            "medications": rng.sample(["ibuprofen", "insulin"], rng.randint(0, 1)),
+        }
+        for i in range(n)
+    ]
+
+
+def test_cube_matches_scan_including_partial_birth_years():
+    rng = random.Random(5)
+    items = _patients(1500)
+    for it in items[::7]:
+        it["bmi"] = round(rng.uniform(15, 45), 2)  # floats whose sums depend on order
+    cube = cohort_cube.CohortCube.from_bytes(cohort_cube.CohortCube.build(items).to_bytes())
+    assert cube.patients == 1500
+    windows = [(None, None), (18.0, 65.0), (30.0, 30.5), (99.99, None)]
+    windows += [(round(rng.uniform(0, 60), 2), round(rng.uniform(40, 110), 2)) for _ in range(40)]
+    for lo, hi in windows:
+        chosen, ages = aggregate.select(items, lo, hi)
+        for endpoint, build in aggregate.BUILDERS.items():
+            expected = json.dumps(build(chosen, ages))
+            assert json.dumps(cohort_cube.BODIES[endpoint](cube, lo, hi)) == expected
+
+
+def test_cube_size_follows_vocabulary_not_patients():
+    items = _patients(400)
+    cube = cohort_cube.CohortCube.build(items)
+    tenfold = cohort_cube.CohortCube.build(
+        {**it, "patient_id": f"{it['patient_id']}-{k}"} for k in range(10) for it in items
+    )
+    assert tenfold.patients == 10 * cube.patients
+    assert (len(tenfold.years), len(tenfold.days)) == (len(cube.years), len(cube.days))
+    assert tenfold.overview(None, None)["total_patients"] == 4000
+    with pytest.raises(ValueError):
+        cohort_cube.CohortCube.from_bytes(b"nope" + bytes(8))
+
+
+@pytest.fixture
+def cube_emu(tmp_path, monkeypatch):
+    emu = LocalDynamo()
+    emu.create_table("records", "patient_id", _patients(300))
+    emu.create_table("aggs", "aggKey")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("AGGREGATES_TABLE", "aggs")
+    monkeypatch.setattr(result_cache.result_cache, "ttl", 0)
+    monkeypatch.setattr(cohort_cube, "COHORT_CUBE_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(cohort_cube, "_store", None)
+    cohort_cube._cache.clear()
+    yield emu
+    cohort_cube._cache.clear()
+
+
+def test_precompute_publishes_cube_that_serves_any_window(cube_emu, monkeypatch):
+    from handlers import admin_diseases, admin_overview, precompute_cohorts
+
+    emu = cube_emu
+    summary = precompute_cohorts.lambda_handler({}, None)
+    assert summary["cube_cells"] > 0 and summary["cube_bytes"] > 0
+
+    event = {**ADMIN, "queryStringParameters": {"min_age": "23.4", "max_age": "57.1"}}
+    scans = emu.calls["Scan"]
+    served = json.loads(admin_diseases.lambda_handler(event, None)["body"])
+    overview = json.loads(admin_overview.lambda_handler(event, None)["body"])
+    assert emu.calls["Scan"] == scans  # not a configured cohort, answered from the cube
+    live_event = {**event, "queryStringParameters": {**event["queryStringParameters"]}}
+    live_event["queryStringParameters"]["consistent"] = "true"
+    assert served == json.loads(admin_diseases.lambda_handler(live_event, None)["body"])
+    live = json.loads(admin_overview.lambda_handler(live_event, None)["body"])
+    assert overview == live
+
+    cube = cohort_cube._cache.get(cohort_cube.store(), cohort_cube.snapshot_name("records"))
+    monkeypatch.setattr(cube, "built_at", cube.built_at - aggregate.PRECOMPUTE_MAX_AGE - 1)
+    scans = emu.calls["Scan"]
+    admin_diseases.lambda_handler(event, None)
+    assert emu.calls["Scan"] == scans + 1  # stale cube: scan
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import aggregate
+from lib.columnar import ATTRIBUTES, PatientColumns, Vocabulary
+
+
+def _patients(n, seed=4):
+    rng = random.Random(seed)
+    today = date.today()
+    return [
+        {
+            "patient_id": f"p{i}",
+            "date_of_birth": (today - timedelta(days=rng.randint(0, 100 * 365))).isoformat(),
+            "sex": rng.choice(["F", "M", "", None]),
+            "bmi": Decimal(str(round(rng.uniform(15, 40), 1))),
+            "diseases": rng.choice([[], ["flu"], ["flu", "flu"], ["asthma", "", "copd"]]),
+            "medications": rng.choice([[], ["insulin"], ["ibuprofen", "insulin"]]),
+            "notes": "n" * 300,
+        }
+        for i in range(n)
+    ]
+
+
+def test_column_aggregations_are_byte_identical_to_the_dict_path():
+    items = _patients(600)
+    items[3].pop("bmi")
+    items[4].pop("medications")
+    columns = PatientColumns()
+    columns.extend(items)
+    assert len(columns) == 600
+    for lo, hi in [(None, None), (18.0, 65.0), (30.0, 39.99), (65.0, None)]:
+        chosen, ages = aggregate.select(items, lo, hi)
+        rows, col_ages = columns.select(lo, hi)
+        assert json.dumps(columns.overview(rows, col_ages)) == json.dumps(
+            aggregate.overview(chosen, ages)
+        )
+        assert json.dumps(columns.disease_counts(rows)) == json.dumps(
+            aggregate.disease_counts(chosen)
+        )
+        assert json.dumps(columns.medication_counts(rows)) == json.dumps(
+            aggregate.medication_counts(chosen)
+        )
+    with pytest.raises(KeyError):
+        columns.append({"patient_id": "x"})
+
+
+def test_vocabulary_is_per_build_and_columns_stay_small():
+    vocab = Vocabulary()
+    assert [vocab.id(s) for s in ("flu", "insulin", "flu")] == [0, 1, 0]
+    assert vocab.names == ["flu", "insulin"]
+
+    a, b = PatientColumns(), PatientColumns()
+    a.extend(_patients(100, seed=1))
+    b.extend(_patients(100, seed=2))
+    assert a.vocab is not b.vocab
+    assert "flu" in a.vocab.ids and "flu" in b.vocab.ids
+    assert len(a.vocab) == len(set(a.vocab.names))
+    assert a.nbytes() < 100 * 64  # a few dozen bytes per patient
+
+
+def test_scan_columns_projects_and_pages(monkeypatch):
+    emu = LocalDynamo(page_limit_bytes=16 * 1024)
+    items = _patients(300)
+    emu.create_table("records", "patient_id", items)
+    table = emu.resource().Table("records")
+    pages = []
+
+    class Recording:
+        def scan(self, **kwargs):
+            resp = table.scan(**kwargs)
+            pages.append(resp["Items"])
+            return resp
+
+    monkeypatch.setattr(lib.db, "_table", Recording())
+    columns = lib.db.scan_columns()
+    assert all(set(it) <= set(ATTRIBUTES) for page in pages for it in page)
+    monkeypatch.setattr(lib.db, "_table", table)
+    assert emu.calls["Scan"] > 1  # paged
+    assert len(columns) == 300
+    expected = aggregate.disease_counts(lib.db.scan_patients())
+    assert columns.disease_counts(range(len(columns))) == expected
+
+
+def test_single_field_scans_read_one_term_and_keep_no_columns(monkeypatch):
+    emu = LocalDynamo(page_limit_bytes=16 * 1024)
+    items = _patients(300)
+    emu.create_table("records", "patient_id", items)
+    table = emu.resource().Table("records")
+    pages = []
+
+    class Recording:
+        def scan(self, **kwargs):
+            resp = table.scan(**kwargs)
+            pages.append(resp["Items"])
+            return resp
+
+    monkeypatch.setattr(lib.db, "_table", Recording())
+    body = aggregate.scan_counts("medications", 18, 65)
+    assert len(pages) > 1
+    assert all(set(it) <= {"date_of_birth", "medications"} for page in pages for it in page)
+    chosen, _ = aggregate.select(items, 18, 65)
+    assert json.dumps(body) == json.dumps(aggregate.medication_counts(chosen))
+
+    pages.clear()
+    columns = lib.db.scan_columns(("diseases",))
+    assert all("medications" not in it for page in pages for it in page)
+    assert list(columns.term_ids) == ["diseases"] and len(columns) == 300
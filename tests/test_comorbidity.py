@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import bitmaps, result_cache
+from lib.utils import compute_age_years
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+DISEASES = ["flu", "asthma", "copd", "diabetes", "gout"]
+
+
+def _patients(n, seed=3):
+    rng = random.Random(seed)
+    today = date.today()
+    return [
+        {
+            "patient_id": f"p{i}",
+            "date_of_birth": (today - timedelta(days=rng.randint(0, 100 * 365))).isoformat(),
+            "diseases": rng.sample(DISEASES, rng.randint(0, 3)),
+        }
+        for i in range(n)
+    ]
+
+
+def _brute_force(items, disease, min_age, max_age):
+    chosen = [
+        set(it["diseases"])
+        for it in items
+        if (min_age is None or compute_age_years(it["date_of_birth"]) >= min_age)
+        and (max_age is None or compute_age_years(it["date_of_birth"]) <= max_age)
+    ]
+    with_x = [d for d in chosen if disease in d]
+    rows = {}
+    for other in DISEASES:
+        both = sum(other in d for d in with_x)
+        if other != disease and both:
+            with_y = sum(other in d for d in chosen)
+            rows[other] = (both, round(both * len(chosen) / (len(with_x) * with_y), 3))
+    return len(chosen), len(with_x), rows
+
+
+def test_bitmap_comorbidity_matches_brute_force():
+    items = _patients(800)
+    index = bitmaps.BitmapIndex.from_bytes(bitmaps.BitmapIndex.build(items).to_bytes())
+    assert len(index) == 800
+    for disease in ("flu", "gout", "unknown"):
+        for lo, hi in [(None, None), (18.0, 65.0), (30.0, 30.99), (70.5, None)]:
+            got = index.comorbidity(disease, lo, hi)
+            total, with_x, rows = _brute_force(items, disease, lo, hi)
+            assert (got["patients"], got["with_disease"]) == (total, with_x)
+            assert {r["disease"]: (r["count"], r["lift"]) for r in got["comorbidities"]} == rows
+            counts = [r["count"] for r in got["comorbidities"]]
+            assert counts == sorted(counts, reverse=True)
+    with pytest.raises(ValueError):
+        bitmaps.BitmapIndex.from_bytes(b"nope" + bytes(8))
+
+
+@pytest.fixture
+def emu(tmp_path, monkeypatch):
+    emu = LocalDynamo()
+    emu.create_table("records", "patient_id", _patients(200))
+    emu.create_table("aggs", "aggKey")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("AGGREGATES_TABLE", "aggs")
+    monkeypatch.setattr(result_cache.result_cache, "ttl", 0)
+    monkeypatch.setattr(bitmaps, "BITMAP_INDEX_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(bitmaps, "_store", None)
+    bitmaps._cache.clear()
+    yield emu
+    bitmaps._cache.clear()
+
+
+def _event(**params):
+    return {**ADMIN, "queryStringParameters": params}
+
+
+def test_comorbidity_endpoint_scans_then_uses_published_bitmaps(emu):
+    from handlers import admin_comorbidity, precompute_cohorts
+
+    assert admin_comorbidity.lambda_handler(_event(), None)["statusCode"] == 400
+    assert admin_comorbidity.lambda_handler({}, None)["statusCode"] == 403
+    bad = admin_comorbidity.lambda_handler(_event(disease="flu", min_age="9", max_age="1"), None)
+    assert bad["statusCode"] == 400
+
+    scans = emu.calls["Scan"]
+    live = admin_comorbidity.lambda_handler(_event(disease="flu", min_age="20"), None)
+    assert live["statusCode"] == 200 and emu.calls["Scan"] > scans
+    body = json.loads(live["body"])
+    total, with_x, rows = _brute_force(emu.items("records"), "flu", 20.0, None)
+    assert (body["patients"], body["with_disease"]) == (total, with_x)
+
+    assert precompute_cohorts.lambda_handler({}, None)["bitmap_bytes"] > 0
+    bitmaps._cache.clear()  # instead of waiting BITMAP_INDEX_REFRESH for the re-check
+    scans = emu.calls["Scan"]
+    served = admin_comorbidity.lambda_handler(_event(disease="flu", min_age="20"), None)
+    assert emu.calls["Scan"] == scans
+    assert served["body"] == live["body"]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from boto3.dynamodb.types import TypeSerializer
+
+from lib.export import export_table
+
+_ser = TypeSerializer()
+
+
+class PagedClient:
+    """Low-level client stub: hash-partitions items into segments, pages by Limit."""
+
+    def __init__(self, n: int, page: int = 7) -> None:
+        self.items = [
+            {
+                k: _ser.serialize(v)
+                for k, v in {
+                    "patient_id": f"p-{i:04d}",
+                    "name": f"Patient {i}",
+                    "sex": "F" if i % 2 else "M",
+                    "date_of_birth": "1980-01-01",
+                    "bmi": 22 + (i % 5),
+                    "diseases": ["asthma"] if i % 3 == 0 else [],
+                    "medications": [],
+                }.items()
+            }
+            for i in range(n)
+        ]
+        self.page = page
+        self.calls = 0
+
+    def scan(self, **kw: Any) -> Dict[str, Any]:
+        self.calls += 1
+        seg, total = kw["Segment"], kw["TotalSegments"]
+        mine = [it for i, it in enumerate(self.items) if i % total == seg]
+        start = kw.get("ExclusiveStartKey", {}).get("idx", 0)
+        chunk = mine[start : start + self.page]
+        resp: Dict[str, Any] = {"Items": chunk}
+        if start + self.page < len(mine):
+            resp["LastEvaluatedKey"] = {"idx": start + self.page}
+        return resp
+
+
+def _read_parts(out: str, manifest: Dict[str, Any]) -> List[str]:
+    lines: List[str] = []
+    for part in manifest["parts"]:
+        with gzip.open(os.path.join(out, part["path"]), "rt", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_export_ndjson_parts_and_manifest(tmp_path):
+    out = str(tmp_path)
+    manifest = export_table(PagedClient(100), "t", out, segments=3, chunk_rows=10)
+    assert manifest["complete"] and manifest["rows"] == 100
+    assert len(manifest["parts"]) > 3
+    records = [json.loads(line) for line in _read_parts(out, manifest)]
+    assert sorted(r["patient_id"] for r in records) == [f"p-{i:04d}" for i in range(100)]
+    assert isinstance(records[0]["bmi"], int)
+    on_disk = json.loads((tmp_path / "manifest.json").read_text())
+    assert on_disk["rows"] == 100
+
+
+def test_export_csv_with_redaction(tmp_path):
+    out = str(tmp_path)
+    manifest = export_table(
+        PagedClient(20), "t", out, segments=2, fmt="csv", redact_fields=["name", "date_of_birth"]
+    )
+    with gzip.open(os.path.join(out, manifest["parts"][0]["path"]), "rt") as f:
+        rows = list(csv.DictReader(io.StringIO(f.read())))
+    assert rows and all(r["name"] == "" and r["date_of_birth"] == "" for r in rows)
+    assert rows[0]["patient_id"].startswith("p-")
+
+
+def test_export_resumes_from_checkpoints(tmp_path):
+    out = str(tmp_path)
+    client = PagedClient(60, page=5)
+    stops = iter([False, True] + [False] * 100)
+    first = export_table(
+        client, "t", out, segments=1, chunk_rows=5, should_stop=lambda: next(stops)
+    )
+    assert not first["complete"]
+    assert not (tmp_path / "manifest.json").exists()
+
+    calls_before = client.calls
+    second = export_table(client, "t", out, segments=1, chunk_rows=5)
+    assert second["complete"] and second["rows"] == 60
+    assert client.calls - calls_before == 10
+    ids = [json.loads(line)["patient_id"] for line in _read_parts(out, second)]
+    assert len(ids) == len(set(ids)) == 60
+
+
+class FakeS3:
+    """Just enough of the S3 client for the export handler."""
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+
+    def upload_file(self, path: str, bucket: str, key: str) -> None:
+        with open(path, "rb") as f:
+            self.objects[key] = f.read()
+
+    def download_file(self, bucket: str, key: str, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+    def get_paginator(self, name: str) -> "FakeS3":
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str) -> List[Dict[str, Any]]:
+        return [{"Contents": [{"Key": k} for k in sorted(self.objects) if k.startswith(Prefix)]}]
+
+
+class Context:
+    def __init__(self, remaining: List[int]) -> None:
+        self.remaining = iter(remaining)
+
+    def get_remaining_time_in_millis(self) -> int:
+        return next(self.remaining, 600_000)
+
+
+def test_export_handler_resumes_in_another_container(tmp_path, monkeypatch):
+    from handlers import admin_export
+
+    s3, dynamo = FakeS3(), PagedClient(40, page=5)
+    monkeypatch.setattr(
+        admin_export.boto3, "client", lambda name, **kw: s3 if name == "s3" else dynamo
+    )
+    monkeypatch.setenv("PATIENT_TABLE_NAME", "t")
+    monkeypatch.setenv("EXPORT_BUCKET", "bucket")
+    event = {"segments": 1, "chunkRows": 5}
+
+    monkeypatch.setenv("EXPORT_TMP_DIR", str(tmp_path / "a"))
+    first = admin_export.lambda_handler(event, Context([600_000, 1]))
+    assert not first["complete"]
+    job = first["jobId"]
+    assert any(k.startswith(f"exports/{job}/_checkpoints/") for k in s3.objects)
+
+    monkeypatch.setenv("EXPORT_TMP_DIR", str(tmp_path / "b"))  # a different container
+    second = admin_export.lambda_handler({**event, "jobId": job}, Context([]))
+    assert second["complete"] and second["rows"] == 40
+    assert f"exports/{job}/manifest.json" in s3.objects
+
+    third = admin_export.lambda_handler(event, Context([]))
+    assert third["jobId"] != job and third["rows"] == 40
+
+
+@pytest.mark.parametrize(
+    "event, error",
+    [
+        ({"format": "xml"}, "format must be one of"),
+        ({"segments": "four"}, "segments must be an integer"),
+        ({"segments": -1}, "segments must be >= 1"),
+        ({"chunkRows": [5]}, "chunkRows must be an integer"),
+    ],
+)
+def test_export_handler_rejects_bad_options(monkeypatch, event, error):
+    from handlers import admin_export
+
+    monkeypatch.setenv("PATIENT_TABLE_NAME", "t")
+    result = admin_export.lambda_handler(event, Context([]))
+    assert result["complete"] is False and result["error"].startswith(error)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import generate_patients as gen  # noqa: E402
+from lib.bulk_load import read_records, validate_chunk  # noqa: E402
+
+
+def test_same_seed_gives_identical_bytes(tmp_path):
+    for fmt, name in (("ndjson", "x.ndjson.gz"), ("dynamodb-json", "x.json"), ("npz", "x.npz")):
+        a, b = tmp_path / ("a" + name), tmp_path / ("b" + name)
+        for p in (a, b):
+            if fmt == "npz":
+                gen.write_npz(str(p), 7, 2500, gen.date(2025, 1, 1))
+            else:
+                gen.write_text(str(p), 7, 2500, fmt, gen.date(2025, 1, 1))
+        assert a.read_bytes() == b.read_bytes(), fmt
+    other = tmp_path / "c.json"
+    gen.write_text(str(other), 8, 2500, "dynamodb-json", gen.date(2025, 1, 1))
+    assert other.read_bytes() != (tmp_path / "ax.json").read_bytes()
+
+
+def test_ndjson_rows_are_valid_patient_records(tmp_path):
+    out = tmp_path / "p.ndjson.gz"
+    gen.write_text(str(out), 1, 1000, "ndjson", gen.date(2025, 1, 1))
+    rows = list(read_records(str(out)))
+    items, rejects = validate_chunk(rows)
+    assert len(items) == 1000 and not rejects
+    assert len({r["patient_id"] for r in rows}) == 1000
+    assert all(set(r["diseases"]) <= set(gen.DISEASES) for r in rows)
+
+
+def test_zipf_ranks_and_dynamodb_json(tmp_path):
+    cols = gen.generate_chunk(3, 0, 20000)
+    freq = [(cols["diseases"] >> i & 1).sum() for i in range(len(gen.DISEASES))]
+    assert freq == sorted(freq, reverse=True)
+    assert 15.0 <= cols["bmi"].min() and cols["bmi"].max() <= 55.0
+
+    line = next(gen.dynamodb_json_lines(gen.generate_chunk(3, 0, 1)))
+    item = json.loads(line)["Item"]
+    assert set(item["bmi"]) == {"N"} and "L" in item["diseases"]
+
+    out = tmp_path / "c.npz"
+    gen.write_npz(str(out), 3, 10, gen.date(2025, 1, 1))
+    with np.load(out) as z:
+        assert z["birth_day"].shape == (10,) and list(z["vocab_diseases"]) == gen.DISEASES
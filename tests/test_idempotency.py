@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import cache, idempotency
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    import handlers.patient_handler as patient_handler
+
+    # Slow patient writes so duplicates arrive while the first one is in flight.
+    emu = LocalDynamo(latency=lambda op: 0.1 if op == "UpdateItem" else 0.0)
+    emu.create_table("me", "patientId")
+    emu.create_table("idem", "id")
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+    monkeypatch.setenv("TABLE_NAME", "me")
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_TABLE", "idem")
+    return patient_handler.handler, emu
+
+
+def _put(body, key="k-1"):
+    return {
+        "requestContext": {
+            "http": {"method": "PUT"},
+            "authorizer": {"jwt": {"claims": {"email": "a@b.c"}}},
+        },
+        "headers": {"Idempotency-Key": key},
+        "body": json.dumps(body),
+    }
+
+
+def _version(emu):
+    return emu.resource().Table("me").get_item(Key={"patientId": "a@b.c"})["Item"]["version"]
+
+
+def test_concurrent_duplicates_coalesce_into_one_write(setup):
+    handle, emu = setup
+    responses = []
+
+    def send():
+        responses.append(handle(_put({"diagnosis": "flu"}), None))
+
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [r["statusCode"] for r in responses] == [200] * 8
+    assert len({r["body"] for r in responses}) == 1
+    replayed = [r for r in responses if r["headers"].get("idempotent-replayed") == "true"]
+    assert len(replayed) == 7
+    assert _version(emu) == 1
+
+    cache.backend.clear()  # another container: replayed from the table
+    again = handle(_put({"diagnosis": "flu"}), None)
+    assert again["body"] == responses[0]["body"] and _version(emu) == 1
+
+
+def test_key_reuse_with_other_body_and_release_on_failure(setup, monkeypatch):
+    handle, emu = setup
+    assert handle(_put({"diagnosis": "flu"}), None)["statusCode"] == 200
+    assert handle(_put({"diagnosis": "cold"}), None)["statusCode"] == 422
+
+    import handlers.patient_handler as patient_handler
+
+    def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(patient_handler, "_put", broken)
+    with pytest.raises(RuntimeError):
+        handle(_put({"diagnosis": "cold"}, key="k-2"), None)
+    monkeypatch.undo()
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+    monkeypatch.setenv("TABLE_NAME", "me")
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_TABLE", "idem")
+    assert handle(_put({"diagnosis": "cold"}, key="k-2"), None)["statusCode"] == 200
+    assert _version(emu) == 2
+
+
+def test_stuck_claim_answers_409_after_waiting(setup, monkeypatch):
+    _, emu = setup
+    store = idempotency.IdempotencyStore(emu.client(), "idem", wait=0.1)
+    assert store.claim("k", idempotency.fingerprint("{}")) is None
+    resp = idempotency.run(store, "k", "{}", lambda: pytest.fail("must not run"))
+    assert resp["statusCode"] == 409 and resp["headers"]["Retry-After"] == "1"
+
+    expired = idempotency.IdempotencyStore(emu.client(), "idem", lock_seconds=-1)
+    assert expired.claim("stale", "f") is None
+    assert expired.claim("stale", "f") is None  # dead owner's claim is taken over
+
+
+def test_storing_the_response_is_retried_after_the_write(setup, monkeypatch):
+    _, emu = setup
+    store = idempotency.IdempotencyStore(emu.client(), "idem")
+    complete, failures = store.complete, iter([True, True])
+
+    def flaky(key, response):
+        if next(failures, False):
+            raise ClientError({"Error": {"Code": "InternalServerError"}}, "UpdateItem")
+        complete(key, response)
+
+    monkeypatch.setattr(store, "complete", flaky)
+    runs = []
+    ok = {"statusCode": 200, "headers": {}, "body": "{}"}
+    assert idempotency.run(store, "k", "{}", lambda: runs.append(1) or ok) == ok
+    cache.backend.clear()  # another container: replayed from the table
+    again = idempotency.run(store, "k", "{}", lambda: runs.append(1) or ok)
+    assert again["headers"]["idempotent-replayed"] == "true" and runs == [1]
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+import dev_jwt  # noqa: E402
+from lib import auth  # noqa: E402
+
+
+@lru_cache(maxsize=None)
+def _key(kid: str = "k1"):
+    return dev_jwt.generate_key(1024, seed=sum(map(ord, kid)), kid=kid)
+
+
+def _jwks(*kids):
+    return auth.JwksCache(fetch=lambda: dev_jwt.jwks([_key(k) for k in kids]))
+
+
+def test_miller_rabin_and_signature_roundtrip():
+    rng = __import__("random").Random(1)
+    assert dev_jwt.is_probable_prime(2**127 - 1, rng)
+    assert not dev_jwt.is_probable_prime(561, rng)  # Carmichael number
+    token = dev_jwt.sign(_key(), dev_jwt.claims_for("u1", "a@b.c", ["Admin"]))
+    claims = auth.verify_token(token, _jwks("k1"), auth.VerifiedTokenCache())
+    assert claims["sub"] == "u1" and claims["cognito:groups"] == ["Admin"]
+
+
+def test_rejects_tampering_expiry_audience_and_alg():
+    jwks, cache = _jwks("k1"), auth.VerifiedTokenCache()
+    token = dev_jwt.sign(_key(), dev_jwt.claims_for("u1", audience="client-a"))
+    header, payload, sig = token.split(".")
+    forged = dev_jwt.sign(_key(), dev_jwt.claims_for("admin")).split(".")[1]
+    with pytest.raises(auth.TokenError, match="signature"):
+        auth.verify_token(f"{header}.{forged}.{sig}", jwks, cache)
+    with pytest.raises(auth.TokenError, match="expired"):
+        auth.verify_token(token, jwks, cache, now=10**11)
+    with pytest.raises(auth.TokenError, match="audience"):
+        auth.verify_token(token, jwks, cache, audience="client-b")
+    none_alg = auth.base64.urlsafe_b64encode(b'{"alg":"none"}').decode().rstrip("=")
+    with pytest.raises(auth.TokenError, match="algorithm"):
+        auth.verify_token(f"{none_alg}.{payload}.", jwks, cache)
+    with pytest.raises(auth.TokenError, match="Malformed"):
+        auth.verify_token("not-a-jwt", jwks, cache)
+    assert len(cache) == 0
+
+
+def test_cache_hit_skips_rsa_until_exp(monkeypatch):
+    jwks, cache = _jwks("k1"), auth.VerifiedTokenCache(max_size=2)
+    claims = dev_jwt.claims_for("u1", ttl=100)
+    token = dev_jwt.sign(_key(), claims)
+    auth.verify_token(token, jwks, cache, now=claims["iat"])
+
+    def boom(*args):
+        raise AssertionError("signature checked again")
+
+    monkeypatch.setattr(auth, "rsa_pkcs1_sha256_verify", boom)
+    assert auth.verify_token(token, jwks, cache, now=claims["iat"] + 50)["sub"] == "u1"
+    with pytest.raises(AssertionError):
+        auth.verify_token(token, jwks, cache, now=claims["exp"] + auth.JWT_LEEWAY_SECONDS)
+
+
+def test_unknown_kid_refreshes_once_per_interval():
+    kids = ["k1"]
+    jwks = auth.JwksCache(fetch=lambda: dev_jwt.jwks([_key(k) for k in kids]))
+    cache = auth.VerifiedTokenCache()
+    auth.verify_token(dev_jwt.sign(_key("k1"), dev_jwt.claims_for("u")), jwks, cache)
+    kids.append("k2")
+    rotated = dev_jwt.sign(_key("k2"), dev_jwt.claims_for("u"))
+    with pytest.raises(auth.TokenError, match="Unknown"):
+        auth.verify_token(rotated, jwks, cache)
+    assert jwks.fetches == 1
+
+    jwks.min_refresh_seconds = 0
+    assert auth.verify_token(rotated, jwks, cache)["sub"] == "u"
+    assert jwks.fetches == 2
+
+
+def test_admin_handler_accepts_bearer_token_without_authorizer(monkeypatch, tmp_path):
+    import json
+
+    import handlers.admin_diseases as diseases
+    import lib.db
+
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(dev_jwt.jwks([_key()])))
+    monkeypatch.setattr(auth, "JWT_VERIFY", True)
+    monkeypatch.setattr(auth, "_jwks", auth.JwksCache(path=str(path)))
+    monkeypatch.setattr(auth, "_verified", auth.VerifiedTokenCache())
+    monkeypatch.setattr(lib.db, "scan_pages", lambda attributes: iter([]))
+
+    admin = dev_jwt.sign(_key(), dev_jwt.claims_for("a", groups=["Admin"]))
+    patient = dev_jwt.sign(_key(), dev_jwt.claims_for("p", groups=["GroupPatients"]))
+    ok = diseases.lambda_handler({"headers": {"authorization": f"Bearer {admin}"}}, None)
+    denied = diseases.lambda_handler({"headers": {"authorization": f"Bearer {patient}"}}, None)
+    bad = diseases.lambda_handler({"headers": {"authorization": "Bearer x.y.z"}}, None)
+    assert (ok["statusCode"], denied["statusCode"], bad["statusCode"]) == (200, 403, 403)
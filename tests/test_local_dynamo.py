@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.local_dynamo import LocalDynamo
+
+
+def _emulator(n: int = 300, **kw) -> LocalDynamo:
+    emu = LocalDynamo(**kw)
+    emu.create_table(
+        "patients",
+        "patientId",
+        [
+            {
+                "patientId": f"p{i:04d}",
+                "status": "active" if i % 3 else "inactive",
+                "notes": "x" * 900,
+            }
+            for i in range(n)
+        ],
+    )
+    return emu
+
+
+def _scan_all(table, **kw):
+    pages, items = 0, []
+    while True:
+        resp = table.scan(**kw)
+        pages += 1
+        items.extend(resp.get("Items", []))
+        if "LastEvaluatedKey" not in resp:
+            return pages, items
+        kw["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def test_scan_pages_at_one_megabyte_and_limit():
+    table = _emulator(3000).resource().Table("patients")
+    pages, items = _scan_all(table)
+    assert pages == 3 and len(items) == 3000
+    pages, items = _scan_all(table, Limit=1000)
+    assert pages == 3 and len({it["patientId"] for it in items}) == 3000
+
+
+def test_scan_resumes_after_a_deleted_start_key():
+    table = _emulator().resource().Table("patients")
+    first = table.scan(Limit=100)
+    last = first["LastEvaluatedKey"]
+    table.delete_item(Key=last)
+    rest = []
+    kw = {"ExclusiveStartKey": last}
+    while True:
+        resp = table.scan(**kw)
+        rest.extend(it["patientId"] for it in resp["Items"])
+        if "LastEvaluatedKey" not in resp:
+            break
+        kw["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    ids = [it["patientId"] for it in first["Items"]] + rest
+    assert len(ids) == len(set(ids)) == 300
+
+
+def test_segments_partition_and_projection_and_count():
+    emu = _emulator()
+    table = emu.resource().Table("patients")
+    seen = []
+    for seg in range(4):
+        _, items = _scan_all(
+            table,
+            Segment=seg,
+            TotalSegments=4,
+            ProjectionExpression="#p",
+            ExpressionAttributeNames={"#p": "patientId"},
+        )
+        assert all(set(it) == {"patientId"} for it in items)
+        seen.extend(it["patientId"] for it in items)
+    assert sorted(seen) == [f"p{i:04d}" for i in range(300)]
+
+    resp = table.scan(
+        Select="COUNT",
+        FilterExpression="#s = :v",
+        ExpressionAttributeNames={"#s": "status"},
+        ExpressionAttributeValues={":v": "inactive"},
+    )
+    assert resp["Count"] == 100 and resp["ScannedCount"] == 300 and "Items" not in resp
+
+
+def test_consumed_capacity_and_client_api_types():
+    emu = _emulator(10)
+    client = emu.client()
+    resp = client.get_item(
+        TableName="patients", Key={"patientId": {"S": "p0001"}}, ReturnConsumedCapacity="TOTAL"
+    )
+    assert resp["Item"]["status"] == {"S": "active"}
+    assert resp["ConsumedCapacity"] == {
+        "TableName": "patients",
+        "CapacityUnits": 0.5,
+        "ReadCapacityUnits": 0.5,
+    }
+    resp = client.scan(TableName="patients", ReturnConsumedCapacity="TOTAL", ConsistentRead=True)
+    assert resp["ConsumedCapacity"]["CapacityUnits"] == 3.0
+    assert emu.read_units["patients"] == 3.5
+
+
+def test_update_expressions_and_conditions():
+    table = _emulator(1).resource().Table("patients")
+    resp = table.update_item(
+        Key={"patientId": "p0000"},
+        UpdateExpression=(
+            "SET #v = if_not_exists(#v, :zero) + :one,"
+            " tags = list_append(if_not_exists(tags, :empty), :t)"
+            " REMOVE notes ADD hits :one"
+        ),
+        ConditionExpression="attribute_not_exists(#v) OR #v = :zero",
+        ExpressionAttributeNames={"#v": "version"},
+        ExpressionAttributeValues={":zero": 0, ":one": 1, ":empty": [], ":t": ["a"]},
+        ReturnValues="ALL_NEW",
+    )
+    attrs = resp["Attributes"]
+    assert attrs["version"] == Decimal(1) and attrs["tags"] == ["a"] and "notes" not in attrs
+    with pytest.raises(ClientError) as exc:
+        table.update_item(
+            Key={"patientId": "p0000"},
+            UpdateExpression="SET #v = :one",
+            ConditionExpression="#v = :zero",
+            ExpressionAttributeNames={"#v": "version"},
+            ExpressionAttributeValues={":zero": 0, ":one": 1},
+        )
+    assert exc.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    with pytest.raises(TypeError):
+        table.put_item(Item={"patientId": "p1", "bmi": 1.5})
+
+
+def test_batch_unprocessed_throttling_and_patching():
+    emu = _emulator(50, unprocessed_rate=0.3, seed=1)
+    client = emu.client()
+    keys = [{"patientId": {"S": f"p{i:04d}"}} for i in range(50)]
+    resp = client.batch_get_item(RequestItems={"patients": {"Keys": keys}})
+    got = len(resp["Responses"]["patients"])
+    assert 0 < got < 50 and got + len(resp["UnprocessedKeys"]["patients"]["Keys"]) == 50
+    with pytest.raises(ClientError):
+        client.batch_write_item(
+            RequestItems={"patients": [{"PutRequest": {"Item": k}} for k in keys]}
+        )
+
+    throttled = _emulator(1, throttle_rate=1.0)
+    with pytest.raises(ClientError) as exc:
+        throttled.client().get_item(TableName="patients", Key={"patientId": {"S": "p0000"}})
+    assert exc.value.response["Error"]["Code"] == "ProvisionedThroughputExceededException"
+
+    import boto3
+
+    with emu.patch_boto3():
+        table = boto3.resource("dynamodb").Table("patients")
+        assert table.get_item(Key={"patientId": "p0002"})["Item"]["patientId"] == "p0002"
+    assert emu.calls["GetItem"] == 1
+
+
+def test_handlers_run_against_emulator(monkeypatch):
+    import lib.db
+    import handlers.admin_diseases as diseases
+    import handlers.patient_handler as patient_handler
+
+    emu = LocalDynamo()
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {
+                "patient_id": f"id-{i}",
+                "date_of_birth": "1980-01-01",
+                "diseases": ["asthma"],
+                "notes": "n" * 1000,
+            }
+            for i in range(2500)
+        ],
+    )
+    emu.create_table("me", "patientId", [{"patientId": "a@b.c", "diagnosis": "flu"}])
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+    monkeypatch.setenv("TABLE_NAME", "me")
+
+    admin = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+    resp = diseases.lambda_handler(admin, None)
+    assert resp["statusCode"] == 200 and '"asthma": 2500' in resp["body"]
+    assert emu.calls["Scan"] == 3
+
+    me = {"requestContext": {"authorizer": {"jwt": {"claims": {"email": "a@b.c"}}}}}
+    assert '"diagnosis": "flu"' in patient_handler.handler(me, None)["body"]
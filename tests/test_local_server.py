@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import local_server  # noqa: E402
+from benchmarks.local_dynamo import LocalDynamo  # noqa: E402
+
+ADMIN = {"sub": "admin-1", "email": "admin@example.com", "cognito:groups": "Admin"}
+
+
+async def _drain(tasks):
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def serve():
+    started = []
+
+    def start(server: local_server.LocalServer) -> int:
+        loop = asyncio.new_event_loop()
+        srv = loop.run_until_complete(server.start("127.0.0.1", 0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        started.append((loop, srv, thread, server))
+        return srv.sockets[0].getsockname()[1]
+
+    yield start
+    for loop, srv, thread, server in started:
+        loop.call_soon_threadsafe(srv.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(_drain(pending))
+        loop.close()
+        server.close()
+
+
+def _request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, dict(resp.getheaders()), data
+
+
+def test_build_event_matches_http_api_v2_shape():
+    event = local_server.build_event(
+        "GET",
+        "/admin/diseases?min_age=30&tag=a&tag=b",
+        [("Host", "x"), ("Cookie", "a=1; b=2"), ("X-Trace", "1"), ("x-trace", "2")],
+        b"",
+        "GET /admin/diseases",
+        ADMIN,
+    )
+    assert event["version"] == "2.0" and event["routeKey"] == "GET /admin/diseases"
+    assert event["queryStringParameters"] == {"min_age": "30", "tag": "a,b"}
+    assert event["headers"] == {"host": "x", "x-trace": "1,2"}
+    assert event["cookies"] == ["a=1", "b=2"]
+    assert event["requestContext"]["http"]["method"] == "GET"
+    assert event["requestContext"]["authorizer"]["jwt"]["claims"] == ADMIN
+    assert "body" not in event
+
+
+def test_handlers_served_with_claims_concurrency_and_metrics(serve, monkeypatch):
+    import lib.db
+
+    emu = LocalDynamo()
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {"patient_id": f"p{i}", "date_of_birth": "1980-01-01", "diseases": ["flu"]}
+            for i in range(50)
+        ],
+    )
+    emu.create_table("me", "patientId")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("TABLE_NAME", "me")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+
+    def slow(event, context):
+        time.sleep(0.2)
+        return {"remaining": context.get_remaining_time_in_millis() > 0}
+
+    routes = {k: local_server.resolve(v) for k, v in local_server.ROUTES.items()}
+    routes["GET /slow"] = slow
+    port = serve(local_server.LocalServer(routes, claims=ADMIN, workers=8))
+
+    with emu.patch_boto3():
+        status, _, body = _request(port, "GET", "/admin/diseases?min_age=30")
+        assert status == 200 and json.loads(body) == {"diseases": {"flu": 50}}
+
+        user = json.dumps({"sub": "u1", "email": "a@b.c"})
+        status, headers, body = _request(
+            port, "PUT", "/me/record", json.dumps({"diagnosis": "flu"}), {"X-Local-Claims": user}
+        )
+        assert status == 200 and headers["etag"] == '"1"'
+        status, _, body = _request(port, "GET", "/me/record", headers={"X-Local-Claims": user})
+        assert json.loads(body)["diagnosis"] == "flu"
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: _request(port, "GET", "/slow"), range(8)))
+    assert time.perf_counter() - t0 < 1.0  # 8 x 0.2 s ran in parallel
+    assert all(json.loads(r[2]) == {"remaining": True} for r in results)
+
+    assert _request(port, "GET", "/nope")[0] == 404
+    assert _request(port, "DELETE", "/me/record")[0] == 405
+
+    status, _, text = _request(port, "GET", "/metrics")
+    metrics = text.decode()
+    assert 'handler_request_duration_seconds_count{route="GET /slow"} 8' in metrics
+    assert 'handler_request_duration_seconds_bucket{route="GET /slow",le="0.1"} 0' in metrics
+    assert 'handler_requests_total{route="PUT /me/record",status="200"} 1' in metrics
+
+
+def test_keep_alive_and_handler_errors(serve):
+    def boom(event, context):
+        raise RuntimeError("boom")
+
+    port = serve(
+        local_server.LocalServer({"GET /ok": lambda e, c: {"statusCode": 204}, "GET /boom": boom})
+    )
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    for _ in range(3):
+        conn.request("GET", "/ok")
+        resp = conn.getresponse()
+        resp.read()
+        assert resp.status == 204
+    conn.request("GET", "/boom")
+    resp = conn.getresponse()
+    assert resp.status == 500 and json.loads(resp.read()) == {"message": "Internal Server Error"}
+    conn.close()
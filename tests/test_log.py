@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+
+from lib import log, timing
+
+
+def _records(out: str):
+    return [json.loads(line) for line in out.splitlines() if '"level"' in line]
+
+
+def test_level_filter_skips_lazy_fields(monkeypatch, capsys):
+    monkeypatch.setattr(log, "LEVEL", log.INFO)
+    calls = []
+    log.debug("hidden", expensive=lambda: calls.append(1))
+    log.info("shown", n=lambda: 42, tags={"a"})
+    assert calls == []
+    (record,) = _records(capsys.readouterr().out)
+    assert record["msg"] == "shown" and record["n"] == 42 and record["tags"] == "{'a'}"
+
+
+def test_invocation_context_and_single_buffered_write(monkeypatch, capsys):
+    monkeypatch.setattr(timing, "EMF_ENABLED", False)
+    writes = []
+    monkeypatch.setattr(log, "_write", writes.append)
+
+    @timing.instrumented("patient_me")
+    def handler(event, context):
+        log.info("one")
+        log.bind(patient="p1")
+        log.warning("two")
+        assert writes == []
+        return {"statusCode": 200, "body": ""}
+
+    handler({"routeKey": "GET /patient/me"}, type("Ctx", (), {"aws_request_id": "r-1"})())
+    (chunk,) = writes
+    first, second = _records(chunk)
+    assert first["function"] == "patient_me" and first["route"] == "GET /patient/me"
+    assert first["request_id"] == "r-1" and "cold_start" in first and "patient" not in first
+    assert second["patient"] == "p1" and second["level"] == "WARNING"
+
+
+def test_sampling_is_per_invocation_and_errors_flush(monkeypatch):
+    writes = []
+    monkeypatch.setattr(log, "_write", writes.append)
+    monkeypatch.setattr(log, "SAMPLE_RATES", {log.INFO: 0.0})
+    token = log.begin(function="f")
+    log.info("dropped")
+    log.error("kept", code=500)
+    assert len(writes) == 1 and _records(writes[0])[0]["code"] == 500
+    log.end(token)
+    assert len(writes) == 1
+
+    monkeypatch.setattr(log, "SAMPLE_RATES", {log.INFO: 1.0})
+    token = log.begin(function="f")
+    log.info("a")
+    log.info("b")
+    log.end(token)
+    assert [r["msg"] for r in _records(writes[1])] == ["a", "b"]
+
+
+def test_parse_rates():
+    assert log._parse_rates("debug=0.01, INFO=0.5,bogus=1,WARNING=") == {
+        log.DEBUG: 0.01,
+        log.INFO: 0.5,
+    }
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+
+from benchmarks.local_dynamo import LocalDynamo
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-central-1")
+    import handlers.patient_handler as patient_handler
+
+    emu = LocalDynamo()
+    emu.create_table("me", "patientId")
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+    monkeypatch.setenv("TABLE_NAME", "me")
+    return patient_handler.handler, emu
+
+
+def _event(method, body=None, headers=None):
+    return {
+        "requestContext": {
+            "http": {"method": method},
+            "authorizer": {"jwt": {"claims": {"email": "a@b.c"}}},
+        },
+        "headers": headers or {},
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+def test_put_returns_new_record_and_primes_reads(handler):
+    handle, emu = handler
+    resp = handle(_event("PUT", {"diagnosis": "flu", "updatedAt": "1970-01-01T00:00:00Z"}), None)
+    body = json.loads(resp["body"])
+    assert resp["statusCode"] == 200 and resp["headers"]["etag"] == '"1"'
+    assert body["diagnosis"] == "flu" and body["version"] == 1
+    assert body["updatedAt"].endswith("Z") and not body["updatedAt"].startswith("1970")
+
+    again = handle(_event("GET"), None)
+    assert json.loads(again["body"]) == body
+    assert emu.calls["UpdateItem"] == 1 and emu.calls["GetItem"] == 0
+
+
+def test_stale_version_is_rejected_with_current_record(handler):
+    handle, emu = handler
+    assert handle(_event("PUT", {"diagnosis": "flu", "version": 0}), None)["statusCode"] == 200
+    assert (
+        handle(_event("PUT", {"diagnosis": "cold"}, {"If-Match": '"1"'}), None)["statusCode"] == 200
+    )
+
+    stale = handle(_event("PUT", {"diagnosis": "lost", "version": 1}), None)
+    assert stale["statusCode"] == 409
+    assert json.loads(stale["body"])["current"]["diagnosis"] == "cold"
+    assert json.loads(stale["body"])["current"]["version"] == 2
+    assert handle(_event("PUT", {"diagnosis": "x", "version": 0}), None)["statusCode"] == 409
+    assert handle(_event("PUT", {"diagnosis": "x", "version": "v2"}), None)["statusCode"] == 400
+    assert emu.calls["GetItem"] == 0
+
+
+def test_concurrent_writers_with_same_version_do_not_lose_updates(handler):
+    handle, emu = handler
+    handle(_event("PUT", {"diagnosis": "base"}), None)
+    statuses = []
+
+    def write(i):
+        statuses.append(handle(_event("PUT", {"diagnosis": f"w{i}", "version": 1}), None))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    codes = sorted(r["statusCode"] for r in statuses)
+    assert codes == [200] + [409] * 7
+    (winner,) = [json.loads(r["body"]) for r in statuses if r["statusCode"] == 200]
+    stored = json.loads(handle(_event("GET", headers={"Cache-Control": "no-cache"}), None)["body"])
+    assert stored == winner and stored["version"] == 2
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import lib.db
+from benchmarks.local_dynamo import LocalDynamo
+from lib import aggregate, result_cache
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+
+
+def _born(years: float) -> str:
+    return (date.today() - timedelta(days=round(years * 365.2425))).isoformat()
+
+
+@pytest.fixture
+def emu(monkeypatch):
+    emu = LocalDynamo()
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {
+                "patient_id": f"p{i}",
+                "date_of_birth": _born(5 + i * 0.9),
+                "sex": "F" if i % 2 else "M",
+                "bmi": 20 + i % 7,
+                "diseases": ["flu"] + (["asthma"] if i % 3 == 0 else []),
+                "medications": ["ibuprofen"] if i % 4 == 0 else [],
+            }
+            for i in range(100)
+        ],
+    )
+    emu.create_table("aggs", "aggKey")
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setattr(lib.db, "_dynamodb", emu.resource())
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("AGGREGATES_TABLE", "aggs")
+    monkeypatch.setattr(result_cache.result_cache, "ttl", 0)
+    return emu
+
+
+def _event(**params):
+    return {**ADMIN, "queryStringParameters": params}
+
+
+def test_parse_cohorts_expands_and_quantises():
+    cohorts = aggregate.parse_cohorts("all, decades, 18-65, 65-, -17.999, 18.0-65")
+    assert cohorts[0] == (None, None)
+    assert (30.0, 39.99) in cohorts and (100.0, None) in cohorts
+    assert cohorts[-3:] == [(18.0, 65.0), (65.0, None), (None, 17.99)]
+    assert len(cohorts) == 1 + 11 + 3
+    with pytest.raises(ValueError):
+        aggregate.parse_cohorts("adults")
+
+
+def test_precomputed_cohorts_match_live_results_without_a_scan(emu):
+    from handlers import admin_diseases, admin_medications, admin_overview, precompute_cohorts
+
+    summary = precompute_cohorts.lambda_handler({}, None)
+    assert summary["items"] == 3 * len(aggregate.COHORTS) == len(emu.items("aggs"))
+    assert summary["patients"] == 100
+
+    for handler in (admin_overview, admin_diseases, admin_medications):
+        for params in (
+            {"min_age": "18", "max_age": "65"},
+            {},
+            {"min_age": "30", "max_age": "39.99"},
+        ):
+            scans = emu.calls["Scan"]
+            served = handler.lambda_handler(_event(**params), None)
+            assert emu.calls["Scan"] == scans
+            live = handler.lambda_handler(_event(consistent="true", **params), None)
+            assert emu.calls["Scan"] > scans
+            assert served["statusCode"] == 200 and served["body"] == live["body"]
+            assert served["headers"] == live["headers"]
+
+    body = json.loads(
+        admin_overview.lambda_handler(_event(min_age="18", max_age="65"), None)["body"]
+    )
+    assert body["total_patients"] == sum(18 <= 5 + i * 0.9 <= 65 for i in range(100))
+
+
+def test_stale_or_unknown_cohorts_fall_back_to_a_scan(emu, monkeypatch):
+    from handlers import admin_diseases, precompute_cohorts
+
+    old = datetime.now(timezone.utc) - timedelta(seconds=aggregate.PRECOMPUTE_MAX_AGE + 60)
+    aggregate.store(lib.db.scan_patients(), aggregate.COHORTS, now=old)
+    scans = emu.calls["Scan"]
+    assert (
+        admin_diseases.lambda_handler(_event(min_age="18", max_age="65"), None)["statusCode"] == 200
+    )
+    assert emu.calls["Scan"] == scans + 1
+
+    precompute_cohorts.lambda_handler({}, None)
+    gets, scans = emu.calls["GetItem"], emu.calls["Scan"]
+    admin_diseases.lambda_handler(_event(min_age="21"), None)
+    assert emu.calls["GetItem"] == gets and emu.calls["Scan"] == scans + 1
+
+    item = emu.items("aggs")[0]
+    assert not aggregate.is_fresh({**item, "asOf": "2000-01-01"})
+    assert aggregate.is_fresh(item)
+
+    monkeypatch.setattr(lib.db, "_dynamodb", LocalDynamo().resource())  # no aggregates table
+    assert admin_diseases.lambda_handler(_event(), None)["statusCode"] == 200
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+
+from lib import profiling, timing
+from lib.utils import compute_age_years
+
+
+def _work(event, context):
+    ages = [compute_age_years("1980-05-17") for _ in range(300)]
+    return {"statusCode": 200, "body": json.dumps({"n": len(ages)})}
+
+
+def test_disabled_returns_handler_unchanged(monkeypatch):
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "SECRET", "")
+    assert profiling.profiled("fn")(_work) is _work
+
+
+def test_sampled_invocation_logs_summary(monkeypatch, capsys):
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(timing, "EMF_ENABLED", False)
+    handler = profiling.profiled("fn")(_work)
+    assert handler({}, None)["statusCode"] == 200
+
+    (line,) = [ln for ln in capsys.readouterr().out.splitlines() if ln.startswith('{"profile"')]
+    summary = json.loads(line)["profile"]
+    assert summary["function"] == "fn" and summary["peak_kb"] > 0
+    hot = [row["function"] for row in summary["top_cumulative"]]
+    assert any("compute_age_years" in name for name in hot)
+    assert summary["allocations"] and {"site", "kb", "blocks"} <= set(summary["allocations"][0])
+
+
+def test_signed_header_writes_files_and_calls_upload_hook(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "SECRET", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    uploaded = []
+    profiling.set_upload_hook(lambda paths, summary: uploaded.append(paths))
+    try:
+        handler = profiling.profiled("fn")(_work)
+        handler({"headers": {"x-profile-token": "1.bad"}}, None)
+        assert uploaded == []
+        token = profiling.sign_token("s3cret", "fn", 4_000_000_000)
+        handler({"headers": {"x-profile-token": token}}, None)
+    finally:
+        profiling.set_upload_hook(None)
+
+    (paths,) = uploaded
+    assert sorted(p.rsplit(".", 1)[1] for p in paths) == ["json", "prof"]
+    assert json.loads((tmp_path / paths[0].rsplit("/", 1)[1]).read_text())["function"] == "fn"
+
+
+def test_token_expiry_and_function_binding():
+    token = profiling.sign_token("k", "admin_overview", 100)
+    assert profiling.verify_token("k", "admin_overview", token, now=50)
+    assert not profiling.verify_token("k", "admin_overview", token, now=150)
+    assert not profiling.verify_token("k", "admin_diseases", token, now=50)
+    assert not profiling.verify_token("other", "admin_overview", token, now=50)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+
+from botocore.exceptions import EndpointConnectionError
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import ratelimit
+from lib.ratelimit import RateLimiter, TokenBucket, WindowCounter, parse_limits
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _event(sub: str) -> dict:
+    return {"requestContext": {"authorizer": {"jwt": {"claims": {"sub": sub}}}}}
+
+
+def test_parse_limits_and_defaults():
+    assert parse_limits("read=10/1, scan=2/60,") == {"read": (10, 1.0), "scan": (2, 60.0)}
+    assert ratelimit.LIMITS["scan"][0] / ratelimit.LIMITS["scan"][1] < (
+        ratelimit.LIMITS["read"][0] / ratelimit.LIMITS["read"][1]
+    )
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(capacity=2, rate=0.5, now=0)
+    assert bucket.take(0) == 0 and bucket.take(0) == 0
+    assert bucket.take(0) == 2.0
+    assert bucket.take(1) == 1.0
+    assert bucket.take(2) == 0
+
+
+def test_local_limits_are_per_caller_and_class():
+    clock = Clock()
+    limiter = RateLimiter({"scan": (3, 60), "read": (100, 60)}, clock=clock)
+    assert [limiter.check("a#admin", "scan") for _ in range(3)] == [0, 0, 0]
+    assert limiter.check("a#admin", "scan") == 20.0
+    assert limiter.check("b#admin", "scan") == 0
+    assert all(limiter.check("a#me", "read") == 0 for _ in range(50))
+    assert limiter.check("a#health", "unlisted") == 0
+    clock.now += 20
+    assert limiter.check("a#admin", "scan") == 0
+
+
+def test_shared_window_is_enforced_across_containers_with_leases():
+    emu = LocalDynamo()
+    emu.create_table("rl", "id")
+    clock = Clock(6000.0)  # start of a 60 s window
+    limits = {"read": (100, 60)}
+    containers = [RateLimiter(limits, WindowCounter(emu.client(), "rl"), clock) for _ in range(2)]
+
+    allowed = 0
+    for i in range(300):
+        clock.now += 0.01
+        allowed += containers[i % 2].check("u#me", "read") == 0
+    # Each container's own bucket would allow 100; the shared window caps both together.
+    assert allowed == 100
+    assert emu.calls["UpdateItem"] <= 22  # 20 leases of 5, one refusal per container
+
+    clock.now = 6060.0
+    assert containers[0].check("u#me", "read") == 0
+
+
+def test_counter_outage_fails_open():
+    class Down:
+        def update_item(self, **kw):
+            raise EndpointConnectionError(endpoint_url="http://dynamodb")
+
+    limiter = RateLimiter({"scan": (5, 60)}, WindowCounter(Down(), "rl"))
+    assert limiter.check("u#admin", "scan") == 0
+
+
+def test_decorated_handler_returns_429_without_running(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "_limiter", RateLimiter({"scan": (2, 60)}, clock=Clock()))
+    calls = []
+
+    @ratelimit.rate_limited("admin_overview", "scan")
+    def handler(event, context):
+        calls.append(event)
+        return {"statusCode": 200, "body": "{}"}
+
+    assert [handler(_event("a"), None)["statusCode"] for _ in range(3)] == [200, 200, 429]
+    throttled = handler(_event("a"), None)
+    assert throttled["headers"]["Retry-After"] == "30"
+    assert json.loads(throttled["body"]) == {"message": "Too Many Requests"}
+    assert handler(_event("b"), None)["statusCode"] == 200
+    assert len(calls) == 3
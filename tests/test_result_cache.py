@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, timedelta
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import result_cache
+from lib.result_cache import quantize_bounds, seconds_until_midnight
+
+ADMIN = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+
+
+def _event(**params):
+    return {**ADMIN, "queryStringParameters": {k: str(v) for k, v in params.items()}}
+
+
+def test_quantized_bounds_select_the_same_ages():
+    assert quantize_bounds(30, 40) == (30.0, 40.0)
+    assert quantize_bounds(29.991, 40.009) == (30.0, 40.0)
+    assert quantize_bounds(30.001, None) == (30.01, None)
+    assert quantize_bounds(None, 0.3) == (None, 0.3)
+    ages = [round(i / 100, 2) for i in range(0, 5000, 7)]
+    for lo, hi in [(12.345, 20.001), (0.005, 0.3), (33.3333, 33.34)]:
+        qlo, qhi = quantize_bounds(lo, hi)
+        assert [a for a in ages if lo <= a <= hi] == [a for a in ages if qlo <= a <= qhi]
+
+
+def test_seconds_until_midnight():
+    assert seconds_until_midnight(datetime(2026, 3, 1, 23, 0)) == 3600
+    assert seconds_until_midnight(datetime(2026, 3, 1)) == 24 * 3600
+
+
+def test_default_ttl_is_short_without_a_shared_backend(monkeypatch):
+    import importlib
+
+    from lib import cache
+
+    monkeypatch.delenv("RESULT_CACHE_TTL", raising=False)
+    try:
+        assert importlib.reload(result_cache).RESULT_CACHE_TTL == cache.METRICS_CACHE_TTL
+        monkeypatch.setattr(cache, "backend", object())  # any shared backend
+        assert importlib.reload(result_cache).RESULT_CACHE_TTL == 3600
+    finally:
+        monkeypatch.undo()
+        importlib.reload(result_cache)
+
+
+def test_admin_results_reuse_versioning_and_date_rollover(monkeypatch):
+    import lib.db
+    import handlers.admin_diseases as diseases
+    import handlers.admin_overview as overview
+    import handlers.patient_handler as patient_handler
+
+    emu = LocalDynamo()
+    born = [(date.today() - timedelta(days=365 * age)).isoformat() for age in (20, 35, 50)]
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {"patient_id": f"p{i}", "date_of_birth": dob, "diseases": ["flu"], "sex": "F"}
+            for i, dob in enumerate(born)
+        ],
+    )
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    monkeypatch.setenv("DYNAMODB_TABLE", "records")
+    monkeypatch.setenv("TABLE_NAME", "records")
+    monkeypatch.setattr(patient_handler, "_dynamo", emu.client)
+
+    first = diseases.lambda_handler(_event(min_age=30), None)
+    assert json.loads(first["body"]) == {"diseases": {"flu": 2}}
+    again = diseases.lambda_handler(_event(min_age="29.999", max_age=""), None)
+    assert again["body"] == first["body"]
+    assert emu.calls["Scan"] == 1
+
+    overview.lambda_handler(_event(min_age=30), None)  # other endpoint, own entry
+    assert emu.calls["Scan"] == 2
+    diseases.lambda_handler({**_event(min_age=30), "headers": {"cache-control": "no-cache"}}, None)
+    assert emu.calls["Scan"] == 3
+
+    put = {
+        "requestContext": {
+            "http": {"method": "PUT"},
+            "authorizer": {"jwt": {"claims": {"email": "p0"}}},
+        },
+        "body": json.dumps({"diagnosis": "asthma"}),
+    }
+    monkeypatch.setenv("PK_NAME", "patient_id")
+    assert patient_handler.handler(put, None)["statusCode"] == 200
+    diseases.lambda_handler(_event(min_age=30), None)
+    assert emu.calls["Scan"] == 4
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.fromordinal(date.today().toordinal() + 1)
+
+    monkeypatch.setattr(result_cache, "date", Tomorrow)
+    diseases.lambda_handler(_event(min_age=30), None)
+    assert emu.calls["Scan"] == 5
+
+    rejected = diseases.lambda_handler(_event(min_age=-1), None)
+    assert rejected["statusCode"] == 400 and emu.calls["Scan"] == 5
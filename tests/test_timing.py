@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import time
+
+from lib import timing
+
+
+def _emf_lines(out: str):
+    return [json.loads(line) for line in out.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_emits_one_emf_line_with_phases_counters_and_cold_start(capsys):
+    @timing.instrumented("demo")
+    def handler(event, context):
+        with timing.phase("scan"):
+            time.sleep(0.002)
+        with timing.phase("scan"):
+            pass
+        timing.count("items", 3)
+        return {"statusCode": 200, "body": '{"ok": true}'}
+
+    timing._cold_start = True
+    handler({}, type("Ctx", (), {"aws_request_id": "req-1"})())
+    handler({}, None)
+
+    first, second = _emf_lines(capsys.readouterr().out)
+    directive = first["_aws"]["CloudWatchMetrics"][0]
+    names = {m["Name"]: m["Unit"] for m in directive["Metrics"]}
+    assert directive["Dimensions"] == [["function"]] and first["function"] == "demo"
+    assert names["scan_ms"] == "Milliseconds" and names["response_bytes"] == "Bytes"
+    assert first["scan_ms"] >= 2.0 and first["duration_ms"] >= first["scan_ms"]
+    assert first["items"] == 3 and first["response_bytes"] == 12
+    assert first["status"] == 200 and first["request_id"] == "req-1"
+    assert (first["cold_start"], second["cold_start"]) == (1, 0)
+
+
+def test_server_timing_header_and_noop_outside_invocation(monkeypatch, capsys):
+    monkeypatch.setattr(timing, "SERVER_TIMING", True)
+    with timing.phase("ignored"):
+        timing.count("ignored")
+    assert timing.current() is None
+
+    import handlers.health as health
+
+    resp = health.lambda_handler({}, None)
+    header = resp["headers"]["Server-Timing"]
+    assert header.startswith("total;dur=")
+    (record,) = _emf_lines(capsys.readouterr().out)
+    assert record["function"] == "health" and record["status"] == 200
+
+
+def test_exception_still_emits_and_overhead_is_small(monkeypatch, capsys):
+    @timing.instrumented("boom")
+    def failing(event, context):
+        with timing.phase("auth"):
+            raise RuntimeError("x")
+
+    try:
+        failing({}, None)
+    except RuntimeError:
+        pass
+    (record,) = _emf_lines(capsys.readouterr().out)
+    assert record["status"] is None and "auth_ms" in record
+
+    @timing.instrumented("noop")
+    def noop(event, context):
+        with timing.phase("a"):
+            timing.count("n")
+        return None
+
+    monkeypatch.setattr(timing, "EMF_ENABLED", False)
+    t0 = time.perf_counter()
+    for _ in range(2000):
+        noop({}, None)
+    per_call_us = (time.perf_counter() - t0) / 2000 * 1e6
+    assert per_call_us < 200
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import socket
+
+import pytest
+
+from benchmarks.local_dynamo import LocalDynamo
+from lib import timing, tracing
+
+
+@pytest.fixture
+def collected(monkeypatch):
+    docs = []
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    monkeypatch.setattr(timing, "EMF_ENABLED", False)
+    monkeypatch.delenv("_X_AMZN_TRACE_ID", raising=False)
+    tracing.set_exporter(docs.extend)
+    yield docs
+    tracing.set_exporter(None)
+
+
+def test_disabled_span_is_shared_noop():
+    assert tracing.span("x") is tracing.span("y")
+    assert tracing.start("fn") is None
+    with tracing.span("x") as s:
+        assert s is None
+
+
+def test_handler_spans_nest_under_local_root(collected, monkeypatch):
+    import lib.db
+    import handlers.admin_diseases as diseases
+
+    emu = LocalDynamo()
+    emu.create_table(
+        "records",
+        "patient_id",
+        [
+            {"patient_id": f"id-{i}", "date_of_birth": "1980-01-01", "notes": "n" * 1000}
+            for i in range(1500)
+        ],
+    )
+    monkeypatch.setattr(lib.db, "_table", emu.resource().Table("records"))
+    admin = {"requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}}}
+    assert diseases.lambda_handler(admin, None)["statusCode"] == 200
+
+    by_name = {}
+    for doc in collected:
+        by_name.setdefault(doc["name"], []).append(doc)
+    (root,) = by_name["admin_diseases"]
+    assert "type" not in root and root["trace_id"].startswith("1-")
+    assert {"auth", "scan", "aggregate", "serialize"} <= set(by_name)
+    (scan,) = by_name["scan"]
+    pages = by_name["DynamoDB.Scan"]
+    assert len(pages) == 2 and all(p["parent_id"] == scan["id"] for p in pages)
+    assert all(p["namespace"] == "aws" for p in pages)
+    assert scan["parent_id"] == root["id"]
+    assert {doc["trace_id"] for doc in collected} == {root["trace_id"]}
+    assert all(d["start_time"] <= d["end_time"] for d in collected)
+
+
+def test_lambda_trace_header_and_sampling(collected, monkeypatch):
+    @timing.instrumented("fn")
+    def handler(event, context):
+        with tracing.span("work", size=3):
+            pass
+        return {"statusCode": 200, "body": ""}
+
+    monkeypatch.setenv("_X_AMZN_TRACE_ID", "Root=1-abc-def;Parent=53995c3f42cd8ad8;Sampled=1")
+    handler({}, None)
+    (doc,) = collected
+    assert doc["trace_id"] == "1-abc-def" and doc["parent_id"] == "53995c3f42cd8ad8"
+    assert doc["type"] == "subsegment" and doc["metadata"] == {"default": {"size": 3}}
+
+    collected.clear()
+    monkeypatch.setenv("_X_AMZN_TRACE_ID", "Root=1-abc-def;Parent=53995c3f42cd8ad8;Sampled=0")
+    handler({}, None)
+    assert collected == []
+
+
+def test_send_udp_uses_daemon_framing():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(2)
+        port = server.getsockname()[1]
+        tracing.send_udp([{"name": "x"}], f"tcp:127.0.0.1:1 udp:127.0.0.1:{port}")
+        header, body = server.recv(65536).split(b"\n", 1)
+    assert json.loads(header) == {"format": "json", "version": 1}
+    assert json.loads(body) == {"name": "x"}
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import handlers.admin_overview as overview
+from lib.columnar import PatientColumns
 
 
 def test_overview_400_on_invalid_bounds(monkeypatch):
-    monkeypatch.setattr(overview, "scan_patients", lambda: [])
+    monkeypatch.setattr(overview, "scan_columns", PatientColumns)
     event = {
         "requestContext": {"authorizer": {"jwt": {"claims": {"cognito:groups": "Admin"}}}},
         "queryStringParameters": {"min_age": "60", "max_age": "20"},